@@ -110,6 +110,8 @@ def get_admin_conversation_states(admin_handlers):
             CallbackQueryHandler(admin_handlers.att_daily_chart, pattern="^att_daily_chart_\\d+$"),
             CallbackQueryHandler(admin_handlers.att_download_csv, pattern="^att_download_csv_\\d+$"),
             CallbackQueryHandler(admin_handlers.weapon_details, pattern="^weapon_details_\\d+$"),
+            CallbackQueryHandler(admin_handlers.view_search_aliases, pattern="^analytics_search_aliases$"),
+            CallbackQueryHandler(admin_handlers.review_search_alias, pattern="^alias_(approve|reject)_\\d+$"),
             # CMS
             CallbackQueryHandler(admin_handlers.cms_menu, pattern="^admin_cms$"),
             CallbackQueryHandler(admin_handlers.cms_add_start, pattern="^cms_add$"),
@@ -23,6 +23,7 @@ from handlers.user.modules.cms.cms_handler import CMSUserHandler
 from handlers.user.modules.categories.weapon_handler import WeaponHandler
 from handlers.user.modules.attachments.top_handler import TopAttachmentsHandler
 from handlers.user.modules.attachments.all_handler import AllAttachmentsHandler
+from handlers.user.modules.attachments.trending_handler import TrendingNowHandler
 from utils.subscribers_pg import SubscribersPostgres
 
 from handlers.user import SEARCHING
@@ -62,6 +63,7 @@ class UserHandlerRegistry(BaseHandlerRegistry):
         self.top_handler = TopAttachmentsHandler(self.db)
         self.all_handler = AllAttachmentsHandler(self.db)
         self.season_handler = SeasonTopHandler(self.db)
+        self.trending_handler = TrendingNowHandler(self.db)
         self.suggested_handler = SuggestedHandler(self.db)
         self.guides_handler = GuidesHandler(self.db)
         self.cms_user_handler = CMSUserHandler(self.db)
@@ -120,6 +122,9 @@ class UserHandlerRegistry(BaseHandlerRegistry):
         self.application.add_handler(MessageHandler(filters.Regex('^⚙️ تنظیمات کالاف$'), self.guides_handler.game_settings_menu))
         self.application.add_handler(MessageHandler(filters.Regex('^⚙️ تنظیمات بازی$'), self.guides_handler.game_settings_menu))
         self.application.add_handler(MessageHandler(filters.Regex('^⚙️ Game Settings$'), self.guides_handler.game_settings_menu))
+        # ترندهای الان (شمارنده حافظه‌ای ترندینگ)
+        self.application.add_handler(MessageHandler(filters.Regex('^🔥 ترندهای الان$'), self.trending_handler.trending_now_msg))
+        self.application.add_handler(MessageHandler(filters.Regex('^🔥 Trending Now$'), self.trending_handler.trending_now_msg))
         # تنظیمات ربات (کاربر)
         self.application.add_handler(MessageHandler(filters.Regex('^⚙️ تنظیمات ربات$'), self.language_handler.open_user_settings))
         self.application.add_handler(MessageHandler(filters.Regex('^⚙️ Bot Settings$'), self.language_handler.open_user_settings))
@@ -283,6 +288,10 @@ class UserHandlerRegistry(BaseHandlerRegistry):
         # صفحه‌بندی و جزئیات
         self.application.add_handler(CallbackQueryHandler(self.season_handler.season_top_list_page_navigation, pattern="^slist_page_"))
         self.application.add_handler(CallbackQueryHandler(self.season_handler.season_top_item_detail, pattern="^satt_"))
+        
+        # ترندهای الان
+        self.application.add_handler(CallbackQueryHandler(self.trending_handler.trending_now, pattern="^trending_now$"))
+        self.application.add_handler(CallbackQueryHandler(self.trending_handler.trending_item_detail, pattern=r"^trend_att_\d+$"))
     
     def _register_suggested_handlers(self):
         """ثبت handlers اتچمنت‌های پیشنهادی"""
@@ -0,0 +1,247 @@
+"""
+Local stand-in for the Telegram Bot API
+=======================================
+A small aiohttp server that answers ``getMe``, ``sendMessage`` and
+``sendPhoto`` like api.telegram.org so broadcaster changes can be measured
+without messaging real users. Point a bot at it with
+``ExtBot(token, base_url=f"{server.base_url}/bot")``.
+
+Simulated behaviour (all deterministic for a given seed):
+    - latency:      log-normal around --latency-ms (sigma --latency-sigma)
+    - flood limit:  more than --flood-limit sends in any 1s window -> 429 retry_after
+    - random 429:   --retry-after-rate fraction of sends -> 429 retry_after
+    - blocked:      --blocked-rate fraction of chat ids -> 403 "bot was blocked by the user"
+    - timeouts:     --timeout-rate fraction of sends hang for --timeout-seconds
+
+Requires aiohttp (not a bot dependency): pip install aiohttp
+
+Standalone usage:
+    python benchmarks/broadcast/fake_bot_api.py --port 8081 --flood-limit 30
+"""
+
+import asyncio
+import argparse
+import json
+import math
+import random
+import socket
+import sys
+import time
+from collections import Counter, deque
+from typing import Dict, Optional
+
+try:
+    from aiohttp import web
+except ImportError:  # benchmark-only dependency
+    web = None
+
+SEND_METHODS = {'sendMessage', 'sendPhoto'}
+
+
+class FakeBotAPI:
+    """شبیه‌ساز endpointهای ارسال Bot API با تاخیر، 429، کاربر blocked و timeout"""
+
+    def __init__(
+        self,
+        latency_ms: float = 40.0,
+        latency_sigma: float = 0.5,
+        flood_limit: int = 0,
+        flood_retry_after: int = 1,
+        retry_after_rate: float = 0.0,
+        blocked_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 30.0,
+        seed: int = 42,
+    ):
+        if web is None:
+            raise RuntimeError("aiohttp is required for the fake Bot API: pip install aiohttp")
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.flood_limit = flood_limit
+        self.flood_retry_after = flood_retry_after
+        self.retry_after_rate = retry_after_rate
+        self.blocked_rate = blocked_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._window: deque = deque()
+        self._message_id = 0
+        self.stats: Counter = Counter()
+        self.attempts_per_chat: Counter = Counter()
+        self._runner: Optional["web.AppRunner"] = None
+        self.base_url: Optional[str] = None
+
+    def reset(self) -> None:
+        """پاک کردن آمار بین دو سناریو"""
+        self._rng = random.Random(self.seed)
+        self._window.clear()
+        self.stats.clear()
+        self.attempts_per_chat.clear()
+
+    def is_blocked(self, chat_id: int) -> bool:
+        # hash ضربی تا مجموعه blocked برای هر اجرا ثابت باشد
+        return ((chat_id * 2654435761) % 2 ** 32) / 2 ** 32 < self.blocked_rate
+
+    def summary(self) -> Dict:
+        unique = len(self.attempts_per_chat)
+        requests = self.stats['requests']
+        return {
+            'requests': requests,
+            'unique_chats': unique,
+            'delivered': self.stats['delivered'],
+            'retry_after_429': self.stats['429'],
+            'blocked_403': self.stats['403'],
+            'timeouts': self.stats['timeout'],
+            'retry_overhead_pct': round((requests - unique) / unique * 100, 2) if unique else 0.0,
+        }
+
+    # ==================== HTTP ====================
+
+    def _reply(self, result=None, status: int = 200, description: str = None, parameters: dict = None):
+        body = {'ok': status == 200}
+        if status == 200:
+            body['result'] = result
+        else:
+            body['error_code'] = status
+            body['description'] = description
+            if parameters:
+                body['parameters'] = parameters
+        return web.json_response(body, status=status)
+
+    def _flooded(self, now: float) -> bool:
+        if not self.flood_limit:
+            return False
+        while self._window and self._window[0] <= now - 1.0:
+            self._window.popleft()
+        if len(self._window) >= self.flood_limit:
+            return True
+        self._window.append(now)
+        return False
+
+    async def _handle(self, request: "web.Request"):
+        method = request.match_info['method']
+        if method == 'getMe':
+            return self._reply({
+                'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot',
+                'can_join_groups': False, 'can_read_all_group_messages': False,
+                'supports_inline_queries': False,
+            })
+        if method not in SEND_METHODS:
+            return self._reply(True)
+
+        data = await request.post()
+        chat_id = int(data.get('chat_id', 0))
+        self.stats['requests'] += 1
+        self.attempts_per_chat[chat_id] += 1
+
+        # Telegram سرریز را بدون تاخیر پردازش رد می‌کند
+        if self._flooded(time.monotonic()) or self._rng.random() < self.retry_after_rate:
+            self.stats['429'] += 1
+            return self._reply(
+                status=429,
+                description=f"Too Many Requests: retry after {self.flood_retry_after}",
+                parameters={'retry_after': self.flood_retry_after},
+            )
+
+        await asyncio.sleep(self._rng.lognormvariate(math.log(self.latency_ms / 1000.0), self.latency_sigma))
+
+        if self._rng.random() < self.timeout_rate:
+            self.stats['timeout'] += 1
+            await asyncio.sleep(self.timeout_seconds)
+
+        if self.is_blocked(chat_id):
+            self.stats['403'] += 1
+            return self._reply(status=403, description="Forbidden: bot was blocked by the user")
+
+        self.stats['delivered'] += 1
+        self._message_id += 1
+        message = {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+        }
+        if method == 'sendPhoto':
+            message['photo'] = [{'file_id': 'bench', 'file_unique_id': 'bench', 'width': 1, 'height': 1}]
+            if data.get('caption'):
+                message['caption'] = data['caption']
+        else:
+            message['text'] = data.get('text', '')
+        return self._reply(message)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """راه‌اندازی سرور؛ base_url (بدون /bot) برگردانده می‌شود"""
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # port=0: پورت آزاد؛ socket از قبل bind می‌شود تا پورت واقعی معلوم باشد
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        site = web.SockSite(self._runner, sock)
+        await site.start()
+        self.base_url = f"http://{host}:{sock.getsockname()[1]}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """آرگومان‌های مشترک شبیه‌سازی (برای run_benchmark.py هم استفاده می‌شود)"""
+    parser.add_argument('--latency-ms', type=float, default=40.0, help="median send latency")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="log-normal sigma of latency")
+    parser.add_argument('--flood-limit', type=int, default=0, help="sends per second before 429 (0 = off)")
+    parser.add_argument('--flood-retry-after', type=int, default=1, help="retry_after returned with 429")
+    parser.add_argument('--retry-after-rate', type=float, default=0.0, help="fraction of random 429s")
+    parser.add_argument('--blocked-rate', type=float, default=0.0, help="fraction of blocked chat ids")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="fraction of hanging sends")
+    parser.add_argument('--timeout-seconds', type=float, default=30.0, help="how long a hanging send hangs")
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def server_from_args(args: argparse.Namespace) -> FakeBotAPI:
+    return FakeBotAPI(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        flood_limit=args.flood_limit,
+        flood_retry_after=args.flood_retry_after,
+        retry_after_rate=args.retry_after_rate,
+        blocked_rate=args.blocked_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for broadcast benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    if web is None:
+        sys.exit("aiohttp is required: pip install aiohttp")
+
+    async def serve():
+        server = server_from_args(args)
+        url = await server.start(args.host, args.port)
+        print(f"Fake Bot API listening on {url} (base_url={url}/bot)", file=sys.stderr)
+        try:
+            while True:
+                await asyncio.sleep(10)
+                print(json.dumps(server.summary()), file=sys.stderr)
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Synthetic catalog generator for search benchmarks
+==================================================
+Builds categories, weapons and attachments with mixed Persian/English names
+at a given scale factor (1x ≈ the production catalog), plus a query mix that
+resembles real user searches (exact names, prefixes, codes, typos, misses).
+
+Everything is deterministic for a given seed so runs are comparable across
+commits.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple
+
+# Categories are a fixed enum in config.WEAPON_CATEGORIES; only their
+# display names are synthetic here.
+CATEGORIES: List[Tuple[str, str]] = [
+    ('assault_rifle', 'تفنگ تهاجمی'),
+    ('smg', 'مسلسل دستی'),
+    ('lmg', 'مسلسل سبک'),
+    ('sniper', 'تک‌تیرانداز'),
+    ('marksman', 'نیمه‌خودکار'),
+    ('shotgun', 'شاتگان'),
+    ('pistol', 'کلت'),
+    ('launcher', 'موشک‌انداز'),
+]
+
+BASE_WEAPONS: Dict[str, List[str]] = {
+    'assault_rifle': ['AK-47', 'M4', 'Type 25', 'ASM10', 'BK57', 'HBRa3', 'Krig 6', 'Grau 5.56'],
+    'smg': ['MP5', 'QQ9', 'Fennec', 'PDW-57', 'CBR4', 'Switchblade X9', 'MAC-10', 'Cordite'],
+    'lmg': ['RPD', 'M4LMG', 'Holger 26', 'UL736', 'Chopper', 'Hades', 'PKM', 'Bruen MK9'],
+    'sniper': ['DL Q33', 'Locus', 'Arctic .50', 'XPR-50', 'Outlaw', 'ZRG 20mm', 'HDR', 'Rytec AMR'],
+    'marksman': ['Kilo Bolt-Action', 'SKS', 'SP-R 208', 'MK2', 'Type 63', 'M21 EBR', 'Tundra', 'Lapa'],
+    'shotgun': ['HS0405', 'BY15', 'Striker', 'Echo', 'R9-0', 'JAK-12', 'KRM-262', 'Argus'],
+    'pistol': ['J358', 'MW11', '.50 GS', 'Renetti', 'Shorty', 'Dobvra', 'L-CAR 9', 'Crossbow'],
+    'launcher': ['SMRS', 'FHJ-18', 'Thumper', 'D13 Sector', 'Strela-P', 'RPG-7', 'JOKR', 'Cigma 2B'],
+}
+
+VARIANT_SUFFIXES = ['Mk2', 'Tactical', 'Ghost', 'Elite', 'طرح ویژه', 'نسخه فصل', 'Prime', 'Vortex']
+
+ATTACHMENT_SLOTS = [
+    'Monolithic Suppressor', 'OWC Marksman', 'RTC Light Stock', 'Granulated Grip Tape',
+    'Extended Mag', 'Red Dot Sight', 'Tactical Foregrip', 'Agency Silencer',
+    'صداخفه‌کن', 'لوله بلند', 'قنداق سبک', 'خشاب بزرگ', 'دوربین رد دات', 'دسته تاکتیکال', 'گریپ لیزری',
+]
+
+ATTACHMENT_STYLES = [
+    'Rush', 'Long Range', 'Aggressive', 'Stealth', 'Sniper Support', 'No Recoil',
+    'سبک سرعتی', 'پوینت بلنک', 'مولتی کلاس', 'بدون لگد', 'دوربرد', 'اسنایپ ساپورت',
+]
+
+# 1x ≈ size of the production catalog
+BASE_WEAPONS_PER_CATEGORY = 8
+ATTACHMENTS_PER_WEAPON_MODE = 10
+
+
+@dataclass
+class SyntheticCatalog:
+    scale: int
+    categories: List[Tuple[str, str]] = field(default_factory=list)
+    weapons: List[Dict] = field(default_factory=list)       # {category, name}
+    attachments: List[Dict] = field(default_factory=list)   # {weapon_idx, mode, code, name, ...}
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'scale': self.scale,
+            'categories': len(self.categories),
+            'weapons': len(self.weapons),
+            'attachments': len(self.attachments),
+        }
+
+
+def _slug(name: str) -> str:
+    return ''.join(c for c in name.upper() if c.isalnum())[:6] or 'W'
+
+
+def generate_catalog(scale: int = 1, seed: int = 42) -> SyntheticCatalog:
+    """ساخت کاتالوگ مصنوعی با ضریب مقیاس (تعداد سلاح‌ها × scale)"""
+    rng = random.Random(seed + scale)
+    catalog = SyntheticCatalog(scale=scale, categories=list(CATEGORIES))
+
+    for cat_key, _display in CATEGORIES:
+        base = BASE_WEAPONS[cat_key]
+        for i in range(BASE_WEAPONS_PER_CATEGORY * scale):
+            name = base[i % len(base)]
+            generation = i // len(base)
+            if generation:
+                suffix = VARIANT_SUFFIXES[(generation - 1) % len(VARIANT_SUFFIXES)]
+                round_no = (generation - 1) // len(VARIANT_SUFFIXES)
+                name = f"{name} {suffix}" + (f" {round_no + 1}" if round_no else "")
+            catalog.weapons.append({'category': cat_key, 'name': name})
+
+    for w_idx, weapon in enumerate(catalog.weapons):
+        slug = _slug(weapon['name'])
+        for mode in ('br', 'mp'):
+            for j in range(ATTACHMENTS_PER_WEAPON_MODE):
+                name = f"{rng.choice(ATTACHMENT_SLOTS)} {rng.choice(ATTACHMENT_STYLES)}"
+                catalog.attachments.append({
+                    'weapon_idx': w_idx,
+                    'mode': mode,
+                    'code': f"{slug}{w_idx:05d}{mode.upper()}{j:02d}",
+                    'name': name,
+                    'is_top': j < 2,
+                    'is_season_top': j == 0 and rng.random() < 0.3,
+                    'views_count': int(rng.paretovariate(1.2) * 10),
+                    'shares_count': rng.randint(0, 20),
+                })
+    return catalog
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    op = rng.choice(('swap', 'drop', 'dup'))
+    if op == 'swap':
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if op == 'drop':
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+
+def generate_queries(catalog: SyntheticCatalog, count: int = 500, seed: int = 7) -> List[Tuple[str, str]]:
+    """
+    ساخت کوئری‌های نمونه
+
+    Returns:
+        لیست (kind, query) - kind برای گزارش تفکیکی
+    """
+    rng = random.Random(seed)
+    mix = [
+        ('weapon_exact', 0.30),
+        ('weapon_prefix', 0.20),
+        ('code', 0.15),
+        ('attachment_word', 0.15),
+        ('typo', 0.10),
+        ('miss', 0.10),
+    ]
+    kinds = [k for k, _ in mix]
+    weights = [w for _, w in mix]
+    queries = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'weapon_exact':
+            q = rng.choice(catalog.weapons)['name']
+        elif kind == 'weapon_prefix':
+            q = rng.choice(catalog.weapons)['name'][:3]
+        elif kind == 'code':
+            q = rng.choice(catalog.attachments)['code']
+        elif kind == 'attachment_word':
+            q = rng.choice(rng.choice(catalog.attachments)['name'].split())
+        elif kind == 'typo':
+            q = _typo(rng.choice(catalog.weapons)['name'], rng)
+        else:
+            q = ''.join(rng.choice('qwxzjkvb') for _ in range(rng.randint(4, 8)))
+        queries.append((kind, q))
+    return queries
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Search Latency Benchmark
+========================
+Loads a synthetic catalog (benchmarks/search/catalog.py) into a throwaway
+PostgreSQL database at 1x/10x/100x scale and measures the search paths:
+
+    - DatabasePostgresProxy.search
+    - DatabasePostgresProxy.search_attachments_fts
+    - DatabasePostgresProxy.search_attachments_like
+    - FuzzySearchEngine.search_with_fuzzy
+    - FuzzySearchEngine.fuzzy_match (in-memory index only)
+
+Reports p50/p95/p99 latency (ms) and QPS per path as JSON.
+
+The throwaway database is created with CREATE DATABASE through --admin-url
+(a role with CREATEDB is required) and dropped afterwards unless --keep.
+
+Usage:
+    python benchmarks/search/run_benchmark.py \\
+        --admin-url postgresql://postgres@localhost:5432/postgres \\
+        [--scales 1,10,100] [--queries 500] [--warmup 50] [--output results.json] [--keep]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(PROJECT_ROOT, '.env'))
+# config.config exits without a token; the benchmark never talks to Telegram
+os.environ.setdefault('BOT_TOKEN', 'benchmark')
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+from catalog import generate_catalog, generate_queries, SyntheticCatalog
+from core.database.database_pg_proxy import DatabasePostgresProxy
+
+
+# ==================== Database lifecycle ====================
+
+def create_throwaway_db(admin_url: str, name: str) -> str:
+    with psycopg.connect(admin_url, autocommit=True) as conn:
+        conn.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+        conn.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+    params = conninfo_to_dict(admin_url)
+    params['dbname'] = name
+    return make_conninfo(**params)
+
+
+def drop_throwaway_db(admin_url: str, name: str) -> None:
+    with psycopg.connect(admin_url, autocommit=True) as conn:
+        conn.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(name)))
+
+
+def load_catalog(db: DatabasePostgresProxy, catalog: SyntheticCatalog) -> float:
+    """بارگذاری کاتالوگ با COPY؛ داده‌های seed شده توسط ensure_schema پاک می‌شوند"""
+    start = time.perf_counter()
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        cur.execute("TRUNCATE attachments, weapons RESTART IDENTITY CASCADE")
+        for key, display in catalog.categories:
+            cur.execute("""
+                INSERT INTO weapon_categories (name, display_name) VALUES (%s, %s)
+                ON CONFLICT (name) DO UPDATE SET display_name = EXCLUDED.display_name
+            """, (key, display))
+        cur.execute("SELECT id, name FROM weapon_categories")
+        cat_ids = {r['name']: r['id'] for r in cur.fetchall()}
+
+        with cur.copy("COPY weapons (id, category_id, name) FROM STDIN") as copy:
+            for idx, w in enumerate(catalog.weapons, start=1):
+                copy.write_row((idx, cat_ids[w['category']], w['name']))
+        cur.execute("SELECT setval('weapons_id_seq', %s)", (len(catalog.weapons),))
+
+        with cur.copy(
+            "COPY attachments (weapon_id, mode, code, name, is_top, is_season_top, views_count, shares_count) FROM STDIN"
+        ) as copy:
+            for a in catalog.attachments:
+                copy.write_row((
+                    a['weapon_idx'] + 1, a['mode'], a['code'], a['name'],
+                    a['is_top'], a['is_season_top'], a['views_count'], a['shares_count'],
+                ))
+        cur.execute("ANALYZE weapon_categories, weapons, attachments")
+    return time.perf_counter() - start
+
+
+# ==================== Measurement ====================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def measure(fn: Callable[[str], object], queries: List[Tuple[str, str]], warmup: int) -> Dict:
+    for _kind, q in queries[:warmup]:
+        fn(q)
+    latencies = []
+    per_kind: Dict[str, List[float]] = {}
+    errors = 0
+    started = time.perf_counter()
+    for kind, q in queries:
+        t0 = time.perf_counter()
+        try:
+            fn(q)
+        except Exception:
+            errors += 1
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        latencies.append(elapsed_ms)
+        per_kind.setdefault(kind, []).append(elapsed_ms)
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'qps': round(len(latencies) / total, 2) if total > 0 else 0.0,
+        'p95_by_kind_ms': {k: round(percentile(sorted(v), 95), 3) for k, v in sorted(per_kind.items())},
+    }
+
+
+def run_scale(admin_url: str, scale: int, query_count: int, warmup: int, seed: int, keep: bool) -> Dict:
+    db_name = f"codm_bench_{scale}x_{os.getpid()}"
+    url = create_throwaway_db(admin_url, db_name)
+    db = None
+    try:
+        db = DatabasePostgresProxy(url)
+        catalog = generate_catalog(scale, seed=seed)
+        load_seconds = load_catalog(db, catalog)
+        queries = generate_queries(catalog, query_count, seed=seed)
+
+        engine = db.fuzzy_engine
+        t0 = time.perf_counter()
+        engine.build_search_index(force=True)
+        index_build_ms = (time.perf_counter() - t0) * 1000
+
+        targets: Dict[str, Callable[[str], object]] = {
+            'search': db.search,
+            'search_attachments_fts': lambda q: db.search_attachments_fts(q, limit=30),
+            'search_attachments_like': lambda q: db.search_attachments_like(q, limit=30),
+            'search_with_fuzzy': lambda q: engine.search_with_fuzzy(q, max_results=30),
+            'fuzzy_index_match': engine.fuzzy_match,
+        }
+        results = {}
+        for name, fn in targets.items():
+            print(f"  [{scale}x] {name} ...", file=sys.stderr)
+            results[name] = measure(fn, queries, warmup)
+
+        return {
+            'catalog': catalog.summary(),
+            'load_seconds': round(load_seconds, 3),
+            'fuzzy_index_build_ms': round(index_build_ms, 3),
+            'targets': results,
+        }
+    finally:
+        if db is not None:
+            db.close()
+        if not keep:
+            drop_throwaway_db(admin_url, db_name)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency benchmark")
+    parser.add_argument('--admin-url', default=os.getenv('BENCH_ADMIN_DATABASE_URL'),
+                        help="connection string of a role with CREATEDB (default: $BENCH_ADMIN_DATABASE_URL)")
+    parser.add_argument('--scales', default='1,10,100', help="comma separated scale factors")
+    parser.add_argument('--queries', type=int, default=500, help="queries per target")
+    parser.add_argument('--warmup', type=int, default=50, help="warm-up queries (not measured)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    parser.add_argument('--keep', action='store_true', help="keep the throwaway databases")
+    args = parser.parse_args()
+
+    if not args.admin_url:
+        parser.error("--admin-url or BENCH_ADMIN_DATABASE_URL is required")
+
+    with psycopg.connect(args.admin_url) as conn:
+        server_version = conn.execute("SHOW server_version").fetchone()[0]
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'postgres': server_version,
+            'queries': args.queries,
+            'warmup': args.warmup,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    for scale in (int(s) for s in args.scales.split(',') if s.strip()):
+        print(f"Benchmarking {scale}x catalog...", file=sys.stderr)
+        report['results'][f"{scale}x"] = run_scale(
+            args.admin_url, scale, args.queries, args.warmup, args.seed, args.keep
+        )
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,19 @@ SUPPORTED_LANGS = [s.strip() for s in os.getenv("SUPPORTED_LANGS", "fa,en").spli
 FALLBACK_LANG = os.getenv("FALLBACK_LANG", "en")
 LANGUAGE_ONBOARDING = os.getenv("LANGUAGE_ONBOARDING", "true").lower() == "true"
 
+# Broadcast: اگر true باشد، ارسال jobها فقط توسط پروسس جدا (main.py --broadcast-worker) انجام می‌شود
+BROADCAST_EXTERNAL_WORKER = os.getenv("BROADCAST_EXTERNAL_WORKER", "false").lower() == "true"
+
+# نگهداری داده تحلیلی: پارتیشن‌های ماهانه قدیمی‌تر از این تعداد ماه جدا می‌شوند (0 = نگهداری دائمی)
+METRICS_RETENTION_MONTHS = int(os.getenv("METRICS_RETENTION_MONTHS", "12"))
+SEARCH_HISTORY_RETENTION_MONTHS = int(os.getenv("SEARCH_HISTORY_RETENTION_MONTHS", "6"))
+# اگر تنظیم شود، هر پارتیشن قبل از جدا شدن به صورت CSV فشرده در این مسیر ذخیره می‌شود
+ANALYTICS_ARCHIVE_DIR = os.getenv("ANALYTICS_ARCHIVE_DIR", "").strip()
+# false = پارتیشن فقط detach می‌شود (جدول جدا در دیتابیس می‌ماند)
+ANALYTICS_DROP_EXPIRED = os.getenv("ANALYTICS_DROP_EXPIRED", "true").lower() == "true"
+# true = شمارش کاربران یکتا در داشبوردها دقیق (COUNT DISTINCT) به جای sketchهای HyperLogLog (برای audit)
+ANALYTICS_EXACT_UNIQUES = os.getenv("ANALYTICS_EXACT_UNIQUES", "false").lower() == "true"
+
 # توکن ربات تلگرام - از متغیر محیطی خوانده می‌شود
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
@@ -42,6 +42,7 @@ CACHE_TTL_USERS = 600            # 10 minutes
 CACHE_TTL_CHANNEL_MEMBER = 1800  # 30 minutes (for members)
 CACHE_TTL_CHANNEL_NON_MEMBER = 120  # 2 minutes (for non-members)
 CACHE_TTL_CATEGORY_COUNTS = 1800  # 30 minutes
+CACHE_TTL_NOTIFICATION_AUDIENCE = 300  # 5 minutes (audience size per event set/mode)
 
 # Cache Limits
 CACHE_MAX_SIZE = 10000  # Maximum cache entries (LRU eviction)
@@ -57,9 +58,30 @@ SLOW_QUERY_THRESHOLD_SEC = SLOW_QUERY_THRESHOLD_MS / 1000  # 0.1 seconds
 # Broadcasting & Batch Operations
 # ====================================
 
-BROADCAST_BATCH_SIZE = 30
-BROADCAST_DELAY_SECONDS = 0.05  # 50ms between batches
+BROADCAST_RATE_PER_SECOND = 28  # Token bucket rate (Telegram global limit is ~30 msg/s)
+BROADCAST_BURST = 30  # Token bucket capacity
+BROADCAST_WORKERS = 30  # Concurrent sender workers
+BROADCAST_MAX_RETRY_AFTER = 5  # Max 429 (RetryAfter) retries per user
+BROADCAST_JOB_PAGE_SIZE = 1000  # Recipients fetched per cursor page (broadcast_jobs)
+BROADCAST_DELIVERY_FLUSH_SIZE = 200  # Deliveries per batched insert
+BROADCAST_JOB_POLL_SECONDS = 10  # Idle poll interval for new jobs
+BROADCAST_JOB_LEASE_SECONDS = 120  # A running job without heartbeat for this long can be taken over
+BROADCAST_MAX_CONCURRENT_JOBS = 3  # Jobs sent at the same time per worker (shared outbound rate budget)
+SUBSCRIBER_STREAM_BATCH_SIZE = 5000  # Keyset page size for streaming subscribers
+SUBSCRIBER_REMOVE_CHUNK_SIZE = 1000  # user_ids per bulk deactivate (ANY(%s)) after a broadcast
 NOTIFICATION_BATCH_DELAY_SECONDS = 5  # Combine notifications within 5 seconds
+SCHEDULER_RESYNC_SECONDS = 300  # Reload scheduled notification heap from DB (changes from other processes)
+SCHEDULER_MAX_CONCURRENT_ITEMS = 4  # Scheduled notifications sent at the same time (without BroadcastJobManager)
+
+# Outbound dispatcher (all Bot API sends, shared by every sender path)
+OUTBOUND_GLOBAL_RATE_PER_SECOND = 30  # Global message budget per bot token (Telegram limit is ~30 msg/s)
+OUTBOUND_INTERACTIVE_RESERVE_PER_SECOND = 10  # Bot process budget when BROADCAST_EXTERNAL_WORKER sends broadcasts
+BROADCAST_EXTERNAL_RATE_PER_SECOND = OUTBOUND_GLOBAL_RATE_PER_SECOND - OUTBOUND_INTERACTIVE_RESERVE_PER_SECOND  # External worker default (split across workers)
+OUTBOUND_GLOBAL_BURST = 30  # Global token bucket capacity
+OUTBOUND_PRIVATE_CHAT_PER_SECOND = 1  # Sustained sends per private chat
+OUTBOUND_PRIVATE_CHAT_BURST = 3  # Short burst allowed for interactive replies in a private chat
+OUTBOUND_GROUP_CHAT_PER_MINUTE = 20  # Sends per group/channel per minute
+OUTBOUND_MAX_RETRIES = 2  # RetryAfter retries for interactive/transactional sends
 
 # ====================================
 # Database Connection Pool
@@ -82,6 +104,23 @@ MAX_ITEMS_PER_PAGE = 50
 
 FUZZY_SEARCH_THRESHOLD = 60  # Minimum similarity score (0-100)
 SEARCH_MAX_RESULTS = 50
+SEARCH_RANK_CANDIDATES = 200  # Candidate pool fetched from DB before ranking (utils.search_ranking)
+
+# Search analytics ingestion (buffered writes to search_history/popular_searches)
+SEARCH_ANALYTICS_QUEUE_SIZE = 10000  # Max buffered events; extra events are dropped
+SEARCH_ANALYTICS_BATCH_SIZE = 500  # Max events per flush
+SEARCH_ANALYTICS_FLUSH_SECONDS = 5  # Flush interval
+
+# Channel-join funnel ingestion (utils/join_funnel_buffer.py → analytics_* counters)
+JOIN_FUNNEL_QUEUE_SIZE = 10000  # Max buffered events; extra events are dropped
+JOIN_FUNNEL_BATCH_SIZE = 500  # Max events per flush
+JOIN_FUNNEL_FLUSH_SECONDS = 5  # Flush interval
+
+# Zero-result query analyzer (managers/search_alias_analyzer.py)
+SEARCH_ALIAS_ANALYZE_HOURS = 6  # Run interval
+SEARCH_ALIAS_LOOKBACK_DAYS = 14  # search_history window
+SEARCH_ALIAS_MIN_COUNT = 3  # Min zero-result occurrences before proposing an alias
+SEARCH_ALIAS_MIN_SCORE = 80  # Min fuzzy score (0-100) to map a query to a target
 
 # ====================================
 # Rate Limiting
@@ -99,6 +138,36 @@ BACKUP_RETENTION_COUNT = 10  # Keep last 10 backups
 ANALYTICS_DAILY_RETENTION_DAYS = 90  # 3 months
 ANALYTICS_EXPORT_MAX_ROWS = 100000
 
+# Attachment metrics daily rollup (managers/metrics_rollup.py)
+METRICS_ROLLUP_INTERVAL_SECONDS = 60  # Run interval; dashboards lag raw events by at most this much
+METRICS_ROLLUP_BATCH_SIZE = 50000  # Raw attachment_metrics rows per rollup transaction
+METRICS_ROLLUP_LAG_SECONDS = 30  # Rows newer than this wait for the next run (in-flight inserts)
+
+# Monthly partitions of attachment_metrics / search_history (managers/partition_manager.py)
+# Retention and archive settings are env-configurable in config.config
+PARTITION_PREMAKE_MONTHS = 3  # Future monthly partitions kept ready
+PARTITION_MAINTENANCE_HOURS = 24  # Run interval
+
+# Materialized popularity leaderboard (managers/leaderboard_refresher.py)
+LEADERBOARD_REFRESH_SECONDS = 300  # REFRESH ... CONCURRENTLY interval; popular/suggested lists lag by at most this
+
+# Analytics dashboard snapshots (managers/dashboard_snapshot.py)
+DASHBOARD_SNAPSHOT_INTERVAL_SECONDS = 300  # Precompute interval; admins can force a refresh from the dashboard
+
+# In-memory trending counter (managers/trending_counter.py)
+TRENDING_WINDOW_HOURS = 168  # Recent window compared with the window of the same length before it
+TRENDING_TOP_K = 10  # Size of the precomputed trending list
+TRENDING_MIN_VIEWS = 5  # Items without growth need at least this many recent views
+TRENDING_REFRESH_SECONDS = 60  # Top-K recompute interval
+TRENDING_CHECKPOINT_SECONDS = 300  # Hourly buckets are persisted to attachment_trending_buckets at this interval
+
+# Streaming CSV exports (utils/stream_export.py)
+EXPORT_GZIP_LEVEL = 6  # gzip compression level for .csv.gz exports
+EXPORT_PROGRESS_INTERVAL_SECONDS = 3  # How often long exports edit their progress message
+
+# Approximate unique users (utils/hll.py, attachment_metrics_daily_hll)
+HLL_PRECISION = 12  # 2^12 registers = 4 KB per dense sketch (small days stay sparse), ~1.6% standard error
+
 # ====================================
 # Ticket System
 # ====================================
@@ -145,9 +145,27 @@ def invalidate_attachment_caches(category: str = None, weapon: str = None) -> No
     # حذف key های خاص
     _cache.delete("category_counts")
     
+    # نتایج اینلاین ساخته‌شده نیز شامل اتچمنت‌ها هستند
+    invalidate_inline_results()
+    
     logger.info(f"Attachment caches invalidated (category={category}, weapon={weapon})")
 
 
+def invalidate_inline_results() -> None:
+    """
+    پاک کردن نتایج ساخته‌شده اینلاین (inline_results در SmartCache)
+    
+    نتایج شامل مطابقت‌های alias و داده اتچمنت‌ها هستند؛ بعد از تأیید alias و
+    ویرایش اتچمنت باید صدا زده شود. تعداد لایک تا INLINE_RESULT_CACHE_TTL
+    ثانیه کهنه می‌ماند و با هر رأی پاک نمی‌شود.
+    """
+    try:
+        from core.cache.smart_cache import get_smart_cache
+        get_smart_cache().invalidate_pattern("inline_results")
+    except Exception:
+        pass
+
+
 def cached(ttl_or_key = 300, key_func: Optional[Callable] = None, ttl: Optional[int] = None):
     """
     Decorator برای cache کردن خروجی توابع
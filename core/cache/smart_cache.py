@@ -42,6 +42,7 @@ class SmartCacheManager:
         # Dynamic data - short TTL
         'user_data': 60,           # 1 min - داده‌های کاربر
         'search_results': 120,     # 2 min - نتایج جستجو
+        'inline_results': 60,      # 1 min - نتایج ساخته‌شده اینلاین
         'statistics': 300,         # 5 min - آمار
         
         # Real-time data - very short TTL
@@ -11,6 +11,10 @@ from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
 from utils.logger import get_logger, log_exception
 from utils.metrics import measure_query_time
+from utils.notification_mask import audience_bits
+from config.constants import PARTITION_PREMAKE_MONTHS
+from core.database.partitioning import PARTITIONED_TABLES, is_partitioned, ensure_partitions
+from core.database.leaderboard import ensure_leaderboard
 import time
 import logging
 
@@ -233,6 +237,8 @@ class DatabasePostgres:
         - attachments.order_index INTEGER (nullable)
         - pg_trgm extension and trigram GIN indexes for attachments.name/code
         - analytics tables alignment (popular_searches.search_count, search_history.execution_time_ms)
+        - monthly partitions for attachment_metrics/search_history (core/database/partitioning.py)
+        - attachment_leaderboard materialized view (core/database/leaderboard.py)
         """
         try:
             with self.get_connection() as conn:
@@ -524,14 +530,15 @@ class DatabasePostgres:
                     # Search History
                     """
                     CREATE TABLE IF NOT EXISTS search_history (
-                        id SERIAL PRIMARY KEY,
+                        id SERIAL,
                         user_id BIGINT,
                         query TEXT NOT NULL,
                         results_count INTEGER NOT NULL DEFAULT 0,
                         execution_time_ms REAL NOT NULL DEFAULT 0,
                         search_type TEXT,
-                        created_at TIMESTAMP NOT NULL DEFAULT NOW()
-                    )
+                        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                        PRIMARY KEY (id, created_at)
+                    ) PARTITION BY RANGE (created_at)
                     """,
                     # Popular Searches
                     """
@@ -738,14 +745,15 @@ class DatabasePostgres:
                     # Attachment Metrics
                     """
                     CREATE TABLE IF NOT EXISTS attachment_metrics (
-                        id SERIAL PRIMARY KEY,
+                        id SERIAL,
                         attachment_id INTEGER NOT NULL,
                         user_id BIGINT,
                         action_type TEXT NOT NULL CHECK (action_type IN ('view','click','share','copy','rate')),
                         session_id TEXT,
                         metadata JSONB,
-                        action_date TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    )
+                        action_date TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        PRIMARY KEY (id, action_date)
+                    ) PARTITION BY RANGE (action_date)
                     """,
                     # Attachment Performance
                     """
@@ -775,6 +783,118 @@ class DatabasePostgres:
                         updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                         published_at TIMESTAMPTZ
                     )
+                    """,
+                    # Search Aliases (zero-result queries mapped to weapons/attachments)
+                    """
+                    CREATE TABLE IF NOT EXISTS search_aliases (
+                        id SERIAL PRIMARY KEY,
+                        alias TEXT NOT NULL UNIQUE,
+                        target_type TEXT NOT NULL CHECK (target_type IN ('weapon','attachment')),
+                        target_id INTEGER NOT NULL,
+                        target_label TEXT,
+                        confidence REAL NOT NULL DEFAULT 0,
+                        zero_result_count INTEGER NOT NULL DEFAULT 0,
+                        status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending','approved','rejected')),
+                        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                        reviewed_by BIGINT,
+                        reviewed_at TIMESTAMP
+                    )
+                    """,
+                    # Broadcast Jobs (durable, resumable broadcasts)
+                    """
+                    CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                        id SERIAL PRIMARY KEY,
+                        source TEXT NOT NULL DEFAULT 'admin' CHECK (source IN ('admin','scheduled')),
+                        schedule_id INTEGER,
+                        message_type TEXT NOT NULL CHECK (message_type IN ('text','photo')),
+                        message_text TEXT,
+                        photo_file_id TEXT,
+                        parse_mode TEXT DEFAULT 'Markdown',
+                        status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending','running','completed','failed','cancelled')),
+                        total_recipients INTEGER NOT NULL DEFAULT 0,
+                        cursor_user_id BIGINT NOT NULL DEFAULT 0,
+                        sent_count INTEGER NOT NULL DEFAULT 0,
+                        failed_count INTEGER NOT NULL DEFAULT 0,
+                        blocked_count INTEGER NOT NULL DEFAULT 0,
+                        last_error TEXT,
+                        worker_id TEXT,
+                        heartbeat_at TIMESTAMPTZ,
+                        created_by BIGINT,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        started_at TIMESTAMPTZ,
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        finished_at TIMESTAMPTZ
+                    )
+                    """,
+                    # Broadcast Deliveries (one row per recipient per job)
+                    """
+                    CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+                        job_id INTEGER NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+                        user_id BIGINT NOT NULL,
+                        status TEXT NOT NULL CHECK (status IN ('sent','failed','blocked')),
+                        delivered_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        PRIMARY KEY (job_id, user_id)
+                    )
+                    """,
+                    # Attachment Metrics Daily Rollup (incremental, see rollup_attachment_metrics)
+                    """
+                    CREATE TABLE IF NOT EXISTS attachment_metrics_daily (
+                        attachment_id INTEGER NOT NULL,
+                        metric_date DATE NOT NULL,
+                        views INTEGER NOT NULL DEFAULT 0,
+                        clicks INTEGER NOT NULL DEFAULT 0,
+                        shares INTEGER NOT NULL DEFAULT 0,
+                        copies INTEGER NOT NULL DEFAULT 0,
+                        rates INTEGER NOT NULL DEFAULT 0,
+                        unique_users INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (attachment_id, metric_date)
+                    )
+                    """,
+                    # Distinct users per attachment per day (exact unique-user sets for multi-day windows)
+                    """
+                    CREATE TABLE IF NOT EXISTS attachment_metrics_daily_users (
+                        metric_date DATE NOT NULL,
+                        attachment_id INTEGER NOT NULL,
+                        user_id BIGINT NOT NULL,
+                        views INTEGER NOT NULL DEFAULT 0,
+                        clicks INTEGER NOT NULL DEFAULT 0,
+                        last_action_at TIMESTAMPTZ NOT NULL,
+                        PRIMARY KEY (metric_date, attachment_id, user_id)
+                    )
+                    """,
+                    # HyperLogLog sketch of users per attachment per day (attachment_id 0 = all attachments)
+                    """
+                    CREATE TABLE IF NOT EXISTS attachment_metrics_daily_hll (
+                        attachment_id INTEGER NOT NULL,
+                        metric_date DATE NOT NULL,
+                        sketch BYTEA NOT NULL,
+                        PRIMARY KEY (attachment_id, metric_date)
+                    )
+                    """,
+                    # Hourly view buckets checkpointed by the in-memory trending counter
+                    """
+                    CREATE TABLE IF NOT EXISTS attachment_trending_buckets (
+                        attachment_id INTEGER NOT NULL,
+                        bucket_hour TIMESTAMPTZ NOT NULL,
+                        views INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (attachment_id, bucket_hour)
+                    )
+                    """,
+                    # Rollup watermarks (last processed source id per job; trending_counter = first tracked epoch hour)
+                    """
+                    CREATE TABLE IF NOT EXISTS metrics_rollup_state (
+                        name TEXT PRIMARY KEY,
+                        last_id BIGINT NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )
+                    """,
+                    # Analytics dashboard snapshots (managers/dashboard_snapshot.py)
+                    """
+                    CREATE TABLE IF NOT EXISTS analytics_dashboard_snapshots (
+                        view_name TEXT PRIMARY KEY,
+                        payload JSONB NOT NULL,
+                        computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    )
                     """
                 ]
 
@@ -784,6 +904,18 @@ class DatabasePostgres:
                     except Exception as e:
                         logger.warning(f"ensure_schema(create table) warning: {e}")
 
+                # 2.1. Monthly partitions (جداول قدیمی غیرپارتیشنی تا اجرای migration دست نمی‌خورند)
+                for table in PARTITIONED_TABLES:
+                    try:
+                        if is_partitioned(cursor, table):
+                            ensure_partitions(cursor, table, PARTITION_PREMAKE_MONTHS)
+                        else:
+                            logger.warning(
+                                f"{table} is not partitioned; run scripts/migrations/partition_analytics_tables.sql"
+                            )
+                    except Exception as e:
+                        logger.warning(f"ensure_schema(partitions {table}) warning: {e}")
+
                 # 3. Indexes (Helpful indexes)
                 indexes_sql = [
                     "CREATE INDEX IF NOT EXISTS idx_attachments_weapon_mode ON attachments (weapon_id, mode)",
@@ -830,7 +962,17 @@ class DatabasePostgres:
                     "CREATE INDEX IF NOT EXISTS ix_uae_attachment ON user_attachment_engagement (attachment_id)",
                     "CREATE INDEX IF NOT EXISTS ix_cms_content_status_pub ON cms_content (status, published_at DESC)",
                     "CREATE INDEX IF NOT EXISTS ix_cms_content_type_status ON cms_content (content_type, status)",
-                    "CREATE INDEX IF NOT EXISTS ix_cms_content_tags_gin ON cms_content USING gin (tags)"
+                    "CREATE INDEX IF NOT EXISTS ix_cms_content_tags_gin ON cms_content USING gin (tags)",
+                    "CREATE INDEX IF NOT EXISTS idx_search_history_zero ON search_history (created_at) WHERE results_count = 0",
+                    "CREATE INDEX IF NOT EXISTS idx_search_aliases_status ON search_aliases (status, zero_result_count DESC)",
+                    "CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_active ON broadcast_jobs (id) WHERE status IN ('pending','running')",
+                    "CREATE INDEX IF NOT EXISTS idx_amd_date ON attachment_metrics_daily (metric_date)",
+                    "CREATE INDEX IF NOT EXISTS idx_amdu_attachment_date ON attachment_metrics_daily_users (attachment_id, metric_date)",
+                    "CREATE INDEX IF NOT EXISTS idx_amdu_user_date ON attachment_metrics_daily_users (user_id, metric_date)",
+                    # Half-open date ranges (sql_helpers.build_*_range_filter) on the raw column
+                    "CREATE INDEX IF NOT EXISTS ix_am_date ON attachment_metrics (action_date)",
+                    "CREATE INDEX IF NOT EXISTS ix_uae_last_view ON user_attachment_engagement (last_view_date)",
+                    "CREATE INDEX IF NOT EXISTS ix_uae_attachment_last_view ON user_attachment_engagement (attachment_id, last_view_date)"
                 ]
 
                 for sql in indexes_sql:
@@ -839,6 +981,12 @@ class DatabasePostgres:
                     except Exception as e:
                         logger.warning(f"ensure_schema(create index) warning: {e}")
 
+                # 3.1. Materialized popularity leaderboard (core/database/leaderboard.py)
+                try:
+                    ensure_leaderboard(cursor)
+                except Exception as e:
+                    logger.warning(f"ensure_schema(attachment_leaderboard) warning: {e}")
+
                 # 4. Seed Data (Default values)
                 try:
                     # Weapon Categories
@@ -902,67 +1050,42 @@ class DatabasePostgres:
         except Exception as e:
             logger.error(f"Database schema check failed: {e}")
 
-    def get_users_for_notification(self, event_types: list, mode: str) -> set:
+    def get_users_for_notification(self, event_types: list, mode: str) -> dict:
         """
-        Get active users for notification efficiently using SQL
+        Get active users for notification, with their language, in one query
+        
+        Preferences are matched on the normalized subscribers.notify_mask
+        (utils/notification_mask.py), so the audience is read from the
+        idx_subscribers_notify covering index instead of evaluating JSONB per row.
         
         Args:
             event_types: List of event types to check (OR logic)
             mode: Game mode (mp/br)
             
         Returns:
-            Set of user_ids
+            Dict of user_id -> language (None when the user has no language set)
         """
+        mode_bits, event_bits = audience_bits(event_types, mode)
         query = """
-            SELECT s.user_id
+            SELECT s.user_id, u.language
             FROM subscribers s
-            LEFT JOIN user_preferences up ON s.user_id = up.user_id
-            WHERE 
-                -- 1. User has no preferences (default enabled)
-                up.user_id IS NULL
-                OR
-                (
-                    -- 2. Global enabled check
-                    COALESCE((up.preferences->>'enabled')::boolean, true) = true
-                    AND
-                    -- 3. Mode check
-                    (up.preferences->'modes') @> to_jsonb(%s::text)
-                    AND
-                    -- 4. Event check (at least one event must be enabled)
-                    (
-                        -- If events object is missing, default is true
-                        up.preferences->'events' IS NULL
-                        OR
-                        EXISTS (
-                            SELECT 1
-                            FROM jsonb_each_text(up.preferences->'events')
-                            WHERE key = ANY(%s) AND value::boolean = true
-                        )
-                        OR
-                        -- If any of the requested events are NOT in the events object, they are true by default
-                        EXISTS (
-                            SELECT 1
-                            FROM unnest(%s::text[]) as req_event
-                            WHERE NOT (up.preferences->'events' ? req_event)
-                        )
-                    )
-                )
+            LEFT JOIN users u ON u.user_id = s.user_id
+            WHERE s.is_active = TRUE
+              AND (s.notify_mask & %s) <> 0
+              AND (s.notify_mask & %s) <> 0
         """
         
         try:
-            # Convert mode to json string for containment check
-            mode_json = f'"{mode}"'
-            
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, (mode_json, event_types, event_types))
+                cursor.execute(query, (mode_bits, event_bits))
                 results = cursor.fetchall()
-                return {row['user_id'] for row in results}
+                return {row['user_id']: row['language'] for row in results}
                 
         except Exception as e:
             logger.error(f"Error fetching notification users: {e}")
-            # Fallback to empty set to avoid spamming everyone on error
-            return set()
+            # Fallback to empty result to avoid spamming everyone on error
+            return {}
 
     def close(self):
         """بستن connection pool"""
@@ -4,11 +4,21 @@ PostgreSQL Proxy Implementation
 """
 
 from .database_pg import DatabasePostgres, QueryConverter
+from .sql_helpers import build_datetime_range_filter, build_search_feature_sql
+from .leaderboard import LEADERBOARD_VIEW, window_suffix, refresh_leaderboard
+from .hll_sketches import ALL_ATTACHMENTS, update_sketches, rebuild_sketches, count_unique_users
+from .partitioning import (
+    PARTITIONED_TABLES, is_partitioned, ensure_partitions, expired_partitions,
+    export_partition, detach_partition,
+)
+from psycopg import sql
 from psycopg.errors import UniqueViolation
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, Callable
 from utils.logger import get_logger, log_exception
 from config.config import WEAPON_CATEGORIES
-from core.cache.cache_manager import cached
+from config.constants import SEARCH_MAX_RESULTS, SEARCH_RANK_CANDIDATES
+from core.cache.cache_manager import cached, get_cache, invalidate_inline_results
+from utils.notification_mask import preferences_to_mask
 from datetime import date, datetime
 
 logger = get_logger('database.pg_proxy', 'database.log')
@@ -28,6 +38,8 @@ class DatabasePostgresProxy(DatabasePostgres):
     def __init__(self, database_url: str = None):
         """Initialize PostgreSQL proxy"""
         super().__init__(database_url)
+        # شنونده‌های بازدید اتچمنت (مثل شمارنده ترندینگ در پروسس ربات)
+        self._attachment_view_listeners: List[Callable[[int], None]] = []
     
     # ==========================================================================
     # Weapon Category Methods
@@ -94,41 +106,28 @@ class DatabasePostgresProxy(DatabasePostgres):
             return {'top_attachments': [], 'all_attachments': []}
 
     def search(self, query_text: str) -> List[Dict]:
-        """جستجوی اتچمنت‌ها بر اساس نام، کد یا نام سلاح"""
-        try:
-            # جستجو در نام اتچمنت، کد اتچمنت، یا نام سلاح
-            # از ILIKE برای case-insensitive matching استفاده می‌کنیم
-            sql = """
-                SELECT a.id, a.code, a.name, a.image_file_id as image, a.mode,
-                       w.name as weapon, c.name as category
-                FROM attachments a
-                JOIN weapons w ON a.weapon_id = w.id
-                JOIN weapon_categories c ON w.category_id = c.id
-                WHERE a.name ILIKE %s 
-                   OR a.code ILIKE %s 
-                   OR w.name ILIKE %s
-                ORDER BY w.name, a.mode, a.name
-                LIMIT 50
-            """
-            
-            search_term = f"%{query_text}%"
-            params = (search_term, search_term, search_term)
-            
-            results = self.execute_query(sql, params, fetch_all=True)
+        """جستجوی اتچمنت‌ها بر اساس نام، کد یا نام سلاح (رتبه‌بندی با SearchRanker)"""
+        try:
+            # جستجو در نام اتچمنت، کد اتچمنت، یا نام سلاح (ILIKE) و سپس رتبه‌بندی
+            # بر اساس ارتباط متنی + محبوبیت + تازگی
+            from utils.search_ranking import get_search_ranker
+            rank_query = query_text
+            alias = self.resolve_search_alias(query_text)
+            if alias:
+                # alias تأیید شده: lookup مستقیم به جای اسکن ILIKE
+                candidates = self.get_alias_candidates(alias)
+                rank_query = alias.get('target_label') or query_text
+            else:
+                candidates = self.get_search_candidates(query_text)
+            ranked = get_search_ranker().rank(rank_query, candidates, limit=SEARCH_MAX_RESULTS)
             
-            # تبدیل به فرمت مورد انتظار Handler
-            # Handler انتظار لیستی از دیکشنری‌ها را دارد که کلیدهای
-            # category, weapon, mode, attachment (dict) را داشته باشند
-            # اما طبق خط 209-210 handelr، اگر لیست باشد آیتم‌ها را append می‌کند
-            # و در خط 213: item['attachment'] دسترسی پیدا می‌کند.
-            # پس ساختار هر آیتم باید این باشد:
+            # تبدیل به فرمت مورد انتظار Handler:
             # {
             #    'category': ..., 'weapon': ..., 'mode': ...,
-            #    'attachment': {'name': ..., 'code': ..., 'image': ...}
+            #    'attachment': {'id': ..., 'name': ..., 'code': ..., 'image': ...}
             # }
-            
             formatted_results = []
-            for row in results:
+            for row in ranked:
                 formatted_results.append({
                     'category': row['category'],
                     'weapon': row['weapon'],
@@ -147,6 +146,83 @@ class DatabasePostgresProxy(DatabasePostgres):
             log_exception(logger, e, f"search({query_text})")
             return []
 
+    def get_search_candidates(self, query_text: str, limit: int = SEARCH_RANK_CANDIDATES,
+                              use_trgm: bool = True) -> List[Dict]:
+        """
+        دریافت کاندیداهای خام جستجو برای رتبه‌بندی (utils.search_ranking)
+        
+        ویژگی‌های متنی (exact / prefix / trgm) در همین کوئری محاسبه می‌شوند
+        (build_search_feature_sql)؛ رتبه‌بند فقط آن‌ها را وزن‌دهی می‌کند.
+        
+        Args:
+            query_text: متن جستجو
+            limit: حداکثر تعداد کاندیدا
+            use_trgm: اضافه کردن تطبیق trigram (pg_trgm) علاوه بر ILIKE در WHERE
+        
+        Returns:
+            لیست dict تخت: id, code, name, image, mode, weapon, category,
+            is_top, is_season_top, created_at, age_days, exact, prefix, trgm, popularity
+            (age_days در timezone جلسه دیتابیس محاسبه می‌شود)
+        """
+        q = (query_text or '').strip()
+        if not q:
+            return []
+        like_pattern = f"%{q}%"
+        q_norm = ' '.join(q.lower().split())
+        # کوئری‌های کوتاه/عددی با trigram نتیجه معنادار ندارند
+        use_trgm = use_trgm and len(q) >= 3 and not q.isdigit()
+        trgm_where = "a.name %% %s OR w.name %% %s OR a.code %% %s OR " if use_trgm else ""
+        features, features_join = build_search_feature_sql()
+        # محبوبیت: آخرین popularity_score (×10 = واحد engagement) یا شمارنده‌های خود اتچمنت
+        sql = f"""
+            SELECT a.id, a.code, a.name, a.image_file_id as image, a.mode,
+                   a.is_top, a.is_season_top, a.created_at,
+                   EXTRACT(EPOCH FROM (NOW() - a.created_at)) / 86400.0 as age_days,
+                   w.name as weapon, c.name as category,
+                   {features},
+                   GREATEST(COALESCE(ap.popularity_score, 0) * 10,
+                            COALESCE(a.views_count, 0) + 3 * COALESCE(a.shares_count, 0)) as popularity
+            FROM attachments a
+            JOIN weapons w ON a.weapon_id = w.id
+            JOIN weapon_categories c ON w.category_id = c.id
+            {features_join}
+            LEFT JOIN LATERAL (
+                SELECT p.popularity_score
+                FROM attachment_performance p
+                WHERE p.attachment_id = a.id
+                ORDER BY p.performance_date DESC
+                LIMIT 1
+            ) ap ON TRUE
+            WHERE {trgm_where}a.name ILIKE %s OR a.code ILIKE %s OR w.name ILIKE %s
+            ORDER BY trgm DESC, a.is_season_top DESC, a.is_top DESC, popularity DESC
+            LIMIT %s
+        """
+        params = [q_norm] + ([q, q, q] if use_trgm else []) + [like_pattern, like_pattern, like_pattern, limit]
+        try:
+            return self.execute_query(sql, tuple(params), fetch_all=True) or []
+        except Exception as e:
+            # pg_trgm در دسترس نیست: فقط ILIKE، با trgm ثابت 0
+            logger.warning(f"Candidate search with pg_trgm failed, using ILIKE only: {e}")
+            features, features_join = build_search_feature_sql(with_trgm=False)
+            sql_plain = f"""
+                SELECT a.id, a.code, a.name, a.image_file_id as image, a.mode,
+                       a.is_top, a.is_season_top, a.created_at,
+                       EXTRACT(EPOCH FROM (NOW() - a.created_at)) / 86400.0 as age_days,
+                       w.name as weapon, c.name as category,
+                       {features},
+                       COALESCE(a.views_count, 0) + 3 * COALESCE(a.shares_count, 0) as popularity
+                FROM attachments a
+                JOIN weapons w ON a.weapon_id = w.id
+                JOIN weapon_categories c ON w.category_id = c.id
+                {features_join}
+                WHERE a.name ILIKE %s OR a.code ILIKE %s OR w.name ILIKE %s
+                ORDER BY a.is_season_top DESC, a.is_top DESC, popularity DESC
+                LIMIT %s
+            """
+            return self.execute_query(
+                sql_plain, (q_norm, like_pattern, like_pattern, like_pattern, limit), fetch_all=True
+            ) or []
+
     def set_top_attachments(self, category: str, weapon_name: str,
                             attachment_codes: List[str], mode: str = "br") -> bool:
         """
@@ -366,6 +442,26 @@ class DatabasePostgresProxy(DatabasePostgres):
             log_exception(logger, e, f"get_user_language({user_id})")
             return None
 
+    def get_user_languages(self, user_ids: List[int]) -> Dict[int, Optional[str]]:
+        """
+        دریافت دسته‌ای زبان کاربران در یک query (به جای get_user_language در حلقه)
+        Returns: {user_id: 'fa' | 'en' | None}
+        """
+        if not user_ids:
+            return {}
+        try:
+            rows = self.execute_query(
+                "SELECT user_id, language FROM users WHERE user_id = ANY(%s)",
+                (list(user_ids),),
+                fetch_all=True,
+            )
+            languages = {uid: None for uid in user_ids}
+            languages.update({r['user_id']: r.get('language') for r in rows})
+            return languages
+        except Exception as e:
+            log_exception(logger, e, "get_user_languages")
+            return {uid: None for uid in user_ids}
+
     def set_user_language(self, user_id: int, lang: str) -> bool:
         """
         تنظیم زبان کاربر در جدول users (fa/en)
@@ -1131,6 +1227,57 @@ class DatabasePostgresProxy(DatabasePostgres):
             log_exception(logger, e, "mark_schedule_sent")
             return False
 
+    def get_scheduled_notification_run_times(self) -> List[Dict]:
+        """زمان اجرای بعدی همه زمان‌بندی‌های فعال (برای heap زمان‌بند)"""
+        try:
+            query = (
+                """
+                SELECT id, next_run_at
+                FROM scheduled_notifications
+                WHERE enabled = TRUE AND next_run_at IS NOT NULL
+                """
+            )
+            return self.execute_query(query, fetch_all=True)
+        except Exception as e:
+            log_exception(logger, e, "get_scheduled_notification_run_times")
+            return []
+
+    def claim_scheduled_notification(self, schedule_id: int, now_ts) -> Optional[Dict]:
+        """
+        claim اتمیک یک اجرای سررسید شده: next_run_at در همان UPDATE جلو می‌رود،
+        پس پروسس دیگری که همزمان همین ردیف را claim کند چیزی دریافت نمی‌کند.
+        اجرای بعدی از روی زمان برنامه‌ریزی شده محاسبه می‌شود (بدون drift) و اگر
+        هنوز در گذشته باشد (مثلاً بعد از downtime) از now محاسبه می‌شود.
+
+        Returns:
+            ردیف زمان‌بندی با next_run_at جدید، یا None اگر سررسید/فعال نبود
+        """
+        try:
+            query = (
+                """
+                UPDATE scheduled_notifications
+                SET last_sent_at = %s,
+                    next_run_at = CASE
+                        WHEN next_run_at + make_interval(hours => GREATEST(interval_hours, 1)) > %s
+                            THEN next_run_at + make_interval(hours => GREATEST(interval_hours, 1))
+                        ELSE %s + make_interval(hours => GREATEST(interval_hours, 1))
+                    END,
+                    updated_at = NOW()
+                WHERE id = %s
+                  AND enabled = TRUE
+                  AND next_run_at IS NOT NULL
+                  AND next_run_at <= %s
+                RETURNING id, message_type, message_text, photo_file_id, parse_mode,
+                          interval_hours, enabled, last_sent_at, next_run_at
+                """
+            )
+            return self.execute_query(
+                query, (now_ts, now_ts, now_ts, schedule_id, now_ts), fetch_one=True
+            )
+        except Exception as e:
+            log_exception(logger, e, "claim_scheduled_notification")
+            return None
+
     def set_schedule_enabled(self, schedule_id: int, enabled: bool) -> bool:
         """فعال/غیرفعال کردن یک زمان‌بندی"""
         try:
@@ -1164,6 +1311,241 @@ class DatabasePostgresProxy(DatabasePostgres):
         except Exception as e:
             log_exception(logger, e, "get_scheduled_notification_by_id")
             return None
+
+    # ==========================================================================
+    # Broadcast Jobs (durable, resumable broadcasts)
+    # ==========================================================================
+    def create_broadcast_job(
+        self,
+        message_type: str,
+        message_text: str = None,
+        photo_file_id: str = None,
+        parse_mode: str = 'Markdown',
+        source: str = 'admin',
+        created_by: int = None,
+        schedule_id: int = None,
+    ) -> Optional[int]:
+        """ایجاد یک job ارسال همگانی (تعداد گیرندگان در لحظه ایجاد ثبت می‌شود)"""
+        try:
+            query = """
+                INSERT INTO broadcast_jobs (
+                    source, schedule_id, message_type, message_text, photo_file_id,
+                    parse_mode, created_by, total_recipients
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s,
+                        (SELECT COUNT(*) FROM subscribers WHERE is_active = TRUE))
+                RETURNING id
+            """
+            row = self.execute_query(
+                query,
+                (source, schedule_id, message_type, message_text, photo_file_id, parse_mode, created_by),
+                fetch_one=True,
+            )
+            job_id = row['id'] if row else None
+            logger.info(f"✅ Broadcast job created: id={job_id} source={source}")
+            return job_id
+        except Exception as e:
+            log_exception(logger, e, "create_broadcast_job")
+            return None
+
+    def get_broadcast_job(self, job_id: int) -> Optional[Dict]:
+        """دریافت وضعیت یک job (برای polling پنل ادمین)"""
+        try:
+            return self.execute_query(
+                "SELECT * FROM broadcast_jobs WHERE id = %s", (job_id,), fetch_one=True
+            )
+        except Exception as e:
+            log_exception(logger, e, "get_broadcast_job")
+            return None
+
+    def claim_broadcast_job(self, worker_id: str, lease_seconds: int,
+                            exclude_ids: Optional[List[int]] = None) -> Optional[Dict]:
+        """
+        برداشتن اتمیک یک job برای این worker (FOR UPDATE SKIP LOCKED)
+        
+        jobهای pending، jobهای قبلی همین worker (ری‌استارت) و jobهای running
+        که heartbeat آن‌ها از lease قدیمی‌تر است قابل برداشت هستند.
+        exclude_ids: jobهایی که همین worker در حال ارسال آن‌هاست
+        """
+        try:
+            return self.execute_query(
+                """
+                UPDATE broadcast_jobs
+                SET status = 'running',
+                    worker_id = %s,
+                    heartbeat_at = NOW(),
+                    started_at = COALESCE(started_at, NOW()),
+                    updated_at = NOW()
+                WHERE id = (
+                    SELECT id FROM broadcast_jobs
+                    WHERE (status = 'pending'
+                           OR (status = 'running' AND (
+                                   worker_id = %s
+                                   OR heartbeat_at IS NULL
+                                   OR heartbeat_at < NOW() - make_interval(secs => %s)
+                              )))
+                      AND id <> ALL(%s::bigint[])
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+                """,
+                (worker_id, worker_id, lease_seconds, list(exclude_ids or [])),
+                fetch_one=True,
+            )
+        except Exception as e:
+            log_exception(logger, e, "claim_broadcast_job")
+            return None
+
+    def get_broadcast_recipients_page(self, job_id: int, after_user_id: int, limit: int) -> List[int]:
+        """
+        صفحه بعدی گیرندگان بعد از cursor (keyset روی user_id)
+        کاربرانی که برای این job قبلاً delivery ثبت شده دارند حذف می‌شوند.
+        """
+        try:
+            rows = self.execute_query(
+                """
+                SELECT s.user_id
+                FROM subscribers s
+                WHERE s.is_active = TRUE
+                  AND s.user_id > %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM broadcast_deliveries d
+                      WHERE d.job_id = %s AND d.user_id = s.user_id
+                  )
+                ORDER BY s.user_id
+                LIMIT %s
+                """,
+                (after_user_id, job_id, limit),
+                fetch_all=True,
+            )
+            return [r['user_id'] for r in rows]
+        except Exception as e:
+            log_exception(logger, e, "get_broadcast_recipients_page")
+            raise
+
+    def heartbeat_broadcast_job(self, job_id: int, worker_id: str) -> bool:
+        """
+        تمدید lease یک job running
+        
+        Returns:
+            False اگر job دیگر متعلق به این worker نیست (lease از دست رفته)
+        """
+        rowcount = self.execute_query(
+            """
+            UPDATE broadcast_jobs
+            SET heartbeat_at = NOW()
+            WHERE id = %s AND worker_id = %s AND status = 'running'
+            """,
+            (job_id, worker_id),
+        )
+        return bool(rowcount)
+
+    def record_broadcast_deliveries(
+        self,
+        job_id: int,
+        deliveries: List[Tuple[int, str]],
+        cursor_user_id: Optional[int] = None,
+        worker_id: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        ثبت دسته‌ای deliveries و به‌روزرسانی شمارنده‌ها/cursor در یک statement
+        
+        deliveries همیشه ثبت می‌شوند (پیام واقعاً ارسال شده است)؛ شمارنده‌ها،
+        cursor و heartbeat فقط وقتی job هنوز متعلق به worker_id است به‌روز می‌شوند.
+        
+        Args:
+            deliveries: لیست (user_id, status) با status در sent/failed/blocked
+            cursor_user_id: در صورت وجود، cursor تا این user_id جلو می‌رود
+            worker_id: worker صاحب lease (None = بدون بررسی مالکیت)
+        
+        Returns:
+            تعداد deliveries جدید ثبت شده (تکراری‌ها نادیده گرفته می‌شوند)،
+            یا None اگر job به worker دیگری رسیده است
+        """
+        row = self.execute_query(
+            """
+            WITH ins AS (
+                INSERT INTO broadcast_deliveries (job_id, user_id, status)
+                SELECT %s, u, st
+                FROM unnest(%s::bigint[], %s::text[]) AS d(u, st)
+                ON CONFLICT (job_id, user_id) DO NOTHING
+                RETURNING status
+            ), agg AS (
+                SELECT COUNT(*) FILTER (WHERE status = 'sent') AS sent,
+                       COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+                       COUNT(*) FILTER (WHERE status = 'blocked') AS blocked,
+                       COUNT(*) AS total
+                FROM ins
+            )
+            UPDATE broadcast_jobs j
+            SET sent_count = j.sent_count + agg.sent,
+                failed_count = j.failed_count + agg.failed,
+                blocked_count = j.blocked_count + agg.blocked,
+                cursor_user_id = GREATEST(j.cursor_user_id, COALESCE(%s, j.cursor_user_id)),
+                heartbeat_at = NOW(),
+                updated_at = NOW()
+            FROM agg
+            WHERE j.id = %s
+              AND j.worker_id IS NOT DISTINCT FROM COALESCE(%s, j.worker_id)
+            RETURNING agg.total
+            """,
+            (
+                job_id,
+                [d[0] for d in deliveries],
+                [d[1] for d in deliveries],
+                cursor_user_id,
+                job_id,
+                worker_id,
+            ),
+            fetch_one=True,
+        )
+        if not row:
+            logger.warning(f"Broadcast job {job_id}: lease lost by worker {worker_id}")
+            return None
+        return int(row['total'])
+
+    def finish_broadcast_job(self, job_id: int, status: str = 'completed', error: str = None,
+                             worker_id: Optional[str] = None) -> bool:
+        """
+        پایان job با وضعیت completed/failed/cancelled
+        
+        شمارنده‌ها از broadcast_deliveries دوباره محاسبه می‌شوند تا deliveries
+        ثبت شده توسط worker قبلی (بعد از از دست دادن lease) هم شمرده شوند.
+        با worker_id فقط صاحب فعلی lease می‌تواند job را ببندد.
+        """
+        try:
+            rowcount = self.execute_query(
+                """
+                UPDATE broadcast_jobs j
+                SET status = %s,
+                    last_error = COALESCE(%s, j.last_error),
+                    sent_count = d.sent,
+                    failed_count = d.failed,
+                    blocked_count = d.blocked,
+                    finished_at = NOW(),
+                    updated_at = NOW()
+                FROM (
+                    SELECT COUNT(*) FILTER (WHERE status = 'sent') AS sent,
+                           COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+                           COUNT(*) FILTER (WHERE status = 'blocked') AS blocked
+                    FROM broadcast_deliveries
+                    WHERE job_id = %s
+                ) d
+                WHERE j.id = %s
+                  AND j.worker_id IS NOT DISTINCT FROM COALESCE(%s, j.worker_id)
+                """,
+                (status, error, job_id, job_id, worker_id),
+            )
+            if not rowcount:
+                logger.warning(f"Broadcast job {job_id}: not finished, lease held by another worker")
+                return False
+            logger.info(f"Broadcast job {job_id} finished: {status}")
+            return True
+        except Exception as e:
+            log_exception(logger, e, "finish_broadcast_job")
+            return False
     def vote_attachment(self, user_id: int, attachment_id: int, vote: int) -> Dict:
         """
         ثبت یا تغییر رأی کاربر برای اتچمنت (Atomic UPSERT - Race-Condition Safe)
@@ -1237,7 +1619,7 @@ class DatabasePostgresProxy(DatabasePostgres):
                 logger.info(f"✅ Vote (atomic): user={user_id}, att={attachment_id}, "
                            f"{previous_vote}→{new_rating}, action={action}")
                 
-                return {
+                result = {
                     'success': True,
                     'action': action,
                     'previous_vote': previous_vote,
@@ -1245,6 +1627,9 @@ class DatabasePostgresProxy(DatabasePostgres):
                     'like_count': like_count,
                     'dislike_count': dislike_count
                 }
+            
+            # تعداد لایک در نتایج اینلاین کش‌شده حداکثر INLINE_RESULT_CACHE_TTL کهنه است
+            return result
                 
         except Exception as e:
             log_exception(logger, e, f"vote_attachment({user_id}, {attachment_id})")
@@ -1274,6 +1659,15 @@ class DatabasePostgresProxy(DatabasePostgres):
             log_exception(logger, e, f"get_user_vote({attachment_id}, {user_id})")
             return None
     
+    def add_attachment_view_listener(self, callback: Callable[[int], None]) -> None:
+        """ثبت callback که بعد از هر بازدید ثبت شده با attachment_id صدا زده می‌شود"""
+        if callback not in self._attachment_view_listeners:
+            self._attachment_view_listeners.append(callback)
+
+    def remove_attachment_view_listener(self, callback: Callable[[int], None]) -> None:
+        if callback in self._attachment_view_listeners:
+            self._attachment_view_listeners.remove(callback)
+
     def track_attachment_view(self, user_id: int, attachment_id: int) -> bool:
         """
         ثبت بازدید اتچمنت
@@ -1310,8 +1704,13 @@ class DatabasePostgresProxy(DatabasePostgres):
                     """, (user_id, attachment_id))
                 
                 cursor.close()
-                logger.debug(f"✅ View tracked: user={user_id}, att={attachment_id}")
-                return True
+            for listener in self._attachment_view_listeners:
+                try:
+                    listener(attachment_id)
+                except Exception as e:
+                    logger.warning(f"Attachment view listener failed: {e}")
+            logger.debug(f"✅ View tracked: user={user_id}, att={attachment_id}")
+            return True
                 
         except Exception as e:
             log_exception(logger, e, f"track_attachment_view({user_id}, {attachment_id})")
@@ -1366,6 +1765,9 @@ class DatabasePostgresProxy(DatabasePostgres):
         """
         دریافت محبوب‌ترین اتچمنت‌ها بر اساس رأی و تعامل
         
+        از materialized view (attachment_leaderboard) خوانده می‌شود؛ برای days
+        خارج از پنجره‌های leaderboard یا در صورت خطا query زنده اجرا می‌شود.
+        
         Args:
             category: فیلتر دسته (اختیاری)
             weapon: فیلتر سلاح (اختیاری)
@@ -1377,6 +1779,64 @@ class DatabasePostgresProxy(DatabasePostgres):
         Returns:
             List[Dict]: لیست اتچمنت‌های محبوب با آمار
         """
+        suffix = window_suffix(days)
+        if suffix is None:
+            return self._get_popular_attachments_live(category, weapon, mode, limit, days, suggested_only)
+        try:
+            where_clauses = [f"lb.users{suffix} > 0"]
+            params = []
+            
+            if category:
+                where_clauses.append("lb.category = %s")
+                params.append(category)
+            
+            if weapon:
+                where_clauses.append("lb.weapon = %s")
+                params.append(weapon)
+            
+            if mode:
+                where_clauses.append("lb.mode = %s")
+                params.append(mode)
+            
+            join_suggested = (
+                "JOIN suggested_attachments sa ON sa.attachment_id = lb.attachment_id AND sa.mode = lb.mode"
+                if suggested_only else ""
+            )
+            
+            query = f"""
+                SELECT 
+                    a.id,
+                    a.name,
+                    a.code,
+                    lb.mode,
+                    lb.weapon,
+                    lb.category,
+                    lb.likes{suffix} as likes,
+                    lb.dislikes{suffix} as dislikes,
+                    lb.users{suffix} as unique_users,
+                    lb.views{suffix} as views,
+                    lb.clicks{suffix} as total_clicks,
+                    (lb.likes{suffix} - lb.dislikes{suffix}) as net_score
+                FROM {LEADERBOARD_VIEW} lb
+                JOIN attachments a ON a.id = lb.attachment_id
+                {join_suggested}
+                WHERE {" AND ".join(where_clauses)}
+                ORDER BY net_score DESC, views DESC, likes DESC
+                LIMIT %s
+            """
+            params.append(limit)
+            results = self.execute_query(query, tuple(params), fetch_all=True)
+            
+            logger.debug(f"✅ Found {len(results)} popular attachments (leaderboard)")
+            return results
+            
+        except Exception as e:
+            log_exception(logger, e, "get_popular_attachments")
+            return self._get_popular_attachments_live(category, weapon, mode, limit, days, suggested_only)
+    
+    def _get_popular_attachments_live(self, category: str, weapon: str, mode: str,
+                                      limit: int, days: int, suggested_only: bool) -> List[Dict]:
+        """محاسبه مستقیم از user_attachment_engagement (بدون leaderboard)"""
         try:
             # ساخت WHERE clauses
             where_clauses = []
@@ -1394,10 +1854,10 @@ class DatabasePostgresProxy(DatabasePostgres):
                 where_clauses.append("a.mode = %s")
                 params.append(mode)
             
-            # محدوده زمانی: use parameterized interval safely
-            # Using make_interval avoids placing placeholders inside string literals
-            where_clauses.append("uae.last_view_date >= NOW() - make_interval(days => %s)")
-            params.append(days)
+            # محدوده زمانی: بازه نیمه‌باز bind شده روی last_view_date
+            date_filter, date_params = build_datetime_range_filter('uae.last_view_date', days)
+            where_clauses.append(date_filter)
+            params.extend(date_params)
             
             where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
             
@@ -1440,7 +1900,7 @@ class DatabasePostgresProxy(DatabasePostgres):
             return results
             
         except Exception as e:
-            log_exception(logger, e, "get_popular_attachments")
+            log_exception(logger, e, "_get_popular_attachments_live")
             return []
     
     # ==========================================================================
@@ -2504,66 +2964,39 @@ class DatabasePostgresProxy(DatabasePostgres):
             return []
     
     def search_attachments_fts(self, query: str, limit: int = 30) -> List[Dict]:
-        """جستجوی پیشرفته با pg_trgm (PostgreSQL)"""
+        """جستجوی پیشرفته با pg_trgm + رتبه‌بندی ترکیبی (ارتباط متنی، محبوبیت، تازگی)"""
         try:
             # برای کوئری‌های بسیار کوتاه یا صرفاً عددی، مستقیماً از LIKE استفاده کن
             q = (query or '').strip()
             if not q:
                 return []
-            if len(q) < 3 or q.isdigit():
+            from utils.search_ranking import get_search_ranker
+            alias = self.resolve_search_alias(q)
+            if alias:
+                # alias تأیید شده: lookup مستقیم، بدون اسکن FTS و LIKE
+                candidates = self.get_alias_candidates(alias)
+                ranked = get_search_ranker().rank(alias.get('target_label') or q, candidates, limit=limit)
+            elif len(q) < 3 or q.isdigit():
                 return self.search_attachments_like(query, limit)
-
-            # استفاده از pg_trgm برای similarity search
-            query_sql = """
-                SELECT 
-                    c.name as category,
-                    w.name as weapon,
-                    a.mode,
-                    a.code,
-                    a.name as att_name,
-                    a.image_file_id as image,
-                    a.is_top,
-                    a.is_season_top,
-                    -- محاسبه امتیاز شباهت
-                    GREATEST(
-                        similarity(a.name, %s),
-                        similarity(w.name, %s),
-                        similarity(a.code, %s)
-                    ) as score
-                FROM attachments a
-                JOIN weapons w ON a.weapon_id = w.id
-                JOIN weapon_categories c ON w.category_id = c.id
-                WHERE 
-                    a.name %% %s  -- pg_trgm operator
-                    OR w.name %% %s
-                    OR a.code %% %s
-                    -- همچنین برای پوشش کامل، جستجوی ILIKE هم اضافه می‌کنیم
-                    OR a.code ILIKE %s
-                    OR a.name ILIKE %s
-                    OR w.name ILIKE %s
-                ORDER BY score DESC, a.is_season_top DESC, a.is_top DESC
-                LIMIT %s
-            """
-            like_pattern = f"%{q}%"
-            results = self.execute_query(
-                query_sql,
-                (q, q, q, q, q, q, like_pattern, like_pattern, like_pattern, limit),
-                fetch_all=True
-            )
+            else:
+                candidates = self.get_search_candidates(q, limit=max(limit, SEARCH_RANK_CANDIDATES))
+                ranked = get_search_ranker().rank(q, candidates, limit=limit)
             
             items = []
-            for row in results:
+            for row in ranked:
                 items.append({
                     'category': row['category'],
                     'weapon': row['weapon'],
                     'mode': row['mode'],
                     'attachment': {
+                        'id': row['id'],
                         'code': row['code'],
-                        'name': row['att_name'],
+                        'name': row['name'],
                         'image': row['image'],
                         'is_top': row.get('is_top', False),
                         'is_season_top': row.get('is_season_top', False)
-                    }
+                    },
+                    'score': row['rank_score']
                 })
             
             logger.debug(f"FTS search for '{query}' returned {len(items)} results")
@@ -2593,6 +3026,12 @@ class DatabasePostgresProxy(DatabasePostgres):
             query_normalized = query.strip().lower()
             if not query_normalized or len(query_normalized) < 2:
                 return False
+            # مسیر اصلی: صف حافظه + نوشتن دسته‌ای در پس‌زمینه (بدون I/O در مسیر جستجو)
+            from utils.search_analytics_buffer import get_search_analytics_buffer
+            buffer = get_search_analytics_buffer()
+            if buffer.is_running:
+                return buffer.enqueue(user_id, query_normalized, results_count, execution_time_ms)
+            # fallback: وقتی حلقه flush اجرا نمی‌شود (اسکریپت‌ها/ابزارها)
             with self.transaction() as conn:
                 cursor = conn.cursor()
                 # ثبت در تاریخچه
@@ -2615,6 +3054,50 @@ class DatabasePostgresProxy(DatabasePostgres):
             logger.warning(f"Error tracking search: {e}")
             return False
     
+    def write_search_events_batch(self, events: List[Tuple]) -> int:
+        """
+        نوشتن دسته‌ای رویدادهای جستجو
+        
+        Args:
+            events: لیست (user_id, query, results_count, execution_time_ms, created_at)
+        
+        Returns:
+            تعداد ردیف‌های نوشته شده
+        """
+        if not events:
+            return 0
+        # تجمیع شمارش هر کوئری تا برای هر کوئری فقط یک upsert انجام شود
+        deltas: Dict[str, List] = {}
+        for _uid, q, _cnt, _ms, created_at in events:
+            entry = deltas.get(q)
+            if entry is None:
+                deltas[q] = [1, created_at]
+            else:
+                entry[0] += 1
+                if created_at > entry[1]:
+                    entry[1] = created_at
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            with cursor.copy(
+                "COPY search_history (user_id, query, results_count, execution_time_ms, created_at) FROM STDIN"
+            ) as copy:
+                for row in events:
+                    copy.write_row(row)
+            cursor.execute("""
+                INSERT INTO popular_searches (query, search_count, last_searched)
+                SELECT q, c, ls
+                FROM unnest(%s::text[], %s::int[], %s::timestamp[]) AS d(q, c, ls)
+                ON CONFLICT(query) DO UPDATE SET
+                    search_count = popular_searches.search_count + EXCLUDED.search_count,
+                    last_searched = GREATEST(popular_searches.last_searched, EXCLUDED.last_searched)
+            """, (
+                list(deltas.keys()),
+                [v[0] for v in deltas.values()],
+                [v[1] for v in deltas.values()],
+            ))
+            cursor.close()
+        return len(events)
+    
     def get_popular_searches(self, limit: int = 5) -> List[str]:
         """دریافت محبوب‌ترین جستجوها"""
         try:
@@ -2633,8 +3116,11 @@ class DatabasePostgresProxy(DatabasePostgres):
     def get_search_analytics(self, days: int = 30) -> Dict:
         """دریافت آمار جستجو"""
         try:
+            # بازه نیمه‌باز روی created_at (index + partition pruning)
+            date_filter, date_params = build_datetime_range_filter('created_at', days)
+
             # آمار کلی
-            query_stats = """
+            query_stats = f"""
                 SELECT 
                     COUNT(*) as total_searches,
                     COUNT(DISTINCT user_id) as unique_users,
@@ -2642,32 +3128,32 @@ class DatabasePostgresProxy(DatabasePostgres):
                     AVG(execution_time_ms) as avg_time_ms,
                     SUM(CASE WHEN results_count = 0 THEN 1 ELSE 0 END) as zero_results
                 FROM search_history
-                WHERE created_at >= NOW() - make_interval(days => %s)
+                WHERE {date_filter}
             """
-            stats = self.execute_query(query_stats, (days,), fetch_one=True)
+            stats = self.execute_query(query_stats, date_params, fetch_one=True)
             
             # محبوب‌ترین جستجوها
-            query_top = """
+            query_top = f"""
                 SELECT query, COUNT(*) as count
                 FROM search_history
-                WHERE created_at >= NOW() - make_interval(days => %s)
+                WHERE {date_filter}
                 GROUP BY query
                 ORDER BY count DESC
                 LIMIT 10
             """
-            top_queries = self.execute_query(query_top, (days,), fetch_all=True)
+            top_queries = self.execute_query(query_top, date_params, fetch_all=True)
             
             # جستجوهای بدون نتیجه
-            query_failed = """
+            query_failed = f"""
                 SELECT query, COUNT(*) as count
                 FROM search_history
                 WHERE results_count = 0
-                  AND created_at >= NOW() - make_interval(days => %s)
+                  AND {date_filter}
                 GROUP BY query
                 ORDER BY count DESC
                 LIMIT 10
             """
-            failed_queries = self.execute_query(query_failed, (days,), fetch_all=True)
+            failed_queries = self.execute_query(query_failed, date_params, fetch_all=True)
             
             total = stats['total_searches'] or 1
             zero_rate = (stats['zero_results'] / total) * 100 if total > 0 else 0
@@ -2696,17 +3182,593 @@ class DatabasePostgresProxy(DatabasePostgres):
                 'failed_queries': []
             }
     
+    # ==========================================================================
+    # Search Aliases (zero-result query analyzer)
+    # ==========================================================================
+    
+    def get_zero_result_queries(self, days: int = 14, min_count: int = 3, limit: int = 200) -> List[Dict]:
+        """کوئری‌های پرتکرار بدون نتیجه که هنوز alias ندارند"""
+        try:
+            date_filter, date_params = build_datetime_range_filter('sh.created_at', days)
+            query = f"""
+                SELECT sh.query, COUNT(*) as count
+                FROM search_history sh
+                WHERE sh.results_count = 0
+                  AND {date_filter}
+                  AND NOT EXISTS (SELECT 1 FROM search_aliases sa WHERE sa.alias = sh.query)
+                GROUP BY sh.query
+                HAVING COUNT(*) >= %s
+                ORDER BY count DESC
+                LIMIT %s
+            """
+            return self.execute_query(query, (*date_params, min_count, limit), fetch_all=True) or []
+        except Exception as e:
+            log_exception(logger, e, "get_zero_result_queries")
+            return []
+    
+    def get_search_alias_targets(self) -> List[Dict]:
+        """لیست سلاح‌ها و اتچمنت‌ها به عنوان مقصدهای ممکن alias"""
+        try:
+            query = """
+                SELECT 'weapon' as target_type, w.id as target_id, w.name as label, w.name as text
+                FROM weapons w
+                WHERE COALESCE(w.is_active, TRUE) = TRUE
+                UNION ALL
+                SELECT 'attachment', a.id, a.name || ' (' || w.name || ')', a.name
+                FROM attachments a
+                JOIN weapons w ON a.weapon_id = w.id
+                UNION ALL
+                SELECT 'attachment', a.id, a.name || ' (' || w.name || ')', a.code
+                FROM attachments a
+                JOIN weapons w ON a.weapon_id = w.id
+                WHERE a.code IS NOT NULL AND a.code <> ''
+            """
+            return self.execute_query(query, fetch_all=True) or []
+        except Exception as e:
+            log_exception(logger, e, "get_search_alias_targets")
+            return []
+    
+    def save_search_alias_proposals(self, proposals: List[Dict]) -> int:
+        """
+        ثبت پیشنهادهای alias (وضعیت pending)
+        
+        Args:
+            proposals: لیست dict با کلیدهای alias, target_type, target_id,
+                       target_label, confidence, zero_result_count
+        
+        Returns:
+            تعداد ردیف‌های درج/به‌روزرسانی شده
+        """
+        if not proposals:
+            return 0
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO search_aliases
+                        (alias, target_type, target_id, target_label, confidence, zero_result_count)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (alias) DO UPDATE SET
+                        zero_result_count = EXCLUDED.zero_result_count,
+                        confidence = EXCLUDED.confidence
+                    WHERE search_aliases.status = 'pending'
+                """, [
+                    (p['alias'], p['target_type'], p['target_id'], p.get('target_label'),
+                     p.get('confidence', 0), p.get('zero_result_count', 0))
+                    for p in proposals
+                ])
+                count = cursor.rowcount
+                cursor.close()
+            return len(proposals) if count is None or count < 0 else count
+        except Exception as e:
+            log_exception(logger, e, "save_search_alias_proposals")
+            return 0
+    
+    def get_pending_search_aliases(self, limit: int = 10) -> List[Dict]:
+        """پیشنهادهای alias در انتظار تأیید ادمین"""
+        try:
+            query = """
+                SELECT id, alias, target_type, target_id, target_label, confidence, zero_result_count
+                FROM search_aliases
+                WHERE status = 'pending'
+                ORDER BY zero_result_count DESC, confidence DESC
+                LIMIT %s
+            """
+            return self.execute_query(query, (limit,), fetch_all=True) or []
+        except Exception as e:
+            log_exception(logger, e, "get_pending_search_aliases")
+            return []
+    
+    def review_search_alias(self, alias_id: int, approve: bool, admin_id: int) -> bool:
+        """تأیید/رد یک alias توسط ادمین"""
+        try:
+            rowcount = self.execute_query("""
+                UPDATE search_aliases
+                SET status = %s, reviewed_by = %s, reviewed_at = NOW()
+                WHERE id = %s AND status = 'pending'
+            """, ('approved' if approve else 'rejected', admin_id, alias_id))
+            if approve and rowcount:
+                self.get_approved_search_aliases.cache_clear()
+                invalidate_inline_results()
+            return bool(rowcount)
+        except Exception as e:
+            log_exception(logger, e, f"review_search_alias({alias_id})")
+            return False
+    
+    @cached(ttl=300)
+    def get_approved_search_aliases(self) -> Dict[str, Dict]:
+        """نقشه alias → مقصد برای aliasهای تأیید شده"""
+        try:
+            rows = self.execute_query("""
+                SELECT alias, target_type, target_id, target_label
+                FROM search_aliases
+                WHERE status = 'approved'
+            """, fetch_all=True) or []
+            return {r['alias']: r for r in rows}
+        except Exception as e:
+            log_exception(logger, e, "get_approved_search_aliases")
+            return {}
+    
+    def resolve_search_alias(self, query_text: str) -> Optional[Dict]:
+        """یافتن alias تأیید شده برای کوئری (نرمال‌سازی مشابه track_search)"""
+        q = (query_text or '').strip().lower()
+        if not q:
+            return None
+        return self.get_approved_search_aliases().get(q)
+    
+    def get_alias_candidates(self, alias: Dict, limit: int = SEARCH_RANK_CANDIDATES) -> List[Dict]:
+        """کاندیداهای جستجو برای یک alias (lookup مستقیم با id، بدون اسکن متنی)"""
+        column = 'w.id' if alias['target_type'] == 'weapon' else 'a.id'
+        label = ' '.join((alias.get('target_label') or alias.get('alias') or '').lower().split())
+        # ویژگی‌های متنی نسبت به target_label؛ بدون pg_trgm (کاندیداها خود مقصد alias هستند)
+        features, features_join = build_search_feature_sql(with_trgm=False)
+        query = f"""
+            SELECT a.id, a.code, a.name, a.image_file_id as image, a.mode,
+                   a.is_top, a.is_season_top, a.created_at,
+                   EXTRACT(EPOCH FROM (NOW() - a.created_at)) / 86400.0 as age_days,
+                   w.name as weapon, c.name as category,
+                   {features},
+                   COALESCE(a.views_count, 0) + 3 * COALESCE(a.shares_count, 0) as popularity
+            FROM attachments a
+            JOIN weapons w ON a.weapon_id = w.id
+            JOIN weapon_categories c ON w.category_id = c.id
+            {features_join}
+            WHERE {column} = %s
+            ORDER BY a.is_season_top DESC, a.is_top DESC, popularity DESC
+            LIMIT %s
+        """
+        try:
+            return self.execute_query(query, (label, alias['target_id'], limit), fetch_all=True) or []
+        except Exception as e:
+            log_exception(logger, e, f"get_alias_candidates({alias.get('alias')})")
+            return []
+
+    # ==========================================================================
+    # Attachment Metrics Daily Rollup
+    # ==========================================================================
+
+    def rollup_attachment_metrics(self, batch_size: int = 50000, lag_seconds: int = 30) -> int:
+        """
+        تجمیع افزایشی attachment_metrics در attachment_metrics_daily
+
+        فقط ردیف‌های بعد از watermark (metrics_rollup_state.last_id) پردازش
+        می‌شوند؛ هر batch در یک transaction: upsert کاربران روز
+        (attachment_metrics_daily_users)، upsert شمارنده‌های روزانه، sketchهای
+        HLL (attachment_metrics_daily_hll) و جابه‌جایی watermark. کاربر جدید
+        یک روز (درج، نه update) unique_users را یکی زیاد می‌کند، پس شمارش یکتا
+        بدون اسکن دوباره روزهای قبل دقیق می‌ماند.
+
+        ردیف‌های جوان‌تر از lag_seconds (ممکن است id کوچک‌تری هنوز commit نشده
+        باشد) به اجرای بعد موکول می‌شوند.
+
+        Returns:
+            تعداد ردیف‌های خام پردازش شده
+        """
+        processed = 0
+        try:
+            while True:
+                with self.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        INSERT INTO metrics_rollup_state (name) VALUES ('attachment_metrics_daily')
+                        ON CONFLICT (name) DO NOTHING
+                    """)
+                    # FOR UPDATE: دو پروسس هم‌زمان یک بازه را دو بار نمی‌شمارند
+                    cursor.execute("""
+                        SELECT last_id FROM metrics_rollup_state
+                        WHERE name = 'attachment_metrics_daily'
+                        FOR UPDATE
+                    """)
+                    low = int(cursor.fetchone()['last_id'])
+                    # مرز batch: بزرگ‌ترین id دیده‌شده قبل از اولین ردیف جوان‌تر از lag
+                    # (نه first_recent - 1: ممکن است همان id هنوز commit نشده باشد)
+                    cursor.execute("""
+                        WITH batch AS (
+                            SELECT id, action_date
+                            FROM attachment_metrics
+                            WHERE id > %s
+                            ORDER BY id
+                            LIMIT %s
+                        ),
+                        first_recent AS (
+                            SELECT MIN(id) AS id
+                            FROM batch
+                            WHERE action_date >= NOW() - make_interval(secs => %s)
+                        ),
+                        bound AS (
+                            SELECT MAX(b.id) FILTER (WHERE fr.id IS NULL OR b.id < fr.id) AS high,
+                                   COUNT(*) AS fetched
+                            FROM batch b CROSS JOIN first_recent fr
+                        )
+                        SELECT bound.high, bound.fetched,
+                               (SELECT COUNT(*) FROM batch WHERE id <= bound.high) AS ready
+                        FROM bound
+                    """, (low, batch_size, lag_seconds))
+                    row = cursor.fetchone()
+                    high = row['high']
+                    if high is None or high <= low:
+                        break
+
+                    cursor.execute("""
+                        WITH raw AS (
+                            SELECT attachment_id, action_date::date AS metric_date,
+                                   user_id, action_type, action_date
+                            FROM attachment_metrics
+                            WHERE id > %(low)s AND id <= %(high)s
+                        ),
+                        per_user AS (
+                            INSERT INTO attachment_metrics_daily_users AS u
+                                (metric_date, attachment_id, user_id, views, clicks, last_action_at)
+                            SELECT metric_date, attachment_id, user_id,
+                                   COUNT(*) FILTER (WHERE action_type = 'view'),
+                                   COUNT(*) FILTER (WHERE action_type = 'click'),
+                                   MAX(action_date)
+                            FROM raw
+                            WHERE user_id IS NOT NULL
+                            GROUP BY metric_date, attachment_id, user_id
+                            ON CONFLICT (metric_date, attachment_id, user_id) DO UPDATE SET
+                                views = u.views + EXCLUDED.views,
+                                clicks = u.clicks + EXCLUDED.clicks,
+                                last_action_at = GREATEST(u.last_action_at, EXCLUDED.last_action_at)
+                            RETURNING metric_date, attachment_id, (xmax = 0) AS is_new
+                        ),
+                        new_users AS (
+                            SELECT metric_date, attachment_id, COUNT(*) FILTER (WHERE is_new) AS n
+                            FROM per_user
+                            GROUP BY metric_date, attachment_id
+                        ),
+                        counts AS (
+                            SELECT attachment_id, metric_date,
+                                   COUNT(*) FILTER (WHERE action_type = 'view') AS views,
+                                   COUNT(*) FILTER (WHERE action_type = 'click') AS clicks,
+                                   COUNT(*) FILTER (WHERE action_type = 'share') AS shares,
+                                   COUNT(*) FILTER (WHERE action_type = 'copy') AS copies,
+                                   COUNT(*) FILTER (WHERE action_type = 'rate') AS rates
+                            FROM raw
+                            GROUP BY attachment_id, metric_date
+                        )
+                        INSERT INTO attachment_metrics_daily AS d
+                            (attachment_id, metric_date, views, clicks, shares, copies, rates, unique_users)
+                        SELECT c.attachment_id, c.metric_date, c.views, c.clicks, c.shares, c.copies, c.rates,
+                               COALESCE(nu.n, 0)
+                        FROM counts c
+                        LEFT JOIN new_users nu
+                          ON nu.attachment_id = c.attachment_id AND nu.metric_date = c.metric_date
+                        ON CONFLICT (attachment_id, metric_date) DO UPDATE SET
+                            views = d.views + EXCLUDED.views,
+                            clicks = d.clicks + EXCLUDED.clicks,
+                            shares = d.shares + EXCLUDED.shares,
+                            copies = d.copies + EXCLUDED.copies,
+                            rates = d.rates + EXCLUDED.rates,
+                            unique_users = d.unique_users + EXCLUDED.unique_users
+                    """, {'low': low, 'high': high})
+                    # sketchهای HLL کاربران یکتا در همان transaction
+                    update_sketches(cursor, low, high)
+
+                    cursor.execute("""
+                        UPDATE metrics_rollup_state
+                        SET last_id = %s, updated_at = NOW()
+                        WHERE name = 'attachment_metrics_daily'
+                    """, (high,))
+                    cursor.close()
+                processed += int(row['ready'])
+                # batch ناقص یا ردیف‌های نگه‌داشته‌شده (lag): تا اجرای بعد چیزی برای پردازش نیست
+                if int(row['fetched']) < batch_size or int(row['ready']) < int(row['fetched']):
+                    break
+        except Exception as e:
+            log_exception(logger, e, "rollup_attachment_metrics")
+        return processed
+
+    def rebuild_attachment_hll(self, days_ago: Optional[int] = None) -> int:
+        """
+        بازسازی sketchهای HLL از مجموعه‌های دقیق attachment_metrics_daily_users
+
+        Returns:
+            تعداد sketchهای ساخته شده (-1 در صورت خطا)
+        """
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                built = rebuild_sketches(cursor, days_ago)
+                cursor.close()
+            return built
+        except Exception as e:
+            log_exception(logger, e, "rebuild_attachment_hll")
+            return -1
+
+    def count_attachment_unique_users(self, days_ago: Optional[int] = None,
+                                      attachment_id: int = ALL_ATTACHMENTS,
+                                      exact: Optional[bool] = None) -> int:
+        """
+        کاربران یکتای اتچمنت (یا همه) در N روز اخیر؛ تقریبی از sketchها مگر exact
+
+        Args:
+            days_ago: None = کل زمان
+            exact: None = ANALYTICS_EXACT_UNIQUES
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                n = count_unique_users(cursor, days_ago, attachment_id=attachment_id, exact=exact)
+                cursor.close()
+            return n
+        except Exception as e:
+            log_exception(logger, e, f"count_attachment_unique_users({attachment_id})")
+            return 0
+
+    # ==========================================================================
+    # Analytics Partitions (attachment_metrics / search_history)
+    # ==========================================================================
+
+    def ensure_analytics_partitions(self, months_ahead: int = 3) -> Dict[str, List[str]]:
+        """ساخت پارتیشن‌های ماه جاری و آینده برای جداول پارتیشن‌شده"""
+        created: Dict[str, List[str]] = {}
+        for table in PARTITIONED_TABLES:
+            try:
+                with self.transaction() as conn:
+                    cursor = conn.cursor()
+                    if is_partitioned(cursor, table):
+                        created[table] = ensure_partitions(cursor, table, months_ahead)
+                    cursor.close()
+            except Exception as e:
+                log_exception(logger, e, f"ensure_analytics_partitions({table})")
+        return created
+
+    def expire_analytics_partitions(self, table: str, retention_months: int,
+                                    archive_dir: Optional[str] = None, drop: bool = True) -> List[str]:
+        """
+        جدا کردن (و در صورت drop حذف) پارتیشن‌های قدیمی‌تر از retention_months
+
+        هر پارتیشن در transaction خودش؛ اگر export (archive_dir) شکست بخورد
+        پارتیشن دست نمی‌خورد. پارتیشن‌های attachment_metrics که هنوز در
+        rollup روزانه تجمیع نشده‌اند (id بعد از watermark) نگه داشته می‌شوند.
+
+        Returns:
+            نام پارتیشن‌های جدا شده
+        """
+        if table not in PARTITIONED_TABLES or retention_months <= 0:
+            return []
+        expired_names: List[str] = []
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if not is_partitioned(cursor, table):
+                    return []
+                partitions = expired_partitions(cursor, table, retention_months)
+                cursor.close()
+        except Exception as e:
+            log_exception(logger, e, f"expire_analytics_partitions({table})")
+            return []
+
+        for partition in partitions:
+            name = partition['name']
+            try:
+                with self.transaction() as conn:
+                    cursor = conn.cursor()
+                    if table == 'attachment_metrics':
+                        cursor.execute(
+                            sql.SQL("""
+                                SELECT COALESCE(MAX(p.id), 0) > COALESCE(
+                                    (SELECT last_id FROM metrics_rollup_state WHERE name = 'attachment_metrics_daily'), 0
+                                ) AS pending
+                                FROM {} p
+                            """).format(sql.Identifier(name))
+                        )
+                        if cursor.fetchone()['pending']:
+                            logger.warning(f"Partition {name} not rolled up yet; keeping it")
+                            continue
+                    if archive_dir:
+                        path = export_partition(cursor, name, archive_dir)
+                        logger.info(f"Partition {name} exported to {path}")
+                    detach_partition(cursor, table, name, drop=drop)
+                    cursor.close()
+                expired_names.append(name)
+                logger.info(f"Partition {name} {'dropped' if drop else 'detached'}")
+            except Exception as e:
+                log_exception(logger, e, f"expire_analytics_partitions({name})")
+        return expired_names
+
+    # ==========================================================================
+    # Popularity Leaderboard (attachment_leaderboard materialized view)
+    # ==========================================================================
+
+    def refresh_attachment_leaderboard(self, concurrently: bool = True) -> bool:
+        """بازسازی materialized view محبوبیت (بدون قفل کردن خواندن‌ها)"""
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                refresh_leaderboard(cursor, concurrently=concurrently)
+                cursor.close()
+            return True
+        except Exception as e:
+            log_exception(logger, e, "refresh_attachment_leaderboard")
+            return False
+
+    # ==========================================================================
+    # Analytics Dashboard Snapshots
+    # ==========================================================================
+
+    def save_dashboard_snapshots(self, snapshots: Dict[str, Dict]) -> bool:
+        """ذخیره payload چند view داشبورد در یک transaction"""
+        import json
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    """
+                    INSERT INTO analytics_dashboard_snapshots (view_name, payload, computed_at)
+                    VALUES (%s, %s::jsonb, NOW())
+                    ON CONFLICT (view_name) DO UPDATE SET
+                        payload = EXCLUDED.payload,
+                        computed_at = EXCLUDED.computed_at
+                    """,
+                    [
+                        (view, json.dumps(payload, ensure_ascii=False, default=str))
+                        for view, payload in snapshots.items()
+                    ],
+                )
+                cursor.close()
+            return True
+        except Exception as e:
+            log_exception(logger, e, "save_dashboard_snapshots")
+            return False
+
+    def get_dashboard_snapshot(self, view: str) -> Optional[Dict]:
+        """
+        آخرین snapshot یک view داشبورد
+
+        Returns:
+            {'payload': dict, 'computed_at': datetime} یا None
+        """
+        try:
+            row = self.execute_query(
+                "SELECT payload, computed_at FROM analytics_dashboard_snapshots WHERE view_name = %s",
+                (view,), fetch_one=True
+            )
+            if not row:
+                return None
+            return {'payload': row['payload'], 'computed_at': row['computed_at']}
+        except Exception as e:
+            log_exception(logger, e, f"get_dashboard_snapshot({view})")
+            return None
+
+    # ==========================================================================
+    # Trending Counter Checkpoints
+    # ==========================================================================
+
+    def save_trending_buckets(self, rows: List[Tuple], oldest) -> bool:
+        """
+        ذخیره bucketهای ساعتی شمارنده ترندینگ (مقدار کامل، نه delta)
+        و حذف bucketهای قدیمی‌تر از oldest
+
+        Args:
+            rows: لیست (attachment_id, bucket_hour, views)
+            oldest: اولین ساعت پنجره (timestamptz)
+        """
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                if rows:
+                    cursor.executemany(
+                        """
+                        INSERT INTO attachment_trending_buckets (attachment_id, bucket_hour, views)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT (attachment_id, bucket_hour) DO UPDATE SET views = EXCLUDED.views
+                        """,
+                        rows,
+                    )
+                cursor.execute("DELETE FROM attachment_trending_buckets WHERE bucket_hour < %s", (oldest,))
+                cursor.close()
+            return True
+        except Exception as e:
+            log_exception(logger, e, "save_trending_buckets")
+            return False
+
+    def load_trending_buckets(self, since) -> Optional[List[Dict]]:
+        """
+        bucketهای ساعتی از since به بعد
+
+        Returns:
+            لیست {attachment_id, bucket_hour, views} یا None در صورت خطا
+        """
+        try:
+            return self.execute_query(
+                """
+                SELECT attachment_id, bucket_hour, views
+                FROM attachment_trending_buckets
+                WHERE bucket_hour >= %s
+                """,
+                (since,), fetch_all=True
+            ) or []
+        except Exception as e:
+            log_exception(logger, e, "load_trending_buckets")
+            return None
+
+    def start_trending_tracking(self, hour: int) -> Optional[int]:
+        """
+        ساعت شروع ثبت بازدیدهای ترندینگ (epoch hours، در metrics_rollup_state)
+
+        اولین فراخوانی hour را ثبت می‌کند و بعد از آن همان مقدار اول برگردانده
+        می‌شود؛ تا پوشش کامل دو پنجره لیست ترندینگ در حال گرم شدن است.
+
+        Returns:
+            ساعت شروع یا None در صورت خطا
+        """
+        try:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO metrics_rollup_state (name, last_id) VALUES ('trending_counter', %s)
+                    ON CONFLICT (name) DO NOTHING
+                """, (hour,))
+                cursor.execute("""
+                    SELECT last_id FROM metrics_rollup_state WHERE name = 'trending_counter'
+                """)
+                row = cursor.fetchone()
+                cursor.close()
+            return int(row['last_id'])
+        except Exception as e:
+            log_exception(logger, e, "start_trending_tracking")
+            return None
+
+    def get_trending_metadata(self, attachment_ids: List[int]) -> List[Dict]:
+        """اطلاعات نمایشی اتچمنت‌ها برای لیست ترندینگ (بدون اتچمنت‌های تستی)"""
+        if not attachment_ids:
+            return []
+        try:
+            return self.execute_query(
+                """
+                SELECT a.id, a.name, a.code, a.mode,
+                       COALESCE(w.name, 'Unknown') AS weapon,
+                       c.name AS category
+                FROM attachments a
+                LEFT JOIN weapons w ON a.weapon_id = w.id
+                LEFT JOIN weapon_categories c ON w.category_id = c.id
+                WHERE a.id = ANY(%s)
+                  AND a.name NOT LIKE '%%Test%%'
+                  AND a.name NOT LIKE '%%test%%'
+                  AND a.name NOT LIKE '%%تست%%'
+                  AND a.code NOT LIKE 'CODE%%'
+                  AND a.code NOT LIKE 'DUP%%'
+                  AND COALESCE(w.name, '') NOT LIKE '%%Test%%'
+                """,
+                (list(attachment_ids),), fetch_all=True
+            )
+        except Exception as e:
+            log_exception(logger, e, "get_trending_metadata")
+            return []
+
     def get_attachment_stats(self, attachment_id: int, period: str = 'all') -> Dict:
         """دریافت آمار بازخورد اتچمنت"""
         try:
             # تعیین فیلتر زمانی
             date_filter = ""
-            if period == 'week':
-                date_filter = "AND last_view_date >= NOW() - INTERVAL '7 days'"
-            elif period == 'month':
-                date_filter = "AND last_view_date >= NOW() - INTERVAL '30 days'"
-            elif period == 'year':
-                date_filter = "AND last_view_date >= NOW() - INTERVAL '365 days'"
+            params: Tuple = (attachment_id,)
+            period_days = {'week': 7, 'month': 30, 'year': 365}.get(period)
+            if period_days:
+                clause, date_params = build_datetime_range_filter('last_view_date', period_days)
+                date_filter = f"AND {clause}"
+                params += date_params
             
             # آمار رأی‌ها
             query_votes = f"""
@@ -2721,7 +3783,7 @@ class DatabasePostgresProxy(DatabasePostgres):
                 WHERE attachment_id = %s {date_filter}
             """
             
-            vote_stats = self.execute_query(query_votes, (attachment_id,), fetch_one=True)
+            vote_stats = self.execute_query(query_votes, params, fetch_one=True)
             
             likes = vote_stats['likes'] or 0
             dislikes = vote_stats['dislikes'] or 0
@@ -3328,13 +4390,21 @@ class DatabasePostgresProxy(DatabasePostgres):
                     events = EXCLUDED.events,
                     updated_at = NOW()
             """
-            # ✅ استفاده از json.dumps برای تبدیل dict به JSON string، سپس cast به JSONB
-            self.execute_query(query, (
-                user_id,
-                preferences.get('enabled', True),
-                json.dumps(preferences.get('modes', ['br', 'mp'])),
-                json.dumps(preferences.get('events', {}))
-            ))
+            with self.transaction() as conn:
+                cur = conn.cursor()
+                # ✅ استفاده از json.dumps برای تبدیل dict به JSON string، سپس cast به JSONB
+                cur.execute(query, (
+                    user_id,
+                    preferences.get('enabled', True),
+                    json.dumps(preferences.get('modes', ['br', 'mp'])),
+                    json.dumps(preferences.get('events', {}))
+                ))
+                # همگام‌سازی نسخه نرمال‌شده برای کوئری مخاطبان
+                cur.execute(
+                    "UPDATE subscribers SET notify_mask = %s WHERE user_id = %s",
+                    (preferences_to_mask(preferences), user_id)
+                )
+            get_cache().invalidate_pattern('notif_audience:')
             logger.info(f"✅ Notification preferences updated: user={user_id}")
             return True
             
@@ -4264,21 +5334,20 @@ class DatabasePostgresProxy(DatabasePostgres):
                     a.image_file_id as image,
                     sa.priority,
                     sa.reason,
-                    COALESCE(SUM(CASE WHEN uae.rating = 1 THEN 1 ELSE 0 END), 0) as likes,
-                    COALESCE(SUM(CASE WHEN uae.rating = -1 THEN 1 ELSE 0 END), 0) as dislikes,
-                    COALESCE(SUM(uae.total_views), 0) as views,
-                    -- محاسبه PopScore
+                    COALESCE(lb.likes, 0) as likes,
+                    COALESCE(lb.dislikes, 0) as dislikes,
+                    COALESCE(lb.views, 0) as views,
+                    -- محاسبه PopScore (آمار از attachment_leaderboard، بدون GROUP BY)
                     (1000 - sa.priority) + 
-                    (COALESCE(SUM(CASE WHEN uae.rating = 1 THEN 1 ELSE 0 END), 0) * 10) - 
-                    (COALESCE(SUM(CASE WHEN uae.rating = -1 THEN 1 ELSE 0 END), 0) * 5) +
-                    (COALESCE(SUM(uae.total_views), 0) / 10.0) as pop_score
+                    (COALESCE(lb.likes, 0) * 10) - 
+                    (COALESCE(lb.dislikes, 0) * 5) +
+                    (COALESCE(lb.views, 0) / 10.0) as pop_score
                 FROM suggested_attachments sa
                 JOIN attachments a ON sa.attachment_id = a.id
                 JOIN weapons w ON a.weapon_id = w.id
                 JOIN weapon_categories wc ON w.category_id = wc.id
-                LEFT JOIN user_attachment_engagement uae ON a.id = uae.attachment_id
+                LEFT JOIN {LEADERBOARD_VIEW} lb ON lb.attachment_id = a.id
                 WHERE {where_sql}
-                GROUP BY a.id, wc.name, w.name, sa.mode, sa.priority, sa.reason
                 ORDER BY pop_score DESC, sa.priority ASC, likes DESC
             """
             
@@ -0,0 +1,217 @@
+"""
+Daily HyperLogLog sketches of attachment users
+
+attachment_metrics_daily_hll برای هر (attachment_id, metric_date) یک sketch
+کاربران یکتا نگه می‌دارد؛ ردیف attachment_id = ALL_ATTACHMENTS کاربران یکتای
+کل اتچمنت‌ها در آن روز است. کاربران یکتای هر بازه با merge چند sketch روزانه
+(utils/hll.py) تخمین زده می‌شوند، بدون COUNT(DISTINCT) روی مجموعه‌های بزرگ.
+
+sketchها در همان transaction تجمیع روزانه (rollup_attachment_metrics) به‌روز
+می‌شوند و از attachment_metrics_daily_users (مجموعه‌های دقیق) قابل بازسازی
+هستند؛ حالت exact برای audit همان COUNT(DISTINCT) روی مجموعه‌های دقیق است.
+روزهای کم‌کاربر به صورت sparse (hashهای خام) ذخیره می‌شوند، نه ۴ کیلوبایت
+register کامل (utils/hll.py).
+
+توابع این ماژول روی cursor کار می‌کنند (مثل leaderboard و partitioning).
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.config import ANALYTICS_EXACT_UNIQUES
+from core.database.sql_helpers import build_date_range_filter
+from utils.hll import HyperLogLog
+
+HLL_TABLE = 'attachment_metrics_daily_hll'
+
+# attachment_id رزرو شده برای sketch کل اتچمنت‌ها (idهای SERIAL از ۱ شروع می‌شوند)
+ALL_ATTACHMENTS = 0
+
+
+def _merge_into(cursor, users: Dict[Tuple[int, date], Iterable]) -> int:
+    """اضافه کردن کاربران به sketchهای (attachment_id, metric_date) و upsert"""
+    if not users:
+        return 0
+    keys = list(users)
+    cursor.execute(
+        f"""
+        SELECT attachment_id, metric_date, sketch FROM {HLL_TABLE}
+        WHERE (attachment_id, metric_date) IN (
+            SELECT * FROM unnest(%s::int[], %s::date[])
+        )
+        """,
+        ([k[0] for k in keys], [k[1] for k in keys]),
+    )
+    existing = {(r['attachment_id'], r['metric_date']): r['sketch'] for r in cursor.fetchall()}
+
+    rows = []
+    for key, values in users.items():
+        sketch = HyperLogLog.from_bytes(existing[key]) if key in existing else HyperLogLog()
+        sketch.update(values)
+        rows.append((key[0], key[1], sketch.to_bytes()))
+    cursor.executemany(
+        f"""
+        INSERT INTO {HLL_TABLE} (attachment_id, metric_date, sketch)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (attachment_id, metric_date) DO UPDATE SET sketch = EXCLUDED.sketch
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def _group_users(rows) -> Dict[Tuple[int, date], set]:
+    users: Dict[Tuple[int, date], set] = defaultdict(set)
+    for r in rows:
+        users[(r['attachment_id'], r['metric_date'])].add(r['user_id'])
+        users[(ALL_ATTACHMENTS, r['metric_date'])].add(r['user_id'])
+    return users
+
+
+def update_sketches(cursor, low: int, high: int) -> int:
+    """
+    اضافه کردن کاربران ردیف‌های id در (low, high] از attachment_metrics
+
+    در transaction هر batch از rollup صدا زده می‌شود (قفل watermark مانع
+    به‌روزرسانی هم‌زمان می‌شود).
+
+    Returns:
+        تعداد sketchهای به‌روز شده
+    """
+    cursor.execute(
+        """
+        SELECT DISTINCT attachment_id, action_date::date AS metric_date, user_id
+        FROM attachment_metrics
+        WHERE id > %s AND id <= %s AND user_id IS NOT NULL
+        """,
+        (low, high),
+    )
+    return _merge_into(cursor, _group_users(cursor.fetchall()))
+
+
+def rebuild_sketches(cursor, days_ago: Optional[int] = None) -> int:
+    """
+    بازسازی sketchها از attachment_metrics_daily_users (روز به روز)
+
+    قفل ردیف watermark در metrics_rollup_state گرفته می‌شود تا بازسازی با یک
+    batch هم‌زمان rollup (که همین sketchها را به‌روز می‌کند) هم‌پوشانی نداشته باشد.
+
+    Args:
+        days_ago: فقط N روز اخیر؛ None یعنی همه روزها
+
+    Returns:
+        تعداد sketchهای ساخته شده
+    """
+    cursor.execute("""
+        INSERT INTO metrics_rollup_state (name) VALUES ('attachment_metrics_daily')
+        ON CONFLICT (name) DO NOTHING
+    """)
+    cursor.execute("""
+        SELECT last_id FROM metrics_rollup_state
+        WHERE name = 'attachment_metrics_daily'
+        FOR UPDATE
+    """)
+    where, params = ("TRUE", ())
+    if days_ago is not None:
+        where, params = build_date_range_filter('metric_date', days_ago)
+    cursor.execute(f"DELETE FROM {HLL_TABLE} WHERE {where}", params)
+    cursor.execute(
+        f"SELECT DISTINCT metric_date FROM attachment_metrics_daily_users WHERE {where} ORDER BY metric_date",
+        params,
+    )
+    days = [r['metric_date'] for r in cursor.fetchall()]
+    built = 0
+    for day in days:
+        cursor.execute(
+            """
+            SELECT attachment_id, metric_date, user_id
+            FROM attachment_metrics_daily_users
+            WHERE metric_date = %s
+            """,
+            (day,),
+        )
+        built += _merge_into(cursor, _group_users(cursor.fetchall()))
+    return built
+
+
+def _range_filter(days_ago: Optional[int], span_days: Optional[int]) -> Tuple[str, tuple]:
+    if days_ago is None:
+        return "TRUE", ()
+    return build_date_range_filter('metric_date', days_ago, span_days=span_days)
+
+
+def count_unique_users(
+    cursor,
+    days_ago: Optional[int] = None,
+    span_days: Optional[int] = None,
+    attachment_id: int = ALL_ATTACHMENTS,
+    exact: Optional[bool] = None,
+) -> int:
+    """
+    کاربران یکتای یک اتچمنت (یا کل اتچمنت‌ها) در بازه روزانه
+
+    Args:
+        days_ago / span_days: همان معنای get_date_range؛ days_ago=None یعنی کل زمان
+        attachment_id: ALL_ATTACHMENTS برای همه اتچمنت‌ها
+        exact: True = COUNT(DISTINCT) دقیق؛ None = ANALYTICS_EXACT_UNIQUES
+    """
+    return count_unique_users_by_attachment(
+        cursor, [attachment_id], days_ago, span_days, exact=exact
+    ).get(attachment_id, 0)
+
+
+def count_unique_users_by_attachment(
+    cursor,
+    attachment_ids: List[int],
+    days_ago: Optional[int] = None,
+    span_days: Optional[int] = None,
+    exact: Optional[bool] = None,
+) -> Dict[int, int]:
+    """
+    کاربران یکتای هر اتچمنت در بازه روزانه
+
+    Returns:
+        {attachment_id: unique_users}
+    """
+    if not attachment_ids:
+        return {}
+    if exact is None:
+        exact = ANALYTICS_EXACT_UNIQUES
+    date_filter, date_params = _range_filter(days_ago, span_days)
+    counts = {att_id: 0 for att_id in attachment_ids}
+
+    if exact:
+        if ALL_ATTACHMENTS in counts:
+            cursor.execute(
+                f"SELECT COUNT(DISTINCT user_id) AS n FROM attachment_metrics_daily_users WHERE {date_filter}",
+                date_params,
+            )
+            counts[ALL_ATTACHMENTS] = int((cursor.fetchone() or {}).get('n') or 0)
+        ids = [a for a in attachment_ids if a != ALL_ATTACHMENTS]
+        if ids:
+            cursor.execute(
+                f"""
+                SELECT attachment_id, COUNT(DISTINCT user_id) AS n
+                FROM attachment_metrics_daily_users
+                WHERE attachment_id = ANY(%s) AND {date_filter}
+                GROUP BY attachment_id
+                """,
+                (ids, *date_params),
+            )
+            for r in cursor.fetchall():
+                counts[r['attachment_id']] = int(r['n'])
+        return counts
+
+    cursor.execute(
+        f"""
+        SELECT attachment_id, sketch FROM {HLL_TABLE}
+        WHERE attachment_id = ANY(%s) AND {date_filter}
+        """,
+        (list(attachment_ids), *date_params),
+    )
+    sketches: Dict[int, list] = defaultdict(list)
+    for r in cursor.fetchall():
+        sketches[r['attachment_id']].append(r['sketch'])
+    for att_id, items in sketches.items():
+        counts[att_id] = HyperLogLog.union(items).count()
+    return counts
@@ -0,0 +1,107 @@
+"""
+Materialized popularity leaderboard
+
+attachment_leaderboard یک materialized view با یک ردیف برای هر اتچمنت است
+(mode، سلاح و دسته به همراه آمار تجمیعی user_attachment_engagement) تا
+get_popular_attachments و get_suggested_ranked در منوهای کاربر به جای
+GROUP BY روی کل user_attachment_engagement فقط lookup ایندکس‌دار انجام دهند.
+
+آمار برای کل زمان و پنجره‌های LEADERBOARD_WINDOWS (نسبت به زمان refresh)
+نگه داشته می‌شود. refresh به صورت CONCURRENTLY انجام می‌شود تا خواندن‌ها
+قفل نشوند (نیاز به unique index روی attachment_id).
+"""
+from typing import Optional
+
+LEADERBOARD_VIEW = 'attachment_leaderboard'
+
+# پنجره‌های زمانی (روز) که ستون جداگانه دارند؛ بقیه مقادیر days از query زنده می‌خوانند
+LEADERBOARD_WINDOWS = (7, 14, 30, 90)
+
+# days بزرگ‌تر از این مقدار یعنی «کل زمان» (فیلتر «همه» در پنل بازخورد 36500 است)
+LEADERBOARD_ALL_TIME_DAYS = 3650
+
+# (ستون، تابع تجمیع، شرط پایه)
+_METRICS = (
+    ('likes', 'COUNT(*)', 'uae.rating = 1'),
+    ('dislikes', 'COUNT(*)', 'uae.rating = -1'),
+    ('views', 'SUM(uae.total_views)', None),
+    ('clicks', 'SUM(uae.total_clicks)', None),
+    ('users', 'COUNT(DISTINCT uae.user_id)', None),
+)
+
+
+def _metric_expr(aggregate: str, base_cond: Optional[str], window_cond: Optional[str]) -> str:
+    conds = [c for c in (base_cond, window_cond) if c]
+    expr = aggregate + (f" FILTER (WHERE {' AND '.join(conds)})" if conds else '')
+    return f"COALESCE({expr}, 0)" if aggregate.startswith('SUM') else expr
+
+
+def window_suffix(days: Optional[int]) -> Optional[str]:
+    """
+    پسوند ستون‌های پنجره برای days
+
+    Returns:
+        '' برای کل زمان، '_7d' و ... برای پنجره‌های موجود، None اگر پنجره‌ای نیست
+    """
+    if days is None or days >= LEADERBOARD_ALL_TIME_DAYS:
+        return ''
+    if days in LEADERBOARD_WINDOWS:
+        return f"_{days}d"
+    return None
+
+
+def leaderboard_view_sql() -> str:
+    """تعریف materialized view (ستون‌های پنجره از LEADERBOARD_WINDOWS ساخته می‌شوند)"""
+    columns = []
+    windows = [('', None)] + [
+        (f"_{days}d", f"uae.last_view_date >= NOW() - INTERVAL '{days} days'")
+        for days in LEADERBOARD_WINDOWS
+    ]
+    for suffix, window_cond in windows:
+        for name, aggregate, base_cond in _METRICS:
+            columns.append(f"{_metric_expr(aggregate, base_cond, window_cond)} AS {name}{suffix}")
+    select_list = ",\n            ".join(columns)
+    return f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {LEADERBOARD_VIEW} AS
+        SELECT
+            a.id AS attachment_id,
+            a.mode,
+            w.name AS weapon,
+            wc.name AS category,
+            {select_list},
+            NOW() AS refreshed_at
+        FROM attachments a
+        JOIN weapons w ON a.weapon_id = w.id
+        JOIN weapon_categories wc ON w.category_id = wc.id
+        LEFT JOIN user_attachment_engagement uae ON uae.attachment_id = a.id
+        GROUP BY a.id, a.mode, w.name, wc.name
+    """
+
+
+LEADERBOARD_INDEXES = (
+    # برای REFRESH ... CONCURRENTLY الزامی است
+    f"CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_attachment ON {LEADERBOARD_VIEW} (attachment_id)",
+    f"CREATE INDEX IF NOT EXISTS ix_leaderboard_mode_category_weapon ON {LEADERBOARD_VIEW} (mode, category, weapon)",
+    f"CREATE INDEX IF NOT EXISTS ix_leaderboard_category_weapon ON {LEADERBOARD_VIEW} (category, weapon)",
+)
+
+
+def ensure_leaderboard(cursor) -> None:
+    """ساخت materialized view و ایندکس‌هایش (idempotent)"""
+    cursor.execute(leaderboard_view_sql())
+    for statement in LEADERBOARD_INDEXES:
+        cursor.execute(statement)
+
+
+def refresh_leaderboard(cursor, concurrently: bool = True) -> None:
+    """
+    بازسازی leaderboard
+
+    CONCURRENTLY خواندن‌ها را قفل نمی‌کند ولی روی view خالی (WITH NO DATA)
+    کار نمی‌کند؛ در آن حالت refresh عادی انجام می‌شود.
+    """
+    cursor.execute("SELECT relispopulated FROM pg_class WHERE oid = to_regclass(%s)", (LEADERBOARD_VIEW,))
+    row = cursor.fetchone()
+    populated = bool(row) and row['relispopulated']
+    mode = "CONCURRENTLY " if concurrently and populated else ""
+    cursor.execute(f"REFRESH MATERIALIZED VIEW {mode}{LEADERBOARD_VIEW}")
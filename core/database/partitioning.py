@@ -0,0 +1,155 @@
+"""
+Monthly range partitioning for append-only analytics tables
+
+attachment_metrics و search_history به صورت ماهانه روی ستون زمان پارتیشن
+می‌شوند تا کوئری‌های بازه‌ای فقط پارتیشن‌های لازم را بخوانند (partition
+pruning) و حذف داده قدیمی با DETACH/DROP یک پارتیشن انجام شود، نه DELETE
+سطری که vacuum سنگین لازم دارد.
+
+نام پارتیشن‌ها: {table}_pYYYY_MM و یک پارتیشن {table}_default برای ردیف‌های
+خارج از بازه‌ها (در حالت عادی خالی می‌ماند چون پارتیشن‌های آینده از قبل
+ساخته می‌شوند).
+
+توابع این ماژول روی cursor کار می‌کنند تا هم در _ensure_schema و هم در
+PartitionManager قابل استفاده باشند.
+"""
+import gzip
+import os
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+from psycopg import sql
+
+from utils.logger import get_logger
+
+logger = get_logger('database.partitioning', 'database.log')
+
+# جدول -> ستون کلید پارتیشن
+PARTITIONED_TABLES = {
+    'attachment_metrics': 'action_date',
+    'search_history': 'created_at',
+}
+
+_SUFFIX_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    """اول ماه، months ماه بعد (یا قبل)"""
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    """آیا جدول partitioned است (نصب‌های قدیمی تا اجرای migration معمولی‌اند)"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return bool(row) and row['relkind'] == 'p'
+
+
+def list_partitions(cursor, table: str) -> List[Dict]:
+    """
+    پارتیشن‌های ماهانه جدول به ترتیب زمانی
+
+    Returns:
+        لیست {'name', 'month'} (پارتیشن default شامل نمی‌شود)
+    """
+    cursor.execute(
+        """
+        SELECT c.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table,),
+    )
+    partitions = []
+    for row in cursor.fetchall():
+        match = _SUFFIX_RE.search(row['name'])
+        if match:
+            partitions.append({
+                'name': row['name'],
+                'month': date(int(match.group(1)), int(match.group(2)), 1),
+            })
+    return sorted(partitions, key=lambda p: p['month'])
+
+
+def ensure_partitions(cursor, table: str, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """
+    ساخت پارتیشن ماه جاری + months_ahead ماه آینده و پارتیشن default
+
+    Returns:
+        نام پارتیشن‌های تازه ساخته شده
+    """
+    today = today or date.today()
+    existing = {p['name'] for p in list_partitions(cursor, table)}
+    created = []
+    current = month_start(today)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(table, month)
+        if name in existing:
+            continue
+        try:
+            cursor.execute(
+                sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+                    sql.Identifier(name), sql.Identifier(table),
+                    sql.Literal(month.isoformat()), sql.Literal(add_months(month, 1).isoformat()),
+                )
+            )
+            created.append(name)
+        except Exception as e:
+            # مثلاً ردیف‌های این بازه در پارتیشن default: باید دستی منتقل شوند
+            logger.error(f"Failed to create partition {name}: {e}")
+            raise
+    cursor.execute(
+        sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+            sql.Identifier(f"{table}_default"), sql.Identifier(table),
+        )
+    )
+    return created
+
+
+def expired_partitions(cursor, table: str, retention_months: int, today: Optional[date] = None) -> List[Dict]:
+    """پارتیشن‌هایی که کل بازه‌شان قدیمی‌تر از retention_months ماه است"""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    return [p for p in list_partitions(cursor, table) if p['month'] < cutoff]
+
+
+def export_partition(cursor, name: str, archive_dir: str) -> str:
+    """
+    خروجی CSV فشرده (gzip) از یک پارتیشن با COPY TO STDOUT
+
+    Returns:
+        مسیر فایل ساخته شده
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    tmp_path = f"{path}.tmp"
+    copy_sql = sql.SQL("COPY {} TO STDOUT (FORMAT csv, HEADER)").format(sql.Identifier(name))
+    with gzip.open(tmp_path, 'wb') as out:
+        with cursor.copy(copy_sql) as copy:
+            for chunk in copy:
+                out.write(chunk)
+    # فایل نیمه‌کاره هیچ‌وقت با نام نهایی دیده نمی‌شود
+    os.replace(tmp_path, path)
+    return path
+
+
+def detach_partition(cursor, table: str, name: str, drop: bool = True) -> None:
+    """جدا کردن پارتیشن از جدول اصلی و در صورت drop حذف آن"""
+    cursor.execute(
+        sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), sql.Identifier(name))
+    )
+    if drop:
+        cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
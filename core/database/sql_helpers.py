@@ -4,8 +4,8 @@ Helper functions for PostgreSQL database operations (PG-only)
 """
 
 import os
-from typing import Optional, Union
-from datetime import datetime, timedelta
+from typing import Optional, Tuple, Union
+from datetime import date, datetime, timedelta, timezone
 
 
 def get_backend() -> str:
@@ -29,6 +29,10 @@ def get_date_interval(days_ago: int, backend: Optional[str] = None) -> str:
         "DATE('now', '-7 days')"
         >>> get_date_interval(7, 'postgres')
         "CURRENT_DATE - INTERVAL '7 days'"
+    
+    Note:
+        برای فیلتر روی ستون از build_date_range_filter استفاده کنید
+        (پارامتر bind شده و بازه نیمه‌باز)
     """
     # PostgreSQL only
     return f"CURRENT_DATE - INTERVAL '{days_ago} days'"
@@ -50,6 +54,9 @@ def get_datetime_interval(days_ago: int, backend: Optional[str] = None) -> str:
         "datetime('now', '-30 days')"
         >>> get_datetime_interval(30, 'postgres')
         "CURRENT_TIMESTAMP - INTERVAL '30 days'"
+    
+    Note:
+        برای فیلتر روی ستون از build_datetime_range_filter استفاده کنید
     """
     # PostgreSQL only
     return f"CURRENT_TIMESTAMP - INTERVAL '{days_ago} days'"
@@ -77,6 +84,100 @@ def get_current_timestamp(backend: Optional[str] = None) -> str:
     return "CURRENT_TIMESTAMP"
 
 
+# ========== Sargable Date Ranges ==========
+# فیلترهای تاریخ به صورت بازه نیمه‌باز روی خود ستون (col >= ... AND col < ...).
+# ستون داخل تابع نمی‌رود (مثل DATE(col)) تا index روی ستون و partition pruning
+# (core/database/partitioning.py) قابل استفاده باشد.
+#
+# «امروز» فقط از CURRENT_DATE دیتابیس (timezone نشست) می‌آید، همان مبنای بقیه
+# queryهای تحلیلی و rollupها؛ date.today() سرور برنامه نزدیک نیمه‌شب می‌تواند
+# یک روز با آن فرق داشته باشد. CURRENT_DATE تابع stable است، پس index و pruning
+# (در شروع اجرا) همچنان کار می‌کنند.
+
+def get_date_range(
+    days_ago: int,
+    span_days: Optional[int] = None,
+    today: Optional[date] = None
+) -> Tuple[date, date]:
+    """
+    مرزهای بازه روزانه [start, end) در پایتون
+
+    برای queryها از build_date_range_filter (بدون today) استفاده کنید؛ این تابع
+    بدون today تاریخ سرور برنامه را مبنا می‌گیرد، نه CURRENT_DATE دیتابیس.
+
+    Args:
+        days_ago: شروع بازه، N روز قبل از امروز (همان معنای get_date_interval)
+        span_days: طول بازه به روز؛ اگر None باشد تا پایان امروز
+        today: تاریخ مبنا (پیش‌فرض: date.today())
+
+    Returns:
+        (start, end) که end شامل نمی‌شود
+
+    Examples:
+        >>> get_date_range(7, today=date(2026, 10, 18))
+        (date(2026, 10, 11), date(2026, 10, 19))
+        >>> get_date_range(14, span_days=7, today=date(2026, 10, 18))
+        (date(2026, 10, 4), date(2026, 10, 11))
+    """
+    today = today or date.today()
+    start = today - timedelta(days=days_ago)
+    end = start + timedelta(days=span_days) if span_days is not None else today + timedelta(days=1)
+    return start, end
+
+
+def build_date_range_filter(
+    column: str,
+    days_ago: int,
+    span_days: Optional[int] = None,
+    today: Optional[date] = None
+) -> Tuple[str, tuple]:
+    """
+    ساخت predicate نیمه‌باز روزانه روی ستون timestamp/date
+
+    بدون today مرزها نسبت به CURRENT_DATE دیتابیس هستند (پارامترها تعداد روز)؛
+    با today مرزهای date ثابت bind می‌شوند. مقایسه date با TIMESTAMPTZ در
+    PostgreSQL نیمه‌شب همان روز در timezone نشست را در نظر می‌گیرد.
+
+    Returns:
+        (clause, params)
+
+    Example:
+        >>> build_date_range_filter('action_date', 7)
+        ("action_date >= CURRENT_DATE - %s::int AND action_date < CURRENT_DATE - %s::int", (7, -1))
+        >>> build_date_range_filter('action_date', 7, today=date(2026, 10, 18))
+        ("action_date >= %s AND action_date < %s", (date(2026, 10, 11), date(2026, 10, 19)))
+    """
+    if today is not None:
+        return f"{column} >= %s AND {column} < %s", get_date_range(days_ago, span_days, today)
+    end_offset = days_ago - span_days if span_days is not None else -1
+    return (
+        f"{column} >= CURRENT_DATE - %s::int AND {column} < CURRENT_DATE - %s::int",
+        (days_ago, end_offset),
+    )
+
+
+def get_datetime_range(days_ago: int, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    مرزهای بازه غلتان [now - days_ago, now) با datetime دارای timezone (UTC)
+    """
+    now = now or datetime.now(timezone.utc)
+    return now - timedelta(days=days_ago), now
+
+
+def build_datetime_range_filter(
+    column: str,
+    days_ago: int,
+    now: Optional[datetime] = None
+) -> Tuple[str, Tuple[datetime, datetime]]:
+    """
+    ساخت predicate نیمه‌باز برای N روز اخیر تا همین لحظه
+
+    Returns:
+        (clause, params)
+    """
+    return f"{column} >= %s AND {column} < %s", get_datetime_range(days_ago, now)
+
+
 def build_upsert_query(
     table: str,
     columns: list,
@@ -207,6 +308,15 @@ class SQLQuery:
         """محاسبه datetime N روز قبل"""
         return get_datetime_interval(days_ago, self.backend)
     
+    def date_range(self, column: str, days_ago: int,
+                   span_days: Optional[int] = None) -> Tuple[str, tuple]:
+        """بازه نیمه‌باز روزانه نسبت به CURRENT_DATE (clause, params)"""
+        return build_date_range_filter(column, days_ago, span_days)
+    
+    def datetime_range(self, column: str, days_ago: int) -> Tuple[str, Tuple[datetime, datetime]]:
+        """بازه نیمه‌باز N روز اخیر (clause, params)"""
+        return build_datetime_range_filter(column, days_ago)
+    
     def current_date(self) -> str:
         """تاریخ امروز"""
         return get_current_date(self.backend)
@@ -354,6 +464,41 @@ def build_fts_query(
     return (where_clause, order_clause, params)
 
 
+def build_search_feature_sql(with_trgm: bool = True) -> Tuple[str, str]:
+    """
+    ستون‌های ویژگی متنی رتبه‌بندی جستجو (utils.search_ranking.SQL_COLUMNS)
+    
+    روی attachments a و weapons w: exact (تطابق کامل نام/کد/سلاح)، prefix
+    (1.0 برای شروع نام/کد/سلاح، 0.5 برای شروع یکی از کلمات نام/سلاح) و
+    trgm (بیشینه similarity و word_similarity از pg_trgm).
+    
+    Args:
+        with_trgm: اگر False باشد trgm ثابت 0 است (وقتی pg_trgm نصب نیست)
+    
+    Returns:
+        (select_columns, lateral_join) - lateral_join یک پارامتر %s دارد:
+        کوئری نرمال‌شده (lowercase، فاصله‌های تکی)
+    
+    Examples:
+        >>> columns, lateral = build_search_feature_sql()
+        # SELECT ..., {columns} FROM attachments a JOIN weapons w ... {lateral}
+    """
+    trgm = """GREATEST(similarity(a.name, t.q), similarity(w.name, t.q), similarity(a.code, t.q),
+                            word_similarity(t.q, a.name), word_similarity(t.q, w.name))""" if with_trgm else "0.0"
+    columns = f"""(t.q IN (t.n, t.k, t.wn))::int as exact,
+                   CASE
+                       WHEN t.q IN (t.n, t.k, t.wn) THEN 0.0
+                       WHEN starts_with(t.n, t.q) OR starts_with(t.k, t.q) OR starts_with(t.wn, t.q) THEN 1.0
+                       WHEN strpos(t.n, ' ' || t.q) > 0 OR strpos(t.wn, ' ' || t.q) > 0 THEN 0.5
+                       ELSE 0.0
+                   END as prefix,
+                   {trgm} as trgm"""
+    lateral = """CROSS JOIN LATERAL (
+                SELECT %s::text as q, lower(a.name) as n, lower(COALESCE(a.code, '')) as k, lower(w.name) as wn
+            ) t"""
+    return columns, lateral
+
+
 def get_fts_similarity_threshold(backend: Optional[str] = None) -> float:
     """
     دریافت similarity threshold برای FTS
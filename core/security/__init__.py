@@ -1,6 +1,6 @@
 """Security and authorization modules"""
 
 from .role_manager import RoleManager, Role, Permission
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, OutboundDispatcher
 
-__all__ = ['RoleManager', 'Role', 'Permission', 'RateLimiter']
+__all__ = ['RoleManager', 'Role', 'Permission', 'RateLimiter', 'OutboundDispatcher']
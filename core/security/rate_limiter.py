@@ -3,12 +3,27 @@
 """
 
 import asyncio
+import heapq
+import itertools
 import time
-from typing import Dict, List, Optional, Callable
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Callable, Tuple, Union
 from dataclasses import dataclass
 from collections import deque
 import logging
 
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config.constants import (
+    OUTBOUND_GLOBAL_RATE_PER_SECOND,
+    OUTBOUND_GLOBAL_BURST,
+    OUTBOUND_PRIVATE_CHAT_PER_SECOND,
+    OUTBOUND_PRIVATE_CHAT_BURST,
+    OUTBOUND_GROUP_CHAT_PER_MINUTE,
+    OUTBOUND_MAX_RETRIES,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -94,7 +109,12 @@ class RateLimiter:
 
 
 class BroadcastQueue:
-    """صف هوشمند برای ارسال پیام‌های broadcast"""
+    """
+    صف هوشمند برای ارسال پیام‌های broadcast
+
+    اگر send_func متد یک bot با OutboundDispatcher باشد، pacing به dispatcher
+    سپرده می‌شود و ارسال‌ها با اولویت bulk انجام می‌شوند.
+    """
     
     def __init__(self, rate_limiter: RateLimiter):
         self.rate_limiter = rate_limiter
@@ -106,6 +126,7 @@ class BroadcastQueue:
         
     async def add_message(self, user_id: int, send_func: Callable, *args, **kwargs):
         """اضافه کردن پیام به صف"""
+        kwargs = dict(outbound_priority_kwargs(send_func, PRIORITY_BULK), **kwargs)
         await self.queue.put({
             'user_id': user_id,
             'send_func': send_func,
@@ -128,8 +149,9 @@ class BroadcastQueue:
                         break
                     continue
                 
-                # رعایت rate limit
-                await self.rate_limiter.wait_if_needed('broadcast')
+                # رعایت rate limit (در صورت وجود dispatcher همان‌جا اعمال می‌شود)
+                if 'rate_limit_args' not in message['kwargs']:
+                    await self.rate_limiter.wait_if_needed('broadcast')
                 
                 # ارسال پیام
                 try:
@@ -186,6 +208,305 @@ class BroadcastQueue:
             logger.warning(f"Stopped with {self.queue.qsize()} messages in queue")
 
 
+# ==================== Outbound Dispatcher ====================
+
+PRIORITY_INTERACTIVE = 'interactive'      # پاسخ مستقیم به کاربر (پیش‌فرض)
+PRIORITY_TRANSACTIONAL = 'transactional'  # اعلان تکی به کاربر دیگر (تیکت، بررسی، بن)
+PRIORITY_BULK = 'bulk'                    # broadcast و اعلان‌های گروهی
+
+_PRIORITY_RANK = {PRIORITY_INTERACTIVE: 0, PRIORITY_TRANSACTIONAL: 1, PRIORITY_BULK: 2}
+
+# endpointهایی که پیام جدید در یک چت می‌سازند (بودجه سراسری + pacing هر چت)
+_CHAT_SEND_PREFIXES = ('send', 'copyMessage', 'forwardMessage')
+# فقط بودجه سراسری
+_GLOBAL_ONLY_PREFIXES = ('editMessage',)
+_UNPACED_ENDPOINTS = {'sendChatAction'}
+
+
+def outbound_priority_kwargs(send_func: Callable, priority: str) -> Dict[str, Any]:
+    """
+    kwargs لازم برای تعیین اولویت در OutboundDispatcher
+
+    فقط وقتی bot متد send_func یک rate limiter دارد rate_limit_args برگردانده می‌شود؛
+    telegram.Bot ساده این آرگومان را نمی‌پذیرد.
+    """
+    bot = getattr(send_func, '__self__', None)
+    if getattr(bot, 'rate_limiter', None) is None:
+        return {}
+    return {'rate_limit_args': priority}
+
+
+class _PriorityBudget:
+    """
+    Token bucket سراسری که tokenها را به ترتیب اولویت (و سپس FIFO) واگذار می‌کند
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def _take(self) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    def waiting(self) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for rank, _seq, fut in self._waiters:
+            if not fut.done():
+                counts[rank] = counts.get(rank, 0) + 1
+        return counts
+
+    async def acquire(self, rank: int) -> None:
+        if not self._waiters and self._take():
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), fut))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._grant_loop())
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # token واگذار شده ولی استفاده نشد
+                self._tokens = min(self.capacity, self._tokens + 1.0)
+            raise
+
+    async def _grant_loop(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._take():
+                _rank, _seq, fut = heapq.heappop(self._waiters)
+                fut.set_result(None)
+                continue
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+            else:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """توقف همه ارسال‌ها تا پایان RetryAfter"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+    async def close(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for _rank, _seq, fut in self._waiters:
+            if not fut.done():
+                fut.cancel()
+        self._waiters.clear()
+
+
+class _ChatPacer:
+    """
+    Sliding window برای هر چت؛ چت خصوصی یک پیام در ثانیه (با burst کوچک برای
+    پاسخ‌های interactive) و گروه/کانال ۲۰ پیام در دقیقه.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, private_limit: RateLimit, group_limit: RateLimit):
+        self.private_limit = private_limit
+        self.group_limit = group_limit
+        self.history: Dict[Union[int, str], deque] = {}
+        self._reservations = 0
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        # chat_id رشته‌ای (@channel) فقط برای کانال/سوپرگروه معتبر است
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def reserve(self, chat_id: Union[int, str], interactive: bool) -> float:
+        """
+        رزرو یک ارسال برای چت
+
+        Returns:
+            0 اگر رزرو انجام شد، وگرنه زمان انتظار (ثانیه)
+        """
+        limit = self.group_limit if self._is_group(chat_id) else self.private_limit
+        allowed = limit.burst if (interactive and limit.burst) else limit.calls
+        now = time.monotonic()
+
+        history = self.history.get(chat_id)
+        if history is None:
+            history = self.history[chat_id] = deque()
+        cutoff = now - limit.period
+        while history and history[0] <= cutoff:
+            history.popleft()
+
+        if len(history) >= allowed:
+            return history[len(history) - allowed] + limit.period - now
+
+        history.append(now)
+        self._reservations += 1
+        if self._reservations % self.PRUNE_EVERY == 0:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        horizon = now - max(self.private_limit.period, self.group_limit.period)
+        stale = [cid for cid, h in self.history.items() if not h or h[-1] <= horizon]
+        for cid in stale:
+            del self.history[cid]
+
+
+class OutboundDispatcher(BaseRateLimiter[Union[str, Dict[str, Any]]]):
+    """
+    Dispatcher واحد همه درخواست‌های خروجی Bot API
+
+    به عنوان rate limiter در ApplicationBuilder (و ExtBot پروسس broadcast worker)
+    ثبت می‌شود، پس همه مسیرهای ارسال - پاسخ handlerها، اعلان‌ها، notificationهای
+    زمان‌بندی شده و broadcastها - از همین‌جا عبور می‌کنند:
+
+    - اولویت: interactive > transactional > bulk (از rate_limit_args؛ پیش‌فرض interactive)
+    - pacing هر چت: خصوصی 1 پیام/ثانیه، گروه 20 پیام/دقیقه
+    - بودجه سراسری token bucket؛ tokenها به ترتیب اولویت واگذار می‌شوند
+    - RetryAfter (429) کل بودجه را متوقف می‌کند و درخواست دوباره تلاش می‌شود
+
+    rate_limit_args می‌تواند نام اولویت (str) یا dict با کلیدهای priority و max_retries باشد:
+        await context.bot.send_message(chat_id, text, rate_limit_args=PRIORITY_TRANSACTIONAL)
+    """
+
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE_PER_SECOND,
+        global_burst: int = OUTBOUND_GLOBAL_BURST,
+        private_chat_limit: Optional[RateLimit] = None,
+        group_chat_limit: Optional[RateLimit] = None,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_retries = max_retries
+        self._pacer = _ChatPacer(
+            private_chat_limit or RateLimit(
+                calls=OUTBOUND_PRIVATE_CHAT_PER_SECOND, period=1, burst=OUTBOUND_PRIVATE_CHAT_BURST
+            ),
+            group_chat_limit or RateLimit(calls=OUTBOUND_GROUP_CHAT_PER_MINUTE, period=60),
+        )
+        self._budget = _PriorityBudget(global_rate, global_burst)
+        self._stats = {
+            name: {'sent': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'retry_after': 0}
+            for name in _PRIORITY_RANK
+        }
+
+    async def initialize(self) -> None:
+        logger.info(
+            f"OutboundDispatcher initialized (global {self.global_rate} msg/s, "
+            f"private {self._pacer.private_limit.calls}/{self._pacer.private_limit.period}s, "
+            f"group {self._pacer.group_limit.calls}/{self._pacer.group_limit.period}s)"
+        )
+
+    async def shutdown(self) -> None:
+        await self._budget.close()
+
+    def _parse_args(self, rate_limit_args) -> Tuple[str, int]:
+        priority, max_retries = PRIORITY_INTERACTIVE, None
+        if isinstance(rate_limit_args, str):
+            priority = rate_limit_args
+        elif isinstance(rate_limit_args, dict):
+            priority = rate_limit_args.get('priority', PRIORITY_INTERACTIVE)
+            max_retries = rate_limit_args.get('max_retries')
+        if priority not in _PRIORITY_RANK:
+            priority = PRIORITY_INTERACTIVE
+        if max_retries is None:
+            # broadcaster خودش RetryAfter را مدیریت و در آمار ثبت می‌کند
+            max_retries = 0 if priority == PRIORITY_BULK else self.max_retries
+        return priority, int(max_retries)
+
+    async def _wait_for_chat(self, chat_id, interactive: bool) -> None:
+        while True:
+            wait = self._pacer.reserve(chat_id, interactive)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def process_request(
+        self,
+        callback,
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args,
+    ):
+        if endpoint in _UNPACED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+        per_chat = endpoint.startswith(_CHAT_SEND_PREFIXES)
+        if not per_chat and not endpoint.startswith(_GLOBAL_ONLY_PREFIXES):
+            # answerCallbackQuery، get*، set* و ... محدودیت پیام ندارند
+            return await callback(*args, **kwargs)
+
+        priority, max_retries = self._parse_args(rate_limit_args)
+        chat_id = data.get('chat_id')
+        if isinstance(chat_id, str):
+            try:
+                chat_id = int(chat_id)
+            except ValueError:
+                pass
+        stats = self._stats[priority]
+
+        for attempt in range(max_retries + 1):
+            started = time.monotonic()
+            if per_chat and chat_id is not None:
+                await self._wait_for_chat(chat_id, priority == PRIORITY_INTERACTIVE)
+            await self._budget.acquire(_PRIORITY_RANK[priority])
+            waited = time.monotonic() - started
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+            try:
+                result = await callback(*args, **kwargs)
+                stats['sent'] += 1
+                return result
+            except RetryAfter as exc:
+                retry_after = exc.retry_after
+                seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+                self._budget.pause(seconds)
+                stats['retry_after'] += 1
+                if attempt >= max_retries:
+                    raise
+                logger.warning(f"RetryAfter {seconds}s on {endpoint} ({priority}), retrying")
+        return None
+
+    def get_stats(self) -> Dict:
+        """آمار هر کلاس اولویت: تعداد ارسال، میانگین/بیشینه انتظار و صف فعلی"""
+        waiting = self._budget.waiting()
+        return {
+            name: {
+                'sent': s['sent'],
+                'avg_wait_ms': round(s['wait_total'] / s['sent'] * 1000, 1) if s['sent'] else 0.0,
+                'max_wait_ms': round(s['wait_max'] * 1000, 1),
+                'retry_after': s['retry_after'],
+                'queued': waiting.get(_PRIORITY_RANK[name], 0),
+            }
+            for name, s in self._stats.items()
+        }
+
+
 # Instance سراسری
 rate_limiter = RateLimiter()
 
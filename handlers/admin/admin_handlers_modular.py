@@ -355,6 +355,8 @@ class AdminHandlers(BaseAdminHandler):
         self.weapon_details = self.analytics_handler.weapon_details
         self.att_daily_chart = self.analytics_handler.att_daily_chart
         self.att_download_csv = self.analytics_handler.att_download_csv
+        self.view_search_aliases = self.analytics_handler.view_search_aliases
+        self.review_search_alias = self.analytics_handler.review_search_alias
         
         # Data Health Report
         self.health_handler = DataHealthReportHandler(self.db, role_manager)
@@ -5,12 +5,19 @@ Admin interface for viewing attachment performance analytics
 ✨ Updated: 2025-01-17
 - Added sql_helpers for cross-database date queries
 - Ready for PostgreSQL migration
+- Reads attachment_metrics_daily / attachment_metrics_daily_users rollups
+  (managers/metrics_rollup.py) instead of raw attachment_metrics
+- Overview, user behavior and daily/weekly reports render from
+  precomputed snapshots (managers/dashboard_snapshot.py)
+- Trending renders from the in-memory counter (managers/trending_counter.py)
 """
 
 import os
 import io
 import csv
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
 from telegram.constants import ParseMode
@@ -20,8 +27,12 @@ from handlers.admin.admin_states import ADMIN_MENU
 from core.security.role_manager import Permission
 from core.database.database_adapter import DatabaseAdapter
 from utils.attachment_analytics import AttachmentAnalytics
+from managers.dashboard_snapshot import get_dashboard_snapshot_service
+from managers.trending_counter import get_trending_counter
 from utils.logger import get_logger
-from core.database.sql_helpers import get_date_interval, get_current_date
+from utils.stream_export import copy_query_to_csv_gz, send_and_remove
+from core.database.sql_helpers import build_date_range_filter
+from core.database.hll_sketches import count_unique_users, count_unique_users_by_attachment
 from utils.i18n import t
 from config.config import WEAPON_CATEGORIES
 from utils.language import get_user_lang
@@ -81,10 +92,136 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             await self.send_permission_denied(update, context)
             return ConversationHandler.END
             
-        # Get overview statistics
-        stats = self._get_overview_stats()
+        context.user_data.pop('analytics_search_mode', None)
+        if query:
+            await self._render_snapshot(query, 'overview', lang)
+        else:
+            message, keyboard = await self._snapshot_message('overview', lang)
+            await context.bot.send_message(
+                update.effective_chat.id,
+                message,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            
+        return ADMIN_MENU
         
-        # Build message
+    def _get_db_connection(self):
+        """Helper method to get database connection"""
+        if hasattr(self.db, 'get_connection'):
+            # Via DatabaseAdapter forwarding to PostgreSQL pool
+            return self.db.get_connection()
+        else:
+            raise RuntimeError("Database connection not available")
+    
+    async def _export_csv_gz(self, select_sql: str, params, prefix: str) -> str:
+        """نوشتن خروجی query با COPY در فایل موقت .csv.gz (در executor)"""
+        def _work():
+            with self._get_db_connection() as conn:
+                path, _ = copy_query_to_csv_gz(conn, select_sql, params, prefix=prefix)
+            return path
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _work)
+    
+    # ========== Dashboard snapshots (managers/dashboard_snapshot.py) ==========
+    
+    def _snapshot_builders(self) -> dict:
+        """view -> builder(payload, lang) -> (message, keyboard)"""
+        return {
+            'overview': self._build_overview,
+            'trending': self._build_trending,
+            'user_behavior': self._build_user_behavior,
+            'daily': self._build_daily_report,
+            'weekly': self._build_weekly_report,
+        }
+    
+    async def _load_snapshot(self, view: str) -> Optional[dict]:
+        """snapshot آماده view؛ اگر هنوز ساخته نشده یک‌بار محاسبه می‌شود"""
+        if view == 'trending':
+            return self._trending_snapshot()
+        service = get_dashboard_snapshot_service()
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, service.get, view)
+        if snapshot is None:
+            await service.refresh()
+            snapshot = service.get(view)
+        return snapshot
+    
+    def _trending_snapshot(self) -> Optional[dict]:
+        """لیست ترندینگ از شمارنده حافظه‌ای (بدون SQL)؛ None تا اولین محاسبه"""
+        counter = get_trending_counter()
+        if not counter.is_ready:
+            return None
+        ready_at = counter.ready_at if counter.is_warming_up else None
+        payload = {
+            'items': counter.top(),
+            'most_viewed': counter.is_most_viewed,
+            'ready_at': ready_at.strftime("%Y-%m-%d %H:%M") if ready_at else None,
+        }
+        return {'payload': payload, 'computed_at': counter.updated_at}
+    
+    def _snapshot_age_line(self, computed_at: datetime, lang: str) -> str:
+        if computed_at.tzinfo is None:
+            computed_at = computed_at.replace(tzinfo=timezone.utc)
+        minutes = max(0, int((datetime.now(timezone.utc) - computed_at).total_seconds() // 60))
+        return t('admin.analytics.snapshot.age', lang,
+                 time=computed_at.astimezone().strftime('%H:%M'), minutes=minutes)
+    
+    async def _snapshot_message(self, view: str, lang: str):
+        """متن و کیبورد یک view از روی snapshot به همراه سن آن و دکمه بروزرسانی"""
+        refresh_row = [InlineKeyboardButton(t('menu.buttons.refresh', lang), callback_data=f"analytics_snapshot_refresh_{view}")]
+        try:
+            snapshot = await self._load_snapshot(view)
+        except Exception as e:
+            logger.error(f"Error loading dashboard snapshot '{view}': {e}")
+            snapshot = None
+        if snapshot is None:
+            back = "admin_menu_return" if view == 'overview' else "analytics_menu"
+            keyboard = [refresh_row, [InlineKeyboardButton(t('menu.buttons.back', lang), callback_data=back)]]
+            return t('admin.analytics.snapshot.unavailable', lang), keyboard
+        
+        message, keyboard = self._snapshot_builders()[view](snapshot['payload'], lang)
+        message = message.rstrip("\n") + "\n\n" + self._snapshot_age_line(snapshot['computed_at'], lang)
+        # دکمه بروزرسانی قبل از دکمه بازگشت
+        keyboard.insert(len(keyboard) - 1, refresh_row)
+        return message, keyboard
+    
+    async def _render_snapshot(self, query, view: str, lang: str):
+        message, keyboard = await self._snapshot_message(view, lang)
+        await self._safe_edit_message(query, message, keyboard)
+    
+    async def refresh_snapshot(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """محاسبه مجدد snapshotها در پس‌زمینه: analytics_snapshot_refresh_<view>"""
+        query = update.callback_query
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        view = (query.data or "").replace("analytics_snapshot_refresh_", "", 1)
+        if view not in self._snapshot_builders():
+            await query.answer()
+            return ADMIN_MENU
+        return await self._start_snapshot_refresh(query, context, view, lang)
+    
+    async def _start_snapshot_refresh(self, query, context, view: str, lang: str) -> int:
+        service = get_dashboard_snapshot_service()
+        if view != 'trending' and service.is_refreshing:
+            await query.answer(t('admin.analytics.snapshot.already_refreshing', lang))
+        else:
+            await query.answer(t('admin.analytics.snapshot.refreshing', lang))
+        # handler منتظر محاسبه نمی‌ماند؛ پیام بعد از پایان refresh بازسازی می‌شود
+        context.application.create_task(self._refresh_and_render(query, view, lang))
+        return ADMIN_MENU
+    
+    async def _refresh_and_render(self, query, view: str, lang: str):
+        try:
+            if view == 'trending':
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, get_trending_counter().refresh_top)
+            else:
+                await get_dashboard_snapshot_service().refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing dashboard snapshots: {e}")
+        await self._render_snapshot(query, view, lang)
+    
+    def _build_overview(self, stats: dict, lang: str):
         message = t('admin.analytics.menu.title', lang) + "\n\n"
         message += t('admin.analytics.menu.overview.header', lang, days=30) + "\n"
         message += t('admin.analytics.menu.overview.views', lang, n=stats['total_views']) + "\n"
@@ -105,7 +242,6 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             message += t('admin.analytics.menu.top.highest_rated', lang, name=safe_name, rating=f"{stats['highest_rated']['rating']:.1f}") + "\n"
             
         # Build keyboard (implemented handlers)
-        context.user_data.pop('analytics_search_mode', None)
         keyboard = [
             [
                 InlineKeyboardButton(t('admin.analytics.buttons.trending', lang), callback_data="analytics_view_trending"),
@@ -123,270 +259,59 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                 InlineKeyboardButton(t('admin.analytics.buttons.search_attachment', lang), callback_data="analytics_search_attachment"),
                 InlineKeyboardButton(t('admin.analytics.buttons.download_report', lang), callback_data="analytics_download_report")
             ],
+            [InlineKeyboardButton(t('admin.analytics.buttons.search_aliases', lang), callback_data="analytics_search_aliases")],
             [InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="admin_menu_return")]
         ]
-        
-        if query:
-            await query.edit_message_text(
-                message,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-        else:
-            await context.bot.send_message(
-                update.effective_chat.id,
-                message,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-            
-        return ADMIN_MENU
-        
-    def _get_db_connection(self):
-        """Helper method to get database connection"""
-        if hasattr(self.db, 'get_connection'):
-            # Via DatabaseAdapter forwarding to PostgreSQL pool
-            return self.db.get_connection()
-        else:
-            raise RuntimeError("Database connection not available")
-    
-    def _get_overview_stats(self) -> dict:
-        """Get overview statistics"""
-        stats = {
-            'total_views': 0,
-            'total_clicks': 0,
-            'total_shares': 0,
-            'unique_users': 0,
-            'engagement_rate': 0,
-            'top_performer': None,
-            'most_engaging': None,
-            'highest_rated': None
-        }
-        
-        try:
-            # Overall metrics
-            date_filter = get_date_interval(30)
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(CASE WHEN action_type = 'view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type = 'click' THEN 1 END) as clicks,
-                        COUNT(CASE WHEN action_type = 'share' THEN 1 END) as shares,
-                        COUNT(DISTINCT user_id) as unique_users
-                    FROM attachment_metrics
-                    WHERE DATE(action_date) >= {date_filter}
-                """)
-                
-                result = cursor.fetchone()
-            if result:
-                stats['total_views'] = result['views']
-                stats['total_clicks'] = result['clicks']
-                stats['total_shares'] = result['shares']
-                stats['unique_users'] = result['unique_users']
-                
-                if stats['total_views'] > 0:
-                    stats['engagement_rate'] = (float(stats['total_clicks']) / float(stats['total_views'])) * 100
-                    
-            # Top performer by views (from metrics)
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    WITH v AS (
-                        SELECT attachment_id, COUNT(*) AS views
-                        FROM attachment_metrics
-                        WHERE action_type='view'
-                        GROUP BY attachment_id
-                    )
-                    SELECT a.name, v.views
-                    FROM v
-                    JOIN attachments a ON a.id = v.attachment_id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE v.views > 0
-                      AND a.name NOT LIKE '%%Test%%'
-                      AND a.name NOT LIKE '%%test%%'
-                      AND a.name NOT LIKE '%%تست%%'
-                      AND a.code NOT LIKE 'CODE%%'
-                      AND a.code NOT LIKE 'DUP%%'
-                      AND COALESCE(w.name, '') NOT LIKE '%%Test%%'
-                    ORDER BY v.views DESC
-                    LIMIT 1
-                """)
-                top = cursor.fetchone()
-            if top:
-                stats['top_performer'] = {'name': top['name'], 'views': top['views']}
-            
-            # Most engaging (best click rate) from metrics
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    WITH agg AS (
-                        SELECT attachment_id,
-                               COUNT(CASE WHEN action_type='view' THEN 1 END) AS v,
-                               COUNT(CASE WHEN action_type='click' THEN 1 END) AS c
-                        FROM attachment_metrics
-                        GROUP BY attachment_id
-                    )
-                    SELECT a.name,
-                           (CAST(agg.c AS FLOAT) / NULLIF(agg.v, 0)) * 100 AS engagement_rate
-                    FROM agg
-                    JOIN attachments a ON a.id = agg.attachment_id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE agg.v > 0 AND agg.c > 0
-                      AND a.name NOT LIKE '%%Test%%'
-                      AND a.name NOT LIKE '%%test%%'
-                      AND a.name NOT LIKE '%%تست%%'
-                      AND a.code NOT LIKE 'CODE%%'
-                      AND a.code NOT LIKE 'DUP%%'
-                      AND COALESCE(w.name, '') NOT LIKE '%%Test%%'
-                    ORDER BY engagement_rate DESC
-                    LIMIT 1
-                """)
-                engaging = cursor.fetchone()
-            if engaging:
-                stats['most_engaging'] = {'name': engaging['name'], 'rate': engaging['engagement_rate']}
-                
-            # Highest rated - calculate from user_attachment_engagement
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        a.name,
-                        AVG(uae.rating) as avg_rating
-                    FROM user_attachment_engagement uae
-                    JOIN attachments a ON uae.attachment_id = a.id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE uae.rating IS NOT NULL
-                    AND a.name NOT LIKE '%%Test%%'
-                    AND a.name NOT LIKE '%%test%%'
-                    AND a.name NOT LIKE '%%تست%%'
-                    AND a.code NOT LIKE 'CODE%%'
-                    AND a.code NOT LIKE 'DUP%%'
-                    AND COALESCE(w.name, '') NOT LIKE '%%Test%%'
-                    GROUP BY a.id, a.name
-                    HAVING AVG(uae.rating) > 0
-                    ORDER BY avg_rating DESC
-                    LIMIT 1
-                """)
-                
-                rated = cursor.fetchone()
-            if rated:
-                stats['highest_rated'] = {'name': rated['name'], 'rating': rated['avg_rating']}
-                
-        except Exception as e:
-            logger.error(f"Error getting overview stats: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-        finally:
-            pass  # Connection auto-closed by context manager
-            
-        return stats
+        return message, keyboard
         
     async def view_trending(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """ترندینگ - Real-Time با منطق ساده"""
+        """ترندینگ (رشد بازدید هفته اخیر نسبت به هفته قبل) از شمارنده حافظه‌ای"""
         query = update.callback_query
         lang = get_user_lang(update, context, self.db) or 'fa'
         await query.answer(t('admin.analytics.loading', lang))
-        
-        # Add timestamp to prevent "Message is not modified" error
-        now = datetime.now().strftime('%H:%M:%S')
-        
-        message = t('admin.analytics.trending.title', lang) + "\n"
-        message += t('admin.analytics.trending.subtitle', lang) + "\n"
-        message += t('admin.analytics.trending.updated', lang, time=now) + "\n\n"
-        results = []
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                # Try real-time trending first (with growth)
-                date_filter_7 = get_date_interval(7)
-                date_filter_14 = get_date_interval(14)
-                date_filter_8 = get_date_interval(8)
-                cursor.execute(f"""
-                    WITH week_stats AS (
-                        SELECT 
-                            attachment_id,
-                            COUNT(CASE WHEN CAST(action_date AS DATE) >= {date_filter_7} THEN 1 END) as recent_week,
-                            COUNT(CASE WHEN CAST(action_date AS DATE) BETWEEN {date_filter_14} AND {date_filter_8} THEN 1 END) as previous_week
-                        FROM attachment_metrics
-                        WHERE CAST(action_date AS DATE) >= {date_filter_14}
-                        AND action_type = 'view'
-                        GROUP BY attachment_id
-                        HAVING COUNT(CASE WHEN CAST(action_date AS DATE) >= {date_filter_7} THEN 1 END) > 0
-                    ),
-                    growth_calc AS (
-                        SELECT 
-                            attachment_id,
-                            recent_week,
-                            previous_week,
-                            CASE 
-                                WHEN previous_week = 0 AND recent_week > 0 THEN 100.0
-                                WHEN previous_week > 0 THEN ((recent_week * 1.0 - previous_week) / previous_week * 100)
-                                ELSE 0
-                            END as growth_rate
-                        FROM week_stats
-                    )
-                    SELECT 
-                        a.id,
-                        a.name,
-                        COALESCE(w.name, 'Unknown') as weapon,
-                        gc.recent_week as views,
-                        gc.growth_rate
-                    FROM growth_calc gc
-                    JOIN attachments a ON gc.attachment_id = a.id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE gc.growth_rate > 0 OR gc.recent_week >= 5
-                    ORDER BY gc.growth_rate DESC, gc.recent_week DESC
-                    LIMIT 10
-                """)
-                
-                                
-                results = cursor.fetchall()
-                
-                if results:
-                    # Display trending results with growth
-                    for i, result in enumerate(results, 1):
-                        name = result['name']
-                        weapon = result['weapon']
-                        views = result['views']
-                        growth = result['growth_rate']
-                        
-                        medal = "🥇" if i==1 else "🥈" if i==2 else "🥉" if i==3 else f"{i}."
-                        if growth >= 100:
-                            icon = "🔥"
-                        elif growth >= 50:
-                            icon = "📈"
-                        else:
-                            icon = "📊"
-                        safe_name = self._escape_markdown(name)
-                        safe_weapon = self._escape_markdown(weapon)
-                        message += f"{medal} *{safe_name}*\n"
-                        message += t('admin.analytics.lines.weapon', lang, weapon=safe_weapon) + "\n"
-                        message += t('admin.analytics.lines.growth', lang, icon=icon, value=f"{growth:+.0f}") + "\n"
-                        message += t('admin.analytics.lines.views', lang, value=f"{views:,}") + "\n\n"
-                else:
-                    message += t('admin.analytics.fallback.no_data', lang) + "\n"
-        except Exception as e:
-            logger.error(f"Error in view_trending: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            message = t('admin.analytics.trending.error.title', lang) + "\n\n" + t('admin.analytics.trending.error.body', lang)
-        finally:
-            pass  # Connection auto-closed by context manager
-
-        keyboard = []
+        await self._render_snapshot(query, 'trending', lang)
+        return ADMIN_MENU
+    
+    def _build_trending(self, payload: dict, lang: str):
+        results = payload.get('items') or []
+        most_viewed = bool(results) and payload.get('most_viewed')
+        if most_viewed:
+            # warm-up: پربازدیدترین‌های پنجره اخیر تا پر شدن پنجره مقایسه
+            message = t('admin.analytics.trending.title_most_viewed', lang) + "\n"
+            message += t('admin.analytics.trending.subtitle_most_viewed', lang,
+                         date=payload.get('ready_at') or "-") + "\n\n"
+        else:
+            message = t('admin.analytics.trending.title', lang) + "\n"
+            message += t('admin.analytics.trending.subtitle', lang) + "\n\n"
         if results:
-            for i, r in enumerate(results, 1):
-                try:
-                    att_id = r['id']
-                    title = f"{i}. {r['name']}"
-                    keyboard.append([InlineKeyboardButton(title, callback_data=f"weapon_details_{att_id}")])
-                except Exception:
-                    continue
-        keyboard.append([InlineKeyboardButton(t('menu.buttons.refresh', lang), callback_data="refresh_trending")])
+            # Display trending results with growth (views only during warm-up)
+            for i, result in enumerate(results, 1):
+                growth = result['growth_rate']
+                medal = "🥇" if i==1 else "🥈" if i==2 else "🥉" if i==3 else f"{i}."
+                safe_name = self._escape_markdown(result['name'])
+                safe_weapon = self._escape_markdown(result['weapon'])
+                message += f"{medal} *{safe_name}*\n"
+                message += t('admin.analytics.lines.weapon', lang, weapon=safe_weapon) + "\n"
+                if growth is not None:
+                    if growth >= 100:
+                        icon = "🔥"
+                    elif growth >= 50:
+                        icon = "📈"
+                    else:
+                        icon = "📊"
+                    message += t('admin.analytics.lines.growth', lang, icon=icon, value=f"{growth:+.0f}") + "\n"
+                message += t('admin.analytics.lines.views', lang, value=f"{result['views']:,}") + "\n\n"
+        elif payload.get('ready_at'):
+            message += t('admin.analytics.trending.warming_up', lang, date=payload['ready_at']) + "\n"
+        else:
+            message += t('admin.analytics.fallback.no_data', lang) + "\n"
+
+        keyboard = [
+            [InlineKeyboardButton(f"{i}. {r['name']}", callback_data=f"weapon_details_{r['id']}")]
+            for i, r in enumerate(results, 1)
+        ]
         keyboard.append([InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="analytics_menu")])
-        await self._safe_edit_message(query, message, keyboard)
-        return ADMIN_MENU
+        return message, keyboard
 
     def _map_category_name_to_label(self, db_name: str) -> str:
         """Map DB category name to English+emoji label from WEAPON_CATEGORIES.
@@ -459,12 +384,10 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                            OR LOWER(w.name) LIKE %s
                     ),
                     agg AS (
-                        SELECT m.attachment_id,
-                               COUNT(CASE WHEN m.action_type='view' THEN 1 END) AS views,
-                               COUNT(CASE WHEN m.action_type='click' THEN 1 END) AS clicks
-                        FROM attachment_metrics m
-                        WHERE m.attachment_id IN (SELECT id FROM base)
-                        GROUP BY m.attachment_id
+                        SELECT d.attachment_id, SUM(d.views) AS views, SUM(d.clicks) AS clicks
+                        FROM attachment_metrics_daily d
+                        WHERE d.attachment_id IN (SELECT id FROM base)
+                        GROUP BY d.attachment_id
                     )
                     SELECT b.id AS att_id,
                            b.name AS attachment,
@@ -528,27 +451,33 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             return ADMIN_MENU
         await query.answer()
         try:
-            date7 = get_date_interval(7)
+            date7, date7_params = build_date_range_filter('metric_date', 7)
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"""
+                    WITH agg AS (
+                        SELECT attachment_id, SUM(views) AS views, SUM(clicks) AS clicks
+                        FROM attachment_metrics_daily
+                        WHERE {date7}
+                        GROUP BY attachment_id
+                    )
                     SELECT 
+                        a.id,
                         a.name as attachment,
                         COALESCE(w.name,'Unknown') as weapon,
                         COALESCE(wc.name,'Unknown') as category,
-                        COUNT(CASE WHEN m.action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN m.action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT m.user_id) as users
-                    FROM attachment_metrics m
-                    JOIN attachments a ON m.attachment_id = a.id
+                        agg.views,
+                        agg.clicks
+                    FROM agg
+                    JOIN attachments a ON agg.attachment_id = a.id
                     LEFT JOIN weapons w ON a.weapon_id = w.id
                     LEFT JOIN weapon_categories wc ON w.category_id = wc.id
-                    WHERE CAST(m.action_date AS DATE) >= {date7}
-                    GROUP BY a.id, a.name, w.name, wc.name
                     ORDER BY views DESC
                     LIMIT 200
-                """)
+                """, date7_params)
                 rows = cursor.fetchall() or []
+                # کاربران یکتا از sketchهای HLL (یا دقیق با ANALYTICS_EXACT_UNIQUES)
+                users = count_unique_users_by_attachment(cursor, [r['id'] for r in rows], 7)
             # ساخت CSV در حافظه
             output = io.StringIO()
             writer = csv.writer(output)
@@ -556,7 +485,7 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             for r in rows:
                 writer.writerow([
                     r['attachment'], r['weapon'], r['category'],
-                    int(r['views'] or 0), int(r['clicks'] or 0), int(r['users'] or 0)
+                    int(r['views'] or 0), int(r['clicks'] or 0), users.get(r['id'], 0)
                 ])
             data = io.BytesIO(output.getvalue().encode('utf-8'))
             output.close()
@@ -578,19 +507,19 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             return ADMIN_MENU
         await query.answer()
         try:
-            date7 = get_date_interval(7)
+            date7, date7_params = build_date_range_filter('metric_date', 7)
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"""
                     SELECT 
-                        DATE(action_date) as date,
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                    GROUP BY DATE(action_date)
+                        metric_date as date,
+                        SUM(views) as views,
+                        SUM(clicks) as clicks
+                    FROM attachment_metrics_daily
+                    WHERE {date7}
+                    GROUP BY metric_date
                     ORDER BY date ASC
-                """)
+                """, date7_params)
                 rows = cursor.fetchall() or []
             # تبدیل به دیکشنری برای پر کردن روزهای خالی
             from datetime import date as _date
@@ -628,36 +557,34 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             return ADMIN_MENU
         await query.answer()
         try:
-            date7 = get_date_interval(7)
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    SELECT 
-                        DATE(action_date) as date,
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                    GROUP BY DATE(action_date)
-                    ORDER BY date ASC
-                """)
-                rows = cursor.fetchall() or []
-            # کامل‌سازی روزهای خالی و ساخت CSV
-            today = datetime.utcnow().date()
-            days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-            data_map = {str(r['date']): (int(r['views'] or 0), int(r['clicks'] or 0), int(r['users'] or 0)) for r in rows}
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Date','Views','Clicks','Users'])
-            for d in days:
-                v, c, u = data_map.get(str(d), (0,0,0))
-                writer.writerow([str(d), v, c, u])
-            data = io.BytesIO(output.getvalue().encode('utf-8'))
-            output.close()
-            filename = f"daily_breakdown_{datetime.now().strftime('%Y%m%d')}.csv"
-            await query.message.reply_document(InputFile(data, filename=filename),
-                                               caption=t('admin.analytics.weekly.title', lang))
+            # روزهای بدون داده با generate_series صفر پر می‌شوند
+            date7, date7_params = build_date_range_filter('metric_date', 6)
+            select_sql = f"""
+                WITH agg AS (
+                    SELECT metric_date, SUM(views) AS views, SUM(clicks) AS clicks
+                    FROM attachment_metrics_daily
+                    WHERE {date7}
+                    GROUP BY metric_date
+                ),
+                usr AS (
+                    SELECT metric_date, COUNT(DISTINCT user_id) AS users
+                    FROM attachment_metrics_daily_users
+                    WHERE {date7}
+                    GROUP BY metric_date
+                )
+                SELECT d::date AS "Date",
+                       COALESCE(agg.views, 0) AS "Views",
+                       COALESCE(agg.clicks, 0) AS "Clicks",
+                       COALESCE(usr.users, 0) AS "Users"
+                FROM generate_series(CURRENT_DATE - 6, CURRENT_DATE, INTERVAL '1 day') d
+                LEFT JOIN agg ON agg.metric_date = d::date
+                LEFT JOIN usr ON usr.metric_date = d::date
+                ORDER BY 1 ASC
+            """
+            path = await self._export_csv_gz(select_sql, date7_params * 2, 'daily_breakdown')
+            filename = f"daily_breakdown_{datetime.now().strftime('%Y%m%d')}.csv.gz"
+            await send_and_remove(query.message, path, filename=filename,
+                                  caption=t('admin.analytics.weekly.title', lang))
         except Exception as e:
             logger.error(f"Error in download_daily_csv: {e}")
             import traceback
@@ -703,37 +630,33 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                 )
                 meta = cursor.fetchone() or {}
                 # 30d summary
-                d30 = get_date_interval(30)
+                d30, d30_params = build_date_range_filter('metric_date', 30)
                 cursor.execute(
                     f"""
                     SELECT 
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s AND CAST(action_date AS DATE) >= {d30}
+                        COALESCE(SUM(views), 0) as views,
+                        COALESCE(SUM(clicks), 0) as clicks
+                    FROM attachment_metrics_daily
+                    WHERE attachment_id = %s AND {d30}
                     """,
-                    (att_id,)
+                    (att_id, *d30_params)
                 )
                 s = cursor.fetchone() or {}
                 views = int(s.get('views') or 0)
                 clicks = int(s.get('clicks') or 0)
-                users = int(s.get('users') or 0)
+                users = count_unique_users(cursor, 30, attachment_id=att_id)
                 rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
 
                 # 7d breakdown
-                d7 = get_date_interval(7)
+                d7, d7_params = build_date_range_filter('metric_date', 7)
                 cursor.execute(
                     f"""
-                    SELECT DATE(action_date) as date,
-                           COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                           COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s AND CAST(action_date AS DATE) >= {d7}
-                    GROUP BY DATE(action_date)
+                    SELECT metric_date as date, views, clicks
+                    FROM attachment_metrics_daily
+                    WHERE attachment_id = %s AND {d7}
                     ORDER BY date ASC
                     """,
-                    (att_id,)
+                    (att_id, *d7_params)
                 )
                 rows = cursor.fetchall() or []
 
@@ -808,18 +731,15 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                 row = cursor.fetchone() or {}
                 att_name = self._escape_markdown(row.get('name') or 'Unknown')
                 # 7d breakdown
-                date7 = get_date_interval(7)
+                date7, date7_params = build_date_range_filter('metric_date', 7)
                 cursor.execute(
                     f"""
-                    SELECT DATE(action_date) as date,
-                           COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                           COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s AND CAST(action_date AS DATE) >= {date7}
-                    GROUP BY DATE(action_date)
+                    SELECT metric_date as date, views, clicks
+                    FROM attachment_metrics_daily
+                    WHERE attachment_id = %s AND {date7}
                     ORDER BY date ASC
                     """,
-                    (att_id,)
+                    (att_id, *date7_params)
                 )
                 rows = cursor.fetchall() or []
             today = datetime.utcnow().date()
@@ -860,38 +780,20 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
             await query.answer(t('error.generic', lang), show_alert=True)
             return ADMIN_MENU
         try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                date7 = get_date_interval(7)
-                cursor.execute(
-                    f"""
-                    SELECT DATE(action_date) as date,
-                           COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                           COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                           COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s AND CAST(action_date AS DATE) >= {date7}
-                    GROUP BY DATE(action_date)
-                    ORDER BY date ASC
-                    """,
-                    (att_id,)
-                )
-                rows = cursor.fetchall() or []
-            from datetime import date as _date
-            today = datetime.utcnow().date()
-            days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-            data_map = {str(r['date']): (int(r['views'] or 0), int(r['clicks'] or 0), int(r['users'] or 0)) for r in rows}
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Date','Views','Clicks','Users'])
-            for d in days:
-                v, c, u = data_map.get(str(d), (0,0,0))
-                writer.writerow([str(d), v, c, u])
-            data_buf = io.BytesIO(output.getvalue().encode('utf-8'))
-            output.close()
-            filename = f"attachment_{att_id}_daily_{datetime.now().strftime('%Y%m%d')}.csv"
-            await query.message.reply_document(InputFile(data_buf, filename=filename),
-                                               caption=t('admin.analytics.daily.title', lang))
+            select_sql = """
+                SELECT d::date AS "Date",
+                       COALESCE(m.views, 0) AS "Views",
+                       COALESCE(m.clicks, 0) AS "Clicks",
+                       COALESCE(m.unique_users, 0) AS "Users"
+                FROM generate_series(CURRENT_DATE - 6, CURRENT_DATE, INTERVAL '1 day') d
+                LEFT JOIN attachment_metrics_daily m
+                       ON m.attachment_id = %s AND m.metric_date = d::date
+                ORDER BY 1 ASC
+            """
+            path = await self._export_csv_gz(select_sql, (att_id,), f"attachment_{att_id}_daily")
+            filename = f"attachment_{att_id}_daily_{datetime.now().strftime('%Y%m%d')}.csv.gz"
+            await send_and_remove(query.message, path, filename=filename,
+                                  caption=t('admin.analytics.daily.title', lang))
         except Exception as e:
             logger.error(f"Error in att_download_csv: {e}")
             import traceback
@@ -900,144 +802,63 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
         return ADMIN_MENU
     
     async def view_user_behavior(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """آنالیز رفتار کاربران (خلاصه + هایلایت‌ها)"""
+        """آنالیز رفتار کاربران (خلاصه + هایلایت‌ها) از snapshot"""
         query = update.callback_query
         lang = get_user_lang(update, context, self.db) or 'fa'
         await query.answer(t('admin.analytics.user.loading', lang))
-        
-        message = t('admin.analytics.user.title', lang) + "\n\n"
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                date7 = get_date_interval(7)
-                # Summary (7d)
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(DISTINCT user_id) as active_users,
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                """)
-                s = cursor.fetchone() or {}
-                active_users = int(s.get('active_users') or 0)
-                views = int(s.get('views') or 0)
-                clicks = int(s.get('clicks') or 0)
+        await self._render_snapshot(query, 'user_behavior', lang)
+        return ADMIN_MENU
 
-                # Total users overall (all-time seen in metrics)
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT user_id) as total_users
-                    FROM attachment_metrics
-                """)
-                tu = cursor.fetchone() or {}
-                total_users = int(tu.get('total_users') or 0)
+    def _build_user_behavior(self, s: dict, lang: str):
+        message = t('admin.analytics.user.title', lang) + "\n\n"
+        active_users = s['active_users']
+        views = s['views']
+        clicks = s['clicks']
+        avg_views = (float(views)/float(active_users)) if active_users > 0 else 0.0
+        engagement_rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
 
-                avg_views = (float(views)/float(active_users)) if active_users > 0 else 0.0
-                engagement_rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
+        # Summary lines
+        message += t('admin.analytics.user.summary.header', lang) + "\n"
+        message += t('admin.analytics.user.summary.total_users', lang, n=f"{s['total_users']:,}") + "\n"
+        message += t('admin.analytics.user.summary.active_7d', lang, n=f"{active_users:,}") + "\n"
+        message += t('admin.analytics.user.summary.avg_views', lang, n=f"{avg_views:.1f}") + "\n"
+        message += t('admin.analytics.user.summary.engagement', lang, rate=f"{engagement_rate:.1f}") + "\n\n"
 
-                # Summary lines
-                message += t('admin.analytics.user.summary.header', lang) + "\n"
-                message += t('admin.analytics.user.summary.total_users', lang, n=f"{total_users:,}") + "\n"
-                message += t('admin.analytics.user.summary.active_7d', lang, n=f"{active_users:,}") + "\n"
-                message += t('admin.analytics.user.summary.avg_views', lang, n=f"{avg_views:.1f}") + "\n"
-                message += t('admin.analytics.user.summary.engagement', lang, rate=f"{engagement_rate:.1f}") + "\n\n"
+        if s['has_rows']:
+            # Very active block
+            if s['very_active']:
+                message += t('admin.analytics.user.group.very_active.header', lang) + "\n"
+                for item in s['very_active']:
+                    name = self._escape_markdown(f"#{item['user_id']}")
+                    message += f"\n🥇 *{name}*\n"
+                    message += t('admin.analytics.user.line.views', lang, n=f"{item['views']:,}") + "\n"
+                    message += t('admin.analytics.user.line.clicks', lang, n=f"{item['clicks']:,}") + "\n"
+                    message += t('admin.analytics.user.line.attachments', lang, n=item['atts']) + "\n"
+                    message += t('admin.analytics.user.line.engagement', lang, rate=f"{item['eng']:.0f}") + "\n"
+                    if item.get('rating') is not None:
+                        message += t('admin.analytics.user.line.rating', lang, rating=f"{item['rating']:.1f}") + "\n"
+                    last_label = item['last'][:10] if item['last'] else t('common.unknown', lang)
+                    message += t('admin.analytics.user.line.last', lang, time=last_label) + "\n"
+                message += "\n"
 
-                # Per-user stats (7d)
-                cursor.execute(f"""
-                    SELECT 
-                        user_id,
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT attachment_id) as atts,
-                        MAX(action_date) as last_active
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                    GROUP BY user_id
-                    ORDER BY views DESC
-                """)
-                rows = cursor.fetchall() or []
+            # Active block
+            if s['active']:
+                message += t('admin.analytics.user.group.active.header', lang) + "\n"
+                for item in s['active']:
+                    name = self._escape_markdown(f"#{item['user_id']}")
+                    message += t('admin.analytics.user.line.item', lang, name=name, views=f"{item['views']:,}", atts=item['atts']) + "\n"
+                message += "\n"
 
-                # Optional ratings by user
-                ratings = {}
-                try:
-                    cursor.execute("""
-                        SELECT user_id, AVG(rating) as rating
-                        FROM user_attachment_engagement
-                        WHERE rating IS NOT NULL
-                        GROUP BY user_id
-                    """)
-                    for r in cursor.fetchall() or []:
-                        ratings[int(r['user_id'])] = float(r['rating'])
-                except Exception:
-                    pass
-
-                very_active = []
-                active = []
-                moderate = []
-                for r in rows:
-                    v = int(r['views'] or 0)
-                    c = int(r['clicks'] or 0)
-                    a = int(r['atts'] or 0)
-                    eng = (float(c)/float(v)*100) if v > 0 else 0.0
-                    uid = int(r['user_id'])
-                    last = str(r['last_active']) if r['last_active'] else None
-                    data = {
-                        'user_id': uid,
-                        'views': v,
-                        'clicks': c,
-                        'atts': a,
-                        'eng': eng,
-                        'rating': ratings.get(uid),
-                        'last': last
-                    }
-                    if v >= 50 or c >= 10:
-                        very_active.append(data)
-                    elif v >= 10 or c >= 3:
-                        active.append(data)
-                    else:
-                        moderate.append(data)
-
-                if rows:
-                    # Very active block
-                    if very_active:
-                        message += t('admin.analytics.user.group.very_active.header', lang) + "\n"
-                        for item in very_active[:3]:
-                            name = self._escape_markdown(f"#{item['user_id']}")
-                            message += f"\n🥇 *{name}*\n"
-                            message += t('admin.analytics.user.line.views', lang, n=f"{item['views']:,}") + "\n"
-                            message += t('admin.analytics.user.line.clicks', lang, n=f"{item['clicks']:,}") + "\n"
-                            message += t('admin.analytics.user.line.attachments', lang, n=item['atts']) + "\n"
-                            message += t('admin.analytics.user.line.engagement', lang, rate=f"{item['eng']:.0f}") + "\n"
-                            if item.get('rating') is not None:
-                                message += t('admin.analytics.user.line.rating', lang, rating=f"{item['rating']:.1f}") + "\n"
-                            last_label = item['last'][:10] if item['last'] else t('common.unknown', lang)
-                            message += t('admin.analytics.user.line.last', lang, time=last_label) + "\n"
-                        message += "\n"
-
-                    # Active block
-                    if active:
-                        message += t('admin.analytics.user.group.active.header', lang) + "\n"
-                        for item in active[:2]:
-                            name = self._escape_markdown(f"#{item['user_id']}")
-                            message += t('admin.analytics.user.line.item', lang, name=name, views=f"{item['views']:,}", atts=item['atts']) + "\n"
-                        message += "\n"
-
-                    if moderate:
-                        message += t('admin.analytics.user.group.moderate.count', lang, n=len(moderate)) + "\n"
-                else:
-                    message += t('admin.analytics.user.no_data.title', lang) + "\n\n" + t('admin.analytics.user.no_data.body', lang)
-        except Exception as e:
-            logger.error(f"Error in view_user_behavior: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            message = t('admin.analytics.user.error.title', lang) + "\n\n" + t('admin.analytics.user.error.body', lang)
+            if s['moderate_count']:
+                message += t('admin.analytics.user.group.moderate.count', lang, n=s['moderate_count']) + "\n"
+        else:
+            message += t('admin.analytics.user.no_data.title', lang) + "\n\n" + t('admin.analytics.user.no_data.body', lang)
 
         keyboard = [
             [InlineKeyboardButton(t('admin.analytics.buttons.more_details', lang), callback_data="user_behavior_details")],
             [InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="analytics_menu")]
         ]
-        await self._safe_edit_message(query, message, keyboard)
-        return ADMIN_MENU
+        return message, keyboard
 
     async def user_behavior_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """جزئیات رفتار کاربران (توزیع و برترین‌ها)"""
@@ -1049,18 +870,18 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
         try:
             with self._get_db_connection() as conn:
                 cursor = conn.cursor()
-                date7 = get_date_interval(7)
+                date7, date7_params = build_date_range_filter('metric_date', 7)
 
                 # Per-user stats for distribution
                 cursor.execute(f"""
                     SELECT 
                         user_id,
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
+                        SUM(views) as views,
+                        SUM(clicks) as clicks
+                    FROM attachment_metrics_daily_users
+                    WHERE {date7}
                     GROUP BY user_id
-                """)
+                """, date7_params)
                 rows = cursor.fetchall() or []
 
                 very = 0
@@ -1086,15 +907,16 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                     message += t('admin.analytics.user_details.dist.line', lang, icon='📊', cat=t('admin.analytics.user_details.dist.cat.moderate', lang), count=mod, pct=pct(mod)) + "\n\n"
 
                 # Top attachments by distinct users (7d)
+                du_date7, du_date7_params = build_date_range_filter('du.metric_date', 7)
                 cursor.execute(f"""
-                    SELECT a.name, COUNT(DISTINCT m.user_id) as users
-                    FROM attachment_metrics m
-                    JOIN attachments a ON m.attachment_id = a.id
-                    WHERE m.action_type='view' AND CAST(m.action_date AS DATE) >= {date7}
+                    SELECT a.name, COUNT(DISTINCT du.user_id) as users
+                    FROM attachment_metrics_daily_users du
+                    JOIN attachments a ON du.attachment_id = a.id
+                    WHERE du.views > 0 AND {du_date7}
                     GROUP BY a.id, a.name
                     ORDER BY users DESC
                     LIMIT 3
-                """)
+                """, du_date7_params)
                 top = cursor.fetchall() or []
                 if top:
                     message += t('admin.analytics.user_details.top.header', lang) + "\n"
@@ -1105,14 +927,8 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                         message += f"{medal} {safe_name} — {int(row['users'])}\n"
                     message += "\n"
 
-                # Weekly active users
-                cursor.execute(f"""
-                    SELECT COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                """)
-                w = cursor.fetchone() or {}
-                weekly = int(w.get('users') or 0)
+                # Weekly active users (یک ردیف per-user stats برای هر کاربر فعال)
+                weekly = len(rows)
                 if weekly > 0:
                     message += t('admin.analytics.user_details.weekly', lang, n=weekly) + "\n"
         except Exception as e:
@@ -1294,10 +1110,10 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                             WHERE wc.id = %s AND a.mode = %s
                         ),
                         views AS (
-                            SELECT m.attachment_id, COUNT(*) FILTER (WHERE m.action_type='view') AS v
-                            FROM attachment_metrics m
-                            WHERE m.attachment_id IN (SELECT id FROM base)
-                            GROUP BY m.attachment_id
+                            SELECT d.attachment_id, SUM(d.views) AS v
+                            FROM attachment_metrics_daily d
+                            WHERE d.attachment_id IN (SELECT id FROM base)
+                            GROUP BY d.attachment_id
                         )
                         SELECT 
                             (SELECT name FROM weapon_categories WHERE id = %s) AS category,
@@ -1316,10 +1132,10 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                             WHERE wc.id = %s
                         ),
                         views AS (
-                            SELECT m.attachment_id, COUNT(*) FILTER (WHERE m.action_type='view') AS v
-                            FROM attachment_metrics m
-                            WHERE m.attachment_id IN (SELECT id FROM base)
-                            GROUP BY m.attachment_id
+                            SELECT d.attachment_id, SUM(d.views) AS v
+                            FROM attachment_metrics_daily d
+                            WHERE d.attachment_id IN (SELECT id FROM base)
+                            GROUP BY d.attachment_id
                         )
                         SELECT 
                             (SELECT name FROM weapon_categories WHERE id = %s) AS category,
@@ -1353,8 +1169,10 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
         return ADMIN_MENU
     
     async def refresh_trending(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Refresh trending by delegating to view_trending"""
-        return await self.view_trending(update, context)
+        """Legacy refresh button: recompute the trending list in the background"""
+        query = update.callback_query
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        return await self._start_snapshot_refresh(query, context, 'trending', lang)
     
     async def view_underperforming(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """نمایش آیتم‌های کم‌عملکرد بر اساس بازدید و نرخ تعامل"""
@@ -1370,10 +1188,8 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                 cursor = conn.cursor()
                 cursor.execute("""
                     WITH agg AS (
-                        SELECT attachment_id,
-                               COUNT(CASE WHEN action_type='view' THEN 1 END) AS views,
-                               COUNT(CASE WHEN action_type='click' THEN 1 END) AS clicks
-                        FROM attachment_metrics
+                        SELECT attachment_id, SUM(views) AS views, SUM(clicks) AS clicks
+                        FROM attachment_metrics_daily
                         GROUP BY attachment_id
                     )
                     SELECT 
@@ -1449,145 +1265,127 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
         query = update.callback_query
         lang = get_user_lang(update, context, self.db) or 'fa'
         await query.answer(t('admin.analytics.loading', lang))
-        
+        await self._render_snapshot(query, 'daily', lang)
+        return ADMIN_MENU
+
+    def _build_daily_report(self, s: dict, lang: str):
         message = t('admin.analytics.daily.title', lang) + "\n\n"
+        views, clicks, users = s['views'], s['clicks'], s['users']
+        rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
         
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                today = get_current_date()
-                # Summary
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) = {today}
-                """)
-                s = cursor.fetchone()
-                views = s['views'] if s else 0
-                clicks = s['clicks'] if s else 0
-                users = s['users'] if s else 0
-                rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
-                
-                message += t('admin.analytics.daily.stats.header', lang) + "\n"
-                message += t('admin.analytics.daily.stats.views', lang, n=views) + "\n"
-                message += t('admin.analytics.daily.stats.clicks', lang, n=clicks) + "\n"
-                message += t('admin.analytics.daily.stats.users', lang, n=users) + "\n"
-                message += t('admin.analytics.daily.stats.engagement', lang, rate=f"{rate:.1f}") + "\n\n"
-                
-                # Top today
-                cursor.execute(f"""
-                    SELECT a.name, COALESCE(w.name,'Unknown') as weapon, COUNT(*) as v
-                    FROM attachment_metrics m
-                    JOIN attachments a ON m.attachment_id = a.id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE m.action_type='view' AND CAST(m.action_date AS DATE) = {today}
-                    GROUP BY a.id, a.name, w.name
-                    ORDER BY v DESC
-                    LIMIT 3
-                """)
-                top = cursor.fetchall()
-                if top:
-                    message += t('admin.analytics.daily.top.header', lang) + "\n"
-                    for i,row in enumerate(top,1):
-                        medal = "🥇" if i==1 else "🥈" if i==2 else "🥉"
-                        safe_name = self._escape_markdown(row['name'])
-                        safe_weapon = self._escape_markdown(row['weapon'])
-                        message += f"{medal} *{safe_name}*\n"
-                        message += t('admin.analytics.lines.weapon', lang, weapon=safe_weapon) + "\n"
-                        message += t('admin.analytics.fallback.lines.views', lang, value=f"{row['v']:,}") + "\n\n"
-                else:
-                    message += t('admin.analytics.daily.no_data.title', lang) + "\n\n" + t('admin.analytics.daily.no_data.body', lang)
-        except Exception as e:
-            logger.error(f"Error in daily_report: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            message = t('admin.analytics.daily.error.title', lang) + "\n\n" + t('admin.analytics.daily.error.body', lang)
-        finally:
-            pass
+        message += t('admin.analytics.daily.stats.header', lang) + "\n"
+        message += t('admin.analytics.daily.stats.views', lang, n=views) + "\n"
+        message += t('admin.analytics.daily.stats.clicks', lang, n=clicks) + "\n"
+        message += t('admin.analytics.daily.stats.users', lang, n=users) + "\n"
+        message += t('admin.analytics.daily.stats.engagement', lang, rate=f"{rate:.1f}") + "\n\n"
         
-        keyboard = [
-            [
-                InlineKeyboardButton(t('admin.analytics.buttons.daily_chart', lang), callback_data="daily_chart"),
-                InlineKeyboardButton(t('admin.analytics.buttons.download_csv', lang), callback_data="download_daily_csv")
-            ],
-            [InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="analytics_menu")]
-        ]
-        await self._safe_edit_message(query, message, keyboard)
-        return ADMIN_MENU
+        if s['top']:
+            message += t('admin.analytics.daily.top.header', lang) + "\n"
+            for i,row in enumerate(s['top'],1):
+                medal = "🥇" if i==1 else "🥈" if i==2 else "🥉"
+                safe_name = self._escape_markdown(row['name'])
+                safe_weapon = self._escape_markdown(row['weapon'])
+                message += f"{medal} *{safe_name}*\n"
+                message += t('admin.analytics.lines.weapon', lang, weapon=safe_weapon) + "\n"
+                message += t('admin.analytics.fallback.lines.views', lang, value=f"{row['views']:,}") + "\n\n"
+        else:
+            message += t('admin.analytics.daily.no_data.title', lang) + "\n\n" + t('admin.analytics.daily.no_data.body', lang)
+        return message, self._report_keyboard(lang)
 
     async def weekly_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """گزارش هفتگی ساده بر اساس آمار ۷ روز اخیر"""
         query = update.callback_query
         lang = get_user_lang(update, context, self.db) or 'fa'
         await query.answer(t('admin.analytics.loading', lang))
-        
+        await self._render_snapshot(query, 'weekly', lang)
+        return ADMIN_MENU
+
+    def _build_weekly_report(self, s: dict, lang: str):
         message = t('admin.analytics.weekly.title', lang) + "\n\n"
+        views, clicks, users = s['views'], s['clicks'], s['users']
+        rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
         
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                date7 = get_date_interval(7)
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(CASE WHEN action_type='view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type='click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
-                    WHERE CAST(action_date AS DATE) >= {date7}
-                """)
-                s = cursor.fetchone()
-                views = s['views'] if s else 0
-                clicks = s['clicks'] if s else 0
-                users = s['users'] if s else 0
-                rate = (float(clicks)/float(views)*100) if views > 0 else 0.0
-                
-                message += t('admin.analytics.weekly.summary.header', lang) + "\n"
-                message += t('admin.analytics.weekly.summary.views', lang, n=views) + "\n"
-                message += t('admin.analytics.weekly.summary.clicks', lang, n=clicks) + "\n"
-                message += t('admin.analytics.weekly.summary.users', lang, n=users) + "\n"
-                message += t('admin.analytics.weekly.summary.engagement', lang, rate=f"{rate:.1f}") + "\n\n"
-                
-                cursor.execute(f"""
-                    SELECT a.name, COALESCE(w.name,'Unknown') as weapon, COUNT(*) as v
-                    FROM attachment_metrics m
-                    JOIN attachments a ON m.attachment_id = a.id
-                    LEFT JOIN weapons w ON a.weapon_id = w.id
-                    WHERE m.action_type='view' AND CAST(m.action_date AS DATE) >= {date7}
-                    GROUP BY a.id, a.name, w.name
-                    ORDER BY v DESC
-                    LIMIT 3
-                """)
-                top = cursor.fetchall()
-                if top:
-                    message += t('admin.analytics.weekly.top.header', lang) + "\n"
-                    for i,row in enumerate(top,1):
-                        medal = "🥇" if i==1 else "🥈" if i==2 else "🥉"
-                        safe_name = self._escape_markdown(row['name'])
-                        safe_weapon = self._escape_markdown(row['weapon'])
-                        message += f"{medal} *{safe_name}*\n"
-                        message += t('admin.analytics.lines.weapon_simple', lang, weapon=safe_weapon) + "\n"
-                        message += t('admin.analytics.fallback.lines.views', lang, value=f"{row['v']:,}") + "\n\n"
-                else:
-                    message += t('admin.analytics.weekly.no_data.title', lang) + "\n\n" + t('admin.analytics.weekly.no_data.body', lang)
-        except Exception as e:
-            logger.error(f"Error in weekly_report: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            message = t('admin.analytics.weekly.error.title', lang) + "\n\n" + t('admin.analytics.weekly.error.body', lang)
-        finally:
-            pass
+        message += t('admin.analytics.weekly.summary.header', lang) + "\n"
+        message += t('admin.analytics.weekly.summary.views', lang, n=views) + "\n"
+        message += t('admin.analytics.weekly.summary.clicks', lang, n=clicks) + "\n"
+        message += t('admin.analytics.weekly.summary.users', lang, n=users) + "\n"
+        message += t('admin.analytics.weekly.summary.engagement', lang, rate=f"{rate:.1f}") + "\n\n"
         
-        keyboard = [
+        if s['top']:
+            message += t('admin.analytics.weekly.top.header', lang) + "\n"
+            for i,row in enumerate(s['top'],1):
+                medal = "🥇" if i==1 else "🥈" if i==2 else "🥉"
+                safe_name = self._escape_markdown(row['name'])
+                safe_weapon = self._escape_markdown(row['weapon'])
+                message += f"{medal} *{safe_name}*\n"
+                message += t('admin.analytics.lines.weapon_simple', lang, weapon=safe_weapon) + "\n"
+                message += t('admin.analytics.fallback.lines.views', lang, value=f"{row['views']:,}") + "\n\n"
+        else:
+            message += t('admin.analytics.weekly.no_data.title', lang) + "\n\n" + t('admin.analytics.weekly.no_data.body', lang)
+        return message, self._report_keyboard(lang)
+
+    def _report_keyboard(self, lang: str):
+        return [
             [
                 InlineKeyboardButton(t('admin.analytics.buttons.daily_chart', lang), callback_data="daily_chart"),
                 InlineKeyboardButton(t('admin.analytics.buttons.download_csv', lang), callback_data="download_daily_csv")
             ],
             [InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="analytics_menu")]
         ]
+    
+    async def view_search_aliases(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """نمایش پیشنهادهای alias جستجو (کوئری‌های بدون نتیجه) برای تأیید ادمین"""
+        query = update.callback_query
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        await query.answer()
+        await self._render_search_aliases(query, lang)
+        return ADMIN_MENU
+    
+    async def _render_search_aliases(self, query, lang: str):
+        pending = self.db.get_pending_search_aliases(limit=10)
+        message = t('admin.analytics.aliases.title', lang) + "\n\n"
+        keyboard = []
+        if not pending:
+            message += t('admin.analytics.aliases.empty', lang)
+        for i, row in enumerate(pending, 1):
+            message += t(
+                'admin.analytics.aliases.item', lang,
+                i=i,
+                alias=self._escape_markdown(row['alias']),
+                target=self._escape_markdown(row.get('target_label') or str(row['target_id'])),
+                count=row['zero_result_count'],
+                score=f"{float(row['confidence'] or 0) * 100:.0f}"
+            ) + "\n"
+            keyboard.append([
+                InlineKeyboardButton(f"✅ {i}", callback_data=f"alias_approve_{row['id']}"),
+                InlineKeyboardButton(f"❌ {i}", callback_data=f"alias_reject_{row['id']}")
+            ])
+        keyboard.append([InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="analytics_menu")])
         await self._safe_edit_message(query, message, keyboard)
+    
+    async def review_search_alias(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """تأیید/رد alias: alias_approve_<id> / alias_reject_<id>"""
+        query = update.callback_query
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        user_id = update.effective_user.id
+        if not await self.check_permission(user_id, Permission.MANAGE_ATTACHMENTS):
+            await self.send_permission_denied(update, context)
+            return ADMIN_MENU
+        
+        data = query.data or ""
+        approve = data.startswith("alias_approve_")
+        try:
+            alias_id = int(data.split("_")[-1])
+        except Exception:
+            await query.answer()
+            return ADMIN_MENU
+        
+        ok = self.db.review_search_alias(alias_id, approve, user_id)
+        if ok:
+            await query.answer(t('admin.analytics.aliases.approved' if approve else 'admin.analytics.aliases.rejected', lang))
+        else:
+            await query.answer(t('admin.analytics.aliases.review_failed', lang), show_alert=True)
+        await self._render_search_aliases(query, lang)
         return ADMIN_MENU
     
     def get_conversation_handler(self) -> ConversationHandler:
@@ -1626,6 +1424,10 @@ class AttachmentsDashboardHandler(BaseAdminHandler):
                     CallbackQueryHandler(self.ws_choose_category, pattern="^ws_cat_\\d+$"),
                     CallbackQueryHandler(self.ws_back_to_categories, pattern="^ws_back_to_categories$"),
                     CallbackQueryHandler(self.user_behavior_details, pattern="^user_behavior_details$"),
+                    CallbackQueryHandler(self.refresh_snapshot, pattern="^analytics_snapshot_refresh_[a-z_]+$"),
+                    CallbackQueryHandler(self.refresh_trending, pattern="^refresh_trending$"),
+                    CallbackQueryHandler(self.view_search_aliases, pattern="^analytics_search_aliases$"),
+                    CallbackQueryHandler(self.review_search_alias, pattern="^alias_(approve|reject)_\\d+$"),
                     CallbackQueryHandler(self.admin_cancel, pattern="^admin_menu_return$")
                 ],
                 VIEW_TRENDING: [
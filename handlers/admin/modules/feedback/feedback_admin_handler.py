@@ -13,7 +13,7 @@ from utils.i18n import t
 from utils.language import get_user_lang
 from handlers.admin.modules.base_handler import BaseAdminHandler
 from datetime import datetime, timedelta
-from core.database.sql_helpers import get_date_interval, get_datetime_interval
+from core.database.sql_helpers import build_datetime_range_filter
 import io
 import urllib.parse
 
@@ -471,7 +471,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
         """دریافت آمار کلی سیستم"""
         try:
             # Use proper pooled connection and cursor API (psycopg3)
-            dt_filter = get_datetime_interval(30)
+            dt_filter, dt_params = build_datetime_range_filter('last_view_date', 30)
             base_sql = (
                 f"SELECT "
                 f" COUNT(CASE WHEN rating IS NOT NULL THEN 1 END) as total_votes,"
@@ -481,14 +481,14 @@ class FeedbackAdminHandler(BaseAdminHandler):
                 f" COUNT(CASE WHEN feedback IS NOT NULL AND feedback != '' THEN 1 END) as total_feedbacks,"
                 f" COUNT(DISTINCT user_id) as active_users"
                 f" FROM user_attachment_engagement"
-                f" WHERE last_view_date >= {dt_filter}"
+                f" WHERE {dt_filter}"
             )
             if suggested_only:
                 base_sql += " AND attachment_id IN (SELECT attachment_id FROM suggested_attachments)"
 
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute(base_sql)
+                cur.execute(base_sql, dt_params)
                 row = cur.fetchone()
                 cur.close()
             return {
@@ -600,7 +600,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
         """آمار بر اساس دسته‌بندی"""
         try:
             # Attachments don't have category directly; join through weapons -> weapon_categories
-            dt_filter = get_datetime_interval(30)
+            dt_filter, dt_params = build_datetime_range_filter('uae.last_view_date', 30)
             query = (
                 "SELECT "
                 " wc.name AS category,"
@@ -611,7 +611,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
                 " JOIN weapons w ON a.weapon_id = w.id"
                 " JOIN weapon_categories wc ON w.category_id = wc.id"
                 " LEFT JOIN user_attachment_engagement uae ON a.id = uae.attachment_id"
-                f" AND uae.last_view_date >= {dt_filter}"
+                f" AND {dt_filter}"
             )
             if suggested_only:
                 query += " JOIN suggested_attachments sa ON sa.attachment_id = a.id AND sa.mode = a.mode"
@@ -619,7 +619,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
 
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute(query)
+                cur.execute(query, dt_params)
                 rows = cur.fetchall() or []
                 cur.close()
 
@@ -642,7 +642,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
     def _get_stats_by_mode(self, suggested_only: bool = False) -> dict:
         """آمار بر اساس مود بازی"""
         try:
-            dt_filter = get_datetime_interval(30)
+            dt_filter, dt_params = build_datetime_range_filter('uae.last_view_date', 30)
             query = (
                 "SELECT "
                 " a.mode,"
@@ -651,7 +651,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
                 " COALESCE(SUM(CASE WHEN uae.rating = -1 THEN 1 ELSE 0 END), 0) AS dislikes"
                 " FROM attachments a"
                 " LEFT JOIN user_attachment_engagement uae ON a.id = uae.attachment_id"
-                f" AND uae.last_view_date >= {dt_filter}"
+                f" AND {dt_filter}"
             )
             if suggested_only:
                 query += " JOIN suggested_attachments sa ON sa.attachment_id = a.id AND sa.mode = a.mode"
@@ -659,7 +659,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
 
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute(query)
+                cur.execute(query, dt_params)
                 rows = cur.fetchall() or []
                 cur.close()
 
@@ -679,7 +679,7 @@ class FeedbackAdminHandler(BaseAdminHandler):
         """روند هفتگی رأی‌ها در چند هفته اخیر"""
         try:
             days = weeks * 7
-            dt_filter = get_datetime_interval(days)
+            dt_filter, dt_params = build_datetime_range_filter('uae.last_view_date', days)
             query = (
                 "SELECT "
                 " to_char(date_trunc('week', uae.last_view_date), 'IYYY-IW') AS week_label,"
@@ -692,14 +692,14 @@ class FeedbackAdminHandler(BaseAdminHandler):
                     " JOIN suggested_attachments sa ON sa.attachment_id = a.id AND sa.mode = a.mode"
                 )
             query += (
-                f" WHERE uae.last_view_date >= {dt_filter}"
+                f" WHERE {dt_filter}"
                 " GROUP BY week_label"
                 " ORDER BY week_label"
             )
 
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute(query)
+                cur.execute(query, dt_params)
                 rows = cur.fetchall() or []
                 cur.close()
 
@@ -9,6 +9,7 @@ from telegram.helpers import escape_markdown
 from html import escape as html_escape
 from handlers.admin.modules.base_handler import BaseAdminHandler
 from handlers.admin.admin_states import ADMIN_MENU, TICKET_SEARCH, TICKET_REPLY
+from core.security.rate_limiter import PRIORITY_TRANSACTIONAL
 from utils.logger import log_admin_action, get_logger
 from utils.language import get_user_lang
 from utils.i18n import t
@@ -39,6 +40,7 @@ class TicketHandler(BaseAdminHandler):
             
             await context.bot.send_message(
                 chat_id=ticket['user_id'],
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=message,
                 parse_mode='HTML'
             )
@@ -64,6 +66,7 @@ class TicketHandler(BaseAdminHandler):
             
             await context.bot.send_message(
                 chat_id=ticket['user_id'],
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=message,
                 parse_mode='HTML'
             )
@@ -86,6 +89,7 @@ class TicketHandler(BaseAdminHandler):
             
             await context.bot.send_message(
                 chat_id=ticket['user_id'],
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=message,
                 parse_mode='HTML'
             )
@@ -435,6 +439,7 @@ class TicketHandler(BaseAdminHandler):
                     user_lang = 'fa'
                 await context.bot.send_message(
                     chat_id=ticket['user_id'],
+                    rate_limit_args=PRIORITY_TRANSACTIONAL,
                     text=t('user.tickets.reply.received', user_lang, id=ticket_id, preview=reply_text[:100])
                 )
             except Exception as e:
@@ -231,6 +231,12 @@ class ImportExportHandler(BaseAdminHandler):
         if query.data == "admin_cancel":
             return await self.admin_menu_return(update, context)
         
+        if query.data == "export_csv":
+            # export CSV به صورت stream در پس‌زمینه ساخته و ارسال می‌شود
+            status_msg = await query.message.reply_text("⏳ در حال آماده‌سازی export CSV...")
+            context.application.create_task(self._run_csv_export(query.message, status_msg))
+            return await self.admin_menu_return(update, context)
+        
         await safe_edit_message_text(query, "⏳ در حال آماده‌سازی export...")
         
         try:
@@ -244,22 +250,6 @@ class ImportExportHandler(BaseAdminHandler):
                 export_file = backup_mgr.export_to_json()
                 caption = "📦 Export دیتابیس (JSON)\n\n✅ قابل import مجدد در ربات"
                 
-            elif query.data == "export_csv":
-                export_dir = backup_mgr.export_to_csv()
-                if export_dir:
-                    # Create ZIP from CSV files
-                    import zipfile
-                    export_file = export_dir + ".zip"
-                    with zipfile.ZipFile(export_file, 'w') as zf:
-                        for root, dirs, files in os.walk(export_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                zf.write(file_path, os.path.basename(file_path))
-                    # Clean up CSV directory
-                    import shutil
-                    shutil.rmtree(export_dir)
-                    caption = "📊 Export دیتابیس (CSV)\n\n✅ قابل استفاده در Excel"
-                
             elif query.data == "export_backup":
                 export_file = backup_mgr.create_full_backup()
                 caption = "🗄️ Backup کامل دیتابیس\n\n✅ شامل همه فایل‌ها و تنظیمات"
@@ -297,3 +287,44 @@ class ImportExportHandler(BaseAdminHandler):
             await safe_edit_message_text(query, f"❌ خطا در Export: {str(e)}")
         
         return await self.admin_menu_return(update, context)
+    
+    async def _run_csv_export(self, message, status_msg):
+        """ساخت فایل‌های .csv.gz در executor با پیام پیشرفت و ارسال آن‌ها"""
+        import shutil
+        from managers.backup_manager import BackupManager
+        from utils.stream_export import ExportProgress, format_size, run_with_progress, send_and_remove
+        
+        progress = ExportProgress(total_files=2)
+        export_dir = None
+        try:
+            backup_mgr = BackupManager(self.db)
+            export_dir = await run_with_progress(
+                lambda: backup_mgr.export_to_csv(progress=progress),
+                progress,
+                status_message=status_msg,
+                render=lambda p: f"⏳ در حال export CSV... {p.files_done}/{p.total_files} فایل، {format_size(p.bytes_written)}",
+            )
+            if not export_dir:
+                await status_msg.edit_text("❌ خطا در Export دیتا.")
+                return
+            
+            total_size = 0
+            for name in sorted(os.listdir(export_dir)):
+                path = os.path.join(export_dir, name)
+                total_size += os.path.getsize(path)
+                await send_and_remove(message, path, caption="📊 Export دیتابیس (CSV)\n\n✅ پس از extract قابل استفاده در Excel")
+            
+            await status_msg.edit_text(
+                f"✅ Export با موفقیت انجام شد.\n"
+                f"📁 حجم فایل: {format_size(total_size)}"
+            )
+        except Exception as e:
+            logger.error(f"CSV export error: {e}")
+            log_exception(logger, e, "_run_csv_export")
+            try:
+                await status_msg.edit_text(f"❌ خطا در Export: {str(e)}")
+            except Exception:
+                pass
+        finally:
+            if export_dir and os.path.isdir(export_dir):
+                shutil.rmtree(export_dir, ignore_errors=True)
@@ -9,7 +9,7 @@ import json
 import re
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from telegram.error import Forbidden, BadRequest
+from telegram.error import BadRequest
 from config.config import NOTIFICATION_SETTINGS
 from handlers.admin.modules.base_handler import BaseAdminHandler
 from handlers.admin.admin_states import NOTIF_COMPOSE, NOTIF_CONFIRM, ADMIN_MENU
@@ -182,6 +182,8 @@ class NotificationHandler(BaseAdminHandler):
         )
 
         context.user_data.pop('sched_edit_id', None)
+        if ok:
+            self._schedules_changed(context)
 
         if ok:
             kb = [[InlineKeyboardButton(t("admin.notify.buttons.back_to_schedules", lang), callback_data="admin_sched_notifications")]]
@@ -347,6 +349,7 @@ class NotificationHandler(BaseAdminHandler):
             await query.answer(t("common.not_found", lang), show_alert=True)
             return await self.schedules_menu(update, context)
         self.db.set_schedule_enabled(sid, not row['enabled'])
+        self._schedules_changed(context)
         return await self.schedules_menu(update, context)
 
     @log_admin_action("schedule_delete")
@@ -364,6 +367,7 @@ class NotificationHandler(BaseAdminHandler):
 
         sid = int(query.data.replace("sched_delete_", ""))
         self.db.delete_scheduled_notification(sid)
+        self._schedules_changed(context)
         await query.answer(t("common.deleted", lang))
         return await self.schedules_menu(update, context)
         
@@ -451,6 +455,49 @@ class NotificationHandler(BaseAdminHandler):
         await update.message.reply_text(t("admin.notify.compose.only_text_or_photo", lang))
         return NOTIF_COMPOSE
     
+    async def _poll_broadcast_job(self, job_id: int, status_msg, lang: str, interval: float = 3.0):
+        """به‌روزرسانی پیام وضعیت از روی broadcast_jobs تا پایان job"""
+        last_text = None
+        while True:
+            await asyncio.sleep(interval)
+            job = self.db.get_broadcast_job(job_id)
+            if not job:
+                return
+            total = int(job.get('total_recipients') or 0)
+            sent = int(job.get('sent_count') or 0)
+            blocked = int(job.get('blocked_count') or 0)
+            failed = int(job.get('failed_count') or 0) + blocked
+            done = sent + failed
+            
+            if job.get('status') in ('completed', 'failed', 'cancelled'):
+                success_rate = int((sent / total) * 100) if total > 0 else 0
+                duration = 0.0
+                if job.get('started_at') and job.get('finished_at'):
+                    duration = (job['finished_at'] - job['started_at']).total_seconds()
+                avg = round(duration / done, 3) if done else 0
+                keyboard = [[InlineKeyboardButton(t("menu.buttons.back", lang), callback_data="notify_home")]]
+                try:
+                    await status_msg.edit_text(
+                        t("admin.notify.send.summary", lang, total=total, sent=sent, success=sent, success_rate=success_rate, failed=failed, removed=blocked, avg=avg),
+                        parse_mode='Markdown',
+                        reply_markup=InlineKeyboardMarkup(keyboard)
+                    )
+                except Exception:
+                    pass
+                return
+            
+            ratio = min(1.0, done / total) if total > 0 else 0.0
+            progress = int(ratio * 10)
+            percent = int(ratio * 100)
+            bar_str = ("▰" * progress) + ("▱" * (10 - progress))
+            text = t("admin.notify.send.progress", lang, bar=f"{bar_str} {percent}%", percent=percent, current=done, total=total, sent=sent, failed=failed)
+            if text != last_text:
+                try:
+                    await status_msg.edit_text(text)
+                    last_text = text
+                except Exception:
+                    pass
+    
     @log_admin_action("notify_confirm")
     async def notify_confirm_selected(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """ارسال پیام به همه کاربران ثبت‌شده با گزارش پیشرفت"""
@@ -460,97 +507,40 @@ class NotificationHandler(BaseAdminHandler):
         if query.data != 'notify_confirm':
             return await self.notify_home_menu(update, context)
         
-        subs = Subscribers()
-        ids = subs.all()
-        
-        # یکتا سازی و حذف مقادیر نامعتبر
-        ids = [int(i) for i in set(ids) if isinstance(i, int) or (isinstance(i, str) and i.isdigit())]
-        
-        total = len(ids)
-        sent = 0
-        failed = 0
-        removed = 0
-        
         notif_type = context.user_data.get('notif_type')
         text = context.user_data.get('notif_text') or ''
         photo = context.user_data.get('notif_photo')
         
         lang = get_user_lang(update, context, self.db) or 'fa'
+        
+        # ثبت به صورت job پایدار؛ ارسال توسط BroadcastJobManager انجام می‌شود
+        # و پس از ری‌استارت از آخرین cursor ادامه پیدا می‌کند
+        job_manager = context.application.bot_data.get('broadcast_jobs')
+        job_id = None
+        if job_manager is not None:
+            job_id = job_manager.enqueue(
+                'photo' if notif_type == 'photo' and photo else 'text',
+                message_text=text,
+                photo_file_id=photo if notif_type == 'photo' else None,
+                parse_mode='Markdown',
+                source='admin',
+                created_by=query.from_user.id,
+            )
+        if not job_id:
+            await query.message.edit_text(t("admin.notify.send.queue_error", lang))
+            return await self.notify_home_menu(update, context)
+        
+        job = self.db.get_broadcast_job(job_id) or {}
+        total = int(job.get('total_recipients') or 0)
+        
         # پیام وضعیت
-        await query.message.edit_text(t("admin.notify.send.start", lang))
+        await query.message.edit_text(t("admin.notify.send.start", lang, count=total))
         initial_bar = "▱" * 10
         status_msg = await context.bot.send_message(
             chat_id=query.message.chat_id,
             text=t("admin.notify.send.progress", lang, bar=initial_bar + " 0%", percent=0, current=0, total=total, sent=0, failed=0)
         )
-        
-        for idx, uid in enumerate(ids, 1):
-            try:
-                if notif_type == 'photo' and photo:
-                    try:
-                        await context.bot.send_photo(
-                            chat_id=uid,
-                            photo=photo,
-                            caption=text or None,
-                            parse_mode='Markdown'
-                        )
-                    except Exception:
-                        # اگر Markdown خطا داد، بدون parse_mode ارسال کن
-                        await context.bot.send_photo(
-                            chat_id=uid,
-                            photo=photo,
-                            caption=text or None
-                        )
-                else:
-                    try:
-                        await context.bot.send_message(
-                            chat_id=uid,
-                            text=text,
-                            parse_mode='Markdown'
-                        )
-                    except Exception:
-                        # اگر Markdown خطا داد، بدون parse_mode ارسال کن
-                        await context.bot.send_message(
-                            chat_id=uid,
-                            text=text
-                        )
-                sent += 1
-            except Forbidden:
-                # کاربر ربات را بلاک کرده؛ از لیست حذف شود
-                if subs.remove(uid):
-                    removed += 1
-                failed += 1
-            except Exception:
-                failed += 1
-            
-            # به‌روزرسانی وضعیت هر 10 ارسال یا در پایان
-            if idx % 10 == 0 or idx == total:
-                try:
-                    progress = int((idx / total) * 10)
-                    bar = "▰" * progress + "▱" * (10 - progress)
-                    percent = int((idx / total) * 100)
-                    
-                    bar_str = ("▰" * progress) + ("▱" * (10 - progress))
-                    await status_msg.edit_text(
-                        t("admin.notify.send.progress", lang, bar=f"{bar_str} {percent}%", percent=percent, current=sent + failed, total=total, sent=sent, failed=failed)
-                    )
-                except Exception:
-                    pass
-            
-            # محدودیت نرخ
-            await asyncio.sleep(0.03)
-        
-        # نتیجه نهایی
-        success_rate = int((sent / total) * 100) if total > 0 else 0
-        keyboard = [[InlineKeyboardButton(t("menu.buttons.back", lang), callback_data="notify_home")]]
-        try:
-            await status_msg.edit_text(
-                t("admin.notify.send.summary", lang, total=total, sent=sent, success_rate=success_rate, failed=failed, removed=removed, avg=0.03),
-                parse_mode='Markdown',
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-        except Exception:
-            pass
+        context.application.create_task(self._poll_broadcast_job(job_id, status_msg, lang))
         
         # پاکسازی داده‌های موقت
         for k in ['notif_type', 'notif_text', 'notif_photo']:
@@ -639,6 +629,7 @@ class NotificationHandler(BaseAdminHandler):
             new_id = None
 
         if new_id:
+            self._schedules_changed(context)
             try:
                 await query.answer(t("admin.notify.schedule.saved", lang), show_alert=False)
             except Exception:
@@ -673,10 +664,15 @@ class NotificationHandler(BaseAdminHandler):
         enabled = NOTIFICATION_SETTINGS.get('enabled', True)
         auto_notify = NOTIFICATION_SETTINGS.get('auto_notify', True)
         
+        # پیش‌نمایش reach از cache اندازه مخاطبان (بدون اسکن تنظیمات کاربران)
+        subs = Subscribers()
+        reach = t("admin.notify.settings.reach", lang, br=subs.audience_size(mode='br'), mp=subs.audience_size(mode='mp'))
+        
         text = (
             t("admin.notify.settings.title", lang) + "\n\n" +
             t("admin.notify.settings.status", lang, status=t("common.status.enabled", lang) if enabled else t("common.status.disabled", lang)) + "\n" +
             t("admin.notify.settings.auto", lang, status=t("common.status.enabled", lang) if auto_notify else t("common.status.disabled", lang)) + "\n\n" +
+            reach + "\n\n" +
             t("admin.notify.settings.templates", lang)
         )
         
@@ -866,6 +862,12 @@ class NotificationHandler(BaseAdminHandler):
         
         return NOTIF_COMPOSE
     
+    def _schedules_changed(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """بیدار کردن NotificationScheduler بعد از ایجاد/ویرایش/حذف زمان‌بندی"""
+        scheduler = context.bot_data.get('notification_scheduler')
+        if scheduler is not None:
+            scheduler.notify_changed()
+    
     def _persist_notification_settings(self) -> bool:
         """ذخیره NOTIFICATION_SETTINGS در config.py"""
         try:
@@ -6,6 +6,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKe
 from telegram.ext import ContextTypes, CallbackQueryHandler, ConversationHandler, MessageHandler, filters
 from core.database.database_adapter import get_database_adapter
 from core.security.role_manager import RoleManager, Permission
+from core.security.rate_limiter import PRIORITY_TRANSACTIONAL
 from utils.logger import get_logger
 from utils.i18n import t
 from utils.language import get_user_lang
@@ -204,6 +205,7 @@ async def unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 notif_text = t('user.ua.unbanned', lang)
                 await context.bot.send_message(
                     chat_id=banned_user_id,
+                    rate_limit_args=PRIORITY_TRANSACTIONAL,
                     text=notif_text,
                     parse_mode='Markdown'
                 )
@@ -278,6 +280,7 @@ async def receive_ban_reason(update: Update, context: ContextTypes.DEFAULT_TYPE)
             notif_text = t('user.ua.banned', lang, reason=reason)
             await context.bot.send_message(
                 chat_id=target_user_id,
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=notif_text,
                 parse_mode='Markdown'
             )
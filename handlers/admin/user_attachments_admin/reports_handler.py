@@ -8,6 +8,7 @@ from telegram.ext import ContextTypes, CallbackQueryHandler
 from config.config import GAME_MODES
 from core.database.database_adapter import get_database_adapter
 from core.security.role_manager import RoleManager, Permission
+from core.security.rate_limiter import PRIORITY_TRANSACTIONAL
 from utils.logger import get_logger
 from psycopg.rows import dict_row
 from telegram.helpers import escape_markdown
@@ -461,6 +462,7 @@ async def delete_reported_attachment(update: Update, context: ContextTypes.DEFAU
                 notif_text += escape_markdown(ban_message, version=2)
             await context.bot.send_message(
                 chat_id=owner_id,
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=notif_text,
                 parse_mode='MarkdownV2'
             )
@@ -555,6 +557,7 @@ async def warn_owner_about_report(update: Update, context: ContextTypes.DEFAULT_
                 notif_text += escape_markdown(ban_message, version=2)
             await context.bot.send_message(
                 chat_id=owner_id,
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=notif_text,
                 parse_mode='MarkdownV2'
             )
@@ -10,6 +10,7 @@ from telegram.ext import ContextTypes, CallbackQueryHandler, MessageHandler, fil
 from config.config import GAME_MODES
 from core.database.database_adapter import get_database_adapter
 from core.security.role_manager import RoleManager, Permission
+from core.security.rate_limiter import PRIORITY_TRANSACTIONAL
 from core.cache.ua_cache_manager import get_ua_cache
 from utils.logger import get_logger
 from utils.i18n import t
@@ -537,6 +538,7 @@ async def approve_attachment(update: Update, context: ContextTypes.DEFAULT_TYPE)
             
             await context.bot.send_message(
                 chat_id=attachment['user_id'],
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=t('user.ua.approved', user_lang, name=att_name, weapon=weapon_display, mode=mode_name),
                 parse_mode='Markdown'
             )
@@ -802,6 +804,7 @@ async def receive_reject_reason(update: Update, context: ContextTypes.DEFAULT_TY
             
             await context.bot.send_message(
                 chat_id=attachment['user_id'],
+                rate_limit_args=PRIORITY_TRANSACTIONAL,
                 text=t('user.ua.rejected', user_lang, name=att_name, weapon=weapon_display, mode=mode_name, reason=reason),
                 parse_mode='Markdown'
             )
@@ -5,8 +5,8 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 import logging
 import re
-import os
 from utils.analytics_pg import AnalyticsPostgres as Analytics
+from utils.stream_export import ExportProgress, format_size, run_with_progress, send_and_remove
 from utils.logger import log_exception
 from handlers.admin.admin_handlers_modular import AdminHandlers
 from utils.language import get_user_lang
@@ -1210,25 +1210,35 @@ async def show_period_report(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def export_analytics_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Export آمار به CSV و ارسال فایل‌ها"""
+    """Export آمار به CSV و ارسال فایل‌ها (در پس‌زمینه با پیام پیشرفت)"""
     query = update.callback_query
     try:
         lang = get_user_lang(update, context, context.bot_data.get('database')) or 'fa'
     except Exception:
         lang = 'fa'
     await query.answer(t('admin.channels.export.creating', lang))
-    
+    await safe_edit_message_text(query, t('admin.channels.export.creating', lang))
+    context.application.create_task(_run_analytics_export(query, lang))
+    return CHANNEL_MENU
+
+
+async def _run_analytics_export(query, lang: str):
+    """ساخت فایل‌های .csv.gz با COPY در executor، گزارش پیشرفت و ارسال"""
+    back_markup = InlineKeyboardMarkup([[InlineKeyboardButton(t('admin.channels.history.back_to_stats', lang), callback_data="channel_stats")]])
+    progress = ExportProgress(total_files=3)
     try:
         analytics = Analytics()
-        files = analytics.export_to_csv("all")
+        files = await run_with_progress(
+            lambda: analytics.export_to_csv("all", progress=progress),
+            progress,
+            status_message=query.message,
+            render=lambda p: t('admin.channels.export.progress', lang,
+                               done=p.files_done, total=p.total_files, size=format_size(p.bytes_written)),
+        )
         
         if not files:
-            await safe_edit_message_text(
-                query,
-                t('admin.channels.export.no_files', lang),
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(t('admin.channels.history.back_to_stats', lang), callback_data="channel_stats")]])
-            )
-            return CHANNEL_MENU
+            await safe_edit_message_text(query, t('admin.channels.export.no_files', lang), reply_markup=back_markup)
+            return
         
         # ارسال فایل‌ها
         await safe_edit_message_text(
@@ -1236,30 +1246,18 @@ async def export_analytics_csv(update: Update, context: ContextTypes.DEFAULT_TYP
             t('admin.channels.export.sending', lang, count=len(files))
         )
         
-        for file_path in files:
-            with open(file_path, 'rb') as f:
-                await query.message.reply_document(
-                    document=f,
-                    filename=os.path.basename(file_path),
-                    caption=f"📊 {os.path.basename(file_path)}"
-                )
+        for file_path, filename in files:
+            await send_and_remove(query.message, file_path, filename=filename, caption=f"📊 {filename}")
         
-        keyboard = [[InlineKeyboardButton(t('admin.channels.history.back_to_stats', lang), callback_data="channel_stats")]]
         await query.message.reply_text(
             t('admin.channels.export.success', lang),
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=back_markup
         )
         
     except Exception as e:
         logger.error(f"[channel] Error exporting CSV: {e}")
         log_exception(logger, e, str({"action": "export_analytics_csv"}))
-        await safe_edit_message_text(
-            query,
-            t('admin.channels.export.error', lang),
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(t('admin.channels.history.back_to_stats', lang), callback_data="channel_stats")]])
-        )
-    
-    return CHANNEL_MENU
+        await safe_edit_message_text(query, t('admin.channels.export.error', lang), reply_markup=back_markup)
 
 
 async def test_channel_access(update: Update, context: ContextTypes.DEFAULT_TYPE):
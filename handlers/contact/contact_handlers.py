@@ -4,6 +4,7 @@ Handlers برای سیستم تماس با ما
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from managers.contact_system import ContactSystem, TicketCategory, TicketPriority
+from core.security.rate_limiter import PRIORITY_TRANSACTIONAL
 from utils.logger import get_logger, log_user_action
 from utils.i18n import t
 from utils.language import get_user_lang
@@ -641,6 +642,7 @@ class ContactHandlers:
                     try:
                         await context.bot.send_message(
                             chat_id=admin_id,
+                            rate_limit_args=PRIORITY_TRANSACTIONAL,
                             text=notification_text,
                             parse_mode='Markdown',
                             reply_markup=reply_markup
@@ -16,6 +16,11 @@ class InlineHandler(BaseUserHandler):
         super().__init__(db)
         self.article_only = os.getenv('INLINE_USE_ARTICLE_ONLY', 'false').lower() == 'true'
         self.photo_require_start = os.getenv('INLINE_PHOTO_REQUIRE_START', 'false').lower() == 'true'
+        # کش نتایج ساخته‌شده (ثانیه) و cache_time تلگرام برای پاسخ‌ها
+        self.result_cache_ttl = int(os.getenv('INLINE_RESULT_CACHE_TTL', '60'))
+        self.answer_cache_time = int(os.getenv('INLINE_CACHE_TIME', '30'))
+        self.suggestions_cache_time = int(os.getenv('INLINE_SUGGESTIONS_CACHE_TIME', '300'))
+        self._subscribers = None
 
     async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         import logging
@@ -25,7 +30,10 @@ class InlineHandler(BaseUserHandler):
         user_id = update.effective_user.id if update.effective_user else None
         logger.info(f"Inline query from user {user_id}: '{q}'")
 
+        # زبان کاربر در user_data کش می‌شود؛ برای کلید کش نتایج و دکمه پایین لازم است
+        lang = get_user_lang(update, context, self.db) or 'fa'
         results = []
+        cache_time = self.suggestions_cache_time
         # تشخیص نوع چت برای جلوگیری از نمایش «ثبت نظر» در گروه‌ها
         try:
             chat_type = getattr(update.inline_query, 'chat_type', None)
@@ -36,9 +44,8 @@ class InlineHandler(BaseUserHandler):
             results = self._build_suggestions()
             logger.info(f"Query too short, returning {len(results)} suggestions")
         else:
+            cache_time = self.answer_cache_time
             try:
-                items = self.db.search(q)
-                logger.info(f"Search found {len(items)} items")
                 bot_username = None
                 try:
                     bot_username = context.bot.username
@@ -46,63 +53,21 @@ class InlineHandler(BaseUserHandler):
                     pass
                 if not bot_username:
                     bot_username = os.getenv('BOT_USERNAME', '')
-                try:
-                    started = Subscribers(db_adapter=self.db).is_subscribed(user_id)
-                    logger.info(f"User {user_id} started: {started}")
-                except Exception as e:
-                    logger.error(f"Error checking subscription: {e}")
-                    started = False
-                # حالت ویژه: اگر کوئری به شکل att:ID[-mode] بود، یک نتیجه عکس دار برگردان
-                special_match = re.match(r"(?i)^att[:\-\s]*(\d+)(?:[\-\s_]+(br|mp))?$", q)
-                if special_match:
-                    try:
-                        att_id = int(special_match.group(1))
-                        mode = (special_match.group(2) or 'br').lower()
-                    except Exception:
-                        att_id, mode = None, 'br'
-                    results = []
-                    if att_id:
-                        att = self.db.get_attachment_by_id(att_id)
-                        if att and att.get('image'):
-                            try:
-                                stats = self.db.get_attachment_stats(att_id, period='all') or {}
-                                like_count = stats.get('like_count', 0)
-                                dislike_count = stats.get('dislike_count', 0)
-                            except Exception:
-                                like_count = dislike_count = 0
-                            weapon = att.get('weapon') or ''
-                            lang = get_user_lang(update, context, self.db) or 'fa'
-                            mode_name = t(f"mode.{mode}", lang)
-                            # برای پیام عکس در گروه: فقط دکمه‌های فیدبک + ارسال در پی‌وی + ارسال عکس در گروه
-                            rows = [
-                                [InlineKeyboardButton(f"👍 {like_count}", callback_data=f"att_like_{att_id}"), InlineKeyboardButton(f"👎 {dislike_count}", callback_data=f"att_dislike_{att_id}")]
-                            ]
-                            if is_group and bot_username:
-                                rows.append([InlineKeyboardButton(t("inline.send_in_pm", lang), url=f"https://t.me/{bot_username}?start=att-{att_id}-{mode}")])
-                            if is_group:
-                                rows.append([InlineKeyboardButton(t("inline.send_photo_in_group", lang), switch_inline_query_current_chat=f"att:{att_id}-{mode}")])
-                            results.append(InlineQueryResultCachedPhoto(
-                                id=f"att-{att_id}-{mode}",
-                                photo_file_id=att['image'],
-                                title=f"{att.get('name','?')} ({weapon})",
-                                description=f"{t('attachment.code', lang)}: {att.get('code','')} | {mode_name}",
-                                caption=f"**{att.get('name','')}**\n{t('attachment.code', lang)}: `{att.get('code','')}`\n{weapon} | {mode_name}",
-                                parse_mode='Markdown',
-                                reply_markup=InlineKeyboardMarkup(rows)
-                            ))
-                        else:
-                            # اگر عکس ندارد، از مسیر عادی ادامه بده
-                            pass
+                started = self._is_started(user_id)
+                nq = self._normalize_query(q)
+                # نتایج فقط به (کوئری، زبان، started، گروه بودن) وابسته‌اند، نه به خود کاربر
+                cache_key = f"inline_results:{nq}:{lang}:{int(started)}:{int(is_group)}"
+                cache = get_smart_cache()
+                cached_results = cache.get(cache_key)
+                if cached_results is not None:
+                    results = cached_results
+                    logger.info(f"Inline results cache hit for '{nq}' ({len(results)} results)")
                 else:
-                    results = self._build_weapon_recent_and_lists(
-                        q=q,
-                        items=items,
-                        bot_username=bot_username,
-                        started=started,
-                        is_group=is_group
-                    )
-                logger.info(f"Built {len(results)} results")
+                    results = self._build_query_results(nq, bot_username, started, is_group, lang)
+                    cache.set(cache_key, results, data_type='inline_results', ttl=self.result_cache_ttl)
+                    logger.info(f"Built {len(results)} results")
                 if user_id:
+                    # track_search فقط رویداد را در صف analytics می‌گذارد
                     try:
                         self.db.track_search(user_id, q, int(len(results)), 0.0)
                     except Exception:
@@ -115,9 +80,93 @@ class InlineHandler(BaseUserHandler):
         results = results[:25]
         logger.info(f"Sending {len(results)} results to user")
 
-        lang = get_user_lang(update, context, self.db) or 'fa'
         button = InlineQueryResultsButton(text=t("inline.open_bot", lang), start_parameter="inline")
-        await update.inline_query.answer(results=results, is_personal=True, cache_time=2, button=button)
+        await update.inline_query.answer(results=results, is_personal=True, cache_time=cache_time, button=button)
+
+    def _build_query_results(self, q: str, bot_username: str, started: bool, is_group: bool, lang: str):
+        """ساخت نتایج اینلاین برای یک کوئری نرمال‌شده (بدون وابستگی به user_id)"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        # حالت ویژه: اگر کوئری به شکل att:ID[-mode] بود، یک نتیجه عکس دار برگردان
+        special_match = re.match(r"(?i)^att[:\-\s]*(\d+)(?:[\-\s_]+(br|mp))?$", q)
+        if not special_match:
+            items = self.db.search(q)
+            logger.info(f"Search found {len(items)} items")
+            return self._build_weapon_recent_and_lists(
+                q=q,
+                items=items,
+                bot_username=bot_username,
+                started=started,
+                is_group=is_group,
+                lang=lang
+            )
+        try:
+            att_id = int(special_match.group(1))
+            mode = (special_match.group(2) or 'br').lower()
+        except Exception:
+            att_id, mode = None, 'br'
+        results = []
+        if att_id:
+            att = self.db.get_attachment_by_id(att_id)
+            if att and att.get('image'):
+                try:
+                    stats = self.db.get_attachment_stats(att_id, period='all') or {}
+                    like_count = stats.get('like_count', 0)
+                    dislike_count = stats.get('dislike_count', 0)
+                except Exception:
+                    like_count = dislike_count = 0
+                weapon = att.get('weapon') or ''
+                mode_name = t(f"mode.{mode}", lang)
+                # برای پیام عکس در گروه: فقط دکمه‌های فیدبک + ارسال در پی‌وی + ارسال عکس در گروه
+                rows = [
+                    [InlineKeyboardButton(f"👍 {like_count}", callback_data=f"att_like_{att_id}"), InlineKeyboardButton(f"👎 {dislike_count}", callback_data=f"att_dislike_{att_id}")]
+                ]
+                if is_group and bot_username:
+                    rows.append([InlineKeyboardButton(t("inline.send_in_pm", lang), url=f"https://t.me/{bot_username}?start=att-{att_id}-{mode}")])
+                if is_group:
+                    rows.append([InlineKeyboardButton(t("inline.send_photo_in_group", lang), switch_inline_query_current_chat=f"att:{att_id}-{mode}")])
+                results.append(InlineQueryResultCachedPhoto(
+                    id=f"att-{att_id}-{mode}",
+                    photo_file_id=att['image'],
+                    title=f"{att.get('name','?')} ({weapon})",
+                    description=f"{t('attachment.code', lang)}: {att.get('code','')} | {mode_name}",
+                    caption=f"**{att.get('name','')}**\n{t('attachment.code', lang)}: `{att.get('code','')}`\n{weapon} | {mode_name}",
+                    parse_mode='Markdown',
+                    reply_markup=InlineKeyboardMarkup(rows)
+                ))
+        return results
+
+    @staticmethod
+    def _normalize_query(q: str) -> str:
+        """نرمال‌سازی کوئری برای کلید کش (جستجو case-insensitive است)"""
+        return " ".join((q or "").lower().split())
+
+    def _get_subscribers(self):
+        # ساخت SubscribersPostgres شامل CREATE TABLE IF NOT EXISTS است؛ یک بار کافی است
+        if self._subscribers is None:
+            self._subscribers = Subscribers(db_adapter=self.db)
+        return self._subscribers
+
+    def _is_started(self, user_id: int) -> bool:
+        """وضعیت start کاربر با کش کوتاه‌مدت (مقدار False زودتر منقضی می‌شود)"""
+        import logging
+        logger = logging.getLogger(__name__)
+        if not user_id:
+            return False
+        cache = get_smart_cache()
+        key = f"inline_started:{user_id}"
+        cached = cache.get(key)
+        if cached is not None:
+            return bool(cached)
+        try:
+            started = bool(self._get_subscribers().is_subscribed(user_id))
+            logger.info(f"User {user_id} started: {started}")
+        except Exception as e:
+            logger.error(f"Error checking subscription: {e}")
+            return False
+        cache.set(key, started, data_type='user_data', ttl=600 if started else 30)
+        return started
 
     async def handle_chosen_inline_result(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         import logging
@@ -132,10 +181,7 @@ class InlineHandler(BaseUserHandler):
         if not result_id or not user_id:
             logger.warning("ChosenInlineResult missing result_id or user_id; skipping")
             return
-        try:
-            started = Subscribers(db_adapter=self.db).is_subscribed(user_id)
-        except Exception:
-            started = False
+        started = self._is_started(user_id)
 
         if result_id.startswith("att-"):
             parts = result_id.split("-")
@@ -192,7 +238,7 @@ class InlineHandler(BaseUserHandler):
             return contains
         return uniques[0] if uniques else None
 
-    def _build_weapon_recent_and_lists(self, q: str, items, bot_username: str, started: bool, is_group: bool = False):
+    def _build_weapon_recent_and_lists(self, q: str, items, bot_username: str, started: bool, is_group: bool = False, lang: str = 'fa'):
         import logging
         logger = logging.getLogger(__name__)
         
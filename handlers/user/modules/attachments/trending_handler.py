@@ -0,0 +1,135 @@
+"""
+مدیریت منوی «ترندهای الان»
+لیست از شمارنده حافظه‌ای ترندینگ خوانده می‌شود (managers/trending_counter.py)
+و برای نمایش آن هیچ query اجرا نمی‌شود.
+"""
+
+from datetime import datetime
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from managers.channel_manager import require_channel_membership
+from managers.trending_counter import get_trending_counter
+from utils.logger import log_user_action, get_logger
+from utils.language import get_user_lang
+from utils.i18n import t
+from utils.telegram_safety import safe_edit_message_text
+from handlers.user.base_user_handler import BaseUserHandler
+
+
+logger = get_logger('user', 'user.log')
+
+
+class TrendingNowHandler(BaseUserHandler):
+    """مدیریت منوی ترندهای الان"""
+
+    def _trending_view(self, lang: str, stamp: bool = False):
+        """متن و کیبورد لیست ترندینگ"""
+        counter = get_trending_counter()
+        items = counter.top()
+        text = t("trending.title", lang)
+        if stamp:
+            # timestamp برای جلوگیری از duplicate detection
+            now = datetime.now().strftime("%H:%M:%S")
+            text += f" _{t('notification.updated', lang, time=now)}_"
+        text += "\n\n"
+
+        keyboard = []
+        if items:
+            if counter.is_most_viewed:
+                # warm-up: تا ready_at پربازدیدترین‌های پنجره اخیر نمایش داده می‌شوند
+                ready_at = counter.ready_at
+                text += t("trending.subtitle_most_viewed", lang,
+                          date=ready_at.strftime("%Y-%m-%d %H:%M") if ready_at else "-") + "\n\n"
+            else:
+                text += t("trending.subtitle", lang) + "\n\n"
+            for i, item in enumerate(items, 1):
+                if item['growth_rate'] is None:
+                    text += t(
+                        "trending.line_views", lang,
+                        rank=i, name=item['name'], weapon=item['weapon'], views=f"{item['views']:,}"
+                    ) + "\n"
+                else:
+                    text += t(
+                        "trending.line", lang,
+                        rank=i, name=item['name'], weapon=item['weapon'],
+                        growth=f"{item['growth_rate']:+.0f}", views=f"{item['views']:,}"
+                    ) + "\n"
+                keyboard.append([InlineKeyboardButton(f"{i}. {item['name']}", callback_data=f"trend_att_{item['id']}")])
+        elif counter.is_warming_up and counter.ready_at:
+            text += t("trending.warming_up", lang, date=counter.ready_at.strftime("%Y-%m-%d %H:%M"))
+        else:
+            text += t("trending.empty", lang)
+
+        keyboard.append([InlineKeyboardButton(t("menu.buttons.home", lang), callback_data="main_menu")])
+        return text, InlineKeyboardMarkup(keyboard)
+
+    @require_channel_membership
+    @log_user_action("trending_now_msg")
+    async def trending_now_msg(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """نمایش ترندهای الان (از طریق پیام)"""
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        text, reply_markup = self._trending_view(lang, stamp=True)
+        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+
+    @require_channel_membership
+    @log_user_action("trending_now")
+    async def trending_now(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """نمایش ترندهای الان (از طریق inline)"""
+        query = update.callback_query
+        await query.answer()
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        text, reply_markup = self._trending_view(lang)
+        await safe_edit_message_text(query, text, reply_markup=reply_markup, parse_mode='Markdown')
+
+    @require_channel_membership
+    @log_user_action("trending_item_detail")
+    async def trending_item_detail(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """ارسال یک اتچمنت از لیست ترندینگ"""
+        query = update.callback_query
+        await query.answer()
+        lang = get_user_lang(update, context, self.db) or 'fa'
+        try:
+            att_id = int(query.data.replace('trend_att_', ''))
+        except Exception:
+            return
+
+        att = self.db.get_attachment_by_id(att_id)
+        if not att:
+            await query.answer(t('attachment.not_found', lang))
+            return
+
+        cat_name = t(f"category.{att['category']}", lang)
+        mode_short = t(f"mode.{att['mode']}_short", lang)
+        caption = (
+            f"**{att['name']}**\n"
+            f"{t('attachment.code', lang)}: `{att['code']}`\n"
+            f"{t('weapon.label', lang)}: {att['weapon']} ({cat_name})\n"
+            f"{t('mode.label', lang)}: {mode_short}"
+        )
+
+        # آمار بازخورد + ثبت بازدید
+        stats = self.db.get_attachment_stats(att_id, period='all')
+        like_count = stats.get('like_count', 0)
+        dislike_count = stats.get('dislike_count', 0)
+        self.db.track_attachment_view(query.from_user.id, att_id)
+        feedback_kb = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton(f"👍 {like_count}", callback_data=f"att_like_{att_id}"),
+                InlineKeyboardButton(f"👎 {dislike_count}", callback_data=f"att_dislike_{att_id}")
+            ],
+            [InlineKeyboardButton(t('attachment.copy_code', lang), callback_data=f"att_copy_{att_id}")],
+            [InlineKeyboardButton(t('attachment.feedback', lang), callback_data=f"att_fb_{att_id}")]
+        ])
+        try:
+            if att.get('image'):
+                await query.message.reply_photo(photo=att['image'], caption=caption, parse_mode='Markdown', reply_markup=feedback_kb)
+            else:
+                await query.message.reply_text(caption, parse_mode='Markdown', reply_markup=feedback_kb)
+        except Exception as e:
+            logger.warning(f"Error sending trending attachment (id={att_id}): {e}")
+            await query.message.reply_text(caption, parse_mode='Markdown', reply_markup=feedback_kb)
+
+        back_markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton(t('menu.buttons.back', lang), callback_data="trending_now")
+        ]])
+        await query.message.reply_text(t('success.generic', lang), reply_markup=back_markup)
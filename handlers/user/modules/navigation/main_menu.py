@@ -7,7 +7,7 @@ from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKe
 from telegram.ext import ContextTypes, ConversationHandler
 from config.config import GAME_MODES
 from managers.channel_manager import require_channel_membership
-from utils.analytics_pg import AnalyticsPostgres as Analytics
+from utils.join_funnel_buffer import get_join_funnel_buffer, JOIN_EVENT_START
 from handlers.user.base_user_handler import BaseUserHandler
 from utils.logger import get_logger, log_exception
 from utils.language import get_user_lang
@@ -98,10 +98,9 @@ class MainMenuHandler(BaseUserHandler):
         # Track user info in database (NEW - for analytics)
         self._track_user_info(update)
 
-        # Analytics: ثبت ورود کاربر
+        # Analytics: ثبت ورود کاربر (صف حافظه، نوشتن دسته‌ای در background)
         try:
-            analytics = Analytics()
-            analytics.track_user_start(user_id)
+            get_join_funnel_buffer().enqueue(JOIN_EVENT_START, user_id)
         except Exception as e:
             logger.error(f"[Analytics] Error tracking user start: {e}")
             log_exception(logger, e, "context")
@@ -128,6 +127,7 @@ class MainMenuHandler(BaseUserHandler):
         
         keyboard.extend([
             [kb("menu.buttons.season_list", lang), kb("menu.buttons.season_top", lang)],
+            [kb("menu.buttons.trending", lang)],
             [kb("menu.buttons.notify", lang), kb("menu.buttons.search", lang)],
             [kb("menu.buttons.contact", lang), kb("menu.buttons.help", lang)]
         ])
@@ -174,6 +174,7 @@ class MainMenuHandler(BaseUserHandler):
             [InlineKeyboardButton(kb("menu.buttons.get", lang), callback_data="select_mode_first")],
             [InlineKeyboardButton(kb("menu.buttons.season_top", lang), callback_data="season_top")],
             [InlineKeyboardButton(kb("menu.buttons.season_list", lang), callback_data="season_top_list")],
+            [InlineKeyboardButton(kb("menu.buttons.trending", lang), callback_data="trending_now")],
             [InlineKeyboardButton(kb("menu.buttons.suggested", lang), callback_data="suggested_attachments")]
         ]
         # نمایش مشروط CMS: فقط اگر فعال باشد و محتوای منتشرشده وجود داشته باشد
@@ -111,6 +111,7 @@ class LanguageHandler(BaseUserHandler):
                 
                 keyboard.extend([
                     [kb("menu.buttons.season_list", new_lang), kb("menu.buttons.season_top", new_lang)],
+                    [kb("menu.buttons.trending", new_lang)],
                     [kb("menu.buttons.notify", new_lang), kb("menu.buttons.search", new_lang)],
                     [kb("menu.buttons.contact", new_lang), kb("menu.buttons.help", new_lang)]
                 ])
@@ -25,12 +25,21 @@ from telegram.ext import (
 )
 
 # Additional imports
-from config.config import BOT_TOKEN, ADMIN_IDS, BACKUP_DIR
+from config.config import BOT_TOKEN, ADMIN_IDS, BACKUP_DIR, BROADCAST_EXTERNAL_WORKER
 from core.database.database_adapter import get_database_adapter
 from handlers.admin.admin_handlers_modular import AdminHandlers
 from core.cache.cache_manager import cache_cleanup_task
+from utils.search_analytics_buffer import get_search_analytics_buffer
+from utils.join_funnel_buffer import get_join_funnel_buffer
 from managers.notification_scheduler import NotificationScheduler
 from managers.backup_scheduler import BackupScheduler
+from managers.search_alias_analyzer import SearchAliasAnalyzer
+from managers.metrics_rollup import MetricsRollup
+from managers.partition_manager import PartitionManager
+from managers.leaderboard_refresher import LeaderboardRefresher
+from managers.dashboard_snapshot import get_dashboard_snapshot_service
+from managers.trending_counter import get_trending_counter
+from managers.broadcast_job_manager import BroadcastJobManager
 from handlers.contact.contact_handlers import ContactHandlers
 from utils.subscribers_pg import SubscribersPostgres as Subscribers
 from utils.error_handler import ErrorHandler
@@ -54,8 +63,15 @@ class CODMAttachmentsBot:
         self.db = get_database_adapter()
         self.admin_handlers = AdminHandlers(self.db)
         self.contact_handlers = ContactHandlers(self.db)  # Initialize ContactHandlers
-        self.notification_scheduler = NotificationScheduler(self.db)
+        self.broadcast_jobs = BroadcastJobManager(self.db)
+        self.notification_scheduler = NotificationScheduler(self.db, job_manager=self.broadcast_jobs)
         self.backup_scheduler = BackupScheduler(self.db)
+        self.search_alias_analyzer = SearchAliasAnalyzer(self.db)
+        self.metrics_rollup = MetricsRollup(self.db)
+        self.partition_manager = PartitionManager(self.db)
+        self.leaderboard_refresher = LeaderboardRefresher(self.db)
+        self.dashboard_snapshots = get_dashboard_snapshot_service()
+        self.trending_counter = get_trending_counter()
         self.notification_manager = None  # Will be initialized later if needed
         self.application = None
         self.is_shutting_down = False
@@ -130,9 +146,22 @@ class CODMAttachmentsBot:
     async def post_init(self, application):
         """اجرا بعد از راه‌اندازی ربات"""
         logger.info("CODM Attachments Bot started successfully!")
+        # Start durable broadcast jobs (resumes unfinished jobs from their cursor)
+        # با BROADCAST_EXTERNAL_WORKER فقط job ثبت می‌شود و ارسال با پروسس worker است
+        application.bot_data['broadcast_jobs'] = self.broadcast_jobs
+        if BROADCAST_EXTERNAL_WORKER:
+            logger.info("Broadcast jobs are sent by external worker (main.py --broadcast-worker)")
+        else:
+            try:
+                await self.broadcast_jobs.start(application)
+                logger.info("Broadcast job manager started in post_init")
+            except Exception as e:
+                logger.error(f"Failed to start broadcast job manager: {e}")
         # Start notification scheduler
         try:
             await self.notification_scheduler.start(application)
+            # handlers با notify_changed() زمان‌بند را بعد از تغییر زمان‌بندی‌ها بیدار می‌کنند
+            application.bot_data['notification_scheduler'] = self.notification_scheduler
             logger.info("Notification scheduler started in post_init")
         except Exception as e:
             logger.error(f"Failed to start notification scheduler: {e}")
@@ -150,6 +179,54 @@ class CODMAttachmentsBot:
             logger.info("Cache cleanup task started in post_init")
         except Exception as e:
             logger.warning(f"Failed to start cache cleanup task: {e}")
+        # Start search analytics buffer (batched search_history writes)
+        try:
+            await get_search_analytics_buffer().start()
+            logger.info("Search analytics buffer started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start search analytics buffer: {e}")
+        # Start join funnel buffer (batched channel-join analytics)
+        try:
+            await get_join_funnel_buffer().start()
+            logger.info("Join funnel buffer started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start join funnel buffer: {e}")
+        # Start zero-result query analyzer (search alias proposals)
+        try:
+            await self.search_alias_analyzer.start(application)
+            logger.info("Search alias analyzer started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start search alias analyzer: {e}")
+        # Start attachment metrics rollup (analytics dashboards read the daily rollups)
+        try:
+            await self.metrics_rollup.start(application)
+            logger.info("Metrics rollup started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start metrics rollup: {e}")
+        # Start analytics partition maintenance (future partitions + retention)
+        try:
+            await self.partition_manager.start(application)
+            logger.info("Partition manager started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start partition manager: {e}")
+        # Start popularity leaderboard refresh (materialized view)
+        try:
+            await self.leaderboard_refresher.start(application)
+            logger.info("Leaderboard refresher started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start leaderboard refresher: {e}")
+        # Start analytics dashboard snapshots
+        try:
+            await self.dashboard_snapshots.start(application)
+            logger.info("Dashboard snapshot service started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start dashboard snapshot service: {e}")
+        # Start in-memory trending counter (hourly buckets + checkpoint)
+        try:
+            await self.trending_counter.start(application)
+            logger.info("Trending counter started in post_init")
+        except Exception as e:
+            logger.warning(f"Failed to start trending counter: {e}")
     
     async def cleanup(self):
         """
@@ -171,6 +248,14 @@ class CODMAttachmentsBot:
                 except Exception as e:
                     logger.warning(f"Failed to stop notification scheduler: {e}")
 
+            # 1.1. Stop broadcast jobs (interrupted job resumes on next start)
+            if hasattr(self, 'broadcast_jobs') and self.broadcast_jobs:
+                try:
+                    await self.broadcast_jobs.stop()
+                    logger.info("✅ Broadcast job manager stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop broadcast job manager: {e}")
+
             # 1.5. Stop backup scheduler
             if hasattr(self, 'backup_scheduler') and self.backup_scheduler:
                 try:
@@ -180,6 +265,54 @@ class CODMAttachmentsBot:
                 except Exception as e:
                     logger.warning(f"Failed to stop backup scheduler: {e}")
 
+            # 1.6. Stop search alias analyzer
+            if hasattr(self, 'search_alias_analyzer') and self.search_alias_analyzer:
+                try:
+                    await self.search_alias_analyzer.stop()
+                    logger.info("✅ Search alias analyzer stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop search alias analyzer: {e}")
+
+            # 1.7. Stop metrics rollup (watermark is committed per batch)
+            if hasattr(self, 'metrics_rollup') and self.metrics_rollup:
+                try:
+                    await self.metrics_rollup.stop()
+                    logger.info("✅ Metrics rollup stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop metrics rollup: {e}")
+
+            # 1.8. Stop partition manager
+            if hasattr(self, 'partition_manager') and self.partition_manager:
+                try:
+                    await self.partition_manager.stop()
+                    logger.info("✅ Partition manager stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop partition manager: {e}")
+
+            # 1.9. Stop leaderboard refresher
+            if hasattr(self, 'leaderboard_refresher') and self.leaderboard_refresher:
+                try:
+                    await self.leaderboard_refresher.stop()
+                    logger.info("✅ Leaderboard refresher stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop leaderboard refresher: {e}")
+
+            # 1.10. Stop dashboard snapshot service
+            if hasattr(self, 'dashboard_snapshots') and self.dashboard_snapshots:
+                try:
+                    await self.dashboard_snapshots.stop()
+                    logger.info("✅ Dashboard snapshot service stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop dashboard snapshot service: {e}")
+
+            # 1.11. Stop trending counter (final checkpoint before closing the pool)
+            if hasattr(self, 'trending_counter') and self.trending_counter:
+                try:
+                    await self.trending_counter.stop()
+                    logger.info("✅ Trending counter stopped")
+                except Exception as e:
+                    logger.warning(f"Failed to stop trending counter: {e}")
+
             # 2. Flush pending notifications
             if hasattr(self, 'notification_manager') and self.notification_manager:
                 try:
@@ -194,6 +327,20 @@ class CODMAttachmentsBot:
                 except Exception as e:
                     logger.error(f"❌ Error flushing notifications: {e}")
             
+            # 2.5. Flush buffered search analytics before closing the pool
+            try:
+                await get_search_analytics_buffer().stop()
+                logger.info("✅ Search analytics buffer flushed")
+            except Exception as e:
+                logger.error(f"❌ Error flushing search analytics: {e}")
+            
+            # 2.6. Flush buffered join funnel events before closing the pool
+            try:
+                await get_join_funnel_buffer().stop()
+                logger.info("✅ Join funnel buffer flushed")
+            except Exception as e:
+                logger.error(f"❌ Error flushing join funnel analytics: {e}")
+            
             # 3. Close database connections
             if hasattr(self, 'db') and self.db:
                 try:
@@ -254,9 +401,18 @@ class CODMAttachmentsBot:
         
         # ساخت Application
         from telegram.ext import ApplicationBuilder
+        from core.security.rate_limiter import OutboundDispatcher
+        from config.constants import OUTBOUND_GLOBAL_RATE_PER_SECOND, OUTBOUND_INTERACTIVE_RESERVE_PER_SECOND
+        # همه درخواست‌های خروجی (پاسخ‌ها، اعلان‌ها، broadcastها) از یک dispatcher اولویت‌دار عبور می‌کنند
+        # با worker خارجی، بقیه بودجه توکن (BROADCAST_EXTERNAL_RATE_PER_SECOND) سهم worker است
+        global_rate = (
+            OUTBOUND_INTERACTIVE_RESERVE_PER_SECOND if BROADCAST_EXTERNAL_WORKER
+            else OUTBOUND_GLOBAL_RATE_PER_SECOND
+        )
         self.application = (
             ApplicationBuilder()
             .token(BOT_TOKEN)
+            .rate_limiter(OutboundDispatcher(global_rate=global_rate))
             .post_init(self.post_init)
             .post_shutdown(self.post_shutdown)
             .build()
@@ -290,6 +446,11 @@ class CODMAttachmentsBot:
 
 def main():
     """تابع اصلی"""
+    if '--broadcast-worker' in sys.argv:
+        # پروسس جدا فقط برای ارسال broadcast jobها
+        from managers.broadcast_worker import run_broadcast_worker
+        run_broadcast_worker(BOT_TOKEN)
+        return
     try:
         bot = CODMAttachmentsBot()
         # Ensure an event loop exists
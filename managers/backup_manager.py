@@ -345,10 +345,15 @@ class BackupManager:
             logger.error(f"Error exporting data: {e}")
             return None
     
-    def export_to_csv(self, output_dir: str = None) -> Optional[str]:
-        """Export دیتا به فرمت CSV"""
+    def export_to_csv(self, output_dir: str = None, progress=None) -> Optional[str]:
+        """
+        Export دیتا به فرمت CSV (فایل‌های .csv.gz)
+
+        هر فایل با یک COPY ... TO STDOUT به صورت stream نوشته می‌شود تا
+        حافظه مستقل از تعداد اتچمنت‌ها ثابت بماند.
+        """
         try:
-            import csv
+            from utils.stream_export import copy_query_to_csv_gz
             
             if output_dir is None:
                 output_dir = os.path.join(self.backup_dir, f"csv_export_{self._get_timestamp()}")
@@ -356,41 +361,32 @@ class BackupManager:
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
             
-            # Export weapons
-            weapons_file = os.path.join(output_dir, "weapons.csv")
-            with open(weapons_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Category', 'Weapon', 'Mode', 'Attachment_Code', 'Attachment_Name', 'Is_Top', 'Is_Season_Top'])
-                
-                categories = ['assault_rifle', 'smg', 'lmg', 'sniper', 'marksman', 'shotgun', 'pistol', 'launcher']
-                for category in categories:
-                    weapons = self.db.get_weapons_in_category(category)
-                    for weapon in weapons:
-                        for mode in ['br', 'mp']:
-                            all_atts = self.db.get_all_attachments(category, weapon, mode)
-                            top_atts = self.db.get_top_attachments(category, weapon, mode)
-                            top_codes = {att['code'] for att in top_atts}
-                            
-                            for att in all_atts:
-                                writer.writerow([
-                                    category,
-                                    weapon,
-                                    mode,
-                                    att.get('code', ''),
-                                    att.get('name', ''),
-                                    att['code'] in top_codes,
-                                    att.get('season_top', False)
-                                ])
-            
-            # Export channels
-            channels_file = os.path.join(output_dir, "channels.csv")
-            with open(channels_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Channel_ID', 'Title', 'URL'])
-                
-                channels = self.db.get_required_channels()
-                for ch in channels:
-                    writer.writerow([ch.get('channel_id'), ch.get('title'), ch.get('url')])
+            exports = {
+                # Weapons + attachments
+                "weapons.csv.gz": """
+                    SELECT wc.name AS "Category", w.name AS "Weapon", a.mode AS "Mode",
+                           a.code AS "Attachment_Code", a.name AS "Attachment_Name",
+                           a.is_top AS "Is_Top", a.is_season_top AS "Is_Season_Top"
+                    FROM attachments a
+                    JOIN weapons w ON a.weapon_id = w.id
+                    JOIN weapon_categories wc ON w.category_id = wc.id
+                    ORDER BY wc.sort_order, wc.name, w.name, a.mode, a.order_index NULLS LAST, a.id
+                """,
+                # Channels
+                "channels.csv.gz": """
+                    SELECT channel_id AS "Channel_ID", title AS "Title", url AS "URL"
+                    FROM required_channels
+                    WHERE is_active = TRUE
+                    ORDER BY priority ASC, channel_id ASC
+                """,
+            }
+            with self.db.get_connection() as conn:
+                for filename, select_sql in exports.items():
+                    tmp_path, rows = copy_query_to_csv_gz(
+                        conn, select_sql, prefix=filename.split('.')[0], directory=output_dir, progress=progress
+                    )
+                    os.replace(tmp_path, os.path.join(output_dir, filename))
+                    logger.info(f"Exported {rows} rows to {filename}")
             
             logger.info(f"CSV export created in: {output_dir}")
             return output_dir
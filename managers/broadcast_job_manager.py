@@ -0,0 +1,346 @@
+"""
+Broadcast Job Manager
+Runs durable broadcasts persisted in broadcast_jobs / broadcast_deliveries.
+Recipients are paged by user_id (cursor), deliveries are written in batches,
+and unfinished jobs resume from their cursor after a restart.
+
+Jobs are claimed atomically, so the manager can run inside the bot process or
+in one or more dedicated worker processes (main.py --broadcast-worker). Up to
+BROADCAST_MAX_CONCURRENT_JOBS jobs run at the same time per manager, so one large
+broadcast does not hold up later ones; the shared OutboundDispatcher keeps them
+all within the global rate budget. While a
+job runs, a heartbeat task renews its lease every lease/3 seconds; if the lease
+is lost (another worker took the job over) sending stops immediately.
+"""
+import asyncio
+import os
+import socket
+from typing import Optional, List, Tuple, Dict
+
+from config.constants import (
+    BROADCAST_RATE_PER_SECOND,
+    BROADCAST_JOB_PAGE_SIZE,
+    BROADCAST_DELIVERY_FLUSH_SIZE,
+    BROADCAST_JOB_POLL_SECONDS,
+    BROADCAST_JOB_LEASE_SECONDS,
+    BROADCAST_MAX_CONCURRENT_JOBS,
+)
+from utils.logger import get_logger
+from utils.broadcast_optimizer import OptimizedBroadcaster
+from utils.subscribers_pg import SubscribersPostgres as Subscribers
+
+logger = get_logger('broadcast_jobs', 'broadcast.log')
+
+
+class _DeliveryRecorder:
+    """
+    بافر deliveries یک صفحه؛ هر BROADCAST_DELIVERY_FLUSH_SIZE نتیجه در یک insert
+    دسته‌ای (در executor) ثبت می‌شود تا در صورت قطع شدن، ارسال تکراری حداقل باشد.
+    """
+
+    def __init__(self, db, job_id: int, worker_id: str):
+        self.db = db
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._pending: List[Tuple[int, str]] = []
+        self._flushes: List[asyncio.Future] = []
+        self.skip_failed = False  # در پاس اول (با parse_mode) failedها ثبت نمی‌شوند
+        self.lease_lost = False
+
+    def add(self, user_id: int, status: str) -> None:
+        if status == 'failed' and self.skip_failed:
+            return
+        self._pending.append((user_id, status))
+        if len(self._pending) >= BROADCAST_DELIVERY_FLUSH_SIZE:
+            batch, self._pending = self._pending, []
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                None, self.db.record_broadcast_deliveries, self.job_id, batch, None, self.worker_id
+            )
+            future.add_done_callback(self._check_owner)
+            self._flushes.append(future)
+
+    def _check_owner(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is None and future.result() is None:
+            self.lease_lost = True
+
+    async def flush(self, cursor_user_id: Optional[int] = None) -> bool:
+        """
+        ثبت باقی‌مانده و جلو بردن cursor پس از اتمام flushهای در جریان
+
+        Returns:
+            False اگر lease این job از دست رفته است
+        """
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+            self._flushes = []
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None, self.db.record_broadcast_deliveries, self.job_id, batch, cursor_user_id, self.worker_id
+        )
+        if result is None:
+            self.lease_lost = True
+        return not self.lease_lost
+
+    def flush_sync(self) -> None:
+        """ثبت همزمان باقی‌مانده (هنگام توقف سرویس)"""
+        batch, self._pending = self._pending, []
+        if batch:
+            self.db.record_broadcast_deliveries(self.job_id, batch, None, self.worker_id)
+
+
+class BroadcastJobManager:
+    """
+    Picks up pending/running broadcast jobs and sends them page by page.
+    """
+
+    def __init__(self, db, subscribers: Optional[Subscribers] = None, worker_id: Optional[str] = None,
+                 poll_seconds: float = BROADCAST_JOB_POLL_SECONDS,
+                 rate_per_second: float = BROADCAST_RATE_PER_SECOND,
+                 max_concurrent_jobs: int = BROADCAST_MAX_CONCURRENT_JOBS):
+        self.db = db
+        self.subscribers = subscribers or Subscribers(db_adapter=db)
+        # شناسه پایدار worker تا بعد از ری‌استارت jobهای خودش را بلافاصله ادامه دهد
+        self.worker_id = worker_id or os.getenv('BROADCAST_WORKER_ID') or f"{socket.gethostname()}:bot"
+        self.poll_seconds = poll_seconds
+        self.rate_per_second = rate_per_second
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # job_id -> task در حال ارسال
+        self._jobs: Dict[int, asyncio.Task] = {}
+        self._bot = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def start(self, application=None, bot=None):
+        """
+        Start the job loop; unfinished jobs are resumed first. Safe to call multiple times.
+
+        Args:
+            application: PTB Application (bot process)
+            bot: ExtBot مستقل با OutboundDispatcher (worker process)
+        """
+        if self._running:
+            return
+        self._bot = bot or application.bot
+        self._running = True
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info(f"BroadcastJobManager started (worker_id={self.worker_id})")
+
+    async def stop(self):
+        """
+        Stop the job loop. Jobs interrupted here stay 'running' and resume on next start.
+        """
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        jobs = list(self._jobs.values())
+        for task in jobs:
+            task.cancel()
+        if jobs:
+            await asyncio.gather(*jobs, return_exceptions=True)
+        self._jobs.clear()
+        logger.info("BroadcastJobManager stopped")
+
+    def enqueue(
+        self,
+        message_type: str,
+        message_text: str = None,
+        photo_file_id: str = None,
+        parse_mode: str = 'Markdown',
+        source: str = 'admin',
+        created_by: int = None,
+        schedule_id: int = None,
+    ) -> Optional[int]:
+        """
+        ثبت job جدید و بیدار کردن حلقه؛ شناسه job برای polling وضعیت برگردانده می‌شود
+        (از داخل executor هم قابل فراخوانی است)
+        """
+        job_id = self.db.create_broadcast_job(
+            message_type,
+            message_text=message_text,
+            photo_file_id=photo_file_id,
+            parse_mode=parse_mode,
+            source=source,
+            created_by=created_by,
+            schedule_id=schedule_id,
+        )
+        if job_id and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return job_id
+
+    def get_status(self, job_id: int) -> Optional[Dict]:
+        """وضعیت فعلی job"""
+        return self.db.get_broadcast_job(job_id)
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                self._wake.clear()
+                job = None
+                if len(self._jobs) < self.max_concurrent_jobs:
+                    job = await loop.run_in_executor(
+                        None, self.db.claim_broadcast_job, self.worker_id,
+                        BROADCAST_JOB_LEASE_SECONDS, list(self._jobs)
+                    )
+                if job:
+                    self._start_job(job)
+                    continue
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Broadcast job loop error: {e}")
+                await asyncio.sleep(5)
+
+    def _start_job(self, job: Dict) -> None:
+        job_id = job['id']
+        task = asyncio.create_task(self._run_job(job))
+        self._jobs[job_id] = task
+        task.add_done_callback(lambda t: self._job_done(job_id, t))
+
+    def _job_done(self, job_id: int, task: asyncio.Task) -> None:
+        """آزاد کردن ظرفیت و بیدار کردن حلقه برای برداشتن job بعدی"""
+        self._jobs.pop(job_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Broadcast job {job_id} task error: {task.exception()}")
+        if self._running and self._wake is not None:
+            self._wake.set()
+
+    async def _run_job(self, job: Dict):
+        loop = asyncio.get_running_loop()
+        job_id = job['id']
+        cursor = int(job.get('cursor_user_id') or 0)
+        if cursor:
+            logger.info(f"Resuming broadcast job {job_id} from cursor {cursor}")
+        else:
+            logger.info(f"Starting broadcast job {job_id} ({job.get('total_recipients')} recipients)")
+
+        pages = asyncio.create_task(self._send_pages(job, cursor))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, pages))
+        try:
+            # wait (نه await) تا cancel شدن pages توسط heartbeat به این task نرسد
+            await asyncio.wait({pages})
+        except asyncio.CancelledError:
+            pages.cancel()
+            await asyncio.gather(pages, return_exceptions=True)
+            raise
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        if not pages.cancelled() and pages.exception() is not None:
+            error = pages.exception()
+            logger.error(f"Broadcast job {job_id} failed: {error}")
+            await loop.run_in_executor(
+                None, self.db.finish_broadcast_job, job_id, 'failed', str(error)[:500], self.worker_id
+            )
+            return
+        if pages.cancelled() or not pages.result():
+            logger.warning(f"Broadcast job {job_id}: lease lost, stopped sending (worker_id={self.worker_id})")
+            return
+
+        if self._running:
+            await loop.run_in_executor(
+                None, self.db.finish_broadcast_job, job_id, 'completed', None, self.worker_id
+            )
+
+    async def _send_pages(self, job: Dict, cursor: int) -> bool:
+        """
+        ارسال صفحه به صفحه از cursor
+
+        Returns:
+            False اگر lease این job در حین ارسال از دست رفت
+        """
+        loop = asyncio.get_running_loop()
+        while self._running:
+            page = await loop.run_in_executor(
+                None, self.db.get_broadcast_recipients_page, job['id'], cursor, BROADCAST_JOB_PAGE_SIZE
+            )
+            if not page:
+                break
+            if not await self._send_page(job, page):
+                return False
+            cursor = page[-1]
+        return True
+
+    async def _heartbeat(self, job_id: int, pages: asyncio.Task):
+        """تمدید lease هر lease/3 ثانیه؛ در صورت از دست رفتن lease ارسال متوقف می‌شود"""
+        loop = asyncio.get_running_loop()
+        interval = BROADCAST_JOB_LEASE_SECONDS / 3
+        while not pages.done():
+            await asyncio.sleep(interval)
+            try:
+                owned = await loop.run_in_executor(
+                    None, self.db.heartbeat_broadcast_job, job_id, self.worker_id
+                )
+            except Exception as e:
+                # خطای موقت دیتابیس: تلاش بعدی قبل از پایان lease
+                logger.warning(f"Broadcast job {job_id} heartbeat failed: {e}")
+                continue
+            if not owned:
+                pages.cancel()
+                return
+
+    async def _send_page(self, job: Dict, page: List[int]) -> bool:
+        """
+        ارسال یک صفحه؛ failedهای پاس اول بدون parse_mode دوباره ارسال می‌شوند
+
+        Returns:
+            False اگر lease این job از دست رفته است
+        """
+        recorder = _DeliveryRecorder(self.db, job['id'], self.worker_id)
+        parse_mode = job.get('parse_mode')
+        recorder.skip_failed = bool(parse_mode)
+        try:
+            stats = await self._broadcast(job, page, parse_mode, recorder)
+            failed_users = stats.get('failed_users') or []
+            if failed_users and parse_mode:
+                logger.info(f"Job {job['id']}: retrying without parse_mode for {len(failed_users)} users")
+                recorder.skip_failed = False
+                fallback = await self._broadcast(job, failed_users, None, recorder)
+                stats['blocked_users'] = (stats.get('blocked_users') or []) + (fallback.get('blocked_users') or [])
+            owned = await recorder.flush(cursor_user_id=page[-1])
+        except asyncio.CancelledError:
+            recorder.flush_sync()
+            raise
+
+        blocked = stats.get('blocked_users') or []
+        if blocked:
+            await asyncio.get_running_loop().run_in_executor(None, self.subscribers.remove_many, blocked)
+        return owned
+
+    async def _broadcast(self, job: Dict, user_ids: List[int], parse_mode, recorder) -> Dict:
+        broadcaster = OptimizedBroadcaster(rate_per_second=self.rate_per_second, on_result=recorder.add)
+        extra = {'parse_mode': parse_mode} if parse_mode else {}
+        if job.get('message_type') == 'photo' and job.get('photo_file_id'):
+            return await broadcaster.broadcast_to_users(
+                user_ids,
+                self._bot.send_photo,
+                photo=job['photo_file_id'],
+                caption=job.get('message_text') or None,
+                **extra,
+            )
+        return await broadcaster.broadcast_to_users(
+            user_ids,
+            self._bot.send_message,
+            text=job.get('message_text') or '',
+            **extra,
+        )
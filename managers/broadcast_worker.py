@@ -0,0 +1,79 @@
+"""
+Broadcast Worker
+Dedicated process that consumes broadcast_jobs (python main.py --broadcast-worker).
+
+The worker has its own event loop, its own small DB pool and its own Bot HTTP
+connection pool, so long broadcasts never compete with interactive updates in
+the bot process. Several workers may run at once; jobs are claimed atomically.
+
+Telegram's rate limit is per bot token and the bot process keeps sending
+interactive replies meanwhile. With BROADCAST_EXTERNAL_WORKER the bot's
+dispatcher is capped at OUTBOUND_INTERACTIVE_RESERVE_PER_SECOND and the worker
+defaults to the remainder, BROADCAST_EXTERNAL_RATE_PER_SECOND. With N workers,
+set BROADCAST_RATE_PER_SECOND per worker to about that remainder / N.
+"""
+import asyncio
+import os
+import signal
+import socket
+
+from config.constants import BROADCAST_WORKERS, BROADCAST_JOB_POLL_SECONDS, BROADCAST_EXTERNAL_RATE_PER_SECOND
+from utils.logger import get_logger
+
+logger = get_logger('broadcast_worker', 'broadcast.log')
+
+
+async def _run(token: str, worker_id: str):
+    from telegram.ext import ExtBot
+    from telegram.request import HTTPXRequest
+    from core.security.rate_limiter import OutboundDispatcher
+    from core.database.database_pg_proxy import DatabasePostgresProxy
+    from managers.broadcast_job_manager import BroadcastJobManager
+
+    # pool کوچک و مستقل؛ از DB_POOL_SIZE پروسس ربات سهم نمی‌گیرد
+    os.environ['DB_POOL_SIZE'] = os.getenv('BROADCAST_DB_POOL_SIZE', '4')
+    os.environ['DB_POOL_MAX_OVERFLOW'] = os.getenv('BROADCAST_DB_POOL_MAX_OVERFLOW', '2')
+    db = DatabasePostgresProxy(os.getenv('DATABASE_URL'))
+
+    request = HTTPXRequest(
+        connection_pool_size=BROADCAST_WORKERS + 2,
+        pool_timeout=10.0,
+        media_write_timeout=30.0,
+    )
+    rate = float(os.getenv('BROADCAST_RATE_PER_SECOND', BROADCAST_EXTERNAL_RATE_PER_SECOND))
+    if rate > BROADCAST_EXTERNAL_RATE_PER_SECOND:
+        logger.warning(
+            f"BROADCAST_RATE_PER_SECOND={rate} exceeds the worker budget "
+            f"({BROADCAST_EXTERNAL_RATE_PER_SECOND} msg/s); the token may hit RetryAfter"
+        )
+    # همان dispatcher پروسس ربات؛ بودجه سراسری این پروسس برابر سهم نرخ همین worker است
+    bot = ExtBot(token, request=request, rate_limiter=OutboundDispatcher(global_rate=rate))
+    manager = BroadcastJobManager(
+        db, worker_id=worker_id, poll_seconds=BROADCAST_JOB_POLL_SECONDS, rate_per_second=rate
+    )
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows
+            pass
+
+    try:
+        async with bot:
+            await manager.start(bot=bot)
+            logger.info(f"Broadcast worker {worker_id} running")
+            await stop_event.wait()
+    finally:
+        logger.info(f"Broadcast worker {worker_id} shutting down...")
+        await manager.stop()
+        db.close()
+        logger.info("✅ Broadcast worker stopped")
+
+
+def run_broadcast_worker(token: str) -> None:
+    """نقطه ورود پروسس worker (بلاک می‌شود تا SIGINT/SIGTERM)"""
+    worker_id = os.getenv('BROADCAST_WORKER_ID') or f"{socket.gethostname()}:worker:{os.getpid()}"
+    asyncio.run(_run(token, worker_id))
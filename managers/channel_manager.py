@@ -15,7 +15,7 @@ from config.config import DEFAULT_LANG, LANGUAGE_ONBOARDING
 logger = get_logger('channel', 'channel.log')
 import asyncio
 from datetime import datetime, timedelta
-from utils.analytics_pg import AnalyticsPostgres as Analytics
+from utils.join_funnel_buffer import get_join_funnel_buffer, JOIN_EVENT_ATTEMPT, JOIN_EVENT_SUCCESS
 from core.security.rate_limiter import rate_limiter, RateLimit
 
 
@@ -383,18 +383,17 @@ def require_channel_membership(func):
     return wrapper
 
 
-async def _track_join_success(user_id: int, channels: list):
+def _track_join_events(kind: str, user_id: int, channels: list):
     """
-    ثبت آمار عضویت موفق در background (async)
-    این تابع UI رو block نمی‌کنه
+    ثبت رویداد قیف عضویت برای هر کانال در صف analytics
+    فقط enqueue در حافظه است (بدون I/O)؛ نوشتن دسته‌ای در JoinFunnelBuffer انجام می‌شود
     """
     try:
-        analytics = Analytics()
+        buffer = get_join_funnel_buffer()
         for channel in channels:
-            analytics.track_join_success(user_id, channel['channel_id'])
-        logger.debug(f"Analytics: Tracked join success for user {user_id}")
+            buffer.enqueue(kind, user_id, channel['channel_id'])
     except Exception as e:
-        logger.error(f"[Analytics] Error in background tracking: {e}")
+        logger.error(f"[Analytics] Error queueing {kind} events: {e}")
 
 
 async def _send_main_menu(query, context: ContextTypes.DEFAULT_TYPE, db, user_id: int):
@@ -437,6 +436,7 @@ async def _send_main_menu(query, context: ContextTypes.DEFAULT_TYPE, db, user_id
     
     keyboard.extend([
         [kb("menu.buttons.season_list", lang), kb("menu.buttons.season_top", lang)],
+        [kb("menu.buttons.trending", lang)],
         [kb("menu.buttons.notify", lang), kb("menu.buttons.search", lang)],
         [kb("menu.buttons.contact", lang), kb("menu.buttons.help", lang)]
     ])
@@ -536,6 +536,10 @@ async def check_membership_callback(update, context: ContextTypes.DEFAULT_TYPE):
         else:
             raise
     
+    if not network_error:
+        # Analytics: هر بار زدن دکمه «عضو شدم» یک تلاش برای هر کانال فعال است
+        _track_join_events(JOIN_EVENT_ATTEMPT, user_id, all_channels)
+
     if network_error:
         # Connection error — localized message with retry action
         await query.message.edit_text(
@@ -549,9 +553,8 @@ async def check_membership_callback(update, context: ContextTypes.DEFAULT_TYPE):
         # ارسال منوی اصلی فوراً (بدون تاخیر - اولویت اول)
         await _send_main_menu(query, context, db, user_id)
         
-        # Analytics: ثبت عضویت موفق به صورت async در background
-        # این کار UI رو block نمی‌کنه
-        asyncio.create_task(_track_join_success(user_id, all_channels))
+        # Analytics: ثبت عضویت موفق (صف حافظه، UI را block نمی‌کند)
+        _track_join_events(JOIN_EVENT_SUCCESS, user_id, all_channels)
     else:
         # هنوز عضو نشده
         try:
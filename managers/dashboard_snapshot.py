@@ -0,0 +1,419 @@
+"""
+Analytics Dashboard Snapshots
+Background service that precomputes the attachments analytics dashboard
+screens (overview, user behavior, daily, weekly) into one compact JSON
+payload per view (analytics_dashboard_snapshots). Handlers render from the
+snapshot instead of running the aggregations inside the update handler.
+Trending is served by the in-memory counter (managers/trending_counter.py).
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from config.constants import DASHBOARD_SNAPSHOT_INTERVAL_SECONDS
+from core.database.hll_sketches import count_unique_users
+from core.database.sql_helpers import build_date_range_filter
+from utils.logger import get_logger
+
+logger = get_logger('dashboard_snapshot', 'analytics.log')
+
+# اتچمنت‌های تستی از هایلایت‌های overview حذف می‌شوند
+_EXCLUDE_TEST_ATTACHMENTS = """
+    AND a.name NOT LIKE '%%Test%%'
+    AND a.name NOT LIKE '%%test%%'
+    AND a.name NOT LIKE '%%تست%%'
+    AND a.code NOT LIKE 'CODE%%'
+    AND a.code NOT LIKE 'DUP%%'
+    AND COALESCE(w.name, '') NOT LIKE '%%Test%%'
+"""
+
+
+def _int(value) -> int:
+    return int(value or 0)
+
+
+def _float(value) -> float:
+    return float(value or 0)
+
+
+class DashboardSnapshotService:
+    """
+    Periodically recomputes dashboard snapshots; supports forced refresh.
+    """
+
+    def __init__(self, db=None, interval: float = DASHBOARD_SNAPSHOT_INTERVAL_SECONDS):
+        self.db = db
+        self.interval = interval
+        self._collectors: Dict[str, Callable] = {
+            'overview': self._collect_overview,
+            'user_behavior': self._collect_user_behavior,
+            'daily': self._collect_daily,
+            'weekly': self._collect_weekly,
+        }
+        self._cache: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._refresh_task: Optional[asyncio.Future] = None
+        self._running = False
+
+    @property
+    def views(self):
+        return tuple(self._collectors)
+
+    @property
+    def is_refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    # ========== Lifecycle ==========
+
+    async def start(self, application=None):
+        """
+        Start the snapshot loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        self._database()
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("DashboardSnapshotService started")
+
+    async def stop(self):
+        """
+        Stop the snapshot loop gracefully.
+        """
+        self._running = False
+        for task in (self._task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._refresh_task = None
+        logger.info("DashboardSnapshotService stopped")
+
+    async def _run_loop(self):
+        while self._running:
+            try:
+                await self.refresh()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Dashboard snapshot loop error: {e}")
+                await asyncio.sleep(60)
+
+    async def refresh(self) -> int:
+        """
+        محاسبه همه snapshotها در executor؛ درخواست‌های همزمان یک task مشترک دارند
+
+        Returns:
+            تعداد viewهای ذخیره شده
+        """
+        if not self.is_refreshing:
+            loop = asyncio.get_running_loop()
+            self._refresh_task = asyncio.ensure_future(loop.run_in_executor(None, self.run_once))
+        return await asyncio.shield(self._refresh_task)
+
+    # ========== Sync API ==========
+
+    def _database(self):
+        if self.db is None:
+            from core.database.database_adapter import get_database_adapter
+            self.db = get_database_adapter()
+        return self.db
+
+    def run_once(self) -> int:
+        """
+        یک دور محاسبه و ذخیره snapshot همه viewها
+
+        Returns:
+            تعداد viewهای ذخیره شده
+        """
+        snapshots = {}
+        for view in self._collectors:
+            payload = self.compute(view)
+            if payload is not None:
+                snapshots[view] = payload
+        if snapshots and self._database().save_dashboard_snapshots(snapshots):
+            computed_at = datetime.now(timezone.utc)
+            for view, payload in snapshots.items():
+                self._cache[view] = {'payload': payload, 'computed_at': computed_at}
+            logger.debug(f"Dashboard snapshots refreshed: {', '.join(snapshots)}")
+        return len(snapshots)
+
+    def compute(self, view: str) -> Optional[Dict]:
+        """محاسبه payload یک view (None در صورت خطا)"""
+        try:
+            with self._database().get_connection() as conn:
+                cursor = conn.cursor()
+                payload = self._collectors[view](cursor)
+                cursor.close()
+            return payload
+        except Exception as e:
+            logger.error(f"Error computing dashboard snapshot '{view}': {e}")
+            return None
+
+    def get(self, view: str) -> Optional[Dict]:
+        """
+        آخرین snapshot یک view
+
+        Returns:
+            {'payload': dict, 'computed_at': datetime} یا None
+        """
+        cached = self._cache.get(view)
+        if cached is None:
+            # snapshot ساخته شده توسط process دیگر یا قبل از restart
+            cached = self._database().get_dashboard_snapshot(view)
+            if cached:
+                self._cache[view] = cached
+        return cached
+
+    # ========== Collectors ==========
+
+    def _collect_overview(self, cursor) -> Dict:
+        stats = {
+            'total_views': 0,
+            'total_clicks': 0,
+            'total_shares': 0,
+            'unique_users': 0,
+            'engagement_rate': 0,
+            'top_performer': None,
+            'most_engaging': None,
+            'highest_rated': None
+        }
+        date_filter, date_params = build_date_range_filter('metric_date', 30)
+        cursor.execute(f"""
+            SELECT
+                COALESCE(SUM(views), 0) as views,
+                COALESCE(SUM(clicks), 0) as clicks,
+                COALESCE(SUM(shares), 0) as shares
+            FROM attachment_metrics_daily
+            WHERE {date_filter}
+        """, date_params)
+        result = cursor.fetchone()
+        if result:
+            stats['total_views'] = _int(result['views'])
+            stats['total_clicks'] = _int(result['clicks'])
+            stats['total_shares'] = _int(result['shares'])
+            stats['unique_users'] = count_unique_users(cursor, 30)
+            if stats['total_views'] > 0:
+                stats['engagement_rate'] = (float(stats['total_clicks']) / float(stats['total_views'])) * 100
+
+        # Top performer by views
+        cursor.execute(f"""
+            WITH v AS (
+                SELECT attachment_id, SUM(views) AS views
+                FROM attachment_metrics_daily
+                GROUP BY attachment_id
+            )
+            SELECT a.name, v.views
+            FROM v
+            JOIN attachments a ON a.id = v.attachment_id
+            LEFT JOIN weapons w ON a.weapon_id = w.id
+            WHERE v.views > 0
+            {_EXCLUDE_TEST_ATTACHMENTS}
+            ORDER BY v.views DESC
+            LIMIT 1
+        """)
+        top = cursor.fetchone()
+        if top:
+            stats['top_performer'] = {'name': top['name'], 'views': _int(top['views'])}
+
+        # Most engaging (best click rate)
+        cursor.execute(f"""
+            WITH agg AS (
+                SELECT attachment_id, SUM(views) AS v, SUM(clicks) AS c
+                FROM attachment_metrics_daily
+                GROUP BY attachment_id
+            )
+            SELECT a.name,
+                   (CAST(agg.c AS FLOAT) / NULLIF(agg.v, 0)) * 100 AS engagement_rate
+            FROM agg
+            JOIN attachments a ON a.id = agg.attachment_id
+            LEFT JOIN weapons w ON a.weapon_id = w.id
+            WHERE agg.v > 0 AND agg.c > 0
+            {_EXCLUDE_TEST_ATTACHMENTS}
+            ORDER BY engagement_rate DESC
+            LIMIT 1
+        """)
+        engaging = cursor.fetchone()
+        if engaging:
+            stats['most_engaging'] = {'name': engaging['name'], 'rate': _float(engaging['engagement_rate'])}
+
+        # Highest rated
+        cursor.execute(f"""
+            SELECT
+                a.name,
+                AVG(uae.rating) as avg_rating
+            FROM user_attachment_engagement uae
+            JOIN attachments a ON uae.attachment_id = a.id
+            LEFT JOIN weapons w ON a.weapon_id = w.id
+            WHERE uae.rating IS NOT NULL
+            {_EXCLUDE_TEST_ATTACHMENTS}
+            GROUP BY a.id, a.name
+            HAVING AVG(uae.rating) > 0
+            ORDER BY avg_rating DESC
+            LIMIT 1
+        """)
+        rated = cursor.fetchone()
+        if rated:
+            stats['highest_rated'] = {'name': rated['name'], 'rating': _float(rated['avg_rating'])}
+        return stats
+
+    def _collect_user_behavior(self, cursor) -> Dict:
+        date7, date7_params = build_date_range_filter('metric_date', 7)
+        cursor.execute(f"""
+            SELECT
+                COALESCE(SUM(views), 0) as views,
+                COALESCE(SUM(clicks), 0) as clicks
+            FROM attachment_metrics_daily
+            WHERE {date7}
+        """, date7_params)
+        s = cursor.fetchone() or {}
+        views = _int(s.get('views'))
+        clicks = _int(s.get('clicks'))
+
+        # کل زمان: merge همه sketchهای روزانه به جای COUNT(DISTINCT) روی کل جدول
+        total_users = count_unique_users(cursor)
+
+        # Per-user stats (7d): شمارش گروه‌ها و چند کاربر اول هر گروه در SQL؛
+        # فقط حداکثر ۵ ردیف برمی‌گردد، نه یک ردیف برای هر کاربر فعال
+        cursor.execute(f"""
+            WITH per_user AS (
+                SELECT
+                    user_id,
+                    SUM(views) as views,
+                    SUM(clicks) as clicks,
+                    COUNT(DISTINCT attachment_id) as atts,
+                    MAX(last_action_at) as last_active
+                FROM attachment_metrics_daily_users
+                WHERE {date7}
+                GROUP BY user_id
+            ), tiered AS (
+                SELECT *,
+                       CASE WHEN views >= 50 OR clicks >= 10 THEN 'very_active'
+                            WHEN views >= 10 OR clicks >= 3 THEN 'active'
+                            ELSE 'moderate' END as tier
+                FROM per_user
+            ), counts AS (
+                SELECT COUNT(*) as active_users,
+                       COUNT(*) FILTER (WHERE tier = 'moderate') as moderate_count
+                FROM tiered
+            ), ranked AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY tier ORDER BY views DESC, user_id) as rn
+                FROM tiered
+                WHERE tier <> 'moderate'
+            )
+            SELECT c.active_users, c.moderate_count,
+                   r.tier, r.user_id, r.views, r.clicks, r.atts, r.last_active
+            FROM counts c
+            LEFT JOIN ranked r
+                   ON (r.tier = 'very_active' AND r.rn <= 3) OR (r.tier = 'active' AND r.rn <= 2)
+            ORDER BY r.tier DESC, r.rn
+        """, date7_params)
+        rows = cursor.fetchall() or []
+        active_users = _int(rows[0]['active_users']) if rows else 0
+        moderate_count = _int(rows[0]['moderate_count']) if rows else 0
+
+        very_active, active = [], []
+        top_ids = []
+        for r in rows:
+            if r['user_id'] is None:
+                continue
+            v = _int(r['views'])
+            c = _int(r['clicks'])
+            data = {
+                'user_id': int(r['user_id']),
+                'views': v,
+                'clicks': c,
+                'atts': _int(r['atts']),
+                'eng': (float(c) / float(v) * 100) if v > 0 else 0.0,
+                'rating': None,
+                'last': str(r['last_active']) if r['last_active'] else None,
+            }
+            if r['tier'] == 'very_active':
+                very_active.append(data)
+                top_ids.append(data['user_id'])
+            else:
+                active.append(data)
+
+        if top_ids:
+            cursor.execute("""
+                SELECT user_id, AVG(rating) as rating
+                FROM user_attachment_engagement
+                WHERE rating IS NOT NULL AND user_id = ANY(%s)
+                GROUP BY user_id
+            """, (top_ids,))
+            ratings = {int(r['user_id']): float(r['rating']) for r in cursor.fetchall() or []}
+            for item in very_active:
+                item['rating'] = ratings.get(item['user_id'])
+
+        return {
+            'active_users': active_users,
+            'total_users': total_users,
+            'views': views,
+            'clicks': clicks,
+            'has_rows': active_users > 0,
+            'very_active': very_active,
+            'active': active,
+            'moderate_count': moderate_count,
+        }
+
+    def _collect_period(self, cursor, days: int) -> Dict:
+        """خلاصه و ۳ اتچمنت برتر برای days روز اخیر (0 = امروز)"""
+        date_filter, date_params = build_date_range_filter('metric_date', days)
+        cursor.execute(f"""
+            SELECT
+                COALESCE(SUM(views), 0) as views,
+                COALESCE(SUM(clicks), 0) as clicks
+            FROM attachment_metrics_daily
+            WHERE {date_filter}
+        """, date_params)
+        s = cursor.fetchone() or {}
+
+        d_filter, d_params = build_date_range_filter('d.metric_date', days)
+        cursor.execute(f"""
+            SELECT a.name, COALESCE(w.name,'Unknown') as weapon, SUM(d.views) as v
+            FROM attachment_metrics_daily d
+            JOIN attachments a ON d.attachment_id = a.id
+            LEFT JOIN weapons w ON a.weapon_id = w.id
+            WHERE {d_filter}
+            GROUP BY a.id, a.name, w.name
+            HAVING SUM(d.views) > 0
+            ORDER BY v DESC
+            LIMIT 3
+        """, d_params)
+        top = [
+            {'name': r['name'], 'weapon': r['weapon'], 'views': _int(r['v'])}
+            for r in cursor.fetchall() or []
+        ]
+        return {
+            'views': _int(s.get('views')),
+            'clicks': _int(s.get('clicks')),
+            'users': count_unique_users(cursor, days),
+            'top': top,
+        }
+
+    def _collect_daily(self, cursor) -> Dict:
+        return self._collect_period(cursor, 0)
+
+    def _collect_weekly(self, cursor) -> Dict:
+        return self._collect_period(cursor, 7)
+
+
+_instance: Optional[DashboardSnapshotService] = None
+
+
+def get_dashboard_snapshot_service() -> DashboardSnapshotService:
+    """دریافت singleton instance از DashboardSnapshotService"""
+    global _instance
+    if _instance is None:
+        _instance = DashboardSnapshotService()
+    return _instance
@@ -0,0 +1,69 @@
+"""
+Popularity Leaderboard Refresher
+Background job that refreshes the attachment_leaderboard materialized view
+(REFRESH ... CONCURRENTLY) so popular/suggested menus read precomputed stats
+instead of aggregating user_attachment_engagement on every call.
+"""
+import asyncio
+from typing import Optional
+
+from config.constants import LEADERBOARD_REFRESH_SECONDS
+from utils.logger import get_logger
+
+logger = get_logger('leaderboard_refresher', 'analytics.log')
+
+
+class LeaderboardRefresher:
+    """
+    Periodically refreshes the popularity leaderboard.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self, application=None):
+        """
+        Start the refresh loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("LeaderboardRefresher started")
+
+    async def stop(self):
+        """
+        Stop the refresh loop gracefully.
+        """
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("LeaderboardRefresher stopped")
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+                await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Leaderboard refresh loop error: {e}")
+                await asyncio.sleep(300)
+
+    def run_once(self) -> bool:
+        """
+        یک بار refresh همزمان leaderboard
+
+        Returns:
+            True در صورت موفقیت
+        """
+        return self.db.refresh_attachment_leaderboard()
@@ -0,0 +1,78 @@
+"""
+Attachment Metrics Rollup
+Background job that folds new attachment_metrics rows into the daily rollup
+tables (attachment_metrics_daily / attachment_metrics_daily_users) so analytics
+dashboards read a few rows per attachment-day instead of scanning raw events.
+"""
+import asyncio
+from typing import Optional
+
+from config.constants import (
+    METRICS_ROLLUP_INTERVAL_SECONDS,
+    METRICS_ROLLUP_BATCH_SIZE,
+    METRICS_ROLLUP_LAG_SECONDS,
+)
+from utils.logger import get_logger
+
+logger = get_logger('metrics_rollup', 'analytics.log')
+
+
+class MetricsRollup:
+    """
+    Periodically rolls up attachment_metrics since the last watermark.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self, application=None):
+        """
+        Start the rollup loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("MetricsRollup started")
+
+    async def stop(self):
+        """
+        Stop the rollup loop gracefully.
+        """
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("MetricsRollup stopped")
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+                await asyncio.sleep(METRICS_ROLLUP_INTERVAL_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Metrics rollup loop error: {e}")
+                await asyncio.sleep(300)
+
+    def run_once(self) -> int:
+        """
+        یک دور تجمیع: پردازش ردیف‌های جدید تا رسیدن به انتهای جدول
+
+        Returns:
+            تعداد ردیف‌های خام پردازش شده
+        """
+        processed = self.db.rollup_attachment_metrics(
+            batch_size=METRICS_ROLLUP_BATCH_SIZE, lag_seconds=METRICS_ROLLUP_LAG_SECONDS
+        )
+        if processed:
+            logger.info(f"Attachment metrics rollup: {processed} rows aggregated")
+        return processed
@@ -5,7 +5,7 @@
 import asyncio
 from utils.logger import get_logger, log_exception, log_execution
 logger = get_logger('notification', 'notification.log')
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from telegram.ext import ContextTypes
 from config.config import NOTIFICATION_SETTINGS, GAME_MODES, DEFAULT_LANG
@@ -15,6 +15,11 @@ from utils.i18n import t
 
 
 
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
 class NotificationManager:
     """مدیریت و ارسال نوتیفیکیشن‌ها با قابلیت ترکیب پیام‌ها"""
     
@@ -24,7 +29,8 @@ class NotificationManager:
         self.pending_notifications = {}  # ذخیره نوتیف‌های در انتظار
         self.batch_delay = 3  # تاخیر 3 ثانیه برای ترکیب پیام‌ها
         self._batch_tasks = {}  # ذخیره task های در حال اجرا
-        self.broadcaster = OptimizedBroadcaster(max_concurrent=30, delay_between_batches=1.0)
+        # هر ارسال broadcaster خودش را می‌سازد؛ batchهای همزمان آمار و blockedهای هم را بازنویسی نکنند
+        self.broadcaster_factory = OptimizedBroadcaster
     
     async def queue_notification(self, context: ContextTypes.DEFAULT_TYPE, 
                                  event_type: str, payload: dict):
@@ -94,47 +100,30 @@ class NotificationManager:
             base_info = group['base_info']
             events = group['events']
             
-            # دریافت لیست کاربران با تنظیمات فعال
-            active_users = await self._get_active_users_for_events(
-                [e['type'] for e in events],
-                base_info['mode']
-            )
-
-            logger.info(f"[NotifManager] Active users count: {len(active_users)}")
-
-            if active_users:
-                # گروه‌بندی کاربران بر اساس زبان برای ارسال پیام چندزبانه
-                from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-
-                lang_to_users: Dict[str, Set[int]] = {}
-                for user_id in active_users:
-                    user_lang = None
-                    try:
-                        user_lang = self.db.get_user_language(user_id)
-                    except Exception as e:
-                        logger.error(f"[NotifManager] Error getting language for user {user_id}: {e}")
-                    if not user_lang:
-                        user_lang = DEFAULT_LANG
-                    lang_to_users.setdefault(user_lang, set()).add(user_id)
-
-                # callback_data format: attm__{category}__{weapon}__{code}__{mode}
-                # استفاده از __ به عنوان separator برای جلوگیری از تداخل با underscore در مقادیر
-                callback_data = f"attm__{base_info['category']}__{base_info['weapon']}__{base_info['code']}__{base_info['mode']}"
-
-                for lang, users in lang_to_users.items():
-                    # ساخت پیام ترکیبی برای هر زبان
-                    message = await self._build_combined_message(base_info, events, lang=lang)
-                    logger.info(f"[NotifManager] Built message ({lang}): {message[:100] if message else 'None'}...")
+            # callback_data format: attm__{category}__{weapon}__{code}__{mode}
+            # استفاده از __ به عنوان separator برای جلوگیری از تداخل با underscore در مقادیر
+            callback_data = f"attm__{base_info['category']}__{base_info['weapon']}__{base_info['code']}__{base_info['mode']}"
+            event_types = [e['type'] for e in events]
 
-                    if not message:
-                        continue
+            # پیام هر زبان فقط یک بار و در اولین برخورد ساخته می‌شود
+            rendered: Dict[str, Optional[dict]] = {}
 
-                    button_text = t("notification.view_attachment", lang)
-                    keyboard = [[InlineKeyboardButton(button_text, callback_data=callback_data)]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
+            async def audience():
+                """کاربران فعال (زبان از همان query) به صورت (user_id, kwargs اختصاصی)"""
+                if self.subscribers is not None:
+                    rows = self.subscribers.stream(with_language=True, event_types=event_types, mode=base_info['mode'])
+                else:
+                    # بدون Subscribers: یک query برای کاربران + زبان‌ها
+                    users = self.db.get_users_for_notification(event_types, base_info['mode'])
+                    rows = _aiter({'user_id': uid, 'language': lang} for uid, lang in users.items())
+                async for row in rows:
+                    lang = row.get('language') or DEFAULT_LANG
+                    if lang not in rendered:
+                        rendered[lang] = await self._render_notification(base_info, events, lang, callback_data)
+                    if rendered[lang] is not None:
+                        yield (row['user_id'], rendered[lang])
 
-                    # ارسال پیام به کاربران این زبان
-                    await self._broadcast_to_users(context, message, users, reply_markup)
+            await self._broadcast_to_users(context, audience())
             
             # حذف از صف
             del self.pending_notifications[group_key]
@@ -147,6 +136,18 @@ class NotificationManager:
             logger.error(f"Error sending batch notification: {e}")
             log_exception(logger, e, "context")
     
+    async def _render_notification(self, base_info: dict, events: List[dict],
+                                   lang: str, callback_data: str) -> Optional[dict]:
+        """ساخت kwargs ارسال (متن + دکمه) برای یک زبان"""
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+        message = await self._build_combined_message(base_info, events, lang=lang)
+        logger.info(f"[NotifManager] Built message ({lang}): {message[:100] if message else 'None'}...")
+        if not message:
+            return None
+        keyboard = [[InlineKeyboardButton(t("notification.view_attachment", lang), callback_data=callback_data)]]
+        return {'text': message, 'reply_markup': InlineKeyboardMarkup(keyboard)}
+    
     async def _build_combined_message(self, base_info: dict,
                                      events: List[dict],
                                      lang: str = 'fa') -> Optional[str]:
@@ -261,93 +262,27 @@ class NotificationManager:
         
         return ''.join(message_parts)
     
-    async def _get_active_users_for_events(self, event_types: List[str], 
-                                          mode: str) -> Set[int]:
-        """دریافت کاربرانی که این رویدادها را فعال کرده‌اند (Optimized)"""
+    async def _broadcast_to_users(self, context: ContextTypes.DEFAULT_TYPE, audience):
+        """
+        ارسال پیام به stream کاربران با broadcaster بهینه شده
         
-        start_time = datetime.now()
+        Args:
+            audience: async iterable از (user_id, {'text', 'reply_markup'})
+        """
         
-        try:
-            # استفاده از متد بهینه دیتابیس اگر وجود داشته باشد
-            if hasattr(self.db, 'get_users_for_notification'):
-                active_users = self.db.get_users_for_notification(event_types, mode)
-                
-                duration = (datetime.now() - start_time).total_seconds()
-                logger.info(f"[NotifManager] SQL Filter: Found {len(active_users)} users in {duration:.3f}s")
-                return active_users
-            
-            # Fallback به روش قدیمی (کند) اگر متد جدید در دیتابیس نبود
-            logger.warning("[NotifManager] Optimized query not found, falling back to Python filtering")
-            return await self._get_active_users_for_events_legacy(event_types, mode)
-            
-        except Exception as e:
-            logger.error(f"Error in optimized user fetching: {e}")
-            log_exception(logger, e, "get_active_users_optimized")
-            return set()
-
-    async def _get_active_users_for_events_legacy(self, event_types: List[str], 
-                                          mode: str) -> Set[int]:
-        """روش قدیمی فیلترینگ (جهت پشتیبانی)"""
-        
-        # دریافت همه مشترکین
-        all_subscribers = self.subscribers.all()
-        
-        # فیلتر بر اساس تنظیمات کاربران
-        active_users = set()
-        
-        for user_id in all_subscribers:
-            try:
-                # دریافت تنظیمات کاربر از دیتابیس
-                user_prefs = self.db.get_user_notification_preferences(user_id)
-                
-                if not user_prefs:
-                    active_users.add(user_id)
-                    continue
-                
-                if not user_prefs.get('enabled', True):
-                    continue
-                
-                if mode not in user_prefs.get('modes', ['br', 'mp']):
-                    continue
-                
-                user_events = user_prefs.get('events', {})
-                
-                has_active_event = False
-                for event_type in event_types:
-                    if user_events.get(event_type, True):
-                        has_active_event = True
-                        active_users.add(user_id)
-                        break
-                
-                if has_active_event:
-                    pass
-                        
-            except Exception as e:
-                continue
-        
-        return active_users
-    
-    async def _broadcast_to_users(self, context: ContextTypes.DEFAULT_TYPE,
-                                 message: str, user_ids: Set[int], 
-                                 reply_markup=None):
-        """ارسال پیام به لیست کاربران با broadcaster بهینه شده"""
-        
-        # استفاده از OptimizedBroadcaster برای ارسال سریع و موازی
-        stats = await self.broadcaster.broadcast_to_users(
-            list(user_ids),
+        # استفاده از OptimizedBroadcaster برای ارسال سریع و موازی (مصرف stream)
+        broadcaster = self.broadcaster_factory()
+        stats = await broadcaster.broadcast_to_users(
+            audience,
             context.bot.send_message,
-            text=message,
-            parse_mode='Markdown',
-            reply_markup=reply_markup
+            parse_mode='Markdown'
         )
         
-        # حذف کاربران blocked از لیست subscribers
-        for user_id in stats['blocked_users']:
-            try:
-                self.subscribers.remove(user_id)
-                logger.info(f"Removed blocked user {user_id} from subscribers")
-            except Exception as e:
-                logger.warning(f"Failed to remove blocked user {user_id} from subscribers: {e}")
+        # حذف دسته‌ای کاربران blocked از لیست subscribers
+        if stats['blocked_users'] and self.subscribers is not None:
+            loop = asyncio.get_running_loop()
+            removed = await loop.run_in_executor(None, self.subscribers.remove_many, stats['blocked_users'])
+            logger.info(f"Removed {removed} blocked users from subscribers")
         
         logger.info(
             f"Notification broadcast completed: {stats['success']}/{stats['total']} successful "
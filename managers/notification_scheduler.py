@@ -1,11 +1,26 @@
 """
 Notification Scheduler
-Runs a background loop to send scheduled notifications at defined intervals.
+Event-driven scheduler for recurring scheduled notifications.
+
+Next-run times are kept in a min-heap loaded from the DB; the loop sleeps until
+the earliest item is due and is woken early by notify_changed() whenever a
+schedule is created, edited, toggled or deleted. Each due item is claimed with
+an atomic UPDATE that advances next_run_at, so several bot processes never
+send the same run twice.
+
+With a BroadcastJobManager (the bot wires one in main.py) a due item only
+creates a broadcast job; concurrency across items is then the job manager's
+BROADCAST_MAX_CONCURRENT_JOBS. Without one, items are sent directly, up to
+SCHEDULER_MAX_CONCURRENT_ITEMS at a time. Either way the shared
+OutboundDispatcher keeps all sends within the global rate budget.
 """
 import asyncio
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+import functools
+import heapq
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Set, Tuple
 
+from config.constants import SCHEDULER_RESYNC_SECONDS, SCHEDULER_MAX_CONCURRENT_ITEMS
 from utils.logger import get_logger
 from utils.broadcast_optimizer import OptimizedBroadcaster
 from utils.subscribers_pg import SubscribersPostgres as Subscribers
@@ -15,15 +30,24 @@ logger = get_logger('notif_scheduler', 'notification.log')
 
 class NotificationScheduler:
     """
-    Periodically checks DB for due scheduled notifications and broadcasts them.
+    Sleeps until the next scheduled notification is due and broadcasts it.
     """
 
-    def __init__(self, db, subscribers: Optional[Subscribers] = None):
+    def __init__(self, db, subscribers: Optional[Subscribers] = None, job_manager=None):
         self.db = db
         self.subscribers = subscribers or Subscribers()
+        # BroadcastJobManager (اختیاری): ارسال‌ها به صورت job پایدار ثبت می‌شوند
+        self.job_manager = job_manager
         self._task: Optional[asyncio.Task] = None
         self._running = False
-        self._broadcaster = OptimizedBroadcaster(max_concurrent=30, delay_between_batches=1.0)
+        self._heap: List[Tuple[datetime, int]] = []
+        # نسخه معتبر زمان اجرای هر id؛ ورودی‌های heap که با آن نخوانند کهنه‌اند
+        self._next_run: Dict[int, datetime] = {}
+        self._inflight: Set[int] = set()
+        self._item_tasks: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._reload_requested = True
+        self._slots: Optional[asyncio.Semaphore] = None
 
     async def start(self, application):
         """
@@ -32,6 +56,9 @@ class NotificationScheduler:
         if self._running:
             return
         self._running = True
+        self._wake = asyncio.Event()
+        self._slots = asyncio.Semaphore(SCHEDULER_MAX_CONCURRENT_ITEMS)
+        self._reload_requested = True
         # Pass application to task for bot access
         self._task = asyncio.create_task(self._run_loop(application))
         logger.info("NotificationScheduler started")
@@ -41,37 +68,89 @@ class NotificationScheduler:
         Stop the scheduler loop gracefully.
         """
         self._running = False
-        if self._task and not self._task.done():
-            self._task.cancel()
+        tasks = [t for t in ([self._task] + list(self._item_tasks)) if t and not t.done()]
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
             try:
-                await self._task
+                await t
             except asyncio.CancelledError:
                 pass
         self._task = None
+        self._item_tasks.clear()
         logger.info("NotificationScheduler stopped")
 
+    def notify_changed(self) -> None:
+        """
+        اطلاع از ایجاد/ویرایش/حذف یک زمان‌بندی؛ heap در اولین فرصت از DB بازخوانی می‌شود
+        """
+        self._reload_requested = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def _reload(self) -> None:
+        rows = self.db.get_scheduled_notification_run_times() or []
+        self._next_run = {int(r['id']): r['next_run_at'] for r in rows}
+        self._heap = [(run_at, sid) for sid, run_at in self._next_run.items()]
+        heapq.heapify(self._heap)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        while self._heap:
+            run_at, sid = self._heap[0]
+            if self._next_run.get(sid) != run_at:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, (run_at - now).total_seconds())
+        return float(SCHEDULER_RESYNC_SECONDS)
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, sid = heapq.heappop(self._heap)
+            if self._next_run.get(sid) == run_at:
+                del self._next_run[sid]
+                due.append(sid)
+        return due
+
+    def _push(self, sid: int, run_at: Optional[datetime]) -> None:
+        if run_at is None:
+            self._next_run.pop(sid, None)
+            return
+        self._next_run[sid] = run_at
+        heapq.heappush(self._heap, (run_at, sid))
+
     async def _run_loop(self, application):
-        """Main loop: check due schedules every 60 seconds."""
-        # Use UTC for consistency with PostgreSQL TIMESTAMPTZ
-        check_interval_seconds = 60
+        """Main loop: sleep until the earliest next_run_at (or a change / periodic resync)."""
+        loop = asyncio.get_running_loop()
+        last_sync = 0.0
         while self._running:
             try:
+                self._wake.clear()
+                # resync دوره‌ای تغییرات پروسس‌های دیگر را هم پوشش می‌دهد
+                if self._reload_requested or loop.time() - last_sync >= SCHEDULER_RESYNC_SECONDS:
+                    self._reload_requested = False
+                    await loop.run_in_executor(None, self._reload)
+                    last_sync = loop.time()
+
+                # Use UTC for consistency with PostgreSQL TIMESTAMPTZ
                 now = datetime.now(timezone.utc)
-                # Fetch due schedules
-                due_items = self.db.get_due_scheduled_notifications(now)
-                if due_items:
-                    logger.info(f"Found {len(due_items)} due scheduled notifications")
-                for item in due_items:
+                for sid in self._pop_due(now):
+                    if sid in self._inflight:
+                        continue
+                    self._inflight.add(sid)
+                    task = asyncio.create_task(self._run_item(application, sid))
+                    self._item_tasks.add(task)
+                    task.add_done_callback(self._item_tasks.discard)
+
+                timeout = min(
+                    self._seconds_until_next(datetime.now(timezone.utc)),
+                    max(0.0, SCHEDULER_RESYNC_SECONDS - (loop.time() - last_sync)),
+                )
+                if timeout > 0:
                     try:
-                        await self._send_item(application, item)
-                        # Compute next run
-                        interval_hours = int(item.get('interval_hours') or 0)
-                        next_run_at = now + timedelta(hours=interval_hours)
-                        self.db.mark_schedule_sent(item['id'], now, next_run_at)
-                    except Exception as e:
-                        logger.error(f"Error sending scheduled notification id={item.get('id')}: {e}")
-                # Sleep
-                await asyncio.sleep(check_interval_seconds)
+                        await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
             except asyncio.CancelledError:
                 break
             except Exception as loop_err:
@@ -79,6 +158,30 @@ class NotificationScheduler:
                 # Backoff a bit to avoid tight error loop
                 await asyncio.sleep(5)
 
+    async def _run_item(self, application, schedule_id: int):
+        """claim اتمیک یک اجرا و ارسال آن (در صورتی که پروسس دیگری زودتر claim نکرده باشد)"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._slots:
+                now = datetime.now(timezone.utc)
+                item = await loop.run_in_executor(
+                    None, self.db.claim_scheduled_notification, schedule_id, now
+                )
+                if not item:
+                    # غیرفعال/حذف شده یا توسط پروسس دیگر ارسال شده؛ زمان فعلی از DB خوانده می‌شود
+                    self.notify_changed()
+                    return
+                # next_run_at پیش از ارسال جلو رفته است؛ اجرای بعدی بلافاصله در heap قرار می‌گیرد
+                self._push(schedule_id, item.get('next_run_at'))
+                self._wake.set()
+                await self._send_item(application, item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending scheduled notification id={schedule_id}: {e}")
+        finally:
+            self._inflight.discard(schedule_id)
+
     async def _send_item(self, application, item: dict):
         """
         Broadcast one scheduled item to all subscribers using OptimizedBroadcaster.
@@ -88,13 +191,32 @@ class NotificationScheduler:
         photo_id = item.get('photo_file_id')
         parse_mode = item.get('parse_mode') or 'Markdown'
 
-        user_ids = self.subscribers.all()
-        if not user_ids:
-            logger.info("No subscribers to send scheduled notification")
+        if self.job_manager is not None:
+            # INSERT همزمان است؛ مثل claim در executor اجرا می‌شود
+            job_id = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    self.job_manager.enqueue,
+                    message_type,
+                    message_text=text,
+                    photo_file_id=photo_id,
+                    parse_mode=parse_mode,
+                    source='scheduled',
+                    schedule_id=item.get('id'),
+                ),
+            )
+            if not job_id:
+                raise RuntimeError("Failed to create broadcast job")
+            logger.info(f"Scheduled notification id={item.get('id')} queued as broadcast job {job_id}")
             return
 
+        # stream مشترکین؛ ارسال قبل از پایان خواندن لیست شروع می‌شود
+        user_ids = self.subscribers.stream_ids()
+        # هر آیتم broadcaster خودش را دارد چون آیتم‌ها همزمان اجرا می‌شوند
+        broadcaster = OptimizedBroadcaster()
+
         if message_type == 'photo' and photo_id:
-            stats = await self._broadcaster.broadcast_to_users(
+            stats = await broadcaster.broadcast_to_users(
                 user_ids,
                 application.bot.send_photo,
                 photo=photo_id,
@@ -102,7 +224,7 @@ class NotificationScheduler:
                 parse_mode=parse_mode,
             )
         else:
-            stats = await self._broadcaster.broadcast_to_users(
+            stats = await broadcaster.broadcast_to_users(
                 user_ids,
                 application.bot.send_message,
                 text=text,
@@ -115,14 +237,14 @@ class NotificationScheduler:
             logger.info(f"Retrying without parse_mode for {len(failed_users)} users (scheduled)")
             try:
                 if message_type == 'photo' and photo_id:
-                    fallback_stats = await self._broadcaster.broadcast_to_users(
+                    fallback_stats = await broadcaster.broadcast_to_users(
                         failed_users,
                         application.bot.send_photo,
                         photo=photo_id,
                         caption=text or None,
                     )
                 else:
-                    fallback_stats = await self._broadcaster.broadcast_to_users(
+                    fallback_stats = await broadcaster.broadcast_to_users(
                         failed_users,
                         application.bot.send_message,
                         text=text,
@@ -136,12 +258,10 @@ class NotificationScheduler:
             except Exception as e:
                 logger.warning(f"Fallback send failed: {e}")
 
-        # Remove blocked users
-        for uid in stats.get('blocked_users', []) or []:
-            try:
-                self.subscribers.remove(uid)
-            except Exception:
-                pass
+        # Remove blocked users (one bulk UPDATE per chunk)
+        blocked = stats.get('blocked_users') or []
+        if blocked:
+            await asyncio.get_running_loop().run_in_executor(None, self.subscribers.remove_many, blocked)
         logger.info(
             f"Scheduled broadcast completed: {stats.get('success')}/{stats.get('total')} in {stats.get('duration_seconds')}s"
         )
@@ -0,0 +1,94 @@
+"""
+Analytics Partition Manager
+Background job for the monthly partitions of attachment_metrics and
+search_history: keeps future partitions ready and detaches (optionally
+exporting to .csv.gz first, then dropping) partitions past retention.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from config.config import (
+    METRICS_RETENTION_MONTHS,
+    SEARCH_HISTORY_RETENTION_MONTHS,
+    ANALYTICS_ARCHIVE_DIR,
+    ANALYTICS_DROP_EXPIRED,
+)
+from config.constants import PARTITION_PREMAKE_MONTHS, PARTITION_MAINTENANCE_HOURS
+from utils.logger import get_logger
+
+logger = get_logger('partition_manager', 'database.log')
+
+RETENTION_MONTHS = {
+    'attachment_metrics': METRICS_RETENTION_MONTHS,
+    'search_history': SEARCH_HISTORY_RETENTION_MONTHS,
+}
+
+
+class PartitionManager:
+    """
+    Periodically maintains monthly analytics partitions.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self, application=None):
+        """
+        Start the maintenance loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("PartitionManager started")
+
+    async def stop(self):
+        """
+        Stop the maintenance loop gracefully.
+        """
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("PartitionManager stopped")
+
+    async def _run_loop(self):
+        interval_seconds = PARTITION_MAINTENANCE_HOURS * 3600
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+                await asyncio.sleep(interval_seconds)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Partition maintenance loop error: {e}")
+                await asyncio.sleep(300)
+
+    def run_once(self) -> Dict[str, List[str]]:
+        """
+        یک دور نگهداری: ساخت پارتیشن‌های آینده و جدا کردن پارتیشن‌های منقضی
+
+        Returns:
+            {table: [partitions expired]}
+        """
+        created = self.db.ensure_analytics_partitions(PARTITION_PREMAKE_MONTHS)
+        for table, names in created.items():
+            if names:
+                logger.info(f"Created partitions for {table}: {', '.join(names)}")
+
+        expired: Dict[str, List[str]] = {}
+        for table, retention in RETENTION_MONTHS.items():
+            expired[table] = self.db.expire_analytics_partitions(
+                table,
+                retention,
+                archive_dir=ANALYTICS_ARCHIVE_DIR or None,
+                drop=ANALYTICS_DROP_EXPIRED,
+            )
+        return expired
@@ -0,0 +1,141 @@
+"""
+Search Alias Analyzer
+Background job that clusters frequent zero-result queries from search_history,
+fuzzy-maps them to existing weapons/attachments and stores alias proposals
+for admin approval (search_aliases).
+"""
+import asyncio
+from typing import Optional, List, Dict
+
+from fuzzywuzzy import fuzz, process
+
+from config.constants import (
+    SEARCH_ALIAS_ANALYZE_HOURS,
+    SEARCH_ALIAS_LOOKBACK_DAYS,
+    SEARCH_ALIAS_MIN_COUNT,
+    SEARCH_ALIAS_MIN_SCORE,
+)
+from utils.logger import get_logger
+
+logger = get_logger('search_alias', 'analytics.log')
+
+# حداقل شباهت دو کوئری برای قرار گرفتن در یک خوشه
+CLUSTER_SIMILARITY = 85
+
+
+def _normalize(text: str) -> str:
+    """حذف فاصله/علائم برای مقایسه (مشابه search_attachments_like)"""
+    return ''.join(c for c in (text or '').lower() if c.isalnum())
+
+
+def cluster_queries(rows: List[Dict]) -> List[Dict]:
+    """
+    خوشه‌بندی حریصانه کوئری‌ها بر اساس شباهت متنی
+
+    Args:
+        rows: لیست {'query', 'count'} مرتب شده نزولی بر اساس count
+
+    Returns:
+        لیست خوشه‌ها: {'key', 'members': [{'query', 'count'}], 'total'}
+    """
+    clusters: List[Dict] = []
+    for row in rows:
+        key = _normalize(row['query'])
+        if not key:
+            continue
+        for cluster in clusters:
+            if key == cluster['key'] or fuzz.ratio(key, cluster['key']) >= CLUSTER_SIMILARITY:
+                cluster['members'].append(row)
+                cluster['total'] += int(row['count'])
+                break
+        else:
+            clusters.append({'key': key, 'members': [row], 'total': int(row['count'])})
+    return clusters
+
+
+class SearchAliasAnalyzer:
+    """
+    Periodically proposes search aliases for frequent zero-result queries.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self, application=None):
+        """
+        Start the analyzer loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("SearchAliasAnalyzer started")
+
+    async def stop(self):
+        """
+        Stop the analyzer loop gracefully.
+        """
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("SearchAliasAnalyzer stopped")
+
+    async def _run_loop(self):
+        interval_seconds = SEARCH_ALIAS_ANALYZE_HOURS * 3600
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+                await asyncio.sleep(interval_seconds)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Search alias analyzer loop error: {e}")
+                await asyncio.sleep(300)
+
+    def run_once(self) -> int:
+        """
+        یک دور تحلیل: خوشه‌بندی، تطبیق fuzzy و ثبت پیشنهادها
+
+        Returns:
+            تعداد پیشنهادهای ثبت شده
+        """
+        rows = self.db.get_zero_result_queries(
+            days=SEARCH_ALIAS_LOOKBACK_DAYS, min_count=SEARCH_ALIAS_MIN_COUNT
+        )
+        if not rows:
+            return 0
+        targets = self.db.get_search_alias_targets()
+        if not targets:
+            return 0
+        choices = {i: _normalize(t['text']) for i, t in enumerate(targets) if _normalize(t['text'])}
+
+        proposals = []
+        for cluster in cluster_queries(rows):
+            match = process.extractOne(cluster['key'], choices, scorer=fuzz.WRatio)
+            if not match:
+                continue
+            _text, score, idx = match
+            if score < SEARCH_ALIAS_MIN_SCORE:
+                continue
+            target = targets[idx]
+            for member in cluster['members']:
+                proposals.append({
+                    'alias': member['query'],
+                    'target_type': target['target_type'],
+                    'target_id': target['target_id'],
+                    'target_label': target['label'],
+                    'confidence': round(score / 100.0, 3),
+                    'zero_result_count': int(member['count']),
+                })
+
+        saved = self.db.save_search_alias_proposals(proposals)
+        logger.info(f"Search alias analysis: {len(rows)} zero-result queries, {saved} proposals saved")
+        return saved
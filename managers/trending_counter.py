@@ -0,0 +1,314 @@
+"""
+Trending Counter
+In-memory sliding-window view counter per attachment, bucketed per hour.
+Views are recorded from the engagement stream: while the counter runs it is
+registered as an attachment-view listener on the database (track_attachment_view),
+so other processes (scripts, broadcast workers) never accumulate buckets. The
+top-K trending list (growth of the recent window over the previous one) is
+recomputed periodically with a heap, and buckets are checkpointed to
+attachment_trending_buckets so a restart does not lose the window.
+
+Both windows are fed only by this stream. Until it covers the previous window
+completely (two windows after tracking first started) is_warming_up is True and
+the list ranks attachments by recent-window views instead ("most viewed",
+growth_rate None); growth ranking starts at ready_at.
+
+Readers (admin trending view, user "trending now" menu) call top() and never
+touch the database.
+"""
+import asyncio
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.constants import (
+    TRENDING_WINDOW_HOURS,
+    TRENDING_TOP_K,
+    TRENDING_MIN_VIEWS,
+    TRENDING_REFRESH_SECONDS,
+    TRENDING_CHECKPOINT_SECONDS,
+)
+from utils.logger import get_logger
+
+logger = get_logger('trending_counter', 'analytics.log')
+
+
+def _current_hour() -> int:
+    """شماره ساعت (epoch hours, UTC)"""
+    return int(time.time() // 3600)
+
+
+def hour_to_datetime(hour: int) -> datetime:
+    return datetime.fromtimestamp(hour * 3600, tz=timezone.utc)
+
+
+def datetime_to_hour(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() // 3600)
+
+
+def growth_rate(recent: int, previous: int) -> float:
+    """همان تعریف رشد داشبورد: بدون هفته قبل و با بازدید = ۱۰۰٪"""
+    if previous == 0:
+        return 100.0 if recent > 0 else 0.0
+    return (recent - previous) / previous * 100
+
+
+class TrendingCounter:
+    """
+    Hourly buckets per attachment over two windows (recent + previous).
+    record() is thread-safe and does no I/O.
+    """
+
+    def __init__(self, db=None, window_hours: int = TRENDING_WINDOW_HOURS,
+                 top_k: int = TRENDING_TOP_K):
+        self.db = db
+        self.window_hours = window_hours
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        # attachment_id -> {hour: views}
+        self._buckets: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self._dirty: Set[Tuple[int, int]] = set()
+        # اطلاعات نمایشی اتچمنت‌ها (نام، سلاح، ...)؛ None = حذف/تستی
+        self._meta: Dict[int, Optional[Dict]] = {}
+        self._top: List[Dict] = []
+        # True وقتی لیست فعلی بر اساس بازدید پنجره اخیر است (دوره warm-up)
+        self._most_viewed = False
+        self._updated_at: Optional[datetime] = None
+        self._loaded = False
+        # اولین ساعت ثبت بازدید (epoch hours)؛ از metrics_rollup_state
+        self._tracking_since: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    @property
+    def is_ready(self) -> bool:
+        return self._updated_at is not None
+
+    @property
+    def updated_at(self) -> Optional[datetime]:
+        return self._updated_at
+
+    @property
+    def ready_at(self) -> Optional[datetime]:
+        """زمانی که پنجره قبلی کامل از بازدیدهای ثبت شده پر می‌شود"""
+        if self._tracking_since is None:
+            return None
+        return hour_to_datetime(self._tracking_since + 2 * self.window_hours)
+
+    @property
+    def is_most_viewed(self) -> bool:
+        """لیست فعلی «پربازدیدترین‌ها» است نه رشد (تا ready_at)"""
+        return self._most_viewed
+
+    @property
+    def is_warming_up(self) -> bool:
+        return self._tracking_since is None or _current_hour() < self._tracking_since + 2 * self.window_hours
+
+    # ========== Ingestion ==========
+
+    def record(self, attachment_id: int, views: int = 1) -> None:
+        """ثبت بازدید در bucket ساعت جاری"""
+        hour = _current_hour()
+        with self._lock:
+            buckets = self._buckets[attachment_id]
+            buckets[hour] = buckets.get(hour, 0) + views
+            self._dirty.add((attachment_id, hour))
+
+    def top(self, limit: Optional[int] = None) -> List[Dict]:
+        """آخرین لیست ترندینگ محاسبه شده (بدون SQL)"""
+        items = self._top
+        return list(items[:limit] if limit else items)
+
+    # ========== Lifecycle ==========
+
+    async def start(self, application=None):
+        """
+        Start the refresh/checkpoint loop. Safe to call multiple times.
+        """
+        if self._running:
+            return
+        if self.db is None:
+            from core.database.database_adapter import get_database_adapter
+            self.db = get_database_adapter()
+        self.db.add_attachment_view_listener(self.record)
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("TrendingCounter started")
+
+    async def stop(self):
+        """
+        Stop the loop and write a final checkpoint.
+        """
+        self._running = False
+        if self.db is not None:
+            self.db.remove_attachment_view_listener(self.record)
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._loaded:
+            loop = asyncio.get_running_loop()
+            written = await loop.run_in_executor(None, self.checkpoint)
+            logger.info(f"Final trending checkpoint: {written} buckets")
+        logger.info("TrendingCounter stopped")
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        last_checkpoint = time.monotonic()
+        while self._running:
+            try:
+                if not self._loaded:
+                    await loop.run_in_executor(None, self.load)
+                await loop.run_in_executor(None, self.refresh_top)
+                # قبل از load نوشتن مقادیر ناقص checkpoint قبلی را بازنویسی می‌کرد
+                if self._loaded and time.monotonic() - last_checkpoint >= TRENDING_CHECKPOINT_SECONDS:
+                    await loop.run_in_executor(None, self.checkpoint)
+                    last_checkpoint = time.monotonic()
+                await asyncio.sleep(TRENDING_REFRESH_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Trending counter loop error: {e}")
+                await asyncio.sleep(60)
+
+    # ========== Persistence ==========
+
+    def _oldest_hour(self) -> int:
+        """اولین ساعت پنجره قبلی؛ bucketهای قدیمی‌تر لازم نیستند"""
+        return _current_hour() - 2 * self.window_hours + 1
+
+    def load(self) -> int:
+        """
+        بارگذاری bucketها از آخرین checkpoint (و ادغام با بازدیدهای ثبت شده از زمان شروع)
+
+        Returns:
+            تعداد bucketهای بارگذاری شده؛ در صورت خطا دور بعد دوباره تلاش می‌شود
+        """
+        since = self.db.start_trending_tracking(_current_hour())
+        rows = self.db.load_trending_buckets(hour_to_datetime(self._oldest_hour()))
+        if rows is None or since is None:
+            return 0
+        with self._lock:
+            self._tracking_since = since
+            for row in rows:
+                buckets = self._buckets[row['attachment_id']]
+                hour = datetime_to_hour(row['bucket_hour'])
+                buckets[hour] = buckets.get(hour, 0) + int(row['views'] or 0)
+            self._loaded = True
+        logger.info(f"Trending counter loaded {len(rows)} buckets")
+        return len(rows)
+
+    def checkpoint(self) -> int:
+        """
+        نوشتن bucketهای تغییر کرده و حذف bucketهای خارج از پنجره
+
+        Returns:
+            تعداد bucketهای نوشته شده
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                (att_id, hour_to_datetime(hour), self._buckets.get(att_id, {}).get(hour, 0))
+                for att_id, hour in dirty
+            ]
+        if not self.db.save_trending_buckets(rows, hour_to_datetime(self._oldest_hour())):
+            # bucketها در checkpoint بعدی دوباره نوشته می‌شوند
+            with self._lock:
+                self._dirty |= dirty
+            return 0
+        # اطلاعات نمایشی هر checkpoint دوباره خوانده می‌شود (تغییر نام/حذف)
+        self._meta = {}
+        if rows:
+            logger.debug(f"Trending checkpoint: {len(rows)} buckets")
+        return len(rows)
+
+    # ========== Top-K ==========
+
+    def _window_totals(self) -> Dict[int, Tuple[int, int]]:
+        """جمع پنجره اخیر و قبلی هر اتچمنت؛ bucketهای قدیمی حذف می‌شوند"""
+        recent_from = _current_hour() - self.window_hours + 1
+        oldest = recent_from - self.window_hours
+        totals = {}
+        with self._lock:
+            for att_id in list(self._buckets):
+                buckets = self._buckets[att_id]
+                recent = previous = 0
+                for hour in list(buckets):
+                    if hour < oldest:
+                        del buckets[hour]
+                    elif hour >= recent_from:
+                        recent += buckets[hour]
+                    else:
+                        previous += buckets[hour]
+                if not buckets:
+                    del self._buckets[att_id]
+                elif recent > 0:
+                    totals[att_id] = (recent, previous)
+        return totals
+
+    def _load_metadata(self, ids: List[int]) -> None:
+        missing = [i for i in ids if i not in self._meta]
+        if not missing:
+            return
+        found = {row['id']: dict(row) for row in self.db.get_trending_metadata(missing)}
+        for att_id in missing:
+            self._meta[att_id] = found.get(att_id)
+
+    def refresh_top(self) -> List[Dict]:
+        """
+        محاسبه مجدد لیست top-K (heap) از پنجره‌های حافظه
+
+        Returns:
+            لیست جدید ترندینگ
+        """
+        totals = self._window_totals()
+        most_viewed = self.is_warming_up
+        candidates = []
+        for att_id, (recent, previous) in totals.items():
+            if most_viewed:
+                # پنجره قبلی هنوز کامل نیست؛ رشد نسبت به آن معنادار نیست
+                if recent >= TRENDING_MIN_VIEWS:
+                    candidates.append((recent, None, -att_id))
+                continue
+            growth = growth_rate(recent, previous)
+            if growth > 0 or recent >= TRENDING_MIN_VIEWS:
+                candidates.append((growth, recent, -att_id))
+
+        # چند برابر K تا بعد از حذف اتچمنت‌های تستی/حذف شده باز K آیتم بماند
+        best = heapq.nlargest(self.top_k * 3, candidates)
+        self._load_metadata([-c[2] for c in best])
+        items = []
+        for key, recent, neg_id in best:
+            meta = self._meta.get(-neg_id)
+            if not meta:
+                continue
+            if most_viewed:
+                items.append({**meta, 'views': key, 'growth_rate': None})
+            else:
+                items.append({**meta, 'views': recent, 'growth_rate': round(key, 1)})
+            if len(items) >= self.top_k:
+                break
+
+        self._top = items
+        self._most_viewed = most_viewed
+        self._updated_at = datetime.now(timezone.utc)
+        return items
+
+
+_instance: Optional[TrendingCounter] = None
+
+
+def get_trending_counter() -> TrendingCounter:
+    """دریافت singleton instance از TrendingCounter"""
+    global _instance
+    if _instance is None:
+        _instance = TrendingCounter()
+    return _instance
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Date Filter Index Check
+=======================
+Runs EXPLAIN for the analytics date predicates built by
+core/database/sql_helpers (build_date_range_filter / build_datetime_range_filter)
+and asserts that each one is answered through an index on the raw column
+(the column appears in an Index Cond / Recheck Cond), and that monthly
+partitioned tables only scan the partitions the range touches.
+
+Sequential scans are disabled for the check, so small or empty tables still
+show whether an index *can* serve the predicate. The legacy DATE(column)
+form is included as a control and is expected to fail.
+
+Usage:
+    python scripts/check_date_filter_indexes.py [--json]
+
+Exit code is 1 when any expected check fails.
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, Iterator, List
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(PROJECT_ROOT, '.env'))
+
+from core.database.database_pg_proxy import DatabasePostgresProxy
+from core.database.partitioning import is_partitioned, list_partitions
+from core.database.sql_helpers import (
+    build_date_range_filter,
+    build_datetime_range_filter,
+    get_date_range,
+)
+
+
+def _cases() -> List[Dict]:
+    """predicateهای ساخته شده توسط sql_helpers برای جداول تحلیلی"""
+    cases = []
+
+    def add(name, table, column, where, params, days, expect_index=True):
+        cases.append({
+            'name': name, 'table': table, 'column': column, 'where': where,
+            'params': tuple(params), 'days': days, 'expect_index': expect_index,
+        })
+
+    for table, column, days in (
+        ('attachment_metrics', 'action_date', 30),
+        ('attachment_metrics_daily', 'metric_date', 7),
+        ('attachment_metrics_daily_users', 'metric_date', 7),
+    ):
+        where, params = build_date_range_filter(column, days)
+        add(f"{table}.{column} last {days}d", table, column, where, params, days)
+
+    where, params = build_date_range_filter('metric_date', 30)
+    add("attachment_metrics_daily per attachment 30d", 'attachment_metrics_daily', 'metric_date',
+        f"attachment_id = %s AND {where}", (1, *params), 30)
+
+    for table, column, days in (
+        ('search_history', 'created_at', 30),
+        ('user_attachment_engagement', 'last_view_date', 30),
+    ):
+        where, params = build_datetime_range_filter(column, days)
+        add(f"{table}.{column} last {days}d", table, column, where, params, days)
+
+    # کنترل: فرم قدیمی (ستون داخل تابع) نباید index را استفاده کند
+    add("legacy DATE(action_date) control", 'attachment_metrics', 'action_date',
+        "DATE(action_date) >= CURRENT_DATE - INTERVAL '30 days'", (), 30, expect_index=False)
+    return cases
+
+
+def _walk(plan: Dict) -> Iterator[Dict]:
+    yield plan
+    for child in plan.get('Plans', []) or []:
+        yield from _walk(child)
+
+
+def _months_touched(days: int) -> int:
+    start, end = get_date_range(days)
+    return (end.year - start.year) * 12 + (end.month - start.month) + 1
+
+
+def check(db, case: Dict) -> Dict:
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(
+            f"EXPLAIN (FORMAT JSON) SELECT COUNT(*) FROM {case['table']} WHERE {case['where']}",
+            case['params'],
+        )
+        row = cursor.fetchone()
+        plan = list(row.values())[0][0]['Plan']
+        partitioned = is_partitioned(cursor, case['table'])
+        total_partitions = len(list_partitions(cursor, case['table'])) + 1 if partitioned else 0
+        cursor.close()
+
+    nodes = list(_walk(plan))
+    index_nodes = [
+        n for n in nodes
+        if case['column'] in (n.get('Index Cond', '') + n.get('Recheck Cond', ''))
+    ]
+    scanned = {n['Relation Name'] for n in nodes if n.get('Relation Name')}
+
+    uses_index = bool(index_nodes)
+    ok = uses_index == case['expect_index']
+    result = {
+        'name': case['name'],
+        'uses_index': uses_index,
+        'indexes': sorted({n['Index Name'] for n in index_nodes if n.get('Index Name')}),
+        'ok': ok,
+    }
+    if partitioned and case['expect_index']:
+        # ماه‌های بازه + پارتیشن default
+        allowed = _months_touched(case['days']) + 1
+        result['partitions_scanned'] = len(scanned)
+        result['partitions_total'] = total_partitions
+        result['ok'] = ok and len(scanned) <= allowed
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN check for sargable analytics date filters")
+    parser.add_argument('--json', action='store_true', help="print raw JSON")
+    args = parser.parse_args()
+
+    db = DatabasePostgresProxy()
+    results = [check(db, case) for case in _cases()]
+    failed = [r for r in results if not r['ok']]
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for r in results:
+            status = "OK  " if r['ok'] else "FAIL"
+            detail = ', '.join(r['indexes']) or 'no index'
+            if 'partitions_scanned' in r:
+                detail += f" | partitions {r['partitions_scanned']}/{r['partitions_total']}"
+            print(f"[{status}] {r['name']:<48} {detail}")
+        print()
+        print(f"{len(results) - len(failed)}/{len(results)} checks passed")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
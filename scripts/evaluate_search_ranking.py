@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Search Ranking Offline Evaluation
+=================================
+Replays search_history against the current catalog and compares the legacy
+ordering (trigram similarity → is_season_top → is_top) with SearchRanker.
+
+A search counts as relevant to an attachment when the same user viewed,
+clicked, copied or shared that attachment within --window minutes after the
+search (attachment_metrics / user_attachment_engagement).
+
+Usage:
+    python scripts/evaluate_search_ranking.py [--days 30] [--window 10]
+        [--limit 2000] [--weights "exact=6,popularity=2"] [--json]
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Sequence
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(PROJECT_ROOT, '.env'))
+
+from core.database.database_pg_proxy import DatabasePostgresProxy
+from utils.search_ranking import SearchRanker, RankingWeights
+
+
+REPLAY_SQL = """
+    WITH searches AS (
+        SELECT id, user_id, query, created_at
+        FROM search_history
+        WHERE created_at >= NOW() - make_interval(days => %s)
+          AND results_count > 0
+        ORDER BY id DESC
+        LIMIT %s
+    ),
+    hits AS (
+        SELECT s.id, am.attachment_id
+        FROM searches s
+        JOIN attachment_metrics am
+          ON am.user_id = s.user_id
+         AND am.action_type IN ('view', 'click', 'copy', 'share')
+         AND am.action_date >= s.created_at
+         AND am.action_date < s.created_at + make_interval(mins => %s)
+        UNION
+        SELECT s.id, uae.attachment_id
+        FROM searches s
+        JOIN user_attachment_engagement uae
+          ON uae.user_id = s.user_id
+         AND uae.last_view_date >= s.created_at
+         AND uae.last_view_date < s.created_at + make_interval(mins => %s)
+    )
+    SELECT s.id, s.query, array_agg(h.attachment_id) AS relevant
+    FROM searches s
+    JOIN hits h ON h.id = s.id
+    GROUP BY s.id, s.query
+"""
+
+
+def _reciprocal_rank(ids: Sequence[int], relevant: set) -> float:
+    for pos, att_id in enumerate(ids, start=1):
+        if att_id in relevant:
+            return 1.0 / pos
+    return 0.0
+
+
+def _hit_at(ids: Sequence[int], relevant: set, k: int) -> float:
+    return 1.0 if relevant.intersection(ids[:k]) else 0.0
+
+
+def _summarize(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    n = len(rows) or 1
+    return {
+        'mrr': round(sum(r['rr'] for r in rows) / n, 4),
+        'hit@1': round(sum(r['h1'] for r in rows) / n, 4),
+        'hit@5': round(sum(r['h5'] for r in rows) / n, 4),
+        'hit@10': round(sum(r['h10'] for r in rows) / n, 4),
+    }
+
+
+def evaluate(db, ranker: SearchRanker, days: int, window: int, limit: int) -> Dict:
+    sessions = db.execute_query(REPLAY_SQL, (days, limit, window, window), fetch_all=True) or []
+    candidates_cache: Dict[str, List[Dict]] = {}
+    baseline_rows, ranked_rows = [], []
+    changed = 0
+
+    for session in sessions:
+        query = (session['query'] or '').strip()
+        relevant = set(session['relevant'] or [])
+        if not query or not relevant:
+            continue
+        if query not in candidates_cache:
+            candidates_cache[query] = db.get_search_candidates(query)
+        candidates = candidates_cache[query]
+        if not candidates:
+            continue
+
+        # ترتیب SQL همان ترتیب قدیمی است (trgm → season_top → top)
+        baseline_ids = [c['id'] for c in candidates]
+        ranked_ids = [c['id'] for c in ranker.rank(query, candidates)]
+        if baseline_ids[:5] != ranked_ids[:5]:
+            changed += 1
+
+        for ids, rows in ((baseline_ids, baseline_rows), (ranked_ids, ranked_rows)):
+            rows.append({
+                'rr': _reciprocal_rank(ids, relevant),
+                'h1': _hit_at(ids, relevant, 1),
+                'h5': _hit_at(ids, relevant, 5),
+                'h10': _hit_at(ids, relevant, 10),
+            })
+
+    return {
+        'sessions': len(ranked_rows),
+        'distinct_queries': len(candidates_cache),
+        'top5_changed': changed,
+        'weights': ranker.weights.to_dict(),
+        'baseline': _summarize(baseline_rows),
+        'ranked': _summarize(ranked_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline evaluation of search ranking")
+    parser.add_argument('--days', type=int, default=30, help="search_history window in days")
+    parser.add_argument('--window', type=int, default=10, help="minutes after a search that count as engagement")
+    parser.add_argument('--limit', type=int, default=2000, help="max searches to replay")
+    parser.add_argument('--weights', default=os.getenv('SEARCH_RANK_WEIGHTS', ''),
+                        help='override weights, e.g. "exact=6,popularity=2"')
+    parser.add_argument('--json', action='store_true', help="print raw JSON")
+    args = parser.parse_args()
+
+    db = DatabasePostgresProxy()
+    ranker = SearchRanker(RankingWeights.parse(args.weights))
+    report = evaluate(db, ranker, args.days, args.window, args.limit)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    print(f"Replayed sessions: {report['sessions']} ({report['distinct_queries']} distinct queries)")
+    print(f"Top-5 changed:     {report['top5_changed']}")
+    print(f"Weights:           {report['weights']}")
+    print()
+    print(f"{'metric':<8} {'baseline':>10} {'ranked':>10}")
+    for key in ('mrr', 'hit@1', 'hit@5', 'hit@10'):
+        print(f"{key:<8} {report['baseline'][key]:>10.4f} {report['ranked'][key]:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
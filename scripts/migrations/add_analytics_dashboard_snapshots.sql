@@ -0,0 +1,13 @@
+-- Migration: Add analytics_dashboard_snapshots table
+-- Date: 2026-10-18
+-- Purpose: Precomputed JSON payload per attachments-analytics dashboard view
+--          (overview, trending, user_behavior, daily, weekly), written by
+--          managers/dashboard_snapshot.py so admin handlers render instantly
+
+CREATE TABLE IF NOT EXISTS analytics_dashboard_snapshots (
+    view_name TEXT PRIMARY KEY,
+    payload JSONB NOT NULL,
+    computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- End of migration
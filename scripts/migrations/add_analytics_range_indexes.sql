@@ -0,0 +1,13 @@
+-- Migration: Indexes for half-open date range filters in analytics queries
+-- Date: 2026-10-18
+-- Purpose: Analytics filters are now bound half-open ranges on the raw column
+--          (col >= $start AND col < $end, core/database/sql_helpers.py) instead
+--          of DATE(col) >= CURRENT_DATE - INTERVAL ..., so plain btree indexes
+--          on the timestamp columns can serve them.
+--          Verify with: python scripts/check_date_filter_indexes.py
+
+CREATE INDEX IF NOT EXISTS ix_am_date ON attachment_metrics (action_date);
+CREATE INDEX IF NOT EXISTS ix_uae_last_view ON user_attachment_engagement (last_view_date);
+CREATE INDEX IF NOT EXISTS ix_uae_attachment_last_view ON user_attachment_engagement (attachment_id, last_view_date);
+
+-- End of migration
@@ -0,0 +1,52 @@
+-- Migration: Add attachment_leaderboard materialized view
+-- Date: 2026-10-18
+-- Purpose: Precomputed per-attachment popularity (all-time and 7/14/30/90-day
+--          windows) so get_popular_attachments / get_suggested_ranked do indexed
+--          lookups instead of GROUP BY over user_attachment_engagement.
+--          Refreshed CONCURRENTLY by managers/leaderboard_refresher.py; the
+--          definition is generated in core/database/leaderboard.py.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS attachment_leaderboard AS
+SELECT
+    a.id AS attachment_id,
+    a.mode,
+    w.name AS weapon,
+    wc.name AS category,
+    COUNT(*) FILTER (WHERE uae.rating = 1) AS likes,
+    COUNT(*) FILTER (WHERE uae.rating = -1) AS dislikes,
+    COALESCE(SUM(uae.total_views), 0) AS views,
+    COALESCE(SUM(uae.total_clicks), 0) AS clicks,
+    COUNT(DISTINCT uae.user_id) AS users,
+    COUNT(*) FILTER (WHERE uae.rating = 1 AND uae.last_view_date >= NOW() - INTERVAL '7 days') AS likes_7d,
+    COUNT(*) FILTER (WHERE uae.rating = -1 AND uae.last_view_date >= NOW() - INTERVAL '7 days') AS dislikes_7d,
+    COALESCE(SUM(uae.total_views) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '7 days'), 0) AS views_7d,
+    COALESCE(SUM(uae.total_clicks) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '7 days'), 0) AS clicks_7d,
+    COUNT(DISTINCT uae.user_id) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '7 days') AS users_7d,
+    COUNT(*) FILTER (WHERE uae.rating = 1 AND uae.last_view_date >= NOW() - INTERVAL '14 days') AS likes_14d,
+    COUNT(*) FILTER (WHERE uae.rating = -1 AND uae.last_view_date >= NOW() - INTERVAL '14 days') AS dislikes_14d,
+    COALESCE(SUM(uae.total_views) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '14 days'), 0) AS views_14d,
+    COALESCE(SUM(uae.total_clicks) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '14 days'), 0) AS clicks_14d,
+    COUNT(DISTINCT uae.user_id) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '14 days') AS users_14d,
+    COUNT(*) FILTER (WHERE uae.rating = 1 AND uae.last_view_date >= NOW() - INTERVAL '30 days') AS likes_30d,
+    COUNT(*) FILTER (WHERE uae.rating = -1 AND uae.last_view_date >= NOW() - INTERVAL '30 days') AS dislikes_30d,
+    COALESCE(SUM(uae.total_views) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '30 days'), 0) AS views_30d,
+    COALESCE(SUM(uae.total_clicks) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '30 days'), 0) AS clicks_30d,
+    COUNT(DISTINCT uae.user_id) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '30 days') AS users_30d,
+    COUNT(*) FILTER (WHERE uae.rating = 1 AND uae.last_view_date >= NOW() - INTERVAL '90 days') AS likes_90d,
+    COUNT(*) FILTER (WHERE uae.rating = -1 AND uae.last_view_date >= NOW() - INTERVAL '90 days') AS dislikes_90d,
+    COALESCE(SUM(uae.total_views) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '90 days'), 0) AS views_90d,
+    COALESCE(SUM(uae.total_clicks) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '90 days'), 0) AS clicks_90d,
+    COUNT(DISTINCT uae.user_id) FILTER (WHERE uae.last_view_date >= NOW() - INTERVAL '90 days') AS users_90d,
+    NOW() AS refreshed_at
+FROM attachments a
+JOIN weapons w ON a.weapon_id = w.id
+JOIN weapon_categories wc ON w.category_id = wc.id
+LEFT JOIN user_attachment_engagement uae ON uae.attachment_id = a.id
+GROUP BY a.id, a.mode, w.name, wc.name;
+
+-- Unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_attachment ON attachment_leaderboard (attachment_id);
+CREATE INDEX IF NOT EXISTS ix_leaderboard_mode_category_weapon ON attachment_leaderboard (mode, category, weapon);
+CREATE INDEX IF NOT EXISTS ix_leaderboard_category_weapon ON attachment_leaderboard (category, weapon);
+
+-- End of migration
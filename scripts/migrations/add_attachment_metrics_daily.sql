@@ -0,0 +1,43 @@
+-- Migration: Daily rollup tables for attachment_metrics
+-- Date: 2026-10-18
+-- Purpose: Analytics dashboards read per attachment-day counters instead of
+--          scanning raw attachment_metrics over 7-30 day windows.
+--          attachment_metrics_daily_users keeps exact distinct-user sets per
+--          attachment-day so multi-day unique counts stay exact.
+--          Maintained incrementally by rollup_attachment_metrics()
+--          (managers/metrics_rollup.py) from the watermark in
+--          metrics_rollup_state; the first run backfills existing rows.
+
+CREATE TABLE IF NOT EXISTS attachment_metrics_daily (
+    attachment_id INTEGER NOT NULL,
+    metric_date DATE NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    shares INTEGER NOT NULL DEFAULT 0,
+    copies INTEGER NOT NULL DEFAULT 0,
+    rates INTEGER NOT NULL DEFAULT 0,
+    unique_users INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (attachment_id, metric_date)
+);
+
+CREATE TABLE IF NOT EXISTS attachment_metrics_daily_users (
+    metric_date DATE NOT NULL,
+    attachment_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    last_action_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (metric_date, attachment_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS metrics_rollup_state (
+    name TEXT PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_amd_date ON attachment_metrics_daily (metric_date);
+CREATE INDEX IF NOT EXISTS idx_amdu_attachment_date ON attachment_metrics_daily_users (attachment_id, metric_date);
+CREATE INDEX IF NOT EXISTS idx_amdu_user_date ON attachment_metrics_daily_users (user_id, metric_date);
+
+-- End of migration
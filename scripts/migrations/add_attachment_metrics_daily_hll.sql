@@ -0,0 +1,18 @@
+-- Migration: Add attachment_metrics_daily_hll table
+-- Date: 2026-10-18
+-- Purpose: One HyperLogLog sketch of unique users per attachment per day
+--          (attachment_id 0 = all attachments), maintained by the daily metrics
+--          rollup. Dashboards merge the sketches of a date range instead of
+--          running COUNT(DISTINCT user_id) over attachment_metrics_daily_users.
+--
+-- After applying, backfill sketches for existing days from the exact sets:
+--     python scripts/rebuild_hll_sketches.py
+
+CREATE TABLE IF NOT EXISTS attachment_metrics_daily_hll (
+    attachment_id INTEGER NOT NULL,
+    metric_date DATE NOT NULL,
+    sketch BYTEA NOT NULL,
+    PRIMARY KEY (attachment_id, metric_date)
+);
+
+-- End of migration
@@ -0,0 +1,17 @@
+-- Migration: Add attachment_trending_buckets table
+-- Date: 2026-10-18
+-- Purpose: Checkpoint of the in-memory trending counter (managers/trending_counter.py).
+--          One row per attachment per hour (views in that hour), covering the
+--          recent and previous trending windows; older rows are deleted by the
+--          checkpoint. The table is only fed by live views: the first start is
+--          recorded in metrics_rollup_state ('trending_counter'), and the list
+--          stays in warm-up until both windows are covered.
+
+CREATE TABLE IF NOT EXISTS attachment_trending_buckets (
+    attachment_id INTEGER NOT NULL,
+    bucket_hour TIMESTAMPTZ NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (attachment_id, bucket_hour)
+);
+
+-- End of migration
@@ -0,0 +1,10 @@
+-- Migration: Add worker claim columns to broadcast_jobs
+-- Date: 2026-10-18
+-- Purpose: Let one or more broadcast worker processes (main.py --broadcast-worker)
+--          claim jobs atomically; a job whose heartbeat is older than the lease
+--          is taken over by another worker
+
+ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+
+-- End of migration
@@ -0,0 +1,40 @@
+-- Migration: Add broadcast_jobs / broadcast_deliveries for durable broadcasts
+-- Date: 2026-10-18
+-- Purpose: Persist broadcast progress (managers/broadcast_job_manager.py) so
+--          an interrupted broadcast resumes from its cursor after a restart
+--          without re-sending to users that were already delivered
+
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id SERIAL PRIMARY KEY,
+    source TEXT NOT NULL DEFAULT 'admin' CHECK (source IN ('admin', 'scheduled')),
+    schedule_id INTEGER,
+    message_type TEXT NOT NULL CHECK (message_type IN ('text', 'photo')),
+    message_text TEXT,
+    photo_file_id TEXT,
+    parse_mode TEXT DEFAULT 'Markdown',
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed', 'cancelled')),
+    total_recipients INTEGER NOT NULL DEFAULT 0,
+    cursor_user_id BIGINT NOT NULL DEFAULT 0,
+    sent_count INTEGER NOT NULL DEFAULT 0,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    blocked_count INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_by BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+    job_id INTEGER NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('sent', 'failed', 'blocked')),
+    delivered_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (job_id, user_id)
+);
+
+-- Startup scan for unfinished jobs
+CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_active ON broadcast_jobs (id) WHERE status IN ('pending', 'running');
+
+-- End of migration
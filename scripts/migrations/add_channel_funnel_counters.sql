@@ -0,0 +1,57 @@
+-- Migration: Incremental channel-join funnel counters
+-- Date: 2026-10-18
+-- Purpose: Funnel reports (generate_funnel_analysis, generate_admin_dashboard,
+--          generate_period_report) read per-day counters instead of counting
+--          analytics_users. Counters are maintained by batched event writes
+--          (AnalyticsPostgres.write_join_events_batch):
+--            * analytics_daily_stats.attempted_users / completed_users:
+--              users whose first join attempt / completion happened that day
+--            * analytics_channel_funnel_daily: attempts, joins and first-time
+--              attempted/joined users per channel per day
+--
+-- The backfill below is idempotent. For existing users the day of their first
+-- attempt/completion is unknown, so it is attributed to first_seen; totals are
+-- exact, per-day splits before this migration are approximate.
+
+ALTER TABLE analytics_daily_stats
+    ADD COLUMN IF NOT EXISTS attempted_users INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS completed_users INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS analytics_channel_funnel_daily (
+    date DATE NOT NULL,
+    channel_id TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    joins INTEGER NOT NULL DEFAULT 0,
+    attempted_users INTEGER NOT NULL DEFAULT 0,
+    joined_users INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, channel_id)
+);
+
+-- Backfill: SUM(new_users) = COUNT(*) FROM analytics_users, etc.
+INSERT INTO analytics_daily_stats (date, new_users, attempted_users, completed_users)
+SELECT first_seen::date,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE join_attempts > 0),
+       COUNT(*) FILTER (WHERE completed)
+FROM analytics_users
+GROUP BY first_seen::date
+ON CONFLICT (date) DO UPDATE SET
+    new_users = EXCLUDED.new_users,
+    attempted_users = EXCLUDED.attempted_users,
+    completed_users = EXCLUDED.completed_users;
+
+-- Backfill: first joins per channel per day from channels_joined.joined_at
+INSERT INTO analytics_channel_funnel_daily (date, channel_id, joins, joined_users)
+SELECT (j.value->>'joined_at')::timestamp::date, j.key, COUNT(*), COUNT(*)
+FROM analytics_users u
+CROSS JOIN LATERAL jsonb_each(
+    CASE WHEN jsonb_typeof(u.channels_joined) = 'object' THEN u.channels_joined ELSE '{}'::jsonb END
+) AS j
+WHERE jsonb_typeof(j.value) = 'object'
+  AND j.value->>'joined_at' IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (date, channel_id) DO UPDATE SET
+    joined_users = EXCLUDED.joined_users,
+    joins = GREATEST(analytics_channel_funnel_daily.joins, EXCLUDED.joins);
+
+-- End of migration
@@ -0,0 +1,26 @@
+-- Migration: Add search_aliases table for zero-result query aliases
+-- Date: 2026-10-18
+-- Purpose: Store alias proposals produced by the zero-result query analyzer
+--          (managers/search_alias_analyzer.py); approved aliases are used by
+--          search as direct lookups
+
+CREATE TABLE IF NOT EXISTS search_aliases (
+    id SERIAL PRIMARY KEY,
+    alias TEXT NOT NULL UNIQUE,
+    target_type TEXT NOT NULL CHECK (target_type IN ('weapon', 'attachment')),
+    target_id INTEGER NOT NULL,
+    target_label TEXT,
+    confidence REAL NOT NULL DEFAULT 0,
+    zero_result_count INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    reviewed_by BIGINT,
+    reviewed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_aliases_status ON search_aliases (status, zero_result_count DESC);
+
+-- Partial index for the analyzer's zero-result scan
+CREATE INDEX IF NOT EXISTS idx_search_history_zero ON search_history (created_at) WHERE results_count = 0;
+
+-- End of migration
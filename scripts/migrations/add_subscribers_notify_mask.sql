@@ -0,0 +1,32 @@
+-- Migration: Normalize notification preferences into subscribers.notify_mask
+-- Date: 2026-10-18
+-- Purpose: Audience queries filter on a bitmask (utils/notification_mask.py)
+--          served by a covering partial index instead of evaluating JSONB
+--          containment and unnest for every subscriber.
+--          bit 0 = enabled, bits 1-2 = modes (br, mp), bits 8-15 = events.
+--          Kept in sync by update_user_notification_preferences().
+
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS notify_mask INTEGER NOT NULL DEFAULT 65287;
+
+UPDATE subscribers s
+SET notify_mask = CASE WHEN NOT p.enabled THEN 0 ELSE
+        1
+        | (CASE WHEN p.modes ? 'br' THEN 2 ELSE 0 END)
+        | (CASE WHEN p.modes ? 'mp' THEN 4 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'add_attachment')::boolean, TRUE) THEN 256 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'edit_name')::boolean, TRUE) THEN 512 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'edit_image')::boolean, TRUE) THEN 1024 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'edit_code')::boolean, TRUE) THEN 2048 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'delete_attachment')::boolean, TRUE) THEN 4096 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'top_set')::boolean, TRUE) THEN 8192 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'top_added')::boolean, TRUE) THEN 16384 ELSE 0 END)
+        | (CASE WHEN COALESCE((p.events->>'top_removed')::boolean, TRUE) THEN 32768 ELSE 0 END)
+    END
+FROM user_notification_preferences p
+WHERE p.user_id = s.user_id;
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_notify
+    ON subscribers (user_id) INCLUDE (notify_mask)
+    WHERE is_active = TRUE;
+
+-- End of migration
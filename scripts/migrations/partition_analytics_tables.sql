@@ -0,0 +1,138 @@
+-- Migration: Convert attachment_metrics and search_history to monthly range partitions
+-- Date: 2026-10-18
+-- Purpose: Range queries scan only the months they touch (partition pruning) and
+--          retention becomes DETACH/DROP of whole partitions instead of DELETE +
+--          vacuum (managers/partition_manager.py). Existing rows are copied into
+--          monthly partitions; ids and sequences are preserved so the rollup
+--          watermark (metrics_rollup_state.last_id) stays valid.
+--
+-- Run while the bot is stopped. Each table is converted in its own transaction.
+-- Already-partitioned tables are skipped.
+
+-- ============================================================================
+-- attachment_metrics (partition key: action_date)
+-- ============================================================================
+BEGIN;
+
+DO $$
+DECLARE
+    first_month DATE;
+    last_month DATE := date_trunc('month', NOW() + INTERVAL '3 months')::date;
+    m DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('attachment_metrics')) IS DISTINCT FROM 'r' THEN
+        RAISE NOTICE 'attachment_metrics is missing or already partitioned, skipping';
+        RETURN;
+    END IF;
+
+    -- sequence must survive dropping the legacy table
+    ALTER SEQUENCE attachment_metrics_id_seq OWNED BY NONE;
+    ALTER TABLE attachment_metrics RENAME TO attachment_metrics_legacy;
+    ALTER TABLE attachment_metrics_legacy RENAME CONSTRAINT attachment_metrics_pkey TO attachment_metrics_legacy_pkey;
+    DROP INDEX IF EXISTS ix_am_attachment_date;
+    DROP INDEX IF EXISTS ix_am_action_date;
+    DROP INDEX IF EXISTS ix_am_attachment_action;
+    DROP INDEX IF EXISTS ix_am_user;
+
+    CREATE TABLE attachment_metrics (
+        id INTEGER NOT NULL DEFAULT nextval('attachment_metrics_id_seq'),
+        attachment_id INTEGER NOT NULL,
+        user_id BIGINT,
+        action_type TEXT NOT NULL CHECK (action_type IN ('view','click','share','copy','rate')),
+        session_id TEXT,
+        metadata JSONB,
+        action_date TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, action_date)
+    ) PARTITION BY RANGE (action_date);
+
+    SELECT date_trunc('month', COALESCE(MIN(action_date), NOW()))::date
+    INTO first_month FROM attachment_metrics_legacy;
+
+    m := first_month;
+    WHILE m <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF attachment_metrics FOR VALUES FROM (%L) TO (%L)',
+            'attachment_metrics_p' || to_char(m, 'YYYY_MM'), m, (m + INTERVAL '1 month')::date
+        );
+        m := (m + INTERVAL '1 month')::date;
+    END LOOP;
+    CREATE TABLE attachment_metrics_default PARTITION OF attachment_metrics DEFAULT;
+
+    INSERT INTO attachment_metrics (id, attachment_id, user_id, action_type, session_id, metadata, action_date)
+    SELECT id, attachment_id, user_id, action_type, session_id, metadata, action_date
+    FROM attachment_metrics_legacy;
+
+    ALTER SEQUENCE attachment_metrics_id_seq OWNED BY attachment_metrics.id;
+    DROP TABLE attachment_metrics_legacy;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_am_attachment_date ON attachment_metrics (attachment_id, action_date);
+CREATE INDEX IF NOT EXISTS ix_am_action_date ON attachment_metrics (action_type, action_date);
+CREATE INDEX IF NOT EXISTS ix_am_attachment_action ON attachment_metrics (attachment_id, action_type);
+CREATE INDEX IF NOT EXISTS ix_am_user ON attachment_metrics (user_id);
+
+COMMIT;
+
+-- ============================================================================
+-- search_history (partition key: created_at)
+-- ============================================================================
+BEGIN;
+
+DO $$
+DECLARE
+    first_month DATE;
+    last_month DATE := date_trunc('month', NOW() + INTERVAL '3 months')::date;
+    m DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('search_history')) IS DISTINCT FROM 'r' THEN
+        RAISE NOTICE 'search_history is missing or already partitioned, skipping';
+        RETURN;
+    END IF;
+
+    ALTER SEQUENCE search_history_id_seq OWNED BY NONE;
+    ALTER TABLE search_history RENAME TO search_history_legacy;
+    ALTER TABLE search_history_legacy RENAME CONSTRAINT search_history_pkey TO search_history_legacy_pkey;
+    DROP INDEX IF EXISTS idx_search_history_created;
+    DROP INDEX IF EXISTS idx_search_history_created_at;
+    DROP INDEX IF EXISTS idx_search_history_user;
+    DROP INDEX IF EXISTS idx_search_history_zero;
+
+    CREATE TABLE search_history (
+        id INTEGER NOT NULL DEFAULT nextval('search_history_id_seq'),
+        user_id BIGINT,
+        query TEXT NOT NULL,
+        results_count INTEGER NOT NULL DEFAULT 0,
+        execution_time_ms REAL NOT NULL DEFAULT 0,
+        search_type TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    SELECT date_trunc('month', COALESCE(MIN(created_at), NOW()))::date
+    INTO first_month FROM search_history_legacy;
+
+    m := first_month;
+    WHILE m <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF search_history FOR VALUES FROM (%L) TO (%L)',
+            'search_history_p' || to_char(m, 'YYYY_MM'), m, (m + INTERVAL '1 month')::date
+        );
+        m := (m + INTERVAL '1 month')::date;
+    END LOOP;
+    CREATE TABLE search_history_default PARTITION OF search_history DEFAULT;
+
+    INSERT INTO search_history (id, user_id, query, results_count, execution_time_ms, search_type, created_at)
+    SELECT id, user_id, query, COALESCE(results_count, 0), COALESCE(execution_time_ms, 0), search_type, COALESCE(created_at, NOW())
+    FROM search_history_legacy;
+
+    ALTER SEQUENCE search_history_id_seq OWNED BY search_history.id;
+    DROP TABLE search_history_legacy;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_search_history_created ON search_history (created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_search_history_user ON search_history (user_id) WHERE user_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_search_history_zero ON search_history (created_at) WHERE results_count = 0;
+
+COMMIT;
+
+-- End of migration
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Rebuild HLL Sketches
+====================
+Rebuilds attachment_metrics_daily_hll (daily HyperLogLog sketches of unique
+users per attachment) from the exact per-day user sets in
+attachment_metrics_daily_users. Run once after adding the table, after
+changing HLL_PRECISION, or to rewrite older dense sketches of small days in
+the sparse format.
+
+With --compare, prints sketch estimates next to exact COUNT(DISTINCT)
+results for a few common windows (audit).
+
+Usage:
+    python scripts/rebuild_hll_sketches.py [--days N] [--compare]
+
+Exit code is 1 when the rebuild fails.
+"""
+
+import os
+import sys
+import argparse
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(PROJECT_ROOT, '.env'))
+
+from core.database.database_pg_proxy import DatabasePostgresProxy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild daily HLL sketches from exact user sets")
+    parser.add_argument('--days', type=int, default=None, help="only the last N days (default: all)")
+    parser.add_argument('--compare', action='store_true', help="compare estimates with exact counts")
+    args = parser.parse_args()
+
+    db = DatabasePostgresProxy()
+    built = db.rebuild_attachment_hll(args.days)
+    if built < 0:
+        print("Rebuild failed, see database.log")
+        sys.exit(1)
+    print(f"{built} sketches rebuilt")
+
+    if args.compare:
+        print()
+        for days in (0, 7, 30, None):
+            approx = db.count_attachment_unique_users(days, exact=False)
+            exact = db.count_attachment_unique_users(days, exact=True)
+            error = (abs(approx - exact) / exact * 100) if exact else 0.0
+            label = 'all time' if days is None else f"last {days}d"
+            print(f"{label:<10} approx={approx:<10} exact={exact:<10} error={error:.2f}%")
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -296,15 +296,18 @@ CREATE TABLE IF NOT EXISTS feedback (
 -- STEP 8: Search & Analytics
 -- ============================================================================
 
+-- Partitioned by month; partitions are created by the bot at startup and by
+-- managers/partition_manager.py (core/database/partitioning.py)
 CREATE TABLE IF NOT EXISTS search_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id BIGINT,
     query TEXT NOT NULL,
     results_count INTEGER NOT NULL DEFAULT 0,
     execution_time_ms REAL NOT NULL DEFAULT 0,
     search_type TEXT,
-    created_at TIMESTAMP NOT NULL DEFAULT NOW()
-);
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 CREATE INDEX IF NOT EXISTS idx_search_history_created ON search_history (created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_search_history_user ON search_history (user_id) WHERE user_id IS NOT NULL;
@@ -316,6 +319,24 @@ CREATE TABLE IF NOT EXISTS popular_searches (
     updated_at TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS idx_search_history_zero ON search_history (created_at) WHERE results_count = 0;
+
+CREATE TABLE IF NOT EXISTS search_aliases (
+    id SERIAL PRIMARY KEY,
+    alias TEXT NOT NULL UNIQUE,
+    target_type TEXT NOT NULL CHECK (target_type IN ('weapon', 'attachment')),
+    target_id INTEGER NOT NULL,
+    target_label TEXT,
+    confidence REAL NOT NULL DEFAULT 0,
+    zero_result_count INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    reviewed_by BIGINT,
+    reviewed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_aliases_status ON search_aliases (status, zero_result_count DESC);
+
 CREATE TABLE IF NOT EXISTS suggested_attachments (
     attachment_id INTEGER NOT NULL REFERENCES attachments(id) ON DELETE CASCADE,
     mode TEXT NOT NULL CHECK (mode IN ('br', 'mp')),
@@ -6,6 +6,8 @@ Helper برای استفاده آسان از database در analytics modules
 from typing import List, Dict, Any, Optional
 from contextlib import contextmanager
 
+from core.database.sql_helpers import build_datetime_range_filter
+
 class AnalyticsDBHelper:
     """Helper class برای analytics با PostgreSQL support"""
     
@@ -51,9 +53,8 @@ class AnalyticsDBHelper:
             days = 30
         days = max(1, min(days, 365))
         
-        # PostgreSQL date query: use make_interval for safe parameter binding
-        date_filter = "created_at >= NOW() - make_interval(days => %s)"
-        params = (days,)
+        # Half-open range on the raw column with bound parameters (index friendly)
+        date_filter, params = build_datetime_range_filter('created_at', days)
         
         query = f"""
             SELECT COUNT(*) as total
@@ -5,8 +5,9 @@
 
 import json
 import os
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -91,6 +92,28 @@ class AnalyticsPostgres:
                 );
                 """
             )
+            # شمارنده‌های قیف: کاربرانی که اولین تلاش/تکمیل‌شان در این روز بوده
+            cur.execute(
+                """
+                ALTER TABLE analytics_daily_stats
+                    ADD COLUMN IF NOT EXISTS attempted_users INTEGER NOT NULL DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS completed_users INTEGER NOT NULL DEFAULT 0;
+                """
+            )
+            # analytics_channel_funnel_daily (قیف هر کانال در هر روز)
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analytics_channel_funnel_daily (
+                    date DATE NOT NULL,
+                    channel_id TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    joins INTEGER NOT NULL DEFAULT 0,
+                    attempted_users INTEGER NOT NULL DEFAULT 0,
+                    joined_users INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (date, channel_id)
+                );
+                """
+            )
             conn.commit()
     
     def _get_today_key(self) -> str:
@@ -106,189 +129,206 @@ class AnalyticsPostgres:
         """, (date_key,))
     
     # ===== User Tracking =====
-    
-    def track_user_start(self, user_id: int) -> bool:
-        """ثبت اولین ورود کاربر به ربات"""
+    #
+    # رویدادها در JoinFunnelBuffer صف می‌شوند و به صورت دسته‌ای با
+    # write_join_events_batch نوشته می‌شوند؛ اگر حلقه flush در حال اجرا نباشد
+    # (اسکریپت‌ها) همان رویداد مستقیم نوشته می‌شود.
+
+    def _record_event(self, kind: str, user_id: int, channel_id: Optional[str] = None) -> bool:
+        from utils.join_funnel_buffer import get_join_funnel_buffer
+        buffer = get_join_funnel_buffer()
+        if buffer.is_running:
+            return buffer.enqueue(kind, user_id, channel_id)
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # اگر کاربر جدید است
-                cursor.execute("""
-                    INSERT INTO analytics_users (user_id, first_seen)
-                    VALUES (%s, %s)
-                    ON CONFLICT (user_id) DO NOTHING
-                    RETURNING user_id
-                """, (user_id, datetime.now()))
-                
-                is_new = cursor.fetchone() is not None
-                
-                if is_new:
-                    # آمار روزانه
-                    today = self._get_today_key()
-                    self._ensure_daily_stats(cursor, today)
-                    cursor.execute("""
-                        UPDATE analytics_daily_stats
-                        SET new_users = new_users + 1
-                        WHERE date = %s
-                    """, (today,))
-                    
-                    logger.info(f"[Analytics] New user tracked: {user_id}")
-                
-                conn.commit()
-                cursor.close()
-                return True
-                
+            self.write_join_events_batch([(kind, user_id, channel_id, datetime.now())])
+            return True
         except Exception as e:
-            logger.error(f"[Analytics] Error tracking user start: {e}")
+            logger.error(f"[Analytics] Error writing {kind} event: {e}")
             return False
+
+    def track_user_start(self, user_id: int) -> bool:
+        """ثبت اولین ورود کاربر به ربات"""
+        from utils.join_funnel_buffer import JOIN_EVENT_START
+        return self._record_event(JOIN_EVENT_START, user_id)
     
     def track_join_attempt(self, user_id: int, channel_id: str) -> bool:
         """ثبت تلاش برای عضویت (زدن دکمه عضو شدم)"""
-        try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # اطمینان از وجود کاربر
-                cursor.execute("""
-                    INSERT INTO analytics_users (user_id, first_seen)
-                    VALUES (%s, %s)
-                    ON CONFLICT (user_id) DO NOTHING
-                """, (user_id, datetime.now()))
-                
-                # افزایش تعداد تلاش‌ها
-                cursor.execute("""
-                    UPDATE analytics_users
-                    SET join_attempts = join_attempts + 1,
-                        channels_joined = jsonb_set(
-                            COALESCE(channels_joined, '{}'::jsonb),
-                            ARRAY[%s],
-                            jsonb_build_object(
-                                'joined_at', NULL,
-                                'attempts', COALESCE((channels_joined->%s->>'attempts')::int, 0) + 1
-                            ),
-                            true
-                        )
-                    WHERE user_id = %s
-                """, (channel_id, channel_id, user_id))
-                
-                # آمار کانال
-                cursor.execute("""
-                    UPDATE analytics_channels
-                    SET total_join_attempts = total_join_attempts + 1
-                    WHERE channel_id = %s
-                """, (channel_id,))
-                
-                # آمار روزانه
-                today = self._get_today_key()
-                self._ensure_daily_stats(cursor, today)
-                cursor.execute("""
-                    UPDATE analytics_daily_stats
-                    SET total_attempts = total_attempts + 1
-                    WHERE date = %s
-                """, (today,))
-                
-                conn.commit()
-                cursor.close()
-                logger.info(f"[Analytics] Join attempt: user={user_id}, channel={channel_id}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"[Analytics] Error tracking join attempt: {e}")
-            return False
+        from utils.join_funnel_buffer import JOIN_EVENT_ATTEMPT
+        return self._record_event(JOIN_EVENT_ATTEMPT, user_id, channel_id)
     
     def track_join_success(self, user_id: int, channel_id: str) -> bool:
         """ثبت عضویت موفق در کانال"""
-        try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # اطمینان از وجود کاربر
-                cursor.execute("""
-                    INSERT INTO analytics_users (user_id, first_seen)
-                    VALUES (%s, %s)
-                    ON CONFLICT (user_id) DO NOTHING
-                """, (user_id, datetime.now()))
-                
-                # ثبت زمان عضویت موفق
-                cursor.execute("""
-                    UPDATE analytics_users
-                    SET channels_joined = jsonb_set(
-                        COALESCE(channels_joined, '{}'::jsonb),
-                        ARRAY[%s, 'joined_at'],
-                        to_jsonb(%s::text),
-                        true
-                    )
-                    WHERE user_id = %s
-                """, (channel_id, datetime.now().isoformat(), user_id))
-                
-                # چک کردن completion (همه کانال‌های فعال را join کرده؟)
-                cursor.execute("""
-                    SELECT COUNT(*) as active_count
-                    FROM analytics_channels
-                    WHERE status = 'active'
-                """)
-                _row = cursor.fetchone()
-                active_count = int((_row or {}).get('active_count') or 0)
-                
-                cursor.execute("""
-                    SELECT jsonb_object_keys(channels_joined) as channel_id
-                    FROM analytics_users
-                    WHERE user_id = %s
-                """, (user_id,))
-                joined_channels = [row['channel_id'] for row in cursor.fetchall()]
-                
-                # بررسی تعداد کانال‌های active که join شده
+        from utils.join_funnel_buffer import JOIN_EVENT_SUCCESS
+        return self._record_event(JOIN_EVENT_SUCCESS, user_id, channel_id)
+
+    def write_join_events_batch(self, events: List[Tuple]) -> int:
+        """
+        نوشتن دسته‌ای رویدادهای قیف عضویت در یک transaction
+
+        وضعیت کاربران (analytics_users) یک بار خوانده و قفل می‌شود، گذارها
+        (کاربر جدید، اولین تلاش، اولین عضویت در کانال، تکمیل) در پایتون محاسبه
+        می‌شوند و فقط deltaها به analytics_channels، analytics_daily_stats و
+        analytics_channel_funnel_daily اضافه می‌شوند.
+
+        Args:
+            events: لیست (kind, user_id, channel_id, created_at)
+
+        Returns:
+            تعداد رویدادهای نوشته شده
+        """
+        from utils.join_funnel_buffer import JOIN_EVENT_ATTEMPT, JOIN_EVENT_SUCCESS
+        if not events:
+            return 0
+        events = sorted(events, key=lambda e: e[3])
+        first_seen: Dict[int, datetime] = {}
+        for _kind, user_id, _channel_id, created_at in events:
+            first_seen.setdefault(user_id, created_at)
+        user_ids = sorted(first_seen)
+
+        daily: Dict = defaultdict(lambda: defaultdict(int))
+        channel_daily: Dict = defaultdict(lambda: defaultdict(int))
+        channel_totals: Dict = defaultdict(lambda: defaultdict(int))
+
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO analytics_users (user_id, first_seen)
+                SELECT * FROM unnest(%s::bigint[], %s::timestamp[])
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING user_id, first_seen
+            """, (user_ids, [first_seen[u] for u in user_ids]))
+            for row in cursor.fetchall():
+                daily[row['first_seen'].date()]['new_users'] += 1
+
+            # قفل به ترتیب user_id تا flushهای هم‌زمان deadlock نکنند
+            cursor.execute("""
+                SELECT user_id, join_attempts, completed, channels_joined
+                FROM analytics_users
+                WHERE user_id = ANY(%s)
+                ORDER BY user_id
+                FOR UPDATE
+            """, (user_ids,))
+            users = {}
+            for row in cursor.fetchall():
+                channels = row['channels_joined'] or {}
+                if isinstance(channels, str):
+                    channels = json.loads(channels)
+                users[row['user_id']] = {
+                    'join_attempts': int(row['join_attempts'] or 0),
+                    'completed': bool(row['completed']),
+                    'channels': channels,
+                }
+
+            cursor.execute("SELECT channel_id FROM analytics_channels WHERE status = 'active'")
+            active_channels = {row['channel_id'] for row in cursor.fetchall()}
+
+            changed = set()
+            for kind, user_id, channel_id, created_at in events:
+                day = created_at.date()
+                user = users.get(user_id)
+                if user is None or not channel_id:
+                    continue
+                entry = user['channels'].setdefault(channel_id, {'joined_at': None, 'attempts': 0})
+                if kind == JOIN_EVENT_ATTEMPT:
+                    if not entry.get('attempts'):
+                        channel_daily[(day, channel_id)]['attempted_users'] += 1
+                    if user['join_attempts'] == 0:
+                        daily[day]['attempted_users'] += 1
+                    entry['attempts'] = int(entry.get('attempts') or 0) + 1
+                    user['join_attempts'] += 1
+                    daily[day]['total_attempts'] += 1
+                    channel_daily[(day, channel_id)]['attempts'] += 1
+                    channel_totals[channel_id]['attempts'] += 1
+                elif kind == JOIN_EVENT_SUCCESS:
+                    if not entry.get('joined_at'):
+                        entry['joined_at'] = created_at.isoformat()
+                        channel_daily[(day, channel_id)]['joined_users'] += 1
+                    daily[day]['successful_joins'] += 1
+                    channel_daily[(day, channel_id)]['joins'] += 1
+                    channel_totals[channel_id]['joins'] += 1
+                    # تکمیل: عضویت در همه کانال‌های فعال
+                    if not user['completed'] and active_channels:
+                        joined = {c for c, v in user['channels'].items() if v.get('joined_at')}
+                        if active_channels <= joined:
+                            user['completed'] = True
+                            daily[day]['completed_users'] += 1
+                else:
+                    continue
+                changed.add(user_id)
+
+            if changed:
+                rows = [(u, users[u]['join_attempts'], users[u]['completed'],
+                         json.dumps(users[u]['channels'])) for u in sorted(changed)]
                 cursor.execute("""
-                    SELECT COUNT(*) as joined_active
-                    FROM analytics_channels
-                    WHERE status = 'active' 
-                    AND channel_id = ANY(%s)
-                """, (joined_channels,))
-                _row2 = cursor.fetchone()
-                joined_active_count = int((_row2 or {}).get('joined_active') or 0)
-                
-                if joined_active_count >= active_count and active_count > 0:
-                    cursor.execute("""
-                        UPDATE analytics_users
-                        SET completed = TRUE
-                        WHERE user_id = %s
-                    """, (user_id,))
-                
-                # آمار کانال
+                    UPDATE analytics_users AS u
+                    SET join_attempts = d.join_attempts,
+                        completed = d.completed,
+                        channels_joined = d.channels_joined::jsonb
+                    FROM unnest(%s::bigint[], %s::int[], %s::bool[], %s::text[])
+                        AS d(user_id, join_attempts, completed, channels_joined)
+                    WHERE u.user_id = d.user_id
+                """, tuple(map(list, zip(*rows))))
+
+            if channel_totals:
+                ids = list(channel_totals)
                 cursor.execute("""
-                    UPDATE analytics_channels
-                    SET total_joins = total_joins + 1,
-                        conversion_rate = CASE 
-                            WHEN total_join_attempts > 0 
-                            THEN ROUND(((total_joins + 1)::numeric / total_join_attempts::numeric) * 100, 2)
+                    UPDATE analytics_channels AS c
+                    SET total_join_attempts = c.total_join_attempts + d.attempts,
+                        total_joins = c.total_joins + d.joins,
+                        conversion_rate = CASE
+                            WHEN c.total_join_attempts + d.attempts > 0
+                            THEN ROUND(((c.total_joins + d.joins)::numeric
+                                        / (c.total_join_attempts + d.attempts)::numeric) * 100, 2)
                             ELSE 0.0
                         END
-                    WHERE channel_id = %s
-                """, (channel_id,))
-                
-                # آمار روزانه
-                today = self._get_today_key()
-                self._ensure_daily_stats(cursor, today)
+                    FROM unnest(%s::text[], %s::int[], %s::int[]) AS d(channel_id, attempts, joins)
+                    WHERE c.channel_id = d.channel_id
+                """, (ids, [channel_totals[c]['attempts'] for c in ids],
+                      [channel_totals[c]['joins'] for c in ids]))
+
+            if daily:
+                days = sorted(daily)
+                cols = ('new_users', 'successful_joins', 'total_attempts', 'attempted_users', 'completed_users')
                 cursor.execute("""
-                    UPDATE analytics_daily_stats
-                    SET successful_joins = successful_joins + 1,
+                    INSERT INTO analytics_daily_stats
+                        (date, new_users, successful_joins, total_attempts,
+                         attempted_users, completed_users, conversion_rate)
+                    SELECT d, n, s, a, au, cu,
+                           CASE WHEN a > 0 THEN ROUND((s::numeric / a::numeric) * 100, 2) ELSE 0.0 END
+                    FROM unnest(%s::date[], %s::int[], %s::int[], %s::int[], %s::int[], %s::int[])
+                        AS x(d, n, s, a, au, cu)
+                    ON CONFLICT (date) DO UPDATE SET
+                        new_users = analytics_daily_stats.new_users + EXCLUDED.new_users,
+                        successful_joins = analytics_daily_stats.successful_joins + EXCLUDED.successful_joins,
+                        total_attempts = analytics_daily_stats.total_attempts + EXCLUDED.total_attempts,
+                        attempted_users = analytics_daily_stats.attempted_users + EXCLUDED.attempted_users,
+                        completed_users = analytics_daily_stats.completed_users + EXCLUDED.completed_users,
                         conversion_rate = CASE
-                            WHEN total_attempts > 0
-                            THEN ROUND(((successful_joins + 1)::numeric / total_attempts::numeric) * 100, 2)
+                            WHEN analytics_daily_stats.total_attempts + EXCLUDED.total_attempts > 0
+                            THEN ROUND(((analytics_daily_stats.successful_joins + EXCLUDED.successful_joins)::numeric
+                                        / (analytics_daily_stats.total_attempts + EXCLUDED.total_attempts)::numeric) * 100, 2)
                             ELSE 0.0
                         END
-                    WHERE date = %s
-                """, (today,))
-                
-                conn.commit()
-                cursor.close()
-                logger.info(f"[Analytics] Join success: user={user_id}, channel={channel_id}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"[Analytics] Error tracking join success: {e}")
-            return False
+                """, (days, *[[daily[d][c] for d in days] for c in cols]))
+
+            if channel_daily:
+                keys = sorted(channel_daily)
+                cols = ('attempts', 'joins', 'attempted_users', 'joined_users')
+                cursor.execute("""
+                    INSERT INTO analytics_channel_funnel_daily
+                        (date, channel_id, attempts, joins, attempted_users, joined_users)
+                    SELECT * FROM unnest(%s::date[], %s::text[], %s::int[], %s::int[], %s::int[], %s::int[])
+                    ON CONFLICT (date, channel_id) DO UPDATE SET
+                        attempts = analytics_channel_funnel_daily.attempts + EXCLUDED.attempts,
+                        joins = analytics_channel_funnel_daily.joins + EXCLUDED.joins,
+                        attempted_users = analytics_channel_funnel_daily.attempted_users + EXCLUDED.attempted_users,
+                        joined_users = analytics_channel_funnel_daily.joined_users + EXCLUDED.joined_users
+                """, ([k[0] for k in keys], [k[1] for k in keys],
+                      *[[channel_daily[k][c] for k in keys] for c in cols]))
+            cursor.close()
+
+        logger.debug(f"[Analytics] Wrote {len(events)} join funnel events")
+        return len(events)
     
     # ===== Channel Management Tracking =====
     
@@ -556,6 +596,55 @@ class AnalyticsPostgres:
             logger.error(f"[Analytics] Error getting completed users: {e}")
             return 0
     
+    def get_funnel_totals(self) -> Dict[str, int]:
+        """
+        شمارنده‌های کل قیف از جمع ردیف‌های روزانه (یک ردیف برای هر روز،
+        مستقل از تعداد کاربران و رویدادها)
+
+        Returns:
+            {'started', 'attempted', 'completed'}
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT
+                        COALESCE(SUM(new_users), 0) AS started,
+                        COALESCE(SUM(attempted_users), 0) AS attempted,
+                        COALESCE(SUM(completed_users), 0) AS completed
+                    FROM analytics_daily_stats
+                """)
+                row = cursor.fetchone() or {}
+                cursor.close()
+                return {k: int(row.get(k) or 0) for k in ('started', 'attempted', 'completed')}
+        except Exception as e:
+            logger.error(f"[Analytics] Error getting funnel totals: {e}")
+            return {'started': 0, 'attempted': 0, 'completed': 0}
+
+    def get_channel_funnel(self, start_date: str, end_date: str, limit: int = 5) -> List[Dict]:
+        """قیف هر کانال در بازه [start_date, end_date] از analytics_channel_funnel_daily"""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT f.channel_id, COALESCE(c.title, f.channel_id) AS title,
+                           SUM(f.attempts) AS attempts, SUM(f.joins) AS joins,
+                           SUM(f.attempted_users) AS attempted_users,
+                           SUM(f.joined_users) AS joined_users
+                    FROM analytics_channel_funnel_daily f
+                    LEFT JOIN analytics_channels c ON c.channel_id = f.channel_id
+                    WHERE f.date BETWEEN %s AND %s
+                    GROUP BY f.channel_id, c.title
+                    ORDER BY SUM(f.joined_users) DESC, SUM(f.joins) DESC
+                    LIMIT %s
+                """, (start_date, end_date, limit))
+                rows = cursor.fetchall()
+                cursor.close()
+                return [dict(r) for r in rows]
+        except Exception as e:
+            logger.error(f"[Analytics] Error getting channel funnel: {e}")
+            return []
+    
     # ===== Dashboard Generation =====
     
     def generate_admin_dashboard(self) -> str:
@@ -564,9 +653,10 @@ class AnalyticsPostgres:
             lines = []
             lines.append("📊 <b>آمار کانال‌های اجباری</b>\n")
             
-            # آمار کلی
-            total_users = self.get_total_users()
-            completed_users = self.get_completed_users()
+            # آمار کلی (شمارنده‌های تجمیعی قیف)
+            totals = self.get_funnel_totals()
+            total_users = totals['started']
+            completed_users = totals['completed']
             
             lines.append(f"👥 کل کاربران: <b>{total_users}</b>")
             if total_users > 0:
@@ -668,19 +758,8 @@ class AnalyticsPostgres:
 
     def generate_funnel_analysis(self) -> str:
         """تحلیل قیف تبدیل کاربران (PostgreSQL)"""
-        try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) AS count FROM analytics_users")
-                row = cursor.fetchone(); started = int(row.get('count') or 0) if row else 0
-                cursor.execute("SELECT COUNT(*) AS count FROM analytics_users WHERE join_attempts > 0")
-                row = cursor.fetchone(); attempted = int(row.get('count') or 0) if row else 0
-                cursor.execute("SELECT COUNT(*) AS count FROM analytics_users WHERE completed = TRUE")
-                row = cursor.fetchone(); completed = int(row.get('count') or 0) if row else 0
-                cursor.close()
-        except Exception as e:
-            logger.error(f"[Analytics] Error generating funnel: {e}")
-            started = attempted = completed = 0
+        totals = self.get_funnel_totals()
+        started, attempted, completed = totals['started'], totals['attempted'], totals['completed']
 
         if started == 0:
             return "📈 <b>تحلیل قیف تبدیل</b>\n\nهنوز کاربری ثبت نشده است."
@@ -703,72 +782,65 @@ class AnalyticsPostgres:
 
         return "\n".join(lines)
 
-    def export_to_csv(self, export_type: str = "all") -> list:
-        """Export آمار به CSV: channels | users | daily | all. برمی‌گرداند مسیر فایل‌ها."""
+    # (نام فایل، query) برای export؛ aliasها سرستون‌های CSV هستند
+    _CSV_EXPORTS = {
+        "channels": (
+            "channels",
+            """
+            SELECT channel_id AS "Channel ID", title AS "Title", url AS "URL", status AS "Status",
+                   total_joins AS "Total Joins", total_join_attempts AS "Total Attempts",
+                   conversion_rate AS "Conversion Rate", added_at AS "Added At", removed_at AS "Removed At"
+            FROM analytics_channels ORDER BY added_at DESC
+            """,
+        ),
+        "users": (
+            "users",
+            """
+            SELECT user_id AS "User ID", first_seen AS "First Seen", completed AS "Completed",
+                   join_attempts AS "Join Attempts"
+            FROM analytics_users ORDER BY first_seen DESC
+            """,
+        ),
+        "daily": (
+            "daily_stats",
+            """
+            SELECT date AS "Date", new_users AS "New Users", successful_joins AS "Successful Joins",
+                   failed_joins AS "Failed Joins", total_attempts AS "Total Attempts",
+                   conversion_rate AS "Conversion Rate"
+            FROM analytics_daily_stats ORDER BY date DESC
+            """,
+        ),
+    }
+
+    def export_to_csv(self, export_type: str = "all", progress=None) -> list:
+        """
+        Export آمار به CSV: channels | users | daily | all
+
+        هر جدول با COPY به صورت stream در یک فایل موقت .csv.gz نوشته می‌شود
+        (حافظه ثابت). فراخواننده مسئول حذف فایل‌ها بعد از ارسال است.
+
+        Returns:
+            لیست (مسیر فایل، نام فایل برای ارسال)
+        """
+        from utils.stream_export import copy_query_to_csv_gz
         files_created = []
         try:
-            import csv, os
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            export_dir = "exports"
-            os.makedirs(export_dir, exist_ok=True)
-
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-
-                if export_type in ("channels", "all"):
-                    cursor.execute(
-                        "SELECT channel_id, title, url, status, total_joins, total_join_attempts, conversion_rate, added_at, removed_at FROM analytics_channels ORDER BY added_at DESC"
-                    )
-                    rows = cursor.fetchall()
-                    filename = os.path.join(export_dir, f"channels_{ts}.csv")
-                    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
-                        writer = csv.writer(f)
-                        writer.writerow([
-                            "Channel ID", "Title", "URL", "Status", "Total Joins",
-                            "Total Attempts", "Conversion Rate", "Added At", "Removed At"
-                        ])
-                        for r in rows:
-                            writer.writerow([
-                                r['channel_id'], r['title'], r['url'], r['status'],
-                                r['total_joins'], r['total_join_attempts'], r['conversion_rate'],
-                                r['added_at'], r['removed_at']
-                            ])
-                    files_created.append(filename)
-
-                if export_type in ("users", "all"):
-                    cursor.execute(
-                        "SELECT user_id, first_seen, completed, join_attempts FROM analytics_users ORDER BY first_seen DESC"
-                    )
-                    rows = cursor.fetchall()
-                    filename = os.path.join(export_dir, f"users_{ts}.csv")
-                    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(["User ID", "First Seen", "Completed", "Join Attempts"])
-                        for r in rows:
-                            writer.writerow([r['user_id'], r['first_seen'], r['completed'], r['join_attempts']])
-                    files_created.append(filename)
-
-                if export_type in ("daily", "all"):
-                    cursor.execute(
-                        "SELECT date, new_users, successful_joins, failed_joins, total_attempts, conversion_rate FROM analytics_daily_stats ORDER BY date DESC"
-                    )
-                    rows = cursor.fetchall()
-                    filename = os.path.join(export_dir, f"daily_stats_{ts}.csv")
-                    with open(filename, "w", newline="", encoding="utf-8-sig") as f:
-                        writer = csv.writer(f)
-                        writer.writerow([
-                            "Date", "New Users", "Successful Joins", "Failed Joins", "Total Attempts", "Conversion Rate"
-                        ])
-                        for r in rows:
-                            writer.writerow([
-                                r['date'], r['new_users'], r['successful_joins'], r['failed_joins'], r['total_attempts'], r['conversion_rate']
-                            ])
-                    files_created.append(filename)
-
-                cursor.close()
+                for key, (name, select_sql) in self._CSV_EXPORTS.items():
+                    if export_type not in (key, "all"):
+                        continue
+                    path, rows = copy_query_to_csv_gz(conn, select_sql, prefix=name, progress=progress)
+                    files_created.append((path, f"{name}_{ts}.csv.gz"))
+                    logger.info(f"[Analytics] Exported {rows} rows to {path}")
 
         except Exception as e:
             logger.error(f"[Analytics] Error exporting to CSV: {e}")
+            for path, _ in files_created:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
             return []
 
         return files_created
@@ -825,6 +897,17 @@ class AnalyticsPostgres:
                 period_conv = round((total_successful / total_attempts) * 100, 1)
                 lines.append(f"\n✅ <b>نرخ تبدیل دوره:</b> {period_conv}%")
 
+            channels = self.get_channel_funnel(start_date, end_date)
+            if channels:
+                lines.append("\n📢 <b>کانال‌ها در این دوره:</b>")
+                for i, ch in enumerate(channels, 1):
+                    attempts = int(ch.get('attempts') or 0)
+                    joins = int(ch.get('joins') or 0)
+                    conv = round((joins / attempts) * 100, 1) if attempts > 0 else 0
+                    lines.append(f"{i}. <b>{ch.get('title')}</b>")
+                    lines.append(f"   • عضو جدید: {int(ch.get('joined_users') or 0)} نفر")
+                    lines.append(f"   • تلاش: {attempts} بار | نرخ تبدیل: {conv}%")
+
             return "\n".join(lines)
         except Exception as e:
             logger.error(f"[Analytics] Error generating period report: {e}")
@@ -13,7 +13,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 from collections import defaultdict
 import logging
-from core.database.sql_helpers import get_date_interval, get_datetime_interval, get_current_timestamp, get_current_date
+from core.database.sql_helpers import build_date_range_filter, get_current_date
+from core.database.hll_sketches import count_unique_users
 
 if TYPE_CHECKING:
     from core.database.database_adapter import DatabaseAdapter
@@ -265,26 +266,27 @@ class AttachmentAnalytics:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 # Get basic metrics
-                # استفاده از sql_helpers برای cross-database compatibility
-                date_filter = get_date_interval(days)
+                # بازه نیمه‌باز bind شده روی metric_date (sql_helpers)
+                # از rollup روزانه (attachment_metrics_daily) به جای اسکن رویدادهای خام
+                date_filter, date_params = build_date_range_filter('metric_date', days)
                 cursor.execute(f"""
                     SELECT 
-                        COUNT(CASE WHEN action_type = 'view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type = 'click' THEN 1 END) as clicks,
-                        COUNT(CASE WHEN action_type = 'share' THEN 1 END) as shares,
-                        COUNT(DISTINCT user_id) as unique_users,
-                        COUNT(CASE WHEN action_type = 'copy' THEN 1 END) as copies
-                    FROM attachment_metrics
+                        COALESCE(SUM(views), 0) as views,
+                        COALESCE(SUM(clicks), 0) as clicks,
+                        COALESCE(SUM(shares), 0) as shares,
+                        COALESCE(SUM(copies), 0) as copies
+                    FROM attachment_metrics_daily
                     WHERE attachment_id = %s
-                    AND DATE(action_date) >= {date_filter}
-                """, (attachment_id,))
+                    AND {date_filter}
+                """, (attachment_id, *date_params))
                 
                 result = cursor.fetchone()
                 if result:
                     stats['total_views'] = result['views']
                     stats['total_clicks'] = result['clicks']
                     stats['total_shares'] = result['shares']
-                    stats['unique_users'] = result['unique_users']
+                    # کاربران یکتا از merge sketchهای HLL روزانه
+                    stats['unique_users'] = count_unique_users(cursor, days, attachment_id=attachment_id)
                     
                     if stats['total_views'] > 0:
                         stats['engagement_rate'] = (float(stats['total_clicks']) / float(stats['total_views'])) * 100
@@ -301,20 +303,18 @@ class AttachmentAnalytics:
                 stats['avg_rating'] = round(avg_rating, 2) if avg_rating else 0
                 
                 # Get daily breakdown
-                date_filter = get_date_interval(days)
                 cursor.execute(f"""
                     SELECT 
-                        DATE(action_date) as date,
-                        COUNT(CASE WHEN action_type = 'view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type = 'click' THEN 1 END) as clicks,
-                        COUNT(DISTINCT user_id) as users
-                    FROM attachment_metrics
+                        metric_date as date,
+                        views,
+                        clicks,
+                        unique_users as users
+                    FROM attachment_metrics_daily
                     WHERE attachment_id = %s
-                    AND DATE(action_date) >= {date_filter}
-                    GROUP BY DATE(action_date)
+                    AND {date_filter}
                     ORDER BY date DESC
                     LIMIT 7
-                """, (attachment_id,))
+                """, (attachment_id, *date_params))
                 
                 for row in cursor.fetchall():
                     stats['daily_stats'].append({
@@ -430,209 +430,100 @@ class AttachmentAnalytics:
         """
         Calculate and update performance scores for all attachments
         Should be run periodically (e.g., daily)
+
+        همه امتیازها (popularity/trending/engagement/quality) و رتبه‌ها با یک
+        INSERT ... SELECT مجموعه‌ای محاسبه می‌شوند؛ تعداد round-tripها مستقل از
+        تعداد اتچمنت‌هاست (قبلاً ۴ query برای هر اتچمنت).
         """
+        current_date = get_current_date()
+        window_filter, window_params = build_date_range_filter('action_date', 30)
+        recent_filter, recent_params = build_date_range_filter('action_date', 7)
+        previous_filter, previous_params = build_date_range_filter('action_date', 14, span_days=7)
+
         try:
             with self.db.transaction() as conn:
                 cursor = conn.cursor()
-                
-                # Get all attachments with recent activity
-                date_filter = get_date_interval(7)
                 cursor.execute(f"""
-                    SELECT DISTINCT a.id
-                    FROM attachments a
-                    JOIN attachment_metrics am ON a.id = am.attachment_id
-                    WHERE DATE(am.action_date) >= {date_filter}
-                """)
-                
-                attachment_ids = [row['id'] for row in cursor.fetchall()]
-                
-                for att_id in attachment_ids:
-                    scores = self._calculate_single_attachment_scores(att_id)
-                    
-                    # Insert or update performance record
-                    current_date = get_current_date()
-                    cursor.execute(f"""
-                        INSERT INTO attachment_performance (
-                            attachment_id, performance_date,
-                            popularity_score, trending_score,
-                            engagement_rate, quality_score
-                        ) VALUES (%s, {current_date}, %s, %s, %s, %s)
-                        ON CONFLICT (attachment_id, performance_date)
-                        DO UPDATE SET
-                            popularity_score = EXCLUDED.popularity_score,
-                            trending_score = EXCLUDED.trending_score,
-                            engagement_rate = EXCLUDED.engagement_rate,
-                            quality_score = EXCLUDED.quality_score
-                    """, (
-                        att_id,
-                        scores['popularity'],
-                        scores['trending'],
-                        scores['engagement'],
-                        scores['quality']
-                    ))
-                    
-                # Update rankings
-                self._update_rankings(cursor)
-                
-                logger.info(f"✅ Updated performance scores for {len(attachment_ids)} attachments")
-                
+                    WITH activity AS (
+                        -- یک scan روی ۳۰ روز اخیر؛ پنجره‌های ۷ و ۱۴ روزه با FILTER
+                        SELECT
+                            attachment_id,
+                            COUNT(DISTINCT user_id) AS unique_users,
+                            COUNT(*) FILTER (WHERE action_type = 'view') AS views,
+                            COUNT(*) FILTER (WHERE action_type = 'click') AS clicks,
+                            COUNT(*) FILTER (WHERE action_type = 'share') AS shares,
+                            COUNT(*) FILTER (WHERE {recent_filter}) AS recent,
+                            COUNT(*) FILTER (WHERE {previous_filter}) AS previous
+                        FROM attachment_metrics
+                        WHERE {window_filter}
+                        GROUP BY attachment_id
+                    ),
+                    ratings AS (
+                        SELECT attachment_id, AVG(rating) AS avg_rating, COUNT(rating) AS rating_count
+                        FROM user_attachment_engagement
+                        WHERE rating IS NOT NULL
+                        AND attachment_id IN (SELECT attachment_id FROM activity WHERE recent > 0)
+                        GROUP BY attachment_id
+                    ),
+                    scores AS (
+                        SELECT
+                            a.id AS attachment_id,
+                            a.weapon_id,
+                            -- Popularity = weighted combination
+                            (act.views + act.clicks * 3 + act.shares * 5 + act.unique_users * 2) / 10.0
+                                AS popularity,
+                            -- Trending = growth rate (new activity without history = 50)
+                            CASE
+                                WHEN act.previous > 0 THEN
+                                    GREATEST(0, LEAST(100, (act.recent - act.previous) * 100.0 / act.previous))
+                                ELSE 50
+                            END AS trending,
+                            CASE
+                                WHEN act.views > 0 THEN (act.clicks + act.shares) * 100.0 / act.views
+                                ELSE 0
+                            END AS engagement,
+                            -- Quality = rating weighted by number of ratings + top/seasonal bonus
+                            LEAST(
+                                100,
+                                COALESCE(r.avg_rating / 5.0 * 100 * LEAST(1.0, r.rating_count / 10.0), 0)
+                                + CASE WHEN a.is_top THEN 10 ELSE 0 END
+                                + CASE WHEN a.is_season_top THEN 15 ELSE 0 END
+                            ) AS quality
+                        FROM activity act
+                        JOIN attachments a ON a.id = act.attachment_id
+                        LEFT JOIN ratings r ON r.attachment_id = act.attachment_id
+                        WHERE act.recent > 0
+                    )
+                    INSERT INTO attachment_performance (
+                        attachment_id, performance_date,
+                        popularity_score, trending_score,
+                        engagement_rate, quality_score,
+                        rank_in_weapon, rank_overall
+                    )
+                    SELECT
+                        attachment_id, {current_date},
+                        popularity, trending,
+                        engagement, quality,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY weapon_id ORDER BY popularity DESC, attachment_id
+                        ),
+                        ROW_NUMBER() OVER (ORDER BY popularity DESC, attachment_id)
+                    FROM scores
+                    ON CONFLICT (attachment_id, performance_date)
+                    DO UPDATE SET
+                        popularity_score = EXCLUDED.popularity_score,
+                        trending_score = EXCLUDED.trending_score,
+                        engagement_rate = EXCLUDED.engagement_rate,
+                        quality_score = EXCLUDED.quality_score,
+                        rank_in_weapon = EXCLUDED.rank_in_weapon,
+                        rank_overall = EXCLUDED.rank_overall
+                """, recent_params + previous_params + window_params)
+
+                logger.info(f"✅ Updated performance scores for {cursor.rowcount} attachments")
+
         except Exception as e:
             logger.error(f"Error calculating performance scores: {e}")
-            
-    def _calculate_single_attachment_scores(self, attachment_id: int) -> Dict:
-        """Calculate performance scores for single attachment"""
-        scores = {
-            'popularity': 0,
-            'trending': 0,
-            'engagement': 0,
-            'quality': 0
-        }
-        
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                # Popularity score (based on total views and unique users)
-                date_filter = get_date_interval(30)
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total_actions,
-                        COUNT(DISTINCT user_id) as unique_users,
-                        COUNT(CASE WHEN action_type = 'view' THEN 1 END) as views,
-                        COUNT(CASE WHEN action_type = 'click' THEN 1 END) as clicks,
-                        COUNT(CASE WHEN action_type = 'share' THEN 1 END) as shares
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s
-                    AND DATE(action_date) >= {date_filter}
-                """, (attachment_id,))
-                
-                result = cursor.fetchone()
-                if result:
-                    total = result['total_actions']
-                    users = result['unique_users']
-                    views = result['views']
-                    clicks = result['clicks']
-                    shares = result['shares']
-                    
-                    # Popularity = weighted combination
-                    scores['popularity'] = (
-                        (views * 1) + 
-                        (clicks * 3) + 
-                        (shares * 5) + 
-                        (users * 2)
-                    ) / 10
-                    
-                    # Engagement rate
-                    if views > 0:
-                        scores['engagement'] = ((clicks + shares) / views) * 100
-                
-                # Trending score (growth rate)
-                date_filter_7 = get_date_interval(7)
-                date_filter_14 = get_date_interval(14)
-                date_filter_8 = get_date_interval(8)
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(CASE WHEN DATE(action_date) >= {date_filter_7} THEN 1 END) as recent,
-                        COUNT(CASE WHEN DATE(action_date) BETWEEN {date_filter_14} AND {date_filter_8} THEN 1 END) as previous
-                    FROM attachment_metrics
-                    WHERE attachment_id = %s
-                """, (attachment_id,))
-                
-                result = cursor.fetchone()
-                recent = result['recent'] if result else 0
-                previous = result['previous'] if result else 0
-                if previous > 0:
-                    growth_rate = ((recent - previous) / previous) * 100
-                    scores['trending'] = max(0, min(100, growth_rate))
-                elif recent > 0:
-                    scores['trending'] = 50  # New trending item
-                    
-                # Quality score (based on ratings and flags)
-                cursor.execute("""
-                    SELECT 
-                        AVG(rating) as avg_rating,
-                        COUNT(rating) as rating_count
-                    FROM user_attachment_engagement
-                    WHERE attachment_id = %s AND rating IS NOT NULL
-                """, (attachment_id,))
-                
-                result = cursor.fetchone()
-                avg_rating = result['avg_rating'] if result and result.get('avg_rating') else None
-                rating_count = result['rating_count'] if result and result.get('rating_count') else 0
-                if avg_rating:
-                    # Weight by number of ratings
-                    weight = min(1.0, float(rating_count) / 10)
-                    scores['quality'] = (float(avg_rating) / 5) * 100 * weight
-                    
-                # Bonus for top/seasonal flags
-                cursor.execute("""
-                    SELECT is_top, is_season_top
-                    FROM attachments
-                    WHERE id = %s
-                """, (attachment_id,))
-                
-                result = cursor.fetchone()
-                is_top = bool(result['is_top']) if result else False
-                is_season_top = bool(result['is_season_top']) if result else False
-                if is_top:
-                    scores['quality'] = min(100, scores['quality'] + 10)
-                if is_season_top:
-                    scores['quality'] = min(100, scores['quality'] + 15)
-                
-        except Exception as e:
-            logger.error(f"Error calculating scores for attachment {attachment_id}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            
-        return scores
-        
-    def _update_rankings(self, cursor) -> None:
-        """Update attachment rankings within weapon, category, and overall"""
-        
-        current_date = get_current_date()
-        
-        # Rank within weapon
-        cursor.execute(f"""
-            WITH RankedAttachments AS (
-                SELECT 
-                    a.id,
-                    a.weapon_id,
-                    ap.popularity_score,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY a.weapon_id 
-                        ORDER BY ap.popularity_score DESC
-                    ) as weapon_rank
-                FROM attachments a
-                JOIN attachment_performance ap ON a.id = ap.attachment_id
-                WHERE ap.performance_date = {current_date}
-            )
-            UPDATE attachment_performance
-            SET rank_in_weapon = (
-                SELECT weapon_rank 
-                FROM RankedAttachments 
-                WHERE RankedAttachments.id = attachment_performance.attachment_id
-            )
-            WHERE performance_date = {current_date}
-        """)
-        
-        # Rank overall
-        cursor.execute(f"""
-            WITH RankedAttachments AS (
-                SELECT 
-                    attachment_id,
-                    popularity_score,
-                    ROW_NUMBER() OVER (ORDER BY popularity_score DESC) as overall_rank
-                FROM attachment_performance
-                WHERE performance_date = {current_date}
-            )
-            UPDATE attachment_performance
-            SET rank_overall = (
-                SELECT overall_rank 
-                FROM RankedAttachments 
-                WHERE RankedAttachments.attachment_id = attachment_performance.attachment_id
-            )
-            WHERE performance_date = {current_date}
-        """)
-        
+
     def get_trending_attachments(self, limit: int = 10) -> List[Dict]:
         """Get currently trending attachments"""
         trending = []
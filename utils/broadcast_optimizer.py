@@ -3,9 +3,20 @@
 """
 
 import asyncio
-from typing import List, Callable, Any
+import time
+from typing import List, Callable, Iterable, AsyncIterable, Optional, Union
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from telegram.error import RetryAfter
+
+from config.constants import (
+    BROADCAST_RATE_PER_SECOND,
+    BROADCAST_BURST,
+    BROADCAST_WORKERS,
+    BROADCAST_MAX_RETRY_AFTER,
+)
+from core.security.rate_limiter import PRIORITY_BULK, outbound_priority_kwargs
 from utils.logger import get_logger
 
 logger = get_logger('broadcast', 'broadcast.log')
@@ -22,86 +33,176 @@ class BroadcastTask:
     max_retries: int = 2
 
 
+class TokenBucket:
+    """
+    Token bucket برای pacing پیوسته ارسال‌ها
+
+    - هر acquire یک token مصرف می‌کند؛ tokenها با نرخ rate در ثانیه پر می‌شوند
+    - pause() کل bucket را تا پایان RetryAfter متوقف می‌کند
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        # شروع با یک token تا burst اولیه از سقف ثانیه اول عبور نکند
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self) -> None:
+        """انتظار تا در دسترس بودن یک token (FIFO بین workerها)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """توقف کل bucket (مثلاً در پاسخ به 429) و خالی کردن tokenها"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    value = getattr(error, 'retry_after', 1)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value or 1)
+
+
 class OptimizedBroadcaster:
     """
     سیستم broadcast بهینه شده با:
-    - ارسال موازی (concurrent)
-    - Retry logic هوشمند
-    - Rate limiting خودکار
-    - Progress tracking
+    - pacing پیوسته با token bucket (به جای batch + sleep ثابت)
+    - pool ثابت از workerها که از asyncio.Queue تغذیه می‌شوند
+    - رعایت RetryAfter (429) با توقف کل bucket
+    - Retry logic هوشمند و Progress tracking
     """
     
-    def __init__(self, max_concurrent: int = 30, delay_between_batches: float = 1.0):
+    def __init__(
+        self,
+        max_concurrent: int = BROADCAST_WORKERS,
+        rate_per_second: float = BROADCAST_RATE_PER_SECOND,
+        burst: int = BROADCAST_BURST,
+        on_result: Optional[Callable[[int, str], None]] = None,
+        priority: str = PRIORITY_BULK,
+    ):
         """
         Args:
-            max_concurrent: تعداد maximum ارسال همزمان (Telegram limit: 30/sec)
-            delay_between_batches: تاخیر بین هر batch (ثانیه)
+            max_concurrent: تعداد workerهای ارسال همزمان
+            rate_per_second: سقف نرخ ارسال (Telegram limit: 30/sec)
+            burst: ظرفیت token bucket
+            on_result: callback اختیاری (user_id, status) با status در sent/blocked/failed
+            priority: کلاس اولویت در OutboundDispatcher (پیش‌فرض bulk تا پاسخ‌های interactive جلو بیفتند)
         """
-        self.max_concurrent = max_concurrent
-        self.delay_between_batches = delay_between_batches
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.on_result = on_result
+        self.priority = priority
         self.success_count = 0
         self.fail_count = 0
         self.blocked_users = []
         self.failed_users = []  # non-blocked failures
+        self.retry_after_pauses = 0
+        self._bucket: Optional[TokenBucket] = None
         
     async def broadcast_to_users(
         self,
-        user_ids: List[int],
+        user_ids: Union[Iterable, AsyncIterable],
         send_func: Callable,
         *args,
         **kwargs
     ) -> dict:
         """
-        ارسال پیام به لیست کاربران به صورت موازی و بهینه
+        ارسال پیام به لیست کاربران با نرخ ثابت و workerهای موازی
         
         Args:
-            user_ids: لیست user ID ها
+            user_ids: لیست، iterable یا async iterable (stream) از user ID ها؛
+                هر آیتم می‌تواند (user_id, kwargs اختصاصی) هم باشد که با kwargs ادغام می‌شود.
+                ارسال همزمان با خواندن stream شروع می‌شود.
             send_func: تابع async برای ارسال (مثل context.bot.send_message)
             *args, **kwargs: آرگومان‌های تابع ارسال
         
         Returns:
-            dict با آمار ارسال: {success, failed, blocked_users, duration}
+            dict با آمار ارسال: {success, failed, blocked_users, duration, rate_per_second}
         """
         start_time = datetime.now()
         self.success_count = 0
         self.fail_count = 0
         self.blocked_users = []
         self.failed_users = []
+        self.retry_after_pauses = 0
+        self._bucket = TokenBucket(self.rate_per_second, self.burst)
+        kwargs = dict(outbound_priority_kwargs(send_func, self.priority), **kwargs)
         
-        total_users = len(user_ids)
-        logger.info(f"Starting broadcast to {total_users} users")
+        total_hint = len(user_ids) if hasattr(user_ids, '__len__') else None
+        logger.info(
+            f"Starting broadcast to {total_hint if total_hint is not None else 'streamed'} users "
+            f"({self.max_concurrent} workers, {self.rate_per_second} msg/s)"
+        )
         
-        # تقسیم کاربران به batch های کوچکتر
-        batches = [
-            user_ids[i:i + self.max_concurrent]
-            for i in range(0, len(user_ids), self.max_concurrent)
-        ]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrent * 4)
+        progress_step = max(100, (total_hint or 0) // 10)
         
-        for batch_num, batch in enumerate(batches, 1):
-            logger.info(f"Processing batch {batch_num}/{len(batches)} ({len(batch)} users)")
-            
-            # ایجاد tasks برای این batch
-            tasks = [
-                self._send_to_user(user_id, send_func, *args, **kwargs)
-                for user_id in batch
-            ]
-            
-            # اجرای موازی
-            await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # تاخیر بین batch ها (به جز batch آخر)
-            if batch_num < len(batches):
-                await asyncio.sleep(self.delay_between_batches)
-            
-            # Log progress
-            progress = (batch_num / len(batches)) * 100
-            logger.info(
-                f"Progress: {progress:.1f}% | "
-                f"Success: {self.success_count} | "
-                f"Failed: {self.fail_count}"
-            )
+        async def worker():
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    if isinstance(item, tuple):
+                        user_id, overrides = item
+                        await self._send_to_user(user_id, send_func, *args, **dict(kwargs, **overrides))
+                    else:
+                        await self._send_to_user(item, send_func, *args, **kwargs)
+                    done = self.success_count + self.fail_count
+                    if done % progress_step == 0:
+                        logger.info(
+                            f"Progress: {done}{f'/{total_hint}' if total_hint else ''} | "
+                            f"Success: {self.success_count} | "
+                            f"Failed: {self.fail_count} | "
+                            f"Rate: {done / max((datetime.now() - start_time).total_seconds(), 1e-6):.1f}/s"
+                        )
+                finally:
+                    queue.task_done()
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrent)]
+        total_users = 0
+        try:
+            if hasattr(user_ids, '__aiter__'):
+                async for item in user_ids:
+                    await queue.put(item)
+                    total_users += 1
+            else:
+                for item in user_ids:
+                    await queue.put(item)
+                    total_users += 1
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            raise
         
         duration = (datetime.now() - start_time).total_seconds()
+        sent = self.success_count + self.fail_count
         
         stats = {
             'success': self.success_count,
@@ -110,12 +211,18 @@ class OptimizedBroadcaster:
             'failed_users': self.failed_users,
             'total': total_users,
             'duration_seconds': round(duration, 2),
-            'rate_per_second': round(total_users / duration, 2) if duration > 0 else 0
+            # نرخ واقعی به‌دست‌آمده و حداقل زمان نظری با نرخ bucket
+            'rate_per_second': round(sent / duration, 2) if duration > 0 else 0,
+            'target_rate_per_second': self.rate_per_second,
+            'min_duration_seconds': round(max(0, total_users - 1) / self.rate_per_second, 2),
+            'retry_after_pauses': self.retry_after_pauses,
         }
         
         logger.info(
             f"Broadcast completed: {self.success_count}/{total_users} successful "
-            f"in {duration:.2f}s ({stats['rate_per_second']}/s)"
+            f"in {duration:.2f}s ({stats['rate_per_second']}/s, "
+            f"theoretical min {stats['min_duration_seconds']}s, "
+            f"{self.retry_after_pauses} RetryAfter pauses)"
         )
         
         return stats
@@ -127,22 +234,37 @@ class OptimizedBroadcaster:
         *args,
         **kwargs
     ):
-        """ارسال پیام به یک کاربر با retry logic"""
+        """ارسال پیام به یک کاربر با retry logic (هر تلاش یک token مصرف می‌کند)"""
         
         retry_count = 0
         max_retries = 2
+        retry_after_count = 0
         
         while retry_count <= max_retries:
+            await self._bucket.acquire()
             try:
-                # اضافه کردن chat_id به kwargs
-                kwargs['chat_id'] = user_id
-                
                 # ارسال پیام
-                await send_func(*args, **kwargs)
+                await send_func(*args, **dict(kwargs, chat_id=user_id))
                 
                 self.success_count += 1
+                self._report(user_id, 'sent')
                 logger.debug(f"✓ Sent to user {user_id}")
                 return
+            
+            except RetryAfter as e:
+                # 429: کل bucket متوقف می‌شود تا همه workerها منتظر بمانند
+                wait_time = _retry_after_seconds(e)
+                self._bucket.pause(wait_time)
+                self.retry_after_pauses += 1
+                retry_after_count += 1
+                logger.warning(f"⚠ RetryAfter {wait_time}s (user {user_id}), pausing broadcast")
+                if retry_after_count <= BROADCAST_MAX_RETRY_AFTER:
+                    continue
+                self.fail_count += 1
+                self.failed_users.append(user_id)
+                self._report(user_id, 'failed')
+                logger.error(f"✗ Giving up on user {user_id} after {retry_after_count} RetryAfter responses")
+                return
                 
             except Exception as e:
                 error_str = str(e).lower()
@@ -151,6 +273,7 @@ class OptimizedBroadcaster:
                 if any(keyword in error_str for keyword in ['blocked', 'user is deactivated', 'chat not found']):
                     self.blocked_users.append(user_id)
                     self.fail_count += 1
+                    self._report(user_id, 'blocked')
                     logger.warning(f"✗ User {user_id} blocked/deactivated bot")
                     return
                 
@@ -169,12 +292,18 @@ class OptimizedBroadcaster:
                 # خطای ناشناخته
                 self.fail_count += 1
                 # track failed user for potential fallback by caller
-                try:
-                    self.failed_users.append(user_id)
-                except Exception:
-                    pass
+                self.failed_users.append(user_id)
+                self._report(user_id, 'failed')
                 logger.error(f"✗ Failed to send to user {user_id}: {e}")
                 return
+    
+    def _report(self, user_id: int, status: str) -> None:
+        if self.on_result is None:
+            return
+        try:
+            self.on_result(user_id, status)
+        except Exception as e:
+            logger.warning(f"on_result callback failed for user {user_id}: {e}")
 
 
 # Helper functions برای استفاده آسان
@@ -0,0 +1,149 @@
+"""
+Event Buffer
+پایه مشترک بافرهای ثبت رویداد analytics (جستجو، قیف عضویت کانال):
+صف محدود در حافظه + حلقه flush دوره‌ای که رویدادها را دسته‌ای به یک writer
+(تابع نوشتن batch در دیتابیس) می‌دهد.
+"""
+import asyncio
+import logging
+import queue
+from typing import Any, Callable, List, Optional
+
+from utils.metrics import IngestionQueueMetrics
+
+# writer یک batch رویداد را در دیتابیس می‌نویسد (sync - در executor اجرا می‌شود)
+BatchWriter = Callable[[List[Any]], Any]
+
+
+class EventBuffer:
+    """
+    صف محدود رویدادها که به‌صورت دوره‌ای flush می‌شود.
+    enqueue هیچ I/O انجام نمی‌دهد؛ در صورت پر بودن صف رویداد دور ریخته
+    و در metrics ثبت می‌شود.
+
+    زیرکلاس‌ها enqueue (ساخت tuple رویداد) و _default_writer (ساخت writer
+    هنگام start وقتی writer داده نشده) را پیاده‌سازی می‌کنند.
+    """
+
+    _instance: Optional["EventBuffer"] = None
+
+    def __init__(self, writer: Optional[BatchWriter], metrics: IngestionQueueMetrics,
+                 max_size: int, batch_size: int, flush_interval: float,
+                 logger: logging.Logger, label: str):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_size)
+        self._metrics = metrics
+        self._logger = logger
+        self._label = label
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    @classmethod
+    def get_instance(cls):
+        """singleton هر زیرکلاس (جدا از بقیه زیرکلاس‌ها)"""
+        if cls.__dict__.get('_instance') is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def _default_writer(self) -> BatchWriter:
+        raise NotImplementedError
+
+    def _put(self, event) -> bool:
+        """افزودن یک رویداد به صف (thread-safe، بدون I/O)"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._metrics.record_dropped()
+            return False
+        self._metrics.record_enqueued()
+        return True
+
+    def pending(self) -> int:
+        """تعداد رویدادهای در انتظار flush"""
+        return self._queue.qsize()
+
+    def _drain(self) -> List[Any]:
+        events = []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def flush(self) -> int:
+        """
+        نوشتن یک دسته از صف در دیتابیس (sync - در executor اجرا می‌شود)
+
+        Returns:
+            تعداد رویدادهای نوشته شده
+        """
+        events = self._drain()
+        if not events:
+            return 0
+        try:
+            self.writer(events)
+        except Exception as e:
+            # تلاش مجدد نمی‌کنیم تا صف پشت یک دیتابیس خراب گیر نکند
+            self._metrics.record_flush_error()
+            self._metrics.record_dropped(len(events))
+            self._logger.warning(f"{self._label} flush failed, dropped {len(events)} events: {e}")
+            return 0
+        self._metrics.record_flushed(len(events))
+        self._logger.debug(f"Flushed {len(events)} {self._label.lower()} events")
+        return len(events)
+
+    def flush_all(self) -> int:
+        """خالی کردن کامل صف (برای shutdown)"""
+        total = 0
+        while True:
+            written = self.flush()
+            if not written:
+                break
+            total += written
+        return total
+
+    async def start(self):
+        """شروع حلقه flush دوره‌ای. Safe to call multiple times."""
+        if self._running:
+            return
+        if self.writer is None:
+            self.writer = self._default_writer()
+        self._running = True
+        self._task = asyncio.create_task(self._run_loop())
+        self._logger.info(f"{type(self).__name__} started")
+
+    async def stop(self):
+        """توقف حلقه و flush رویدادهای باقی‌مانده"""
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self.writer is not None:
+            loop = asyncio.get_running_loop()
+            written = await loop.run_in_executor(None, self.flush_all)
+            self._logger.info(f"{type(self).__name__} stopped (flushed {written} pending events)")
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                # تا زمانی که دسته‌های کامل داریم پشت سر هم flush کن
+                while await loop.run_in_executor(None, self.flush) >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._logger.error(f"{self._label} loop error: {e}")
+                await asyncio.sleep(5)
@@ -0,0 +1,56 @@
+"""
+Join Funnel Buffer
+ثبت رویدادهای قیف عضویت کانال (start / تلاش عضویت / عضویت موفق) در صف حافظه
+و نوشتن دسته‌ای آن‌ها با AnalyticsPostgres.write_join_events_batch
+(به‌روزرسانی افزایشی شمارنده‌های روزانه و روزانه-کانال در یک transaction)
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config.constants import (
+    JOIN_FUNNEL_QUEUE_SIZE,
+    JOIN_FUNNEL_BATCH_SIZE,
+    JOIN_FUNNEL_FLUSH_SECONDS,
+)
+from utils.event_buffer import EventBuffer, BatchWriter
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger('join_funnel', 'analytics.log')
+
+# انواع رویداد
+JOIN_EVENT_START = 'start'
+JOIN_EVENT_ATTEMPT = 'attempt'
+JOIN_EVENT_SUCCESS = 'join'
+
+# (kind, user_id, channel_id, created_at)
+JoinEvent = Tuple[str, int, Optional[str], datetime]
+
+
+class JoinFunnelBuffer(EventBuffer):
+    """صف رویدادهای قیف عضویت؛ writer پیش‌فرض analytics.write_join_events_batch است"""
+
+    def __init__(self, analytics=None, max_size: int = JOIN_FUNNEL_QUEUE_SIZE,
+                 batch_size: int = JOIN_FUNNEL_BATCH_SIZE,
+                 flush_interval: float = JOIN_FUNNEL_FLUSH_SECONDS):
+        self.analytics = analytics
+        super().__init__(
+            writer=analytics.write_join_events_batch if analytics is not None else None,
+            metrics=get_metrics().join_funnel_metrics,
+            max_size=max_size, batch_size=batch_size, flush_interval=flush_interval,
+            logger=logger, label='Join funnel',
+        )
+
+    def _default_writer(self) -> BatchWriter:
+        from utils.analytics_pg import AnalyticsPostgres
+        self.analytics = AnalyticsPostgres()
+        return self.analytics.write_join_events_batch
+
+    def enqueue(self, kind: str, user_id: int, channel_id: Optional[str] = None) -> bool:
+        """افزودن یک رویداد به صف (thread-safe، بدون I/O)"""
+        return self._put((kind, user_id, channel_id, datetime.now()))
+
+
+def get_join_funnel_buffer() -> JoinFunnelBuffer:
+    """دریافت singleton instance از JoinFunnelBuffer"""
+    return JoinFunnelBuffer.get_instance()
@@ -160,12 +160,66 @@ class QueryMetrics:
             self.slow_query_log.clear()
 
 
+@dataclass
+class IngestionQueueMetrics:
+    """آمار یک صف ثبت رویداد analytics (بافر جستجو، بافر قیف عضویت کانال)"""
+    enqueued: int = 0
+    flushed: int = 0
+    dropped: int = 0
+    flush_errors: int = 0
+    _lock: Lock = field(default_factory=Lock, repr=False)
+    
+    def record_enqueued(self):
+        """ثبت رویداد وارد شده به صف"""
+        with self._lock:
+            self.enqueued += 1
+    
+    def record_flushed(self, count: int):
+        """ثبت رویدادهای نوشته شده در دیتابیس"""
+        with self._lock:
+            self.flushed += count
+    
+    def record_dropped(self, count: int = 1):
+        """ثبت رویدادهای دور ریخته شده (صف پر یا خطای flush)"""
+        with self._lock:
+            self.dropped += count
+    
+    def record_flush_error(self):
+        """ثبت خطای flush"""
+        with self._lock:
+            self.flush_errors += 1
+    
+    def get_stats(self) -> Dict[str, any]:
+        """
+        دریافت آمار صف
+        
+        Returns:
+            دیکشنری شامل enqueued, flushed, dropped, flush_errors
+        """
+        return {
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors
+        }
+    
+    def reset(self):
+        """ری‌ست کردن آمار"""
+        with self._lock:
+            self.enqueued = 0
+            self.flushed = 0
+            self.dropped = 0
+            self.flush_errors = 0
+
+
 class MetricsCollector:
     """جمع‌آوری و مدیریت تمام metrics"""
     
     def __init__(self):
         self.cache_metrics = CacheMetrics()
         self.query_metrics = QueryMetrics()
+        self.search_analytics_metrics = IngestionQueueMetrics()
+        self.join_funnel_metrics = IngestionQueueMetrics()
         self._start_time = datetime.now()
     
     @property
@@ -178,12 +232,14 @@ class MetricsCollector:
         دریافت تمام آمار
         
         Returns:
-            دیکشنری شامل cache_stats, query_stats, uptime
+            دیکشنری شامل cache_stats, query_stats, search_analytics, join_funnel, uptime
         """
         return {
             "uptime_hours": round(self.uptime.total_seconds() / 3600, 2),
             "cache": self.cache_metrics.get_stats(),
-            "queries": self.query_metrics.get_stats()
+            "queries": self.query_metrics.get_stats(),
+            "search_analytics": self.search_analytics_metrics.get_stats(),
+            "join_funnel": self.join_funnel_metrics.get_stats()
         }
     
     def generate_report(self) -> str:
@@ -211,6 +267,18 @@ class MetricsCollector:
   • Slow Queries: {stats['queries']['slow_queries']:,}
   • Slow Rate: {stats['queries']['slow_query_rate']*100:.2f}%
   • Avg Duration: {stats['queries']['average_duration_ms']:.2f}ms
+
+🔎 **Search Analytics Queue**:
+  • Enqueued: {stats['search_analytics']['enqueued']:,}
+  • Flushed: {stats['search_analytics']['flushed']:,}
+  • Dropped: {stats['search_analytics']['dropped']:,}
+  • Flush Errors: {stats['search_analytics']['flush_errors']:,}
+
+📢 **Join Funnel Queue**:
+  • Enqueued: {stats['join_funnel']['enqueued']:,}
+  • Flushed: {stats['join_funnel']['flushed']:,}
+  • Dropped: {stats['join_funnel']['dropped']:,}
+  • Flush Errors: {stats['join_funnel']['flush_errors']:,}
 """
         return report.strip()
     
@@ -218,6 +286,8 @@ class MetricsCollector:
         """ری‌ست کردن تمام آمار"""
         self.cache_metrics.reset()
         self.query_metrics.reset()
+        self.search_analytics_metrics.reset()
+        self.join_funnel_metrics.reset()
         self._start_time = datetime.now()
 
 
@@ -0,0 +1,82 @@
+"""
+Bitmask نرمال‌شده تنظیمات نوتیفیکیشن کاربر
+
+تنظیمات JSONB جدول user_notification_preferences (enabled, modes, events) در
+ستون subscribers.notify_mask به یک عدد صحیح تبدیل می‌شود تا کوئری مخاطبان
+به جای jsonb/unnest برای هر مشترک، فقط یک AND بیتی روی ایندکس باشد.
+
+    bit 0        enabled
+    bit 1..7     modes (br, mp)
+    bit 8..      events
+
+کاربر بدون رکورد تنظیمات = همه بیت‌ها (NOTIFY_MASK_ALL)؛ غیرفعال = 0.
+رویداد جدید باید اینجا بیت بگیرد و در migration برای ردیف‌های موجود backfill شود.
+"""
+from typing import Iterable, Optional, Tuple
+
+NOTIFY_ENABLED_BIT = 1 << 0
+
+NOTIFY_MODE_BITS = {
+    'br': 1 << 1,
+    'mp': 1 << 2,
+}
+
+NOTIFY_EVENT_BITS = {
+    'add_attachment': 1 << 8,
+    'edit_name': 1 << 9,
+    'edit_image': 1 << 10,
+    'edit_code': 1 << 11,
+    'delete_attachment': 1 << 12,
+    'top_set': 1 << 13,
+    'top_added': 1 << 14,
+    'top_removed': 1 << 15,
+}
+
+NOTIFY_MASK_ALL = NOTIFY_ENABLED_BIT
+for _bit in list(NOTIFY_MODE_BITS.values()) + list(NOTIFY_EVENT_BITS.values()):
+    NOTIFY_MASK_ALL |= _bit
+
+
+def preferences_to_mask(preferences: Optional[dict]) -> int:
+    """تبدیل dict تنظیمات (enabled/modes/events) به notify_mask"""
+    if not preferences:
+        return NOTIFY_MASK_ALL
+    if not preferences.get('enabled', True):
+        return 0
+    mask = NOTIFY_ENABLED_BIT
+    for mode in preferences.get('modes', list(NOTIFY_MODE_BITS)) or []:
+        mask |= NOTIFY_MODE_BITS.get(mode, 0)
+    events = preferences.get('events') or {}
+    for event, bit in NOTIFY_EVENT_BITS.items():
+        # کلید غایب = فعال (همان رفتار قبلی JSONB)
+        if events.get(event, True):
+            mask |= bit
+    return mask
+
+
+def audience_bits(event_types: Optional[Iterable[str]] = None, mode: Optional[str] = None) -> Tuple[int, int]:
+    """
+    بیت‌های فیلتر مخاطبان: (mode_bits, event_bits)
+
+    کاربر در مخاطبان است اگر (notify_mask & mode_bits) <> 0 و (notify_mask & event_bits) <> 0.
+    بدون فیلتر یا با رویداد ناشناخته (پیش‌فرض فعال) بیت enabled کافی است.
+    """
+    mode_bits = NOTIFY_MODE_BITS.get(mode, 0) if mode else NOTIFY_ENABLED_BIT
+    event_bits = 0
+    for event in event_types or []:
+        bit = NOTIFY_EVENT_BITS.get(event)
+        if bit is None:
+            event_bits = NOTIFY_ENABLED_BIT
+            break
+        event_bits |= bit
+    return mode_bits, event_bits or NOTIFY_ENABLED_BIT
+
+
+def mask_sql(alias: str = 'p') -> str:
+    """عبارت SQL محاسبه notify_mask از ستون‌های JSONB (برای backfill)"""
+    parts = [str(NOTIFY_ENABLED_BIT)]
+    for mode, bit in NOTIFY_MODE_BITS.items():
+        parts.append(f"(CASE WHEN {alias}.modes ? '{mode}' THEN {bit} ELSE 0 END)")
+    for event, bit in NOTIFY_EVENT_BITS.items():
+        parts.append(f"(CASE WHEN COALESCE(({alias}.events->>'{event}')::boolean, TRUE) THEN {bit} ELSE 0 END)")
+    return f"(CASE WHEN NOT {alias}.enabled THEN 0 ELSE {' | '.join(parts)} END)"
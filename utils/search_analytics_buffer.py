@@ -0,0 +1,53 @@
+"""
+Search Analytics Buffer
+ثبت رویدادهای جستجو در صف حافظه و نوشتن دسته‌ای آن‌ها در دیتابیس
+(COPY به search_history + upsert تجمیعی popular_searches)
+"""
+from datetime import datetime
+from typing import Tuple
+
+from config.constants import (
+    SEARCH_ANALYTICS_QUEUE_SIZE,
+    SEARCH_ANALYTICS_BATCH_SIZE,
+    SEARCH_ANALYTICS_FLUSH_SECONDS,
+)
+from utils.event_buffer import EventBuffer, BatchWriter
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger('search_analytics', 'analytics.log')
+
+# (user_id, query, results_count, execution_time_ms, created_at)
+SearchEvent = Tuple[int, str, int, float, datetime]
+
+
+class SearchAnalyticsBuffer(EventBuffer):
+    """صف رویدادهای جستجو؛ writer پیش‌فرض db.write_search_events_batch است"""
+
+    def __init__(self, db=None, max_size: int = SEARCH_ANALYTICS_QUEUE_SIZE,
+                 batch_size: int = SEARCH_ANALYTICS_BATCH_SIZE,
+                 flush_interval: float = SEARCH_ANALYTICS_FLUSH_SECONDS):
+        self.db = db
+        super().__init__(
+            writer=db.write_search_events_batch if db is not None else None,
+            metrics=get_metrics().search_analytics_metrics,
+            max_size=max_size, batch_size=batch_size, flush_interval=flush_interval,
+            logger=logger, label='Search analytics',
+        )
+
+    def _default_writer(self) -> BatchWriter:
+        from core.database.database_adapter import get_database_adapter
+        self.db = get_database_adapter()
+        return self.db.write_search_events_batch
+
+    def enqueue(self, user_id: int, query: str, results_count: int,
+                execution_time_ms: float) -> bool:
+        """افزودن یک رویداد جستجو به صف (thread-safe، بدون I/O)"""
+        return self._put(
+            (user_id, query, int(results_count or 0), float(execution_time_ms or 0.0), datetime.now())
+        )
+
+
+def get_search_analytics_buffer() -> SearchAnalyticsBuffer:
+    """دریافت singleton instance از SearchAnalyticsBuffer"""
+    return SearchAnalyticsBuffer.get_instance()
@@ -0,0 +1,182 @@
+"""
+رتبه‌بندی نتایج جستجو
+ترکیب ارتباط متنی (exact / prefix / trigram) با محبوبیت از پیش محاسبه‌شده
+(engagement) و تازگی اتچمنت. ویژگی‌های متنی در کوئری کاندیدا (SQL) محاسبه
+می‌شوند؛ اینجا فقط ستون‌ها در یک ماتریس numpy چیده، نرمال و در بردار وزن ضرب
+می‌شوند. امتیاز fuzzy (fuzzywuzzy) فقط برای N نتیجه نهایی حساب می‌شود.
+"""
+import math
+import os
+from dataclasses import dataclass, fields, asdict
+from typing import List, Dict, Optional, Sequence
+
+from fuzzywuzzy import fuzz
+
+from config.constants import SEARCH_MAX_RESULTS
+from utils.logger import get_logger
+
+try:  # numpy اختیاری است؛ در نبود آن ضرب ماتریسی با پایتون خالص انجام می‌شود
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = get_logger('search.ranking', 'user.log')
+
+# ترتیب ستون‌های ماتریس ویژگی‌ها (هم‌نام فیلدهای RankingWeights)
+FEATURES = ('exact', 'prefix', 'trigram', 'popularity', 'recency', 'season_top', 'top')
+
+# ستون‌های کاندیدا (خروجی SQL) به ترتیب FEATURES؛ popularity و age_days بعداً تبدیل می‌شوند
+SQL_COLUMNS = ('exact', 'prefix', 'trgm', 'popularity', 'age_days', 'is_season_top', 'is_top')
+
+
+@dataclass
+class RankingWeights:
+    """وزن هر ویژگی در امتیاز نهایی"""
+    exact: float = 5.0
+    prefix: float = 2.5
+    trigram: float = 2.0
+    fuzzy: float = 1.0
+    popularity: float = 1.5
+    recency: float = 0.5
+    season_top: float = 0.6
+    top: float = 0.3
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "RankingWeights":
+        """
+        ساخت وزن‌ها از رشته‌ای مثل "exact=6,popularity=2"
+        کلیدهای ناشناخته نادیده گرفته می‌شوند.
+        """
+        weights = cls()
+        if not spec:
+            return weights
+        valid = {f.name for f in fields(cls)}
+        for part in spec.split(','):
+            if '=' not in part:
+                continue
+            key, value = (p.strip() for p in part.split('=', 1))
+            if key not in valid:
+                logger.warning(f"Unknown ranking weight '{key}' ignored")
+                continue
+            try:
+                setattr(weights, key, float(value))
+            except ValueError:
+                logger.warning(f"Invalid value for ranking weight '{key}': {value}")
+        return weights
+
+    @classmethod
+    def from_env(cls) -> "RankingWeights":
+        return cls.parse(os.getenv('SEARCH_RANK_WEIGHTS', ''))
+
+    def as_vector(self) -> List[float]:
+        """وزن ستون‌های ماتریس (fuzzy جدا و فقط روی نتایج نهایی اعمال می‌شود)"""
+        return [getattr(self, name) for name in FEATURES]
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+class SearchRanker:
+    """
+    رتبه‌بندی کاندیداهای جستجو
+
+    هر کاندیدا یک dict تخت است (خروجی get_search_candidates / get_alias_candidates)
+    با ستون‌های SQL_COLUMNS:
+        exact, prefix (ویژگی متنی از SQL), trgm (similarity / word_similarity),
+        popularity (شمارش engagement), age_days (سن اتچمنت به روز), is_season_top, is_top
+    و name / weapon برای امتیاز fuzzy نتایج نهایی.
+    """
+
+    def __init__(self, weights: Optional[RankingWeights] = None, recency_half_life_days: float = 30.0,
+                 fuzzy_top_n: int = SEARCH_MAX_RESULTS):
+        self.weights = weights or RankingWeights.from_env()
+        self.recency_half_life_days = recency_half_life_days
+        self.fuzzy_top_n = fuzzy_top_n
+
+    def feature_matrix(self, candidates: Sequence[Dict]):
+        """
+        ساخت ماتریس ویژگی‌ها (n × len(FEATURES)) از ستون‌های SQL
+
+        popularity با log1p و تقسیم بر بیشینه به [0, 1] و age_days با نیمه‌عمر
+        recency_half_life_days به امتیاز تازگی تبدیل می‌شود (ستونی، بدون حلقه).
+        """
+        rows = [[float(c.get(col) or 0) for col in SQL_COLUMNS] for c in candidates]
+        for row, cand in zip(rows, candidates):
+            if cand.get('age_days') is None:
+                row[4] = math.inf  # بدون created_at: امتیاز تازگی صفر
+        if np is None:
+            return self._feature_matrix_py(rows)
+        m = np.asarray(rows, dtype=float).reshape(len(rows), len(SQL_COLUMNS))
+        pop = np.log1p(np.clip(m[:, 3], 0.0, None))
+        max_pop = pop.max() if len(pop) else 0.0
+        m[:, 3] = pop / max_pop if max_pop > 0 else 0.0
+        m[:, 4] = 0.5 ** (np.clip(m[:, 4], 0.0, None) / self.recency_half_life_days)
+        return m
+
+    def _feature_matrix_py(self, rows: List[List[float]]) -> List[List[float]]:
+        """معادل پایتون خالص feature_matrix (در نبود numpy)"""
+        pops = [math.log1p(max(0.0, r[3])) for r in rows]
+        max_pop = max(pops) if pops else 0.0
+        for r, pop in zip(rows, pops):
+            r[3] = pop / max_pop if max_pop > 0 else 0.0
+            r[4] = 0.5 ** (max(0.0, r[4]) / self.recency_half_life_days)
+        return rows
+
+    def score(self, candidates: Sequence[Dict]) -> List[float]:
+        """امتیاز پایه هر کاندیدا (ماتریس ویژگی‌ها × بردار وزن)"""
+        if not candidates:
+            return []
+        matrix = self.feature_matrix(candidates)
+        vector = self.weights.as_vector()
+        if np is not None:
+            return (matrix @ np.asarray(vector, dtype=float)).tolist()
+        return [sum(f * w for f, w in zip(row, vector)) for row in matrix]
+
+    def _fuzzy(self, q: str, cand: Dict) -> float:
+        name = (cand.get('name') or '').lower()
+        weapon = (cand.get('weapon') or '').lower()
+        return max(fuzz.partial_ratio(q, name) if name else 0,
+                   fuzz.partial_ratio(q, weapon) if weapon else 0) / 100.0
+
+    def rank(self, query: str, candidates: Sequence[Dict], limit: Optional[int] = None) -> List[Dict]:
+        """
+        مرتب‌سازی کاندیداها بر اساس امتیاز (نزولی)
+
+        امتیاز fuzzy فقط برای min(limit, fuzzy_top_n) کاندیدای برتر حساب و به
+        امتیاز پایه اضافه می‌شود؛ چون فقط امتیاز را بالا می‌برد، این سرگروه
+        بعد از مرتب‌سازی دوباره همچنان بالای بقیه می‌ماند.
+
+        Returns:
+            لیست کاندیداها با کلید اضافه 'rank_score'
+        """
+        scores = self.score(candidates)
+        if np is not None:
+            order = np.argsort(-np.asarray(scores, dtype=float), kind='stable').tolist()
+        else:
+            order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        if limit:
+            order = order[:limit]
+
+        head_n = min(len(order), self.fuzzy_top_n)
+        q = ' '.join((query or '').lower().split())
+        ranked = []
+        for pos, idx in enumerate(order):
+            item = dict(candidates[idx])
+            s = scores[idx]
+            if pos < head_n and self.weights.fuzzy:
+                s += self.weights.fuzzy * self._fuzzy(q, item)
+            item['rank_score'] = round(s, 4)
+            ranked.append(item)
+        ranked[:head_n] = sorted(ranked[:head_n], key=lambda c: c['rank_score'], reverse=True)
+        return ranked
+
+
+_ranker: Optional[SearchRanker] = None
+
+
+def get_search_ranker() -> SearchRanker:
+    """دریافت singleton instance از SearchRanker (وزن‌ها از SEARCH_RANK_WEIGHTS)"""
+    global _ranker
+    if _ranker is None:
+        _ranker = SearchRanker()
+    return _ranker
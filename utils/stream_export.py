@@ -0,0 +1,132 @@
+"""
+Streaming CSV export
+خروجی query با COPY ... TO STDOUT به صورت chunk مستقیماً در یک فایل موقت
+.csv.gz نوشته می‌شود؛ حافظه مصرفی مستقل از تعداد ردیف‌هاست. ارسال فایل و
+گزارش پیشرفت برای exportهای طولانی در یک background task انجام می‌شود.
+"""
+import os
+import gzip
+import asyncio
+import codecs
+import tempfile
+from typing import Callable, Optional, Sequence, Tuple
+
+from config.constants import EXPORT_GZIP_LEVEL, EXPORT_PROGRESS_INTERVAL_SECONDS
+from utils.logger import get_logger
+
+logger = get_logger('stream_export', 'admin.log')
+
+
+class ExportProgress:
+    """
+    شمارنده پیشرفت export؛ worker داخل executor می‌نویسد و task ارسال پیام می‌خواند
+    """
+
+    def __init__(self, total_files: int = 1):
+        self.total_files = total_files
+        self.files_done = 0
+        self.rows = 0
+        self.bytes_written = 0
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes_written += n
+
+    def file_done(self, rows: int) -> None:
+        self.files_done += 1
+        self.rows += rows
+
+
+def format_size(n: int) -> str:
+    """نمایش حجم به صورت KB/MB"""
+    size = n / 1024
+    if size > 1024:
+        return f"{size / 1024:.2f} MB"
+    return f"{size:.2f} KB"
+
+
+def copy_query_to_csv_gz(
+    conn,
+    select_sql: str,
+    params: Optional[Sequence] = None,
+    prefix: str = 'export',
+    directory: Optional[str] = None,
+    progress: Optional[ExportProgress] = None,
+) -> Tuple[str, int]:
+    """
+    اجرای COPY (select_sql) TO STDOUT و نوشتن chunk به chunk در فایل .csv.gz
+
+    نام ستون‌های CSV همان aliasهای select_sql هستند (HEADER).
+
+    Returns:
+        (مسیر فایل، تعداد ردیف)
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=".csv.gz", dir=directory)
+    os.close(fd)
+    try:
+        cursor = conn.cursor()
+        with gzip.open(path, 'wb', compresslevel=EXPORT_GZIP_LEVEL) as out:
+            # BOM برای باز شدن درست متن فارسی در Excel
+            out.write(codecs.BOM_UTF8)
+            with cursor.copy(f"COPY ({select_sql}) TO STDOUT WITH (FORMAT CSV, HEADER)", params) as copy:
+                for chunk in copy:
+                    out.write(chunk)
+                    if progress is not None:
+                        progress.add_bytes(len(chunk))
+        rows = max(cursor.rowcount, 0)
+        cursor.close()
+    except Exception:
+        os.remove(path)
+        raise
+    if progress is not None:
+        progress.file_done(rows)
+    return path, rows
+
+
+async def run_with_progress(
+    worker: Callable,
+    progress: ExportProgress,
+    status_message=None,
+    render: Optional[Callable[[ExportProgress], str]] = None,
+    interval: float = EXPORT_PROGRESS_INTERVAL_SECONDS,
+):
+    """
+    اجرای worker در executor و به‌روزرسانی دوره‌ای status_message با render(progress)
+
+    Returns:
+        خروجی worker
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, worker)
+    last_text = None
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=interval)
+        if done:
+            break
+        if status_message is None or render is None:
+            continue
+        text = render(progress)
+        if text != last_text:
+            try:
+                await status_message.edit_text(text)
+                last_text = text
+            except Exception as e:
+                logger.debug(f"Export progress edit failed: {e}")
+    return future.result()
+
+
+async def send_and_remove(message, path: str, filename: Optional[str] = None, caption: Optional[str] = None) -> None:
+    """ارسال فایل به صورت document و حذف فایل موقت"""
+    try:
+        with open(path, 'rb') as f:
+            await message.reply_document(
+                document=f,
+                filename=filename or os.path.basename(path),
+                caption=caption
+            )
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -3,10 +3,19 @@
 این ماژول جایگزین subscribers.py می‌شود و از PostgreSQL استفاده می‌کند
 """
 from __future__ import annotations
+import asyncio
 import os
-from typing import List
+from typing import List, Dict, Optional, Sequence, Iterable, AsyncIterator
 import logging
 
+from config.constants import (
+    SUBSCRIBER_STREAM_BATCH_SIZE,
+    SUBSCRIBER_REMOVE_CHUNK_SIZE,
+    CACHE_TTL_NOTIFICATION_AUDIENCE,
+)
+from core.cache.cache_manager import get_cache
+from utils.notification_mask import NOTIFY_MASK_ALL, preferences_to_mask, audience_bits, mask_sql
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +66,31 @@ class SubscribersPostgres:
                 );
                 """
             )
+            # notify_mask: تنظیمات نوتیفیکیشن نرمال‌شده (utils/notification_mask.py)
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'subscribers' AND column_name = 'notify_mask'
+            """)
+            if cur.fetchone() is None:
+                cur.execute(
+                    f"ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS notify_mask INTEGER NOT NULL DEFAULT {NOTIFY_MASK_ALL}"
+                )
+                cur.execute("SELECT to_regclass('user_notification_preferences') AS t")
+                row = cur.fetchone()
+                if row and row['t']:
+                    cur.execute(f"""
+                        UPDATE subscribers s
+                        SET notify_mask = {mask_sql('p')}
+                        FROM user_notification_preferences p
+                        WHERE p.user_id = s.user_id
+                    """)
+                    logger.info(f"subscribers.notify_mask backfilled ({cur.rowcount} rows)")
+            # covering index: کوئری مخاطبان index-only scan می‌شود
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_subscribers_notify
+                ON subscribers (user_id) INCLUDE (notify_mask)
+                WHERE is_active = TRUE
+            """)
             conn.commit()
     def add(self, user_id: int) -> bool:
         """
@@ -97,11 +131,11 @@ class SubscribersPostgres:
                         cursor.close()
                         return False  # قبلاً فعال بوده
                 else:
-                    # کاربر جدید
+                    # کاربر جدید (mask از تنظیمات ذخیره‌شده، در غیر این صورت همه فعال)
                     cursor.execute("""
-                        INSERT INTO subscribers (user_id, is_active)
-                        VALUES (%s, TRUE)
-                    """, (user_id,))
+                        INSERT INTO subscribers (user_id, is_active, notify_mask)
+                        VALUES (%s, TRUE, %s)
+                    """, (user_id, self._preferences_mask(user_id)))
                     conn.commit()
                     cursor.close()
                     logger.info(f"New subscriber added: {user_id}")
@@ -111,6 +145,12 @@ class SubscribersPostgres:
             logger.error(f"Error adding subscriber {user_id}: {e}")
             return False
     
+    def _preferences_mask(self, user_id: int) -> int:
+        try:
+            return preferences_to_mask(self.db.get_user_notification_preferences(user_id))
+        except Exception:
+            return NOTIFY_MASK_ALL
+    
     def remove(self, user_id: int) -> bool:
         """
         حذف کاربر از لیست مشترکین (soft delete با is_active=False)
@@ -146,9 +186,54 @@ class SubscribersPostgres:
             logger.error(f"Error removing subscriber {user_id}: {e}")
             return False
     
+    def remove_many(self, user_ids: Iterable[int], chunk_size: int = SUBSCRIBER_REMOVE_CHUNK_SIZE) -> int:
+        """
+        حذف دسته‌ای مشترکین (soft delete) - برای پاکسازی کاربران blocked بعد از broadcast
+        
+        همه chunkها روی یک connection اجرا می‌شوند و هر chunk جداگانه commit می‌شود
+        تا خطا در یک chunk کل پاکسازی را برنگرداند.
+        
+        Args:
+            user_ids: شناسه کاربران (تکراری‌ها نادیده گرفته می‌شوند)
+            chunk_size: تعداد شناسه در هر UPDATE
+            
+        Returns:
+            تعداد مشترکینی که غیرفعال شدند
+        """
+        ids = sorted({int(uid) for uid in user_ids})
+        if not ids:
+            return 0
+        
+        removed = 0
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                for i in range(0, len(ids), chunk_size):
+                    chunk = ids[i:i + chunk_size]
+                    try:
+                        cursor.execute("""
+                            UPDATE subscribers 
+                            SET is_active = FALSE 
+                            WHERE user_id = ANY(%s) AND is_active = TRUE
+                        """, (chunk,))
+                        removed += cursor.rowcount or 0
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        logger.error(f"Error removing subscribers chunk {i // chunk_size}: {e}")
+                cursor.close()
+        except Exception as e:
+            logger.error(f"Error removing subscribers: {e}")
+        
+        if removed:
+            get_cache().invalidate_pattern('notif_audience:')
+            logger.info(f"Subscribers removed: {removed}/{len(ids)}")
+        return removed
+    
     def all(self) -> List[int]:
         """
         دریافت لیست تمام مشترکین فعال
+        برای broadcast از stream() / stream_ids() استفاده کنید (حافظه ثابت).
         
         Returns:
             لیست user_id های مشترکین فعال
@@ -172,6 +257,129 @@ class SubscribersPostgres:
         except Exception as e:
             logger.error(f"Error getting all subscribers: {e}")
             return []
+
+    def fetch_page(
+        self,
+        after_user_id: int = 0,
+        limit: int = SUBSCRIBER_STREAM_BATCH_SIZE,
+        with_language: bool = False,
+        event_types: Optional[Sequence[str]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        یک صفحه از مشترکین فعال بعد از after_user_id (keyset روی PK)
+        
+        Args:
+            with_language: افزودن ستون language از جدول users
+            event_types: فقط کاربرانی که حداقل یکی از این رویدادها برایشان فعال است
+            mode: فقط کاربرانی که این mode (br/mp) را فعال دارند
+        
+        Returns:
+            لیست dict با کلیدهای user_id (و language در صورت درخواست)
+        """
+        columns = ["s.user_id"]
+        joins = []
+        where = ["s.is_active = TRUE", "s.user_id > %s"]
+        params: list = [after_user_id]
+        
+        if with_language:
+            columns.append("u.language")
+            joins.append("LEFT JOIN users u ON u.user_id = s.user_id")
+        
+        if event_types or mode:
+            # فیلتر بیتی روی notify_mask (کاربر بدون تنظیمات = همه بیت‌ها)
+            mode_bits, event_bits = audience_bits(event_types, mode)
+            where.append("(s.notify_mask & %s) <> 0 AND (s.notify_mask & %s) <> 0")
+            params.extend([mode_bits, event_bits])
+        
+        params.append(limit)
+        query = f"""
+            SELECT {', '.join(columns)}
+            FROM subscribers s
+            {' '.join(joins)}
+            WHERE {' AND '.join(where)}
+            ORDER BY s.user_id
+            LIMIT %s
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(params))
+            rows = [dict(r) for r in cursor.fetchall()]
+            cursor.close()
+        return rows
+    
+    async def stream(
+        self,
+        batch_size: int = SUBSCRIBER_STREAM_BATCH_SIZE,
+        with_language: bool = False,
+        event_types: Optional[Sequence[str]] = None,
+        mode: Optional[str] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Async generator مشترکین فعال به ترتیب user_id
+        
+        به جای server-side cursor از keyset pagination استفاده می‌شود تا در طول
+        یک broadcast طولانی هیچ connection/transaction از pool نگه داشته نشود.
+        صفحه بعد همزمان با مصرف صفحه فعلی خوانده می‌شود؛ حافظه به اندازه دو صفحه ثابت است.
+        """
+        loop = asyncio.get_running_loop()
+        
+        def fetch(after: int):
+            return self.fetch_page(after, batch_size, with_language, event_types, mode)
+        
+        pending = loop.run_in_executor(None, fetch, 0)
+        while True:
+            page = await pending
+            if not page:
+                return
+            if len(page) < batch_size:
+                pending = None
+            else:
+                pending = loop.run_in_executor(None, fetch, page[-1]['user_id'])
+            for row in page:
+                yield row
+            if pending is None:
+                return
+    
+    async def stream_ids(self, batch_size: int = SUBSCRIBER_STREAM_BATCH_SIZE, **filters) -> AsyncIterator[int]:
+        """Async generator شناسه مشترکین فعال (برای ارسال مستقیم به broadcaster)"""
+        async for row in self.stream(batch_size=batch_size, **filters):
+            yield row['user_id']
+    
+    def audience_size(self, event_types: Optional[Sequence[str]] = None, mode: Optional[str] = None) -> int:
+        """
+        تعداد مخاطبان یک نوتیفیکیشن (برای پیش‌نمایش reach در پنل ادمین)
+        
+        نتیجه برای هر (مجموعه رویداد، mode) در cache نگه داشته می‌شود؛ با تغییر
+        تنظیمات کاربر یا پاکسازی دسته‌ای invalidate می‌شود و در بقیه موارد
+        حداکثر به اندازه CACHE_TTL_NOTIFICATION_AUDIENCE قدیمی است.
+        """
+        key = f"notif_audience:{mode or '*'}:{','.join(sorted(event_types or [])) or '*'}"
+        cache = get_cache()
+        cached_count = cache.get(key)
+        if cached_count is not None:
+            return cached_count
+        
+        mode_bits, event_bits = audience_bits(event_types, mode)
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT COUNT(*) AS count
+                    FROM subscribers
+                    WHERE is_active = TRUE
+                      AND (notify_mask & %s) <> 0
+                      AND (notify_mask & %s) <> 0
+                """, (mode_bits, event_bits))
+                row = cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            logger.error(f"Error counting notification audience: {e}")
+            return 0
+        
+        count = int(row.get('count') or 0) if row else 0
+        cache.set(key, count, ttl=CACHE_TTL_NOTIFICATION_AUDIENCE)
+        return count
     
     def count(self) -> int:
         """